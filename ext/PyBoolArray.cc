@@ -11,8 +11,11 @@
 //----------------------------------------------------------------------
 
 #include <cassert>
+#include <cerrno>
 #include <cstring>
 #include <string>
+#include <sys/mman.h>
+#include <unistd.h>
 
 #include "PyBoolArray.hh"
 #include "python.hh"
@@ -32,7 +35,10 @@ namespace {
 //----------------------------------------------------------------------
 
 PyBoolArray::PyBoolArray(int length)
-  : length_(length)
+  : length_(length),
+    capacity_(length),
+    map_address_(NULL),
+    map_size_(0)
 {
   // Compute the number of unsigned chars required to store this many
   // bits.  
@@ -45,10 +51,35 @@ PyBoolArray::PyBoolArray(int length)
 }
 
 
+PyBoolArray::PyBoolArray(int fd,
+			 off64_t offset,
+			 int length,
+			 int capacity)
+  : length_(length),
+    capacity_(capacity)
+{
+  assert(length <= capacity);
+  // Map the file from the start of the page containing 'offset'.
+  off64_t page_size = getpagesize();
+  off64_t map_offset = offset - offset % page_size;
+  map_size_ = offset - map_offset + (capacity + 7) / 8;
+  map_address_ = mmap64(NULL, map_size_, PROT_READ | PROT_WRITE,
+			MAP_SHARED, fd, map_offset);
+  if (map_address_ == MAP_FAILED) {
+    map_address_ = NULL;
+    throw Exception(PyExc_IOError, "mmap: %s", strerror(errno));
+  }
+  bits_ = (unsigned char*) map_address_ + (offset - map_offset);
+}
+
+
 PyBoolArray::~PyBoolArray()
 {
   assert(bits_ != NULL);
-  delete [] bits_;
+  if (map_address_ != NULL)
+    munmap(map_address_, map_size_);
+  else
+    delete [] bits_;
 }
 
 
@@ -21,6 +21,7 @@
 //----------------------------------------------------------------------
 
 #include <algorithm>
+#include <sys/types.h>
 
 #include "python.hh"
 
@@ -33,6 +34,15 @@ struct PyBoolArray
 {
   static PyTypeObject type;
   static PyBoolArray* New(int length);
+
+  /* Create an array stored in a shared mapping of a file.
+
+     The bits are stored in file 'fd' starting at byte 'offset'.  The
+     array has 'length' bits, but may be lengthened to 'capacity' bits
+     without moving them.  Changes to the array are written to the
+     file.  */
+  static PyBoolArray* Map(int fd, off64_t offset, int length, 
+			  int capacity);
   static bool Check(PyObject* object);
 
   /* Register this type for pickling.
@@ -50,6 +60,7 @@ struct PyBoolArray
   static Py::Ref<Object> unpickle_function_;
 
   PyBoolArray(int length);
+  PyBoolArray(int fd, off64_t offset, int length, int capacity);
   ~PyBoolArray();
 
   void clear();
@@ -63,6 +74,14 @@ struct PyBoolArray
   // The buffer containing the value bits.
   unsigned char* bits_;
 
+  // The number of bits for which there is room in 'bits_'.
+  int capacity_;
+
+  // If the bits are stored in a mapped file, the address and size of
+  // the mapping; otherwise NULL.
+  void* map_address_;
+  size_t map_size_;
+
   // The number of bytes allocated to store the bits.
   size_t getAllocation() const { return (length_ + 7) / 8; }
 
@@ -87,6 +106,27 @@ PyBoolArray::New(int length)
 }
 
 
+inline PyBoolArray*
+PyBoolArray::Map(int fd,
+		 off64_t offset,
+		 int length,
+		 int capacity)
+{
+  // Construct the Python object.
+  PyBoolArray* result = Py::allocate<PyBoolArray>();
+  // Perform C++ construction.
+  try {
+    new(result) PyBoolArray(fd, offset, length, capacity);
+  }
+  catch (Py::Exception) {
+    Py::deallocate(result);
+    throw;
+  }
+
+  return result;
+}
+
+
 inline bool
 PyBoolArray::Check(PyObject* object)
 {
@@ -0,0 +1,209 @@
+//----------------------------------------------------------------------
+//
+// PyColumnArray.cc
+//
+// Copyright 2003 by Alex Samuel.  All rights reserved.
+//
+//----------------------------------------------------------------------
+
+//----------------------------------------------------------------------
+// includes
+//----------------------------------------------------------------------
+
+#include <cassert>
+#include <cerrno>
+#include <cstring>
+#include <sys/mman.h>
+#include <unistd.h>
+
+#include "PyColumnArray.hh"
+#include "python.hh"
+
+using namespace Py;
+
+//----------------------------------------------------------------------
+// method definitions
+//----------------------------------------------------------------------
+
+PyColumnArray::PyColumnArray(int fd,
+			     off64_t offset,
+			     Value::Type value_type,
+			     int length,
+			     int capacity)
+  : value_type_(value_type),
+    length_(length),
+    capacity_(capacity)
+{
+  assert(value_type == Value::TYPE_LONG || value_type == Value::TYPE_DOUBLE);
+  assert(length <= capacity);
+  // Map the file from the start of the page containing 'offset'.
+  off64_t page_size = getpagesize();
+  off64_t map_offset = offset - offset % page_size;
+  map_size_ = offset - map_offset + capacity * getItemSize(value_type);
+  map_address_ = mmap64(NULL, map_size_, PROT_READ | PROT_WRITE,
+			MAP_SHARED, fd, map_offset);
+  if (map_address_ == MAP_FAILED) {
+    map_address_ = NULL;
+    throw Exception(PyExc_IOError, "mmap: %s", strerror(errno));
+  }
+  data_ = (char*) map_address_ + (offset - map_offset);
+}
+
+
+PyColumnArray::~PyColumnArray()
+{
+  assert(map_address_ != NULL);
+  munmap(map_address_, map_size_);
+}
+
+
+//----------------------------------------------------------------------
+// function definitions
+//----------------------------------------------------------------------
+
+namespace {
+
+void
+tp_dealloc(PyColumnArray* self)
+try {
+  // Perform C++ deallocation.
+  self->~PyColumnArray();
+  // Free memory for the Python object.
+  PyMem_DEL(self);
+}
+catch (Exception) {
+}
+
+
+PyObject*
+tp_str(PyColumnArray* self)
+try {
+  return String::FromFormat
+    ("ColumnArray('%c', %d, ...)",
+     self->value_type_ == Value::TYPE_LONG ? 'l' : 'd', self->length_);
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_buffer_info(PyColumnArray* self)
+try {
+  return Py_BuildValue("(ll)", (long) self->data_, self->length_);
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyMethodDef
+tp_methods[] = {
+  { "buffer_info", (PyCFunction) method_buffer_info, METH_NOARGS, NULL },
+  { NULL, NULL, 0, NULL }
+};
+
+
+int
+sq_length(PyColumnArray* self)
+try {
+  return self->length_;
+}
+catch (Exception) {
+  return -1;
+}
+
+
+PyObject*
+sq_item(PyColumnArray* self,
+	int index)
+try {
+  self->checkIndex(index);
+
+  return self->get(index).cast_as_object();
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+int
+sq_ass_item(PyColumnArray* self,
+	    int index,
+	    Object* value)
+try {
+  self->checkIndex(index);
+
+  if (self->value_type_ == Value::TYPE_LONG)
+    self->set(index, Value::make(value->IntAsLong()));
+  else
+    self->set(index, Value::make(value->FloatAsDouble()));
+  return 0;
+}
+catch (Exception) {
+  return -1;
+}
+
+
+PySequenceMethods
+tp_as_sequence = {
+  (inquiry) sq_length,                  // sq_length
+  (binaryfunc) NULL,                    // sq_concat
+  (intargfunc) NULL,                    // sq_repeat
+  (intargfunc) sq_item,                 // sq_item
+  (intintargfunc) NULL,                 // sq_slice
+  (intobjargproc) sq_ass_item,          // sq_ass_item
+  (intintobjargproc) NULL,              // sq_ass_slice
+  (objobjproc) NULL,                    // sq_contains
+  (binaryfunc) NULL,                    // sq_inplace_concat
+  (intargfunc) NULL,                    // sq_inplace_repeat
+};
+
+
+}  // anonymous namespace
+
+
+PyTypeObject
+PyColumnArray::type = {
+  PyObject_HEAD_INIT(&PyType_Type)
+  0,                                    // ob_size
+  "ColumnArray",                        // tp_name
+  sizeof(PyColumnArray),                // tp_size
+  0,                                    // tp_itemsize
+  (destructor) tp_dealloc,              // tp_dealloc
+  NULL,                                 // tp_print
+  NULL,                                 // tp_getattr
+  NULL,                                 // tp_setattr
+  NULL,                                 // tp_compare
+  (reprfunc) tp_str,                    // tp_repr
+  NULL,                                 // tp_as_number
+  &tp_as_sequence,                      // tp_as_sequence
+  NULL,                                 // tp_as_mapping
+  NULL,                                 // tp_hash
+  NULL,                                 // tp_call
+  (reprfunc) tp_str,                    // tp_str
+  NULL,                                 // tp_getattro
+  NULL,                                 // tp_setattro
+  NULL,                                 // tp_as_buffer
+  Py_TPFLAGS_DEFAULT,                   // tp_flags
+  NULL,                                 // tp_doc
+  NULL,                                 // tp_traverse
+  NULL,                                 // tp_clear
+  NULL,                                 // tp_richcompare
+  0,                                    // tp_weaklistoffset
+  NULL,                                 // tp_iter
+  NULL,                                 // tp_iternext
+  tp_methods,                           // tp_methods
+  NULL,                                 // tp_members
+  NULL,                                 // tp_getset
+  NULL,                                 // tp_base
+  NULL,                                 // tp_dict
+  NULL,                                 // tp_descr_get
+  NULL,                                 // tp_descr_set
+  0,                                    // tp_dictoffset
+  NULL,                                 // tp_init
+  NULL,                                 // tp_alloc
+  NULL,                                 // tp_new
+};
+
+
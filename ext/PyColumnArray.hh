@@ -0,0 +1,146 @@
+//----------------------------------------------------------------------
+//
+// PyColumnArray.hh
+//
+// Copyright 2003 by Alex Samuel.  All rights reserved.
+//
+//----------------------------------------------------------------------
+
+/* Numerical array extension class, stored in a mapped file.
+
+   Like the standard 'array' module's arrays of type 'l' or 'd', except
+   that the elements are stored in a shared mapping of a file, so
+   changes are written to the file.  */
+
+#ifndef __PYCOLUMNARRAY_HH__
+#define __PYCOLUMNARRAY_HH__
+
+//----------------------------------------------------------------------
+// includes
+//----------------------------------------------------------------------
+
+#include <sys/types.h>
+
+#include "python.hh"
+#include "value.hh"
+
+//----------------------------------------------------------------------
+// classes
+//----------------------------------------------------------------------
+
+struct PyColumnArray
+  : public Py::Object
+{
+  static PyTypeObject type;
+
+  /* Create an array stored in a shared mapping of a file.
+
+     The elements are stored in file 'fd' starting at byte 'offset'.
+     'value_type' is 'Value::TYPE_LONG' for elements of type 'long', or
+     'Value::TYPE_DOUBLE' for elements of type 'double'.  The array has
+     'length' elements, but may be lengthened to 'capacity' elements
+     without moving them.  */
+  static PyColumnArray* Map(int fd, off64_t offset, Value::Type value_type,
+			    int length, int capacity);
+  static bool Check(PyObject* object);
+
+  /* Return the size of an element of type 'value_type'.  */
+  static size_t getItemSize(Value::Type value_type);
+
+  PyColumnArray(int fd, off64_t offset, Value::Type value_type,
+		int length, int capacity);
+  ~PyColumnArray();
+
+  Value get(int index) const;
+  void set(int index, const Value& value);
+  void checkIndex(int index) const;
+
+  // The type of the elements.
+  Value::Type value_type_;
+
+  // The number of elements in the array.
+  int length_;
+
+  // The number of elements for which there is room in 'data_'.
+  int capacity_;
+
+  // The buffer containing the elements.
+  char* data_;
+
+  // The address and size of the mapping containing 'data_'.
+  void* map_address_;
+  size_t map_size_;
+
+};
+
+
+inline PyColumnArray*
+PyColumnArray::Map(int fd,
+		   off64_t offset,
+		   Value::Type value_type,
+		   int length,
+		   int capacity)
+{
+  // Construct the Python object.
+  PyColumnArray* result = Py::allocate<PyColumnArray>();
+  // Perform C++ construction.
+  try {
+    new(result) PyColumnArray(fd, offset, value_type, length, capacity);
+  }
+  catch (Py::Exception) {
+    Py::deallocate(result);
+    throw;
+  }
+
+  return result;
+}
+
+
+inline bool
+PyColumnArray::Check(PyObject* object)
+{
+  return ((Object*) object)->IsInstance(&type);
+}
+
+
+inline size_t
+PyColumnArray::getItemSize(Value::Type value_type)
+{
+  return value_type == Value::TYPE_LONG ? sizeof(long) : sizeof(double);
+}
+
+
+inline Value
+PyColumnArray::get(int index)
+  const
+{
+  if (value_type_ == Value::TYPE_LONG)
+    return Value::make(((const long*) data_)[index]);
+  else
+    return Value::make(((const double*) data_)[index]);
+}
+
+
+inline void
+PyColumnArray::set(int index,
+		   const Value& value)
+{
+  if (value_type_ == Value::TYPE_LONG)
+    ((long*) data_)[index] = value.cast_as_long();
+  else
+    ((double*) data_)[index] = value.cast_as_double();
+}
+
+
+inline void
+PyColumnArray::checkIndex(int index)
+  const
+{
+  if (index < 0 || index >= length_)
+    throw Py::Exception(PyExc_IndexError, "%d", index);
+}
+
+
+//----------------------------------------------------------------------
+
+#endif  // #ifndef __PYCOLUMNARRAY_HH__
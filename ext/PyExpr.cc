@@ -10,6 +10,7 @@
 // includes
 //----------------------------------------------------------------------
 
+#include <algorithm>
 #include <cassert>
 #include <iostream>
 #include <vector>
@@ -68,6 +69,8 @@ public:
 
   bool isEmpty() const { return stack_.empty(); }
 
+  int size() const { return stack_.size(); }
+
 private:
 
   std::vector<Value> stack_;
@@ -267,6 +270,10 @@ getSymbolValueFromRow(Mapping* row,
   if (name_index < (int) column_index_map.size()
       && (index = column_index_map[name_index]) >= 0) {
     table::Row* row = row_obj->getRow();
+    // The values of jagged columns aren't in the row; they're looked
+    // up like other names.
+    if (row->getSchema()->getColumn(index).getType() == table::TYPE_JAGGED)
+      return Value();
     return row->getValue(index);
   }
   else 
@@ -274,6 +281,69 @@ getSymbolValueFromRow(Mapping* row,
 }
 
 
+/* Get the values of jagged symbol 'name_index'.
+
+   If 'symbols' is a row of a table in which the symbol is a jagged
+   column, the values are read from the table.  Otherwise, the symbol's
+   value must be a sequence of numbers.
+
+   'token' -- Returned by 'symbols.get' for missing symbols.
+
+   'values' -- If not NULL, filled with the values.
+
+   returns -- The number of values.  */
+
+int
+getJaggedValues(Mapping* symbols,
+		bool is_row,
+		int name_index,
+		PyObject* token,
+		std::vector<double>* values)
+{
+  if (is_row) {
+    PyRow* row_obj = (PyRow*) symbols;
+    std::vector<short>& column_index_map = 
+      row_obj->table_->column_index_map_;
+    table::Table* table = row_obj->table_->table_.get();
+    int index;
+    if (name_index < (int) column_index_map.size()
+	&& (index = column_index_map[name_index]) >= 0
+	&& table->getSchema()->getColumn(index).getType() 
+	   == table::TYPE_JAGGED) {
+      table::JaggedRef ref = 
+	table::getJaggedRef(row_obj->getRow()->getValueData(index));
+      if (values != NULL) {
+	values->resize(ref.count_);
+	if (ref.count_ > 0)
+	  try {
+	    table->readJagged(index, ref.start_, ref.count_, &(*values)[0]);
+	  }
+	  catch (table::FileError error) {
+	    throw Exception(PyExc_IOError, "%s", error.message_.c_str());
+	  }
+      }
+      return ref.count_;
+    }
+  }
+
+  Ref<String> key = symbol_name_table.get(name_index);
+  Ref<Object> value = symbols->CallMethodObjArgs("get", key, token, NULL);
+  if ((PyObject*) value == token)
+    throw Exception(PyExc_KeyError, "%s", key->AsString());
+  int length = PyObject_Length(value);
+  THROW_IF_MINUS_ONE(length);
+  if (values != NULL) {
+    values->resize(length);
+    for (int i = 0; i < length; ++i) {
+      Ref<Object> item = PySequence_GetItem(value, i);
+      THROW_IF_NULL(item);
+      (*values)[i] = item->FloatAsDouble();
+    }
+  }
+  return length;
+}
+
+
 /* Apply a math function to the double value at the top of the stack.
 
    Use this macro only in 'evaluate', below.  Pop a double value off the
@@ -290,11 +360,17 @@ getSymbolValueFromRow(Mapping* row,
   } while (false)
 
 
-Value
+/* Evaluate 'operations' on 'symbols'.
+
+   'outputs' -- Filled with the values the operations leave on the
+   stack, bottom first.  Its size is the number of values expected.  */
+
+void
 evaluate(const Operation* operations,
 	 int num_operations,
 	 Mapping* symbols,
-	 bool is_row)
+	 bool is_row,
+	 std::vector<Value>& outputs)
 {
   const static bool trace = false;
 
@@ -319,6 +395,8 @@ evaluate(const Operation* operations,
   }
 
   Stack st;
+  // Values of subexpressions shared by several outputs.
+  std::vector<Value> temporaries;
   int position = 0;
   while (position < num_operations) {
     const Operation& op = operations[position];
@@ -350,6 +428,18 @@ evaluate(const Operation* operations,
 	advance = 1 + ARG1_LONG;
       break;
 
+    case Operation::OP_TEMPORARY_SET:
+      l0 = ARG1_LONG;
+      if (l0 >= (long) temporaries.size())
+	temporaries.resize(l0 + 1);
+      temporaries[l0] = st.pop();
+      break;
+
+    case Operation::OP_TEMPORARY_GET:
+      assert(ARG1_LONG < (long) temporaries.size());
+      PUSH(temporaries[ARG1_LONG]);
+      break;
+
     //------------------------------------------------------------------
     // operations resulting in a 'long'
 
@@ -381,6 +471,36 @@ evaluate(const Operation* operations,
       }
       break;
 
+    case Operation::OP_LONG_CACHE_GET:
+      {
+	unsigned char* mask_bits = (unsigned char*) ARG1_LONG;
+	int length = ARG3_LONG;
+	int index = ((PyRow*) symbols)->index_;
+	// Is the index in the range of the cache, and do we have a
+	// cached value for this index?
+	if (index < length
+	    && (mask_bits[index / 8] & (1 << (index % 8))) != 0) {
+	  // Yes.  Push the value, and skip the operations that would
+	  // have computed it.
+	  PUSH(((long*) ARG2_LONG)[index]);
+	  advance = 1 + ARG4_LONG;
+	}
+      }
+      break;
+
+    case Operation::OP_LONG_CACHE_SET:
+      {
+	unsigned char* mask_bits = (unsigned char*) ARG1_LONG;
+	int length = ARG3_LONG;
+	int index = ((PyRow*) symbols)->index_;
+	// Make sure we're in the range of the cache.
+	if (index < length) {
+	  mask_bits[index / 8] |= (1 << (index % 8));
+	  ((long*) ARG2_LONG)[index] = PEEK_LONG;
+	}
+      }
+      break;
+
     case Operation::OP_LONG_CAST_FROM_DOUBLE:
       d0 = POP_DOUBLE;
       if (d0 + 1 >= LONG_MAX || d0 - 1 < LONG_MIN)
@@ -536,6 +656,10 @@ evaluate(const Operation* operations,
       PUSH((l0 & (1 << l1)) != 0);
       break;
 
+    case Operation::OP_LONG_JAGGED_LEN:
+      PUSH((long) getJaggedValues(symbols, is_row, ARG1_LONG, token, NULL));
+      break;
+
     //------------------------------------------------------------------
     // operations resulting in a 'double'
 
@@ -557,6 +681,36 @@ evaluate(const Operation* operations,
       }
       break;
 
+    case Operation::OP_DOUBLE_CACHE_GET:
+      {
+	unsigned char* mask_bits = (unsigned char*) ARG1_LONG;
+	int length = ARG3_LONG;
+	int index = ((PyRow*) symbols)->index_;
+	// Is the index in the range of the cache, and do we have a
+	// cached value for this index?
+	if (index < length
+	    && (mask_bits[index / 8] & (1 << (index % 8))) != 0) {
+	  // Yes.  Push the value, and skip the operations that would
+	  // have computed it.
+	  PUSH(((double*) ARG2_LONG)[index]);
+	  advance = 1 + ARG4_LONG;
+	}
+      }
+      break;
+
+    case Operation::OP_DOUBLE_CACHE_SET:
+      {
+	unsigned char* mask_bits = (unsigned char*) ARG1_LONG;
+	int length = ARG3_LONG;
+	int index = ((PyRow*) symbols)->index_;
+	// Make sure we're in the range of the cache.
+	if (index < length) {
+	  mask_bits[index / 8] |= (1 << (index % 8));
+	  ((double*) ARG2_LONG)[index] = PEEK_DOUBLE;
+	}
+      }
+      break;
+
     case Operation::OP_DOUBLE_CAST_FROM_LONG: 
       PUSH((double) POP_LONG);
       break;
@@ -749,6 +903,47 @@ evaluate(const Operation* operations,
       }
       break;
 
+    case Operation::OP_DOUBLE_JAGGED_SUM:
+      {
+	std::vector<double> values;
+	getJaggedValues(symbols, is_row, ARG1_LONG, token, &values);
+	d0 = 0;
+	for (unsigned i = 0; i < values.size(); ++i)
+	  d0 += values[i];
+	PUSH(d0);
+      }
+      break;
+
+    case Operation::OP_DOUBLE_JAGGED_MAX:
+    case Operation::OP_DOUBLE_JAGGED_MIN:
+      {
+	std::vector<double> values;
+	getJaggedValues(symbols, is_row, ARG1_LONG, token, &values);
+	if (values.size() == 0)
+	  throw Exception(PyExc_ValueError, "%s() arg is an empty sequence",
+			  op.type_ == Operation::OP_DOUBLE_JAGGED_MAX 
+			  ? "max" : "min");
+	if (op.type_ == Operation::OP_DOUBLE_JAGGED_MAX)
+	  PUSH(*std::max_element(values.begin(), values.end()));
+	else
+	  PUSH(*std::min_element(values.begin(), values.end()));
+      }
+      break;
+
+    case Operation::OP_DOUBLE_JAGGED_INDEX:
+      {
+	l0 = POP_LONG;
+	std::vector<double> values;
+	getJaggedValues(symbols, is_row, ARG1_LONG, token, &values);
+	// Negative indices count from the end, as for sequences.
+	if (l0 < 0)
+	  l0 += values.size();
+	if (l0 < 0 || l0 >= (long) values.size())
+	  throw Exception(PyExc_IndexError, "index out of range");
+	PUSH(values[l0]);
+      }
+      break;
+
     //------------------------------------------------------------------
     // operations resulting in a 'bool'
 
@@ -964,6 +1159,17 @@ evaluate(const Operation* operations,
       }
       break;
 
+    case Operation::OP_BOOL_JAGGED_ANY:
+      {
+	std::vector<double> values;
+	getJaggedValues(symbols, is_row, ARG1_LONG, token, &values);
+	b0 = false;
+	for (unsigned i = 0; i < values.size() && ! b0; ++i)
+	  b0 = values[i] != 0;
+	PUSH(b0);
+      }
+      break;
+
     case Operation::OP_BOOL_EQUALS_OBJECT:  
       {
 	Ref<Object> o1 = POP_OBJECT;
@@ -1226,13 +1432,12 @@ evaluate(const Operation* operations,
     position += advance;
   }
 
-  Value result = st.pop();
-  if (! st.isEmpty()) {
-    std::cerr << "ERROR: Non-empty stack after evaluating a compiled "
-	      << "expression.\n";
-    abort();
-  }
-  return result;
+  if (st.size() != (int) outputs.size())
+    throw Exception(PyExc_ValueError, 
+		    "expression has %d values, not %d outputs",
+		    st.size(), (int) outputs.size());
+  for (int i = outputs.size() - 1; i >= 0; --i)
+    outputs[i] = st.pop();
 }
 
 
@@ -1244,7 +1449,8 @@ evaluate(const Operation* operations,
 
 PyExpr::PyExpr()
   : num_operations_(0),
-    type_(newRef(None))
+    type_(newRef(None)),
+    num_outputs_(1)
 {
   len_operations_ = 4;
   operations_ = (Operation*) malloc(len_operations_ * sizeof(Operation));
@@ -1290,11 +1496,1013 @@ PyExpr::evaluate(Py::Mapping* symbols)
 }
 
 
-inline Value 
+Value 
 PyExpr::evaluate(Py::Mapping* symbols,
 		 bool is_row)
 {
-  return ::evaluate(operations_, num_operations_, symbols, is_row);
+  if (num_outputs_ != 1)
+    throw Exception(PyExc_ValueError, 
+		    "expression has %d outputs", num_outputs_);
+  std::vector<Value> outputs(1);
+  ::evaluate(operations_, num_operations_, symbols, is_row, outputs);
+  return outputs[0];
+}
+
+
+void
+PyExpr::evaluateOutputs(Py::Mapping* symbols,
+			std::vector<Value>& outputs)
+{
+  outputs.resize(num_outputs_);
+  ::evaluate(operations_, num_operations_, symbols, 
+	     symbols->IsInstance(&PyRow::type), outputs);
+}
+
+
+//----------------------------------------------------------------------
+// class BatchEvaluator
+//----------------------------------------------------------------------
+
+namespace {
+
+/* Convert 'count' values of type 'TYPE' in 'data' to the type of
+   'vector'.  */
+
+template<typename TYPE>
+void
+convertColumn(const char* data,
+	      int count,
+	      bool is_bool,
+	      BatchEvaluator::Vector& vector)
+{
+  const TYPE* values = (const TYPE*) data;
+  switch (vector.type_) {
+  case Value::TYPE_LONG:
+    vector.longs_.resize(count);
+    for (int i = 0; i < count; ++i)
+      vector.longs_[i] = is_bool ? (values[i] != 0) : (long) values[i];
+    break;
+
+  case Value::TYPE_DOUBLE:
+    vector.doubles_.resize(count);
+    for (int i = 0; i < count; ++i)
+      vector.doubles_[i] = is_bool ? (values[i] != 0) : (double) values[i];
+    break;
+
+  case Value::TYPE_BOOL:
+    vector.bools_.resize(count);
+    for (int i = 0; i < count; ++i)
+      vector.bools_[i] = (values[i] != 0);
+    break;
+
+  default:
+    abort();
+  }
+}
+
+
+void
+convertColumn(table::ColumnType type,
+	      const char* data,
+	      int count,
+	      BatchEvaluator::Vector& vector)
+{
+  switch (type) {
+  case table::TYPE_BOOL:
+    convertColumn<int8_t>(data, count, true, vector);
+    break;
+  case table::TYPE_INT_8:
+    convertColumn<int8_t>(data, count, false, vector);
+    break;
+  case table::TYPE_INT_16:
+    convertColumn<int16_t>(data, count, false, vector);
+    break;
+  case table::TYPE_INT_32:
+    convertColumn<int32_t>(data, count, false, vector);
+    break;
+  case table::TYPE_FLOAT_32:
+    convertColumn<float>(data, count, false, vector);
+    break;
+  case table::TYPE_FLOAT_64:
+    convertColumn<double>(data, count, false, vector);
+    break;
+  default:
+    abort();
+  }
+}
+
+
+/* Convenience macros for use in 'BatchEvaluator::evaluate', below.
+
+   Each applies 'STATEMENT' to the values of the vectors at the top of
+   the stack, which are of type 'TYPE' and are stored in the member
+   'IN'.  The first value, 'x0', is from the top of the stack.
+   'STATEMENT' must store the result in 'result', which is of type
+   'RESULT_TYPE' and is stored in the member 'OUT'.  'STATEMENT' may
+   return false to indicate that the evaluation failed.  The arguments
+   are popped off the stack, and the results pushed on.  */
+
+#define BATCH_UNARY(TYPE, IN, RESULT_TYPE, OUT, TYPE_CODE, STATEMENT)   \
+  do {                                                                  \
+    Vector& v0 = stack_[depth - 1];                                     \
+    v0.OUT.resize(count);                                               \
+    for (int i = 0; i < count; ++i) {                                   \
+      TYPE x0 = v0.IN[i];                                               \
+      RESULT_TYPE result;                                               \
+      STATEMENT;                                                        \
+      v0.OUT[i] = result;                                               \
+    }                                                                   \
+    v0.type_ = TYPE_CODE;                                               \
+  } while (false)
+
+#define BATCH_BINARY(TYPE, IN, RESULT_TYPE, OUT, TYPE_CODE, STATEMENT)  \
+  do {                                                                  \
+    Vector& v0 = stack_[depth - 1];                                     \
+    Vector& v1 = stack_[depth - 2];                                     \
+    v1.OUT.resize(count);                                               \
+    for (int i = 0; i < count; ++i) {                                   \
+      TYPE x0 = v0.IN[i];                                               \
+      TYPE x1 = v1.IN[i];                                               \
+      RESULT_TYPE result;                                               \
+      STATEMENT;                                                        \
+      v1.OUT[i] = result;                                               \
+    }                                                                   \
+    v1.type_ = TYPE_CODE;                                               \
+    --depth;                                                            \
+  } while (false)
+
+#define BATCH_TERNARY(TYPE, IN, RESULT_TYPE, OUT, TYPE_CODE, STATEMENT) \
+  do {                                                                  \
+    Vector& v0 = stack_[depth - 1];                                     \
+    Vector& v1 = stack_[depth - 2];                                     \
+    Vector& v2 = stack_[depth - 3];                                     \
+    v2.OUT.resize(count);                                               \
+    for (int i = 0; i < count; ++i) {                                   \
+      TYPE x0 = v0.IN[i];                                               \
+      TYPE x1 = v1.IN[i];                                               \
+      TYPE x2 = v2.IN[i];                                               \
+      RESULT_TYPE result;                                               \
+      STATEMENT;                                                        \
+      v2.OUT[i] = result;                                               \
+    }                                                                   \
+    v2.type_ = TYPE_CODE;                                               \
+    depth -= 2;                                                         \
+  } while (false)
+
+#define BATCH_LONG(STATEMENT)                                           \
+  BATCH_UNARY(long, longs_, long, longs_, Value::TYPE_LONG, STATEMENT)
+#define BATCH_LONG_2(STATEMENT)                                         \
+  BATCH_BINARY(long, longs_, long, longs_, Value::TYPE_LONG, STATEMENT)
+#define BATCH_DOUBLE(STATEMENT)                                         \
+  BATCH_UNARY(double, doubles_, double, doubles_, Value::TYPE_DOUBLE,   \
+	      STATEMENT)
+#define BATCH_DOUBLE_2(STATEMENT)                                       \
+  BATCH_BINARY(double, doubles_, double, doubles_, Value::TYPE_DOUBLE,  \
+	       STATEMENT)
+#define BATCH_BOOL_2(STATEMENT)                                         \
+  BATCH_BINARY(char, bools_, char, bools_, Value::TYPE_BOOL, STATEMENT)
+#define BATCH_COMPARE_LONG(STATEMENT)                                   \
+  BATCH_BINARY(long, longs_, char, bools_, Value::TYPE_BOOL, STATEMENT)
+#define BATCH_COMPARE_DOUBLE(STATEMENT)                                 \
+  BATCH_BINARY(double, doubles_, char, bools_, Value::TYPE_BOOL,        \
+	       STATEMENT)
+
+/* Apply a math function to the double values at the top of the stack,
+   failing if any result is not finite, like 'PUSH_MATH_FN'.  */
+#define BATCH_MATH_FN(FUNCTION)                                         \
+  BATCH_DOUBLE(result = FUNCTION(x0); if (! finite(result)) return false)
+
+}  // anonymous namespace
+
+
+BatchEvaluator::BatchEvaluator(const PyExpr* expr,
+			       PyTable* table)
+  : expr_(expr),
+    table_(table),
+    valid_(true),
+    op_columns_(expr->num_operations_, -1),
+    result_(NULL)
+{
+  static int index_name_index = symbol_name_table.find("_index");
+  const std::vector<short>& column_index_map = table->column_index_map_;
+  const table::Schema* schema = table->table_->getSchema();
+
+  for (int o = 0; o < expr->num_operations_ && valid_; ++o) {
+    const Operation& op = expr->operations_[o];
+    switch (op.type_) {
+    case Operation::OP_PUSH:
+      valid_ = op.arg1_.getType() == Value::TYPE_LONG
+	|| op.arg1_.getType() == Value::TYPE_DOUBLE
+	|| op.arg1_.getType() == Value::TYPE_BOOL;
+      break;
+
+    case Operation::OP_LONG_SYMBOL:
+    case Operation::OP_DOUBLE_SYMBOL:
+    case Operation::OP_BOOL_SYMBOL:
+      {
+	int name_index = op.arg1_.cast_as_long();
+	// '_index' is computed from the row number.
+	if (op.type_ == Operation::OP_LONG_SYMBOL 
+	    && name_index == index_name_index)
+	  break;
+	// Other symbols must be columns of the table.
+	int column_index;
+	if (name_index >= (int) column_index_map.size()
+	    || (column_index = column_index_map[name_index]) < 0) {
+	  valid_ = false;
+	  break;
+	}
+	table::ColumnType type = schema->getColumn(column_index).getType();
+	if (type == table::TYPE_COMPLEX_64 || type == table::TYPE_COMPLEX_128) {
+	  valid_ = false;
+	  break;
+	}
+	// Read each column only once.
+	std::vector<int>::iterator column = 
+	  std::find(columns_.begin(), columns_.end(), column_index);
+	op_columns_[o] = column - columns_.begin();
+	if (column == columns_.end())
+	  columns_.push_back(column_index);
+      }
+      break;
+
+    case Operation::OP_LONG_CAST_FROM_DOUBLE:
+    case Operation::OP_LONG_CAST_FROM_BOOL:
+    case Operation::OP_LONG_ABS:
+    case Operation::OP_LONG_NEGATE:
+    case Operation::OP_LONG_ADD:
+    case Operation::OP_LONG_SUBTRACT:
+    case Operation::OP_LONG_MULTIPLY:
+    case Operation::OP_LONG_SQUARE:
+    case Operation::OP_LONG_FLOOR_DIVIDE:
+    case Operation::OP_LONG_REMAINDER:
+    case Operation::OP_LONG_EXPONENTIATE:
+    case Operation::OP_LONG_MAX:
+    case Operation::OP_LONG_MIN:
+    case Operation::OP_LONG_BITWISE_NOT:
+    case Operation::OP_LONG_BITWISE_AND:
+    case Operation::OP_LONG_BITWISE_OR:
+    case Operation::OP_LONG_BITWISE_XOR:
+    case Operation::OP_LONG_SHIFT_LEFT:
+    case Operation::OP_LONG_SHIFT_RIGHT:
+    case Operation::OP_LONG_GET_BIT:
+    case Operation::OP_DOUBLE_CAST_FROM_LONG:
+    case Operation::OP_DOUBLE_CAST_FROM_BOOL:
+    case Operation::OP_DOUBLE_ABS:
+    case Operation::OP_DOUBLE_NEGATE:
+    case Operation::OP_DOUBLE_ADD:
+    case Operation::OP_DOUBLE_SUBTRACT:
+    case Operation::OP_DOUBLE_MULTIPLY:
+    case Operation::OP_DOUBLE_SQUARE:
+    case Operation::OP_DOUBLE_DIVIDE:
+    case Operation::OP_DOUBLE_REMAINDER:
+    case Operation::OP_DOUBLE_EXPONENTIATE:
+    case Operation::OP_DOUBLE_EXP:
+    case Operation::OP_DOUBLE_LOG:
+    case Operation::OP_DOUBLE_SQRT:
+    case Operation::OP_DOUBLE_HYPOT:
+    case Operation::OP_DOUBLE_SIN:
+    case Operation::OP_DOUBLE_COS:
+    case Operation::OP_DOUBLE_TAN:
+    case Operation::OP_DOUBLE_ASIN:
+    case Operation::OP_DOUBLE_ACOS:
+    case Operation::OP_DOUBLE_ATAN:
+    case Operation::OP_DOUBLE_ATAN2:
+    case Operation::OP_DOUBLE_SINH:
+    case Operation::OP_DOUBLE_COSH:
+    case Operation::OP_DOUBLE_TANH:
+    case Operation::OP_DOUBLE_ASINH:
+    case Operation::OP_DOUBLE_ACOSH:
+    case Operation::OP_DOUBLE_ATANH:
+    case Operation::OP_DOUBLE_FLOOR:
+    case Operation::OP_DOUBLE_CEIL:
+    case Operation::OP_DOUBLE_MAX:
+    case Operation::OP_DOUBLE_MIN:
+    case Operation::OP_DOUBLE_GAUSSIAN:
+    case Operation::OP_BOOL_CAST_FROM_DOUBLE:
+    case Operation::OP_BOOL_CAST_FROM_LONG:
+    case Operation::OP_BOOL_NOT:
+    case Operation::OP_BOOL_AND:
+    case Operation::OP_BOOL_AND_LAZY:
+    case Operation::OP_BOOL_OR:
+    case Operation::OP_BOOL_OR_LAZY:
+    case Operation::OP_BOOL_XOR:
+    case Operation::OP_BOOL_EQUALS_LONG:
+    case Operation::OP_BOOL_LESS_THAN_LONG:
+    case Operation::OP_BOOL_LESS_THAN_OR_EQUAL_LONG:
+    case Operation::OP_BOOL_EQUALS_DOUBLE:
+    case Operation::OP_BOOL_LESS_THAN_DOUBLE:
+    case Operation::OP_BOOL_LESS_THAN_OR_EQUAL_DOUBLE:
+    case Operation::OP_BOOL_IN_RANGE_DOUBLE:
+    case Operation::OP_BOOL_IN_RANGE_LONG:
+    case Operation::OP_BOOL_NEAR_DOUBLE:
+    case Operation::OP_BOOL_NEAR_LONG:
+      break;
+
+    case Operation::OP_LONG_JAGGED_LEN:
+    case Operation::OP_DOUBLE_JAGGED_SUM:
+    case Operation::OP_DOUBLE_JAGGED_MAX:
+    case Operation::OP_DOUBLE_JAGGED_MIN:
+    case Operation::OP_DOUBLE_JAGGED_INDEX:
+    case Operation::OP_BOOL_JAGGED_ANY:
+      {
+	// The symbol must be a jagged column of the table.
+	int name_index = op.arg1_.cast_as_long();
+	int column_index;
+	if (name_index >= (int) column_index_map.size()
+	    || (column_index = column_index_map[name_index]) < 0
+	    || schema->getColumn(column_index).getType() 
+	       != table::TYPE_JAGGED) {
+	  valid_ = false;
+	  break;
+	}
+	std::vector<int>::iterator column = 
+	  std::find(columns_.begin(), columns_.end(), column_index);
+	op_columns_[o] = column - columns_.begin();
+	if (column == columns_.end())
+	  columns_.push_back(column_index);
+      }
+      break;
+
+    case Operation::OP_LONG_CACHE_GET:
+    case Operation::OP_DOUBLE_CACHE_GET:
+    case Operation::OP_BOOL_CACHE_GET:
+      // The operations that compute a value that isn't cached are
+      // never evaluated on blocks; see 'evaluate'.
+      o += op.arg4_.cast_as_long();
+      break;
+
+    case Operation::OP_TEMPORARY_SET:
+      if (op.arg1_.cast_as_long() >= (long) temporaries_.size())
+	temporaries_.resize(op.arg1_.cast_as_long() + 1);
+      break;
+
+    case Operation::OP_TEMPORARY_GET:
+      break;
+
+    default:
+      // Jumps and operations on Python objects must be evaluated row by
+      // row.
+      valid_ = false;
+    }
+  }
+
+  buffers_.resize(columns_.size());
+  decoded_buffers_.resize(columns_.size());
+  jagged_values_.resize(columns_.size());
+  jagged_starts_.resize(columns_.size());
+}
+
+
+bool
+BatchEvaluator::evaluate(int64_t start,
+			 int count)
+{
+  assert(valid_);
+  assert(count > 0 && count <= block_size);
+  const table::Schema* schema = table_->table_->getSchema();
+  result_ = NULL;
+
+  // Block evaluation uses no Python objects, so let other threads run
+  // while reading and evaluating.
+  AllowThreads allow_threads;
+
+  // Read the values of the columns the expression uses.
+  int num_columns = columns_.size();
+  std::vector<char*> buffers(num_columns);
+  for (int c = 0; c < num_columns; ++c) {
+    size_t size = table::getTypeSize(schema->getColumn(columns_[c]).getType());
+    buffers_[c].resize(count * size);
+    buffers[c] = &buffers_[c][0];
+  }
+  if (num_columns > 0)
+    table_->table_->readColumns(columns_, start, count, buffers);
+  // Decode the values of packed columns.
+  for (int c = 0; c < num_columns; ++c) {
+    table::ColumnType type = schema->getColumn(columns_[c]).getType();
+    table::ColumnType value_type = table::getValueType(type);
+    if (value_type != type) {
+      decoded_buffers_[c].resize(count * table::getTypeSize(value_type));
+      table::decodeColumn(schema, columns_[c], buffers[c], count, 
+			  &decoded_buffers_[c][0]);
+      buffers[c] = &decoded_buffers_[c][0];
+    }
+  }
+
+  // The values of jagged columns are read when first used.
+  std::vector<bool> jagged_read(num_columns, false);
+
+  int depth = 0;
+  std::vector<Pending> pending;
+  int position = 0;
+  while (position < expr_->num_operations_) {
+    const Operation& op = expr_->operations_[position];
+    ++position;
+
+    // Operations that push a new vector.
+    if (op.type_ == Operation::OP_PUSH
+	|| op.type_ == Operation::OP_LONG_SYMBOL
+	|| op.type_ == Operation::OP_DOUBLE_SYMBOL
+	|| op.type_ == Operation::OP_BOOL_SYMBOL) {
+      if ((int) stack_.size() == depth)
+	stack_.resize(depth + 1);
+      Vector& v = stack_[depth++];
+      if (op.type_ == Operation::OP_PUSH) {
+	v.type_ = op.arg1_.getType();
+	switch (v.type_) {
+	case Value::TYPE_LONG:
+	  v.longs_.assign(count, op.arg1_.cast_as_long());
+	  break;
+	case Value::TYPE_DOUBLE:
+	  v.doubles_.assign(count, op.arg1_.cast_as_double());
+	  break;
+	default:
+	  v.bools_.assign(count, op.arg1_.cast_as_bool());
+	}
+      }
+      else {
+	v.type_ = 
+	  (op.type_ == Operation::OP_LONG_SYMBOL) ? Value::TYPE_LONG
+	  : (op.type_ == Operation::OP_DOUBLE_SYMBOL) ? Value::TYPE_DOUBLE
+	  : Value::TYPE_BOOL;
+	int c = op_columns_[position - 1];
+	if (c == -1) {
+	  // It's '_index'.
+	  v.longs_.resize(count);
+	  for (int i = 0; i < count; ++i)
+	    v.longs_[i] = start + i;
+	}
+	else
+	  convertColumn(table::getValueType
+			  (schema->getColumn(columns_[c]).getType()), 
+			buffers[c], count, v);
+      }
+    }
+
+    // Cached values.  These can be used only if every row's value is
+    // cached; otherwise, the rows must be evaluated one at a time, to
+    // fill the cache.
+    else if (op.type_ == Operation::OP_LONG_CACHE_GET
+	     || op.type_ == Operation::OP_DOUBLE_CACHE_GET
+	     || op.type_ == Operation::OP_BOOL_CACHE_GET) {
+      const unsigned char* mask_bits = 
+	(const unsigned char*) op.arg1_.cast_as_long();
+      if (start + count > op.arg3_.cast_as_long())
+	return false;
+      for (int i = 0; i < count; ++i) {
+	int64_t index = start + i;
+	if ((mask_bits[index / 8] & (1 << (index % 8))) == 0)
+	  return false;
+      }
+      if ((int) stack_.size() == depth)
+	stack_.resize(depth + 1);
+      Vector& v = stack_[depth++];
+      if (op.type_ == Operation::OP_LONG_CACHE_GET) {
+	const long* values = (const long*) op.arg2_.cast_as_long();
+	v.type_ = Value::TYPE_LONG;
+	v.longs_.assign(values + start, values + start + count);
+      }
+      else if (op.type_ == Operation::OP_DOUBLE_CACHE_GET) {
+	const double* values = (const double*) op.arg2_.cast_as_long();
+	v.type_ = Value::TYPE_DOUBLE;
+	v.doubles_.assign(values + start, values + start + count);
+      }
+      else {
+	const unsigned char* value_bits = 
+	  (const unsigned char*) op.arg2_.cast_as_long();
+	v.type_ = Value::TYPE_BOOL;
+	v.bools_.resize(count);
+	for (int i = 0; i < count; ++i) {
+	  int64_t index = start + i;
+	  v.bools_[i] = (value_bits[index / 8] & (1 << (index % 8))) != 0;
+	}
+      }
+      // Skip the operations that would have computed the value.
+      position += op.arg4_.cast_as_long();
+    }
+
+    // Values of shared subexpressions.  Storing one takes its vector
+    // off the stack without copying it.
+    else if (op.type_ == Operation::OP_TEMPORARY_SET) {
+      Vector& v = stack_[--depth];
+      Vector& t = temporaries_[op.arg1_.cast_as_long()];
+      t.type_ = v.type_;
+      t.longs_.swap(v.longs_);
+      t.doubles_.swap(v.doubles_);
+      t.bools_.swap(v.bools_);
+    }
+    else if (op.type_ == Operation::OP_TEMPORARY_GET) {
+      if ((int) stack_.size() == depth)
+	stack_.resize(depth + 1);
+      Vector& v = stack_[depth++];
+      const Vector& t = temporaries_[op.arg1_.cast_as_long()];
+      v.type_ = t.type_;
+      switch (v.type_) {
+      case Value::TYPE_LONG:
+	v.longs_ = t.longs_;
+	break;
+      case Value::TYPE_DOUBLE:
+	v.doubles_ = t.doubles_;
+	break;
+      default:
+	v.bools_ = t.bools_;
+      }
+    }
+
+    // Operations on the values of jagged columns.
+    else if (op.type_ == Operation::OP_LONG_JAGGED_LEN
+	     || op.type_ == Operation::OP_DOUBLE_JAGGED_SUM
+	     || op.type_ == Operation::OP_DOUBLE_JAGGED_MAX
+	     || op.type_ == Operation::OP_DOUBLE_JAGGED_MIN
+	     || op.type_ == Operation::OP_DOUBLE_JAGGED_INDEX
+	     || op.type_ == Operation::OP_BOOL_JAGGED_ANY) {
+      int c = op_columns_[position - 1];
+      const char* refs = buffers[c];
+      size_t ref_size = table::getTypeSize(table::TYPE_JAGGED);
+      if (op.type_ != Operation::OP_LONG_JAGGED_LEN && ! jagged_read[c]) {
+	readJaggedValues(c, count, refs);
+	jagged_read[c] = true;
+      }
+      const std::vector<double>& values = jagged_values_[c];
+      int64_t first = jagged_starts_[c];
+
+      if (op.type_ == Operation::OP_DOUBLE_JAGGED_INDEX) {
+	// Replace the indices with the elements.
+	Vector& v = stack_[depth - 1];
+	v.doubles_.resize(count);
+	for (int i = 0; i < count; ++i) {
+	  table::JaggedRef ref = table::getJaggedRef(refs + i * ref_size);
+	  long index = v.longs_[i];
+	  if (index < 0)
+	    index += ref.count_;
+	  if (index < 0 || index >= ref.count_)
+	    return false;
+	  v.doubles_[i] = values[ref.start_ - first + index];
+	}
+	v.type_ = Value::TYPE_DOUBLE;
+      }
+      else {
+	if ((int) stack_.size() == depth)
+	  stack_.resize(depth + 1);
+	Vector& v = stack_[depth++];
+	switch (op.type_) {
+	case Operation::OP_LONG_JAGGED_LEN:
+	  v.type_ = Value::TYPE_LONG;
+	  v.longs_.resize(count);
+	  break;
+	case Operation::OP_BOOL_JAGGED_ANY:
+	  v.type_ = Value::TYPE_BOOL;
+	  v.bools_.resize(count);
+	  break;
+	default:
+	  v.type_ = Value::TYPE_DOUBLE;
+	  v.doubles_.resize(count);
+	}
+	for (int i = 0; i < count; ++i) {
+	  table::JaggedRef ref = table::getJaggedRef(refs + i * ref_size);
+	  const double* x = (ref.count_ > 0) 
+	    ? &values[ref.start_ - first] : NULL;
+	  switch (op.type_) {
+	  case Operation::OP_LONG_JAGGED_LEN:
+	    v.longs_[i] = ref.count_;
+	    break;
+	  case Operation::OP_DOUBLE_JAGGED_SUM:
+	    v.doubles_[i] = 0;
+	    for (int j = 0; j < ref.count_; ++j)
+	      v.doubles_[i] += x[j];
+	    break;
+	  case Operation::OP_DOUBLE_JAGGED_MAX:
+	    if (ref.count_ == 0)
+	      return false;
+	    v.doubles_[i] = *std::max_element(x, x + ref.count_);
+	    break;
+	  case Operation::OP_DOUBLE_JAGGED_MIN:
+	    if (ref.count_ == 0)
+	      return false;
+	    v.doubles_[i] = *std::min_element(x, x + ref.count_);
+	    break;
+	  default:
+	    v.bools_[i] = false;
+	    for (int j = 0; j < ref.count_ && ! v.bools_[i]; ++j)
+	      v.bools_[i] = x[j] != 0;
+	  }
+	}
+      }
+    }
+
+    else switch (op.type_) {
+    case Operation::OP_LONG_CAST_FROM_DOUBLE:
+      BATCH_UNARY(double, doubles_, long, longs_, Value::TYPE_LONG,
+		  if (x0 + 1 >= LONG_MAX || x0 - 1 < LONG_MIN) return false;
+		  result = (long) x0);
+      break;
+
+    case Operation::OP_LONG_CAST_FROM_BOOL:
+      BATCH_UNARY(char, bools_, long, longs_, Value::TYPE_LONG,
+		  result = x0 ? 1l : 0l);
+      break;
+
+    case Operation::OP_LONG_ABS:
+      BATCH_LONG(result = labs(x0); if (result < 0) return false);
+      break;
+
+    case Operation::OP_LONG_NEGATE:
+      BATCH_LONG(result = -x0; if (x0 < 0 && result < 0) return false);
+      break;
+
+    case Operation::OP_LONG_ADD:
+      BATCH_LONG_2(result = x0 + x1; 
+		   if ((x0 ^ result) < 0 && (x1 ^ result) < 0) return false);
+      break;
+
+    case Operation::OP_LONG_SUBTRACT:
+      BATCH_LONG_2(result = x0 - x1;
+		   if ((x0 ^ result) < 0 && (result ^ ~x1) < 0) return false);
+      break;
+
+    case Operation::OP_LONG_MULTIPLY:
+      BATCH_LONG_2(result = x0 * x1);
+      break;
+
+    case Operation::OP_LONG_SQUARE:
+      BATCH_LONG(result = x0 * x0);
+      break;
+
+    case Operation::OP_LONG_FLOOR_DIVIDE:
+      BATCH_LONG_2(if (x1 == 0) return false;
+		   result = x0 / x1;
+		   if (result < 0 && (x0 % x1) != 0) --result);
+      break;
+
+    case Operation::OP_LONG_REMAINDER:
+      BATCH_LONG_2(if (x1 == 0) return false;
+		   result = x0 % x1;
+		   if (result != 0 && x1 < 0) result += x1);
+      break;
+
+    case Operation::OP_LONG_EXPONENTIATE:
+      BATCH_LONG_2(if (x1 < 0) return false;
+		   result = 1l;
+		   while (x1-- > 0) result *= x0);
+      break;
+
+    case Operation::OP_LONG_MAX:
+      BATCH_LONG_2(result = max(x0, x1));
+      break;
+
+    case Operation::OP_LONG_MIN:
+      BATCH_LONG_2(result = min(x0, x1));
+      break;
+
+    case Operation::OP_LONG_BITWISE_NOT:
+      BATCH_LONG(result = ~x0);
+      break;
+
+    case Operation::OP_LONG_BITWISE_AND:
+      BATCH_LONG_2(result = x0 & x1);
+      break;
+
+    case Operation::OP_LONG_BITWISE_OR:
+      BATCH_LONG_2(result = x0 | x1);
+      break;
+
+    case Operation::OP_LONG_BITWISE_XOR:
+      BATCH_LONG_2(result = x0 ^ x1);
+      break;
+
+    case Operation::OP_LONG_SHIFT_LEFT:
+      BATCH_LONG_2(result = x0 << x1);
+      break;
+
+    case Operation::OP_LONG_SHIFT_RIGHT:
+      BATCH_LONG_2(result = x0 >> x1);
+      break;
+
+    case Operation::OP_LONG_GET_BIT:
+      BATCH_COMPARE_LONG(result = (x0 & (1 << x1)) != 0);
+      break;
+
+    case Operation::OP_DOUBLE_CAST_FROM_LONG:
+      BATCH_UNARY(long, longs_, double, doubles_, Value::TYPE_DOUBLE,
+		  result = (double) x0);
+      break;
+
+    case Operation::OP_DOUBLE_CAST_FROM_BOOL:
+      BATCH_UNARY(char, bools_, double, doubles_, Value::TYPE_DOUBLE,
+		  result = x0 ? 1.0 : 0.0);
+      break;
+
+    case Operation::OP_DOUBLE_ABS:
+      BATCH_DOUBLE(result = fabs(x0));
+      break;
+
+    case Operation::OP_DOUBLE_NEGATE:
+      BATCH_DOUBLE(result = -x0);
+      break;
+
+    case Operation::OP_DOUBLE_ADD:
+      BATCH_DOUBLE_2(result = x0 + x1);
+      break;
+
+    case Operation::OP_DOUBLE_SUBTRACT:
+      BATCH_DOUBLE_2(result = x0 - x1);
+      break;
+
+    case Operation::OP_DOUBLE_MULTIPLY:
+      BATCH_DOUBLE_2(result = x0 * x1);
+      break;
+
+    case Operation::OP_DOUBLE_SQUARE:
+      BATCH_DOUBLE(result = x0 * x0);
+      break;
+
+    case Operation::OP_DOUBLE_DIVIDE:
+      BATCH_DOUBLE_2(if (x1 == 0) return false; result = x0 / x1);
+      break;
+
+    case Operation::OP_DOUBLE_REMAINDER:
+      BATCH_DOUBLE_2(if (x1 == 0) return false;
+		     result = fmod(x0, x1);
+		     if (result != 0 && ((x0 < 0) != (x1 < 0))) result += x1);
+      break;
+
+    case Operation::OP_DOUBLE_EXPONENTIATE:
+      BATCH_DOUBLE_2(if (x1 == 0) result = 1.0;
+		     else if (x0 == 0) {
+		       if (x1 < 0) return false;
+		       result = 0.0;
+		     }
+		     else if (x0 < 0 && x1 != floor(x1)) return false;
+		     else result = pow(x0, x1));
+      break;
+
+    case Operation::OP_DOUBLE_EXP:
+      BATCH_MATH_FN(exp);
+      break;
+
+    case Operation::OP_DOUBLE_LOG:
+      BATCH_DOUBLE(if (x0 <= 0) return false; result = log(x0));
+      break;
+
+    case Operation::OP_DOUBLE_SQRT:
+      BATCH_MATH_FN(sqrt);
+      break;
+
+    case Operation::OP_DOUBLE_HYPOT:
+      BATCH_DOUBLE_2(result = hypot(x0, x1));
+      break;
+
+    case Operation::OP_DOUBLE_SIN:
+      BATCH_DOUBLE(result = sin(x0));
+      break;
+
+    case Operation::OP_DOUBLE_COS:
+      BATCH_DOUBLE(result = cos(x0));
+      break;
+
+    case Operation::OP_DOUBLE_TAN:
+      BATCH_DOUBLE(result = tan(x0));
+      break;
+
+    case Operation::OP_DOUBLE_ASIN:
+      BATCH_MATH_FN(asin);
+      break;
+
+    case Operation::OP_DOUBLE_ACOS:
+      BATCH_MATH_FN(acos);
+      break;
+
+    case Operation::OP_DOUBLE_ATAN:
+      BATCH_DOUBLE(result = atan(x0));
+      break;
+
+    case Operation::OP_DOUBLE_ATAN2:
+      BATCH_DOUBLE_2(result = atan2(x0, x1));
+      break;
+
+    case Operation::OP_DOUBLE_SINH:
+      BATCH_MATH_FN(sinh);
+      break;
+
+    case Operation::OP_DOUBLE_COSH:
+      BATCH_MATH_FN(cosh);
+      break;
+
+    case Operation::OP_DOUBLE_TANH:
+      BATCH_MATH_FN(tanh);
+      break;
+
+    case Operation::OP_DOUBLE_ASINH:
+      BATCH_MATH_FN(asinh);
+      break;
+
+    case Operation::OP_DOUBLE_ACOSH:
+      BATCH_MATH_FN(acosh);
+      break;
+
+    case Operation::OP_DOUBLE_ATANH:
+      BATCH_MATH_FN(atanh);
+      break;
+
+    case Operation::OP_DOUBLE_FLOOR:
+      BATCH_DOUBLE(result = floor(x0));
+      break;
+
+    case Operation::OP_DOUBLE_CEIL:
+      BATCH_DOUBLE(result = ceil(x0));
+      break;
+
+    case Operation::OP_DOUBLE_MAX:
+      BATCH_DOUBLE_2(result = max(x0, x1));
+      break;
+
+    case Operation::OP_DOUBLE_MIN:
+      BATCH_DOUBLE_2(result = min(x0, x1));
+      break;
+
+    case Operation::OP_DOUBLE_GAUSSIAN:
+      // 'x0' is the mean, 'x1' the width, and 'x2' the argument.
+      BATCH_TERNARY(double, doubles_, double, doubles_, Value::TYPE_DOUBLE,
+		    result = (x2 - x0) / x1;
+		    result = 0.3989422804014326779399 
+		      * exp(-0.5 * result * result) / x1);
+      break;
+
+    case Operation::OP_BOOL_CAST_FROM_DOUBLE:
+      BATCH_UNARY(double, doubles_, char, bools_, Value::TYPE_BOOL,
+		  result = (x0 != 0.0));
+      break;
+
+    case Operation::OP_BOOL_CAST_FROM_LONG:
+      BATCH_UNARY(long, longs_, char, bools_, Value::TYPE_BOOL,
+		  result = (x0 != 0));
+      break;
+
+    case Operation::OP_BOOL_NOT:
+      BATCH_UNARY(char, bools_, char, bools_, Value::TYPE_BOOL,
+		  result = ! x0);
+      break;
+
+    case Operation::OP_BOOL_AND:
+      BATCH_BOOL_2(result = x0 && x1);
+      break;
+
+    case Operation::OP_BOOL_OR:
+      BATCH_BOOL_2(result = x0 || x1);
+      break;
+
+    case Operation::OP_BOOL_AND_LAZY:
+    case Operation::OP_BOOL_OR_LAZY:
+      // Evaluate the second operand for all rows, and combine the
+      // operands once it's done.  If the second operand fails for a row
+      // whose result depends only on the first, the whole block is
+      // evaluated row by row, which preserves the lazy semantics.
+      {
+	Pending p;
+	p.end_ = position + op.arg1_.cast_as_long();
+	p.type_ = op.type_;
+	pending.push_back(p);
+      }
+      break;
+
+    case Operation::OP_BOOL_XOR:
+      BATCH_BOOL_2(result = (x0 && ! x1) || (! x0 && x1));
+      break;
+
+    case Operation::OP_BOOL_EQUALS_LONG:
+      BATCH_COMPARE_LONG(result = (x0 == x1));
+      break;
+
+    case Operation::OP_BOOL_LESS_THAN_LONG:
+      BATCH_COMPARE_LONG(result = (x0 < x1));
+      break;
+
+    case Operation::OP_BOOL_LESS_THAN_OR_EQUAL_LONG:
+      BATCH_COMPARE_LONG(result = (x0 <= x1));
+      break;
+
+    case Operation::OP_BOOL_EQUALS_DOUBLE:
+      BATCH_COMPARE_DOUBLE(result = (x0 == x1));
+      break;
+
+    case Operation::OP_BOOL_LESS_THAN_DOUBLE:
+      BATCH_COMPARE_DOUBLE(result = (x0 < x1));
+      break;
+
+    case Operation::OP_BOOL_LESS_THAN_OR_EQUAL_DOUBLE:
+      BATCH_COMPARE_DOUBLE(result = (x0 <= x1));
+      break;
+
+    case Operation::OP_BOOL_IN_RANGE_DOUBLE:
+      // 'x0' is the minimum, 'x1' the value, and 'x2' the maximum.
+      BATCH_TERNARY(double, doubles_, char, bools_, Value::TYPE_BOOL,
+		    result = (x1 >= x0 && x1 < x2));
+      break;
+
+    case Operation::OP_BOOL_IN_RANGE_LONG:
+      BATCH_TERNARY(long, longs_, char, bools_, Value::TYPE_BOOL,
+		    result = (x1 >= x0 && x1 < x2));
+      break;
+
+    case Operation::OP_BOOL_NEAR_DOUBLE:
+      // 'x0' is the central value, 'x1' the half interval, and 'x2'
+      // the value.
+      BATCH_TERNARY(double, doubles_, char, bools_, Value::TYPE_BOOL,
+		    x2 -= x0; result = (x2 > -x1 && x2 < x1));
+      break;
+
+    case Operation::OP_BOOL_NEAR_LONG:
+      BATCH_TERNARY(long, longs_, char, bools_, Value::TYPE_BOOL,
+		    x2 -= x0; result = (x2 > -x1 && x2 < x1));
+      break;
+
+    default:
+      abort();
+    }
+
+    // Combine the operands of lazy operations whose second operands
+    // are done.
+    while (pending.size() > 0 && pending.back().end_ == position) {
+      if (pending.back().type_ == Operation::OP_BOOL_AND_LAZY)
+	BATCH_BOOL_2(result = x0 && x1);
+      else
+	BATCH_BOOL_2(result = x0 || x1);
+      pending.pop_back();
+    }
+  }
+
+  // The expression's outputs don't match its values; evaluating it row
+  // by row raises an exception.
+  if (depth != expr_->num_outputs_)
+    return false;
+  result_ = &stack_[0];
+  return true;
+}
+
+
+void
+BatchEvaluator::readJaggedValues(int c,
+				 int count,
+				 const char* refs)
+{
+  // The values of consecutive rows are usually stored consecutively, so
+  // read them all at once, from the first value to the last.
+  size_t ref_size = table::getTypeSize(table::TYPE_JAGGED);
+  int64_t first = -1;
+  int64_t end = -1;
+  for (int i = 0; i < count; ++i) {
+    table::JaggedRef ref = table::getJaggedRef(refs + i * ref_size);
+    if (ref.count_ == 0)
+      continue;
+    if (first == -1 || ref.start_ < first)
+      first = ref.start_;
+    end = std::max(end, ref.start_ + ref.count_);
+  }
+
+  std::vector<double>& values = jagged_values_[c];
+  jagged_starts_[c] = first;
+  values.resize(end - first);
+  if (end > first)
+    table_->table_->readJagged(columns_[c], first, end - first, &values[0]);
+}
+
+
+Value
+BatchEvaluator::getValue(int output,
+			 int index)
+  const
+{
+  assert(result_ != NULL);
+  assert(output >= 0 && output < expr_->num_outputs_);
+  const Vector& result = result_[output];
+  switch (result.type_) {
+  case Value::TYPE_LONG:
+    return Value::make(result.longs_[index]);
+  case Value::TYPE_DOUBLE:
+    return Value::make(result.doubles_[index]);
+  case Value::TYPE_BOOL:
+    return Value::make((bool) result.bools_[index]);
+  default:
+    abort();
+  }
+}
+
+
+bool
+BatchEvaluator::getBool(int index)
+  const
+{
+  assert(result_ != NULL);
+  switch (result_->type_) {
+  case Value::TYPE_LONG:
+    return result_->longs_[index] != 0;
+  case Value::TYPE_DOUBLE:
+    return result_->doubles_[index] != 0.0;
+  case Value::TYPE_BOOL:
+    return result_->bools_[index];
+  default:
+    abort();
+  }
 }
 
 
@@ -1310,9 +2518,20 @@ tp_new(PyTypeObject* type,
        Dict* kw_args)
 try {
   // Parse arguments.
-  args->ParseTuple("");
-
-  return PyExpr::New();
+  static char* kw_arg_list[] = {
+    "outputs",
+    NULL
+  };
+  int num_outputs = 1;
+  if (! PyArg_ParseTupleAndKeywords(args, kw_args, "|i", kw_arg_list,
+				    &num_outputs))
+    throw Exception();
+  if (num_outputs < 1)
+    throw Exception(PyExc_ValueError, "outputs must be positive");
+
+  PyExpr* result = PyExpr::New();
+  result->num_outputs_ = num_outputs;
+  return result;
 }
 catch (Exception) {
   return NULL;
@@ -1331,6 +2550,27 @@ catch (Exception) {
 }
 
 
+/* Evaluate 'self' on 'symbols'.  An expression with several outputs
+   returns a tuple of their values.  */
+
+PyObject*
+evaluateObject(PyExpr* self,
+	       Mapping* symbols)
+{
+  if (self->num_outputs_ == 1)
+    return objectFromValue(self->evaluate(symbols));
+
+  std::vector<Value> outputs;
+  self->evaluateOutputs(symbols, outputs);
+  Ref<Tuple> result = Tuple::New(outputs.size());
+  for (int i = 0; i < (int) outputs.size(); ++i) {
+    Ref<Object> value = (Object*) objectFromValue(outputs[i]);
+    result->InitializeItem(i, value);
+  }
+  return result.release();
+}
+
+
 PyObject*
 tp_call(PyExpr* self,
 	Arg* args,
@@ -1345,7 +2585,7 @@ try {
   else
     symbols = newRef(kw_args);
 
-  return objectFromValue(self->evaluate(symbols));
+  return evaluateObject(self, symbols);
 }
 catch (Exception) {
   return NULL;
@@ -1453,7 +2693,7 @@ try {
   Mapping* symbols;
   args->ParseTuple("O", &symbols);
 
-  return objectFromValue(self->evaluate(symbols));
+  return evaluateObject(self, symbols);
 }
 catch (Exception) {
   std::cerr << "warning: Python exception during expression evaluation\n";
@@ -1466,6 +2706,55 @@ catch (...) {
 }
 
 
+PyObject*
+method_evaluateBlock(PyExpr* self,
+		     Arg* args)
+try {
+  PyTable* table;
+  int start;
+  int stop;
+  args->ParseTuple("O!ii", &PyTable::type, &table, &start, &stop);
+  int num_rows = table->table_->getNumRows();
+  if (start < 0 || stop > num_rows || start > stop)
+    throw Exception(PyExc_IndexError, "row range out of range");
+
+  BatchEvaluator evaluator(self, table);
+  if (! evaluator.isValid())
+    RETURN_NONE;
+
+  // Make a list of values for each output.
+  int num_outputs = self->num_outputs_;
+  Ref<Tuple> result = Tuple::New(num_outputs);
+  for (int o = 0; o < num_outputs; ++o) {
+    Ref<List> list = List::New(stop - start);
+    result->InitializeItem(o, list);
+  }
+  for (int block = start; block < stop;
+       block += BatchEvaluator::block_size) {
+    int count = std::min(stop - block, BatchEvaluator::block_size);
+    if (! evaluator.evaluate(block, count))
+      RETURN_NONE;
+    for (int o = 0; o < num_outputs; ++o) {
+      List* list = (List*) PyTuple_GET_ITEM((PyObject*) result, o);
+      for (int i = 0; i < count; ++i) {
+	Ref<Object> value = 
+	  (Object*) objectFromValue(evaluator.getValue(o, i));
+	list->InitializeItem(block - start + i, value);
+      }
+    }
+  }
+
+  // An expression with several outputs returns a tuple of lists.
+  if (num_outputs == 1)
+    return newRef(PyTuple_GET_ITEM((PyObject*) result, 0));
+  else
+    return result.release();
+}
+catch (Exception) {
+  return NULL;
+}
+
+
 PyObject*
 method_extend(PyExpr* self,
 	      Arg* args)
@@ -1489,6 +2778,8 @@ PyMethodDef
 tp_methods[] = {
   { "append", (PyCFunction) method_append, METH_VARARGS, NULL },
   { "evaluate", (PyCFunction) method_evaluate, METH_VARARGS, NULL },
+  { "evaluateBlock", (PyCFunction) method_evaluateBlock, METH_VARARGS, 
+    NULL },
   { "extend", (PyCFunction) method_extend, METH_VARARGS, NULL },
   { NULL, NULL, 0, NULL }
 };
@@ -1523,9 +2814,21 @@ catch (Exception) {
 }
 
 
+PyObject*
+get_outputs(PyExpr* self,
+	    void* /* closure */)
+try {
+  return Int::FromLong(self->num_outputs_);
+}
+catch (Exception) {
+  return NULL;
+}
+
+
 PyGetSetDef
 tp_getset[] = {
   { "length", (getter) get_length, NULL, NULL, NULL },
+  { "outputs", (getter) get_outputs, NULL, NULL, NULL },
   { "type", (getter) get_type, NULL, NULL, NULL },
   { NULL, NULL, NULL, NULL },
 };
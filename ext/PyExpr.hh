@@ -40,6 +40,12 @@
 extern Nametable 
 symbol_name_table;
 
+//----------------------------------------------------------------------
+// forward declarations
+//----------------------------------------------------------------------
+
+struct PyTable;
+
 //----------------------------------------------------------------------
 // class definitions
 //----------------------------------------------------------------------
@@ -81,12 +87,19 @@ struct PyExpr
   Value evaluate(Py::Mapping* symbols);
   Value evaluate(Py::Mapping* symbols, bool is_row);
 
+  /* Evaluate an expression with several outputs, storing their values
+     in 'outputs'.  */
+  void evaluateOutputs(Py::Mapping* symbols, std::vector<Value>& outputs);
+
   Operation* operations_;
   int num_operations_;
   int len_operations_;
   Py::Ref<Py::Object> type_;
   Py::Ref<Py::String> formula_;
 
+  /* The number of values the operations leave on the stack.  */
+  int num_outputs_;
+
 };
 
 
@@ -120,6 +133,116 @@ PyExpr::Check(PyObject* object)
 }
 
 
+/* Evaluation of a compiled expression on blocks of rows of a table.
+
+   Instead of evaluating the expression one row at a time, each
+   operation is applied to the values for a whole block of rows at once.
+   Symbols are filled from column values read in bulk from the table.
+
+   Only expressions whose operations produce 'long', 'double', and
+   'bool' values can be evaluated this way.  Expressions with 'OBJECT_'
+   operations, jumps, or symbols other than the table's columns must be
+   evaluated row by row.  Cached values are used only for blocks in which
+   the value of every row is cached.  */
+
+class BatchEvaluator
+{
+public:
+
+  /* The maximum number of rows in a block.  */
+  static const int block_size = 4096;
+
+  /* Prepare to evaluate 'expr' on rows of 'table'.
+
+     Both are borrowed references, which must outlive this object.  */
+  BatchEvaluator(const PyExpr* expr, PyTable* table);
+
+  /* Return true if the expression can be evaluated in blocks.  */
+  bool isValid() const
+    { return valid_; }
+
+  /* Evaluate the expression on 'count' rows starting at 'start'.
+
+     'count' must be at most 'block_size'.
+
+     returns -- True on success.  False if the evaluation failed for
+     any row, for instance because of a division by zero.  In that case
+     the rows must be evaluated individually to find the row that
+     raises the exception.  
+
+     The global interpreter lock is released during the evaluation.  */
+  bool evaluate(int64_t start, int count);
+
+  /* Return the value for row 'start + index' from the last call to
+     'evaluate'.  */
+  Value getValue(int index) const
+    { return getValue(0, index); }
+
+  /* Return the value of output 'output' for row 'start + index', for
+     an expression with several outputs.  */
+  Value getValue(int output, int index) const;
+
+  /* Return the truth of the value for row 'start + index' from the
+     last call to 'evaluate'.  */
+  bool getBool(int index) const;
+
+  /* Values of one type for each row in a block.  */
+  struct Vector
+  {
+    Value::Type type_;
+    std::vector<long> longs_;
+    std::vector<double> doubles_;
+    std::vector<char> bools_;
+  };
+
+private:
+
+  /* Read the values of jagged column 'columns_[c]' for 'count' rows,
+     whose 'JaggedRef's are at 'refs', into 'jagged_values_'.  */
+  void readJaggedValues(int c, int count, const char* refs);
+
+  /* A lazy 'and' or 'or' whose second operand ends before operation
+     'end_'.  */
+  struct Pending
+  {
+    int end_;
+    Operation::Type type_;
+  };
+
+  const PyExpr* expr_;
+  PyTable* table_;
+  bool valid_;
+
+  /* The columns used by the expression.  */
+  std::vector<int> columns_;
+
+  /* For each operation, the position in 'columns_' of the column it
+     pushes, or -1.  */
+  std::vector<int> op_columns_;
+
+  /* Buffers for values read from 'columns_'.  */
+  std::vector<std::vector<char> > buffers_;
+
+  /* Buffers for decoded values of packed columns.  */
+  std::vector<std::vector<char> > decoded_buffers_;
+
+  /* For jagged columns, the values of the rows in the block, and the
+     position of the first of them in the column's values.  */
+  std::vector<std::vector<double> > jagged_values_;
+  std::vector<int64_t> jagged_starts_;
+
+  /* The evaluation stack.  Vectors are reused between blocks.  */
+  std::vector<Vector> stack_;
+
+  /* Values of subexpressions shared by several outputs.  */
+  std::vector<Vector> temporaries_;
+
+  /* The results of the last evaluation, one for each output.  */
+  const Vector* result_;
+
+};
+
+
 //----------------------------------------------------------------------
 // function declarations
 //----------------------------------------------------------------------
@@ -410,6 +410,15 @@ public:
   virtual Object* getBinError(unsigned bin_index) = 0;
   virtual void setBinError(unsigned bin_index, Object* value) = 0;
 
+  /* Return the stored sums of squares of the bin errors.
+
+     Returns a '(lo, hi)' pair of the squares that 'getBinError' takes
+     the square roots of, so that bins may be combined exactly.  Only
+     error models that store bin errors support this.
+  */
+  virtual Object* getBinSumOfSquares(unsigned bin_index) = 0;
+  virtual void setBinSumOfSquares(unsigned bin_index, Object* value) = 0;
+
 protected:
 
   const unsigned num_bins_;
@@ -440,9 +449,14 @@ public:
   virtual void setBinContent(unsigned bin_index, Object* value_arg);
   virtual Object* getBinError(unsigned bin_index);
   virtual void setBinError(unsigned bin_index, Object* value);
+  virtual Object* getBinSumOfSquares(unsigned bin_index);
+  virtual void setBinSumOfSquares(unsigned bin_index, Object* value);
 
 protected:
 
+  void checkStoredErrors() const;
+
+
   TYPE* bins_;
   double* lo_errors_;
   double* hi_errors_;
@@ -645,6 +659,64 @@ HistogramBinsGeneric<TYPE>::setBinError(unsigned bin_index,
 }
 
 
+template<typename TYPE>
+void
+HistogramBinsGeneric<TYPE>::checkStoredErrors() const
+{
+  if (error_model_ != ERROR_MODEL_SYMMETRIC 
+      && error_model_ != ERROR_MODEL_ASYMMETRIC)
+    throw Exception(PyExc_RuntimeError, 
+		    "no stored errors with error model '%s'",
+		    errorModelAsString(error_model_));
+}
+
+
+template<typename TYPE>
+Object*
+HistogramBinsGeneric<TYPE>::getBinSumOfSquares(unsigned bin_index)
+{
+  assert(bin_index < num_bins_);
+  checkStoredErrors();
+
+  double lo = lo_errors_[bin_index];
+  double hi = 
+    (error_model_ == ERROR_MODEL_ASYMMETRIC) ? hi_errors_[bin_index] : lo;
+  return buildValue("(dd)", lo, hi);
+}
+
+
+template<typename TYPE>
+void
+HistogramBinsGeneric<TYPE>::setBinSumOfSquares(unsigned bin_index,
+					       Object* value_arg)
+{
+  assert(bin_index < num_bins_);
+  checkStoredErrors();
+
+  // Extract the '(lo, hi)' pair of sums of squares.
+  if (! Sequence::Check(value_arg))
+    throw Exception
+      (PyExc_TypeError, "sums of squares must be a '(lo, hi)' pair");
+  Sequence* pair = cast<Sequence>(value_arg);
+  if (pair->Size() != 2)
+    throw Exception
+      (PyExc_TypeError, "sums of squares must be a '(lo, hi)' pair");
+  Ref<Object> first = pair->GetItem(0);
+  double lo = first->FloatAsDouble();
+  Ref<Object> second = pair->GetItem(1);
+  double hi = second->FloatAsDouble();
+  if (lo < 0 || hi < 0)
+    throw Exception(PyExc_ValueError, "sums of squares must be nonnegative");
+
+  if (error_model_ == ERROR_MODEL_ASYMMETRIC) {
+    lo_errors_[bin_index] = lo;
+    hi_errors_[bin_index] = hi;
+  }
+  else
+    lo_errors_[bin_index] = std::max(lo, hi);
+}
+
+
 //----------------------------------------------------------------------
 // inline functions
 //----------------------------------------------------------------------
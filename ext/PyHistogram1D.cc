@@ -399,6 +399,18 @@ catch (Exception) {
 }
 
 
+PyObject*
+method_getBinSumOfSquares(PyHistogram1D* self,
+			  Object* bin_number)
+try {
+  unsigned index = self->mapNumber(self->parseBinNumber(bin_number));
+  return self->bins_->getBinSumOfSquares(index);
+}
+catch (Exception) {
+  return NULL;
+}
+
+
 PyObject*
 method_map(PyHistogram1D* self,
 	   Object* coordinate)
@@ -455,6 +467,24 @@ catch (Exception) {
 }
 
 
+PyObject*
+method_setBinSumOfSquares(PyHistogram1D* self,
+			  Arg* args)
+try {
+  Object* bin_number;
+  Object* value;
+  args->ParseTuple("OO", &bin_number, &value);
+  unsigned index = self->mapNumber(self->parseBinNumber(bin_number));
+
+  self->bins_->setBinSumOfSquares(index, value);
+
+  RETURN_NONE;
+}
+catch (Exception) {
+  return NULL;
+}
+
+
 /* FIXME: Write this function.  */
 #if 0
 PyObject*
@@ -489,9 +519,13 @@ tp_methods[] = {
   { "getBinContent", (PyCFunction) method_getBinContent, METH_O, NULL },
   { "getBinError", (PyCFunction) method_getBinError, METH_O, NULL },
   { "getBinRange", (PyCFunction) method_getBinRange, METH_O, NULL },
+  { "getBinSumOfSquares",
+    (PyCFunction) method_getBinSumOfSquares, METH_O, NULL },
   { "map", (PyCFunction) method_map, METH_O, NULL },
   { "setBinContent", (PyCFunction) method_setBinContent, METH_VARARGS, doc_setBinContent },
   { "setBinError", (PyCFunction) method_setBinError, METH_VARARGS, NULL },
+  { "setBinSumOfSquares",
+    (PyCFunction) method_setBinSumOfSquares, METH_VARARGS, NULL },
 #if 0
   { "update", (PyCFunction) method_update, METH_VARARGS, NULL }
 #endif
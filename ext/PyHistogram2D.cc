@@ -373,6 +373,18 @@ catch (Exception) {
 }
 
 
+PyObject*
+method_getBinSumOfSquares(PyHistogram2D* self,
+			  Object* bin_numbers)
+try {
+  unsigned index = self->mapNumbers(self->parseBinNumbers(bin_numbers));
+  return self->bins_->getBinSumOfSquares(index);
+}
+catch (Exception) {
+  return NULL;
+}
+
+
 PyObject*
 method_map(PyHistogram2D* self,
 	   Object* coordinates)
@@ -428,15 +440,37 @@ catch (Exception) {
 }
 
 
+PyObject*
+method_setBinSumOfSquares(PyHistogram2D* self,
+			  Arg* args)
+try {
+  Object* bin_numbers;
+  Object* value;
+  args->ParseTuple("OO", &bin_numbers, &value);
+  unsigned index = self->mapNumbers(self->parseBinNumbers(bin_numbers));
+
+  self->bins_->setBinSumOfSquares(index, value);
+
+  RETURN_NONE;
+}
+catch (Exception) {
+  return NULL;
+}
+
+
 PyMethodDef
 tp_methods[] = {
   { "accumulate", (PyCFunction) method_accumulate, METH_VARARGS, NULL },
   { "getBinContent", (PyCFunction) method_getBinContent, METH_O, NULL },
   { "getBinError", (PyCFunction) method_getBinError, METH_O, NULL },
   { "getBinRange", (PyCFunction) method_getBinRange, METH_O, NULL },
+  { "getBinSumOfSquares",
+    (PyCFunction) method_getBinSumOfSquares, METH_O, NULL },
   { "map", (PyCFunction) method_map, METH_O, NULL },
   { "setBinContent", (PyCFunction) method_setBinContent, METH_VARARGS, NULL },
   { "setBinError", (PyCFunction) method_setBinError, METH_VARARGS, NULL },
+  { "setBinSumOfSquares",
+    (PyCFunction) method_setBinSumOfSquares, METH_VARARGS, NULL },
   { NULL, NULL, 0, NULL }
 };
 
@@ -11,6 +11,7 @@
 //----------------------------------------------------------------------
 
 #include <algorithm>
+#include <cmath>
 
 #include "PyIterator.hh"
 #include "PyRow.hh"
@@ -21,14 +22,36 @@ using namespace Py;
 
 #define IGNORE_EXCEPTIONS_IN_SELECTION 0
 
+//----------------------------------------------------------------------
+// constants
+//----------------------------------------------------------------------
+
+/* Use a column index for a selection only if it selects at most this
+   fraction of the indexed rows.  */
+const double
+max_index_fraction = 0.25;
+
 //----------------------------------------------------------------------
 // method definitions
 //----------------------------------------------------------------------
 
 PyIterator::PyIterator(PyTable* table,
-		       Object* sel)
+		       Object* sel,
+		       int start,
+		       int stop,
+		       bool reuse)
   : table_(Ref<PyTable>::create(table)),
-    index_(0)
+    index_(start),
+    stop_(stop),
+    step_(1),
+    next_index_row_(0),
+    index_rows_only_(false),
+    checked_block_(-1),
+    batch_start_(0),
+    batch_stop_(0),
+    batch_ok_(false),
+    reuse_(reuse),
+    next_view_(0)
 {
   assert(table_ != NULL);
 
@@ -84,6 +107,95 @@ PyIterator::PyIterator(PyTable* table,
   // Otherwise, just compile the selection.
   else 
     selection_.set(table->compile(selection));
+
+  // If the selection is a compiled expression, try to evaluate it on
+  // blocks of rows.
+  if (cache_mask_ == NULL && selection_ != NULL 
+      && PyExpr::Check(selection_)) {
+    batch_.reset(new BatchEvaluator((PyExpr*) (Object*) selection_, table));
+    if (! batch_->isValid())
+      batch_.reset();
+  }
+
+  // Find the bounds on column values implied by the selection.
+  if (sel != NULL && table->table_->getNumRows() > 0)
+    table->getSelectionBounds(sel, bounds_);
+
+  // Find the indexed column whose bounds are satisfied by the fewest
+  // rows.
+  table::ColumnIndex* best_index = NULL;
+  const table::Bound* best_bound = NULL;
+  int64_t best_count = 0;
+  std::vector<table::Bound>::const_iterator bound;
+  for (bound = bounds_.begin(); bound != bounds_.end(); ++bound) {
+    table::ColumnIndex* index = 
+      table->table_->getIndex(bound->column_index_);
+    if (index == NULL)
+      continue;
+    int64_t count = index->count(*bound);
+    if (best_index == NULL || count < best_count) {
+      best_index = index;
+      best_bound = &*bound;
+      best_count = count;
+    }
+  }
+  // Use the index if it excludes enough rows that reading the remaining
+  // rows individually is faster than scanning.
+  if (best_index != NULL 
+      && best_count <= best_index->getNumRows() * max_index_fraction) {
+    // Consider the rows the index finds in the iteration range.
+    std::vector<int64_t> rows;
+    best_index->find(*best_bound, rows);
+    std::vector<int64_t>::const_iterator row;
+    for (row = rows.begin(); row != rows.end(); ++row)
+      if (*row >= start && (stop < 0 || *row < stop))
+	index_rows_.push_back(*row);
+    // Then scan rows appended since the index was built.
+    index_ = std::max((int64_t) start, best_index->getNumRows());
+  }
+}
+
+
+const int
+PyIterator::num_views;
+
+
+void
+PyIterator::setRows(std::vector<int64_t>& rows)
+{
+  // Rows found with a column index are replaced too; the selection is
+  // still evaluated for each row.
+  index_rows_.swap(rows);
+  rows.clear();
+  next_index_row_ = 0;
+  index_rows_only_ = true;
+}
+
+
+PyRow*
+PyIterator::getRowObject(int index)
+{
+  if (! reuse_)
+    return table_->getRowObject(index);
+
+  // Reuse a row object to which only we refer.
+  for (int v = 0; v < num_views; ++v)
+    if (views_[v] != NULL && views_[v]->GetRefCount() == 1) {
+      views_[v]->reuse(index);
+      return Ref<PyRow>::create(views_[v]).release();
+    }
+
+  // None is free, so make a new one.  The ones we have are left to
+  // whoever still refers to them.
+  Ref<PyRow> row = table_->getRowObject(index);
+  // A row object with instance attributes can't be reused, since the
+  // attributes belong to the row it first represented.
+  if (row->ob_type->tp_dictoffset != 0)
+    return row.release();
+  row->reuse(index);
+  views_[next_view_] = Ref<PyRow>::create(row);
+  next_view_ = (next_view_ + 1) % num_views;
+  return row.release();
 }
 
 
@@ -126,17 +238,90 @@ catch (Exception) {
 }
 
 
+PyObject*
+mp_subscript(PyIterator* self,
+	     Object* key)
+try {
+  if (! PySlice_Check(key))
+    throw Exception(PyExc_TypeError, "iterator index must be a slice");
+  // Only a range of rows, without a selection, may be sliced.
+  if (self->selection_ != NULL || self->step_ != 1 
+      || self->index_rows_only_ || self->index_rows_.size() > 0)
+    throw Exception(PyExc_TypeError, "only an iterator over all rows in "
+		    "a range can be sliced");
+
+  // Find the rows remaining in the iterator's range.
+  int num_rows = self->table_->table_->getNumRows();
+  if (self->stop_ >= 0 && self->stop_ < num_rows)
+    num_rows = self->stop_;
+  int length = std::max(num_rows - self->index_, 0);
+
+  // Let the slice compute its indices into them.
+  Ref<Object> indices = key->CallMethod("indices", "i", length);
+  int start;
+  int stop;
+  int step;
+  cast<Tuple>(indices)->ParseTuple("iii", &start, &stop, &step);
+  start += self->index_;
+  stop += self->index_;
+
+  Ref<PyIterator> result;
+  if (step > 0) {
+    // Scan the rows, skipping the ones in between.  A step longer than
+    // the range gives just the first row.
+    result.set(PyIterator::New(self->table_, NULL, start, stop,
+			       self->reuse_));
+    result->step_ = std::min(step, std::max(length, 1));
+  }
+  else {
+    // Backward.  Choose the rows in advance.
+    std::vector<int64_t> rows;
+    for (int row = start; row > stop; row += step)
+      rows.push_back(row);
+    result.set(PyIterator::New(self->table_, NULL, 0, -1, self->reuse_));
+    result->setRows(rows);
+  }
+  return result.release();
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyMappingMethods
+tp_as_mapping = {
+  NULL,                                 // mp_length
+  (binaryfunc) mp_subscript,            // mp_subscript
+  NULL,                                 // mp_ass_subscript
+};
+
+
 PyObject*
 tp_iternext(PyIterator* self)
 try {
   int num_rows = self->table_->table_->getNumRows();
+  if (self->stop_ >= 0 && self->stop_ < num_rows)
+    num_rows = self->stop_;
 
   while (true) {
     // First, find the index of the next row to consider.
     int index;
+    bool from_index = false;
+
+    // Are there rows from a column index left?
+    if (self->next_index_row_ < self->index_rows_.size()) {
+      // Yes.  Use the next one.
+      index = self->index_rows_[self->next_index_row_++];
+      from_index = true;
+    }
+
+    // Only rows chosen in advance?
+    else if (self->index_rows_only_)
+      // Yes, and there are none left.
+      throw Exception(PyExc_StopIteration, "end of iteration");
 
     // Do we have a cache for the selection expression?
-    if (self->cache_mask_ != NULL) {
+    else if (self->cache_mask_ != NULL) {
       // Yes.  Scan forward to find a row for which the cached value is
       // true, skipping rows for which the cached value is false.  But
       // stop at rows for which the cache does not contain a value.
@@ -149,24 +334,74 @@ try {
 	if (self->cache_data_->get(index))
 	  // Cached result: this row passes the selection.  Return the
 	  // row. 
-	  return self->table_->getRowObject(index);
+	  return self->getRowObject(index);
 	else 
 	  // Cached result: this row fail the selection.  Continue on to
 	  // the next row.
 	  continue;
       }
     }
-    else 
+    else {
       // No cache.  Use the next index value.
-      index = self->index_++;
+      index = self->index_;
+      self->index_ += self->step_;
+    }
 
     // At the end?
     if (index >= num_rows) 
       // Yes.
       throw Exception(PyExc_StopIteration, "end of iteration");
 
+    // Is this the first row of a block we haven't checked yet?  Rows
+    // from a column index needn't be checked.
+    int64_t block = index / table::ZoneMap::block_size;
+    table::ZoneMap* zone_map = self->table_->table_->getZoneMap();
+    if (! from_index && zone_map != NULL && self->bounds_.size() > 0 
+	&& block != self->checked_block_) {
+      self->checked_block_ = block;
+      // Skip the rest of the block if the zone map shows no row in it
+      // satisfies the selection.
+      if (zone_map->excludes(block, self->bounds_)) {
+	int64_t end = std::min((block + 1) * table::ZoneMap::block_size,
+			       zone_map->getNumRows());
+	if (end > index) {
+	  self->index_ = end;
+	  continue;
+	}
+      }
+    }
+
+    // Can the selection be evaluated on a block of rows at once?  Rows
+    // from a column index are too sparse for that.
+    if (! from_index && self->batch_.get() != NULL) {
+      // Evaluate it on the block starting with this row, if we haven't
+      // already.  Don't cross into the next zone map block, which may
+      // be skipped.
+      if (index < self->batch_start_ || index >= self->batch_stop_) {
+	int64_t stop = std::min((int64_t) index + BatchEvaluator::block_size,
+				(block + 1) * table::ZoneMap::block_size);
+	stop = std::min(stop, (int64_t) num_rows);
+	self->batch_start_ = index;
+	self->batch_stop_ = stop;
+	self->batch_ok_ = self->batch_->evaluate(index, stop - index);
+      }
+      // If that failed, evaluate the selection for each row instead.
+      if (self->batch_ok_) {
+	// Skip to the next row in the block that passes the selection.
+	while (index < self->batch_stop_
+	       && ! self->batch_->getBool(index - self->batch_start_))
+	  ++index;
+	if (index == self->batch_stop_) {
+	  self->index_ = index;
+	  continue;
+	}
+	self->index_ = index + 1;
+	return self->getRowObject(index);
+      }
+    }
+
     // Allocate a row.
-    Ref<PyRow> row = self->table_->getRowObject(index);
+    Ref<PyRow> row = self->getRowObject(index);
     
     // Is there a selection?
     if (self->selection_ == NULL) 
@@ -242,7 +477,7 @@ PyIterator::type = {
   NULL,                                 // tp_repr
   NULL,                                 // tp_as_number
   NULL,                                 // tp_as_sequence
-  NULL,                                 // tp_as_mapping
+  &tp_as_mapping,                       // tp_as_mapping
   NULL,                                 // tp_hash
   NULL,                                 // tp_call
   (reprfunc) tp_str,                    // tp_str
@@ -15,9 +15,14 @@
 // imports
 //----------------------------------------------------------------------
 
+#include <memory>
+#include <vector>
+
 #include "PyBoolArray.hh"
+#include "PyExpr.hh"
 #include "PyRow.hh"
 #include "python.hh"
+#include "table.hh"
 
 //----------------------------------------------------------------------
 // forward declarations
@@ -33,9 +38,24 @@ struct PyIterator
   : public Py::Object
 {
   static PyTypeObject type;
-  static PyIterator* New(PyTable* table, PyObject* selection);
+  static PyIterator* New(PyTable* table, PyObject* selection, 
+			 int start=0, int stop=-1, bool reuse=false);
+
+  PyIterator(PyTable* table, Py::Object* selection=NULL, 
+	     int start=0, int stop=-1, bool reuse=false);
+
+  /* Return a row object for row 'index'.  
+
+     If reusing row objects, a row object previously returned is reused
+     if nothing else refers to it any more.
+
+     returns -- A new reference.  */
+  PyRow* getRowObject(int index);
 
-  PyIterator(PyTable* table, Py::Object* selection=NULL);
+  /* Consider only 'rows', in order, instead of scanning the table.  
+
+     The contents of 'rows' are taken; 'rows' is left empty.  */
+  void setRows(std::vector<int64_t>& rows);
 
   // The table being iterated over.
   Py::Ref<PyTable> table_;
@@ -43,6 +63,14 @@ struct PyIterator
   // The index of the next row to consider.
   int index_;
 
+  // The index past the last row to consider, or -1 for the end of the
+  // table.
+  int stop_;
+
+  // The number of rows to advance from one row considered in a scan to
+  // the next.
+  int step_;
+
   // The selection function, or NULL for every row.
   Py::Ref<Py::Object> selection_;
 
@@ -51,18 +79,61 @@ struct PyIterator
   Py::Ref<PyBoolArray> cache_mask_;
   Py::Ref<PyBoolArray> cache_data_;
 
+  // Bounds on column values implied by the selection.  Blocks of rows
+  // which the table's zone map shows can't satisfy them are skipped.
+  std::vector<table::Bound> bounds_;
+
+  // If a column index is used for the selection, the rows it found.
+  // These are considered before rows from 'index_' on.
+  std::vector<int64_t> index_rows_;
+
+  // The position in 'index_rows_' of the next row to consider.
+  size_t next_index_row_;
+
+  // If true, the table isn't scanned after 'index_rows_'.
+  bool index_rows_only_;
+
+  // The last block of rows checked against 'bounds_', or -1.
+  int64_t checked_block_;
+
+  // If the selection can be evaluated on blocks of rows, its evaluator.
+  std::auto_ptr<BatchEvaluator> batch_;
+
+  // The rows for which 'batch_' was last evaluated.
+  int64_t batch_start_;
+  int64_t batch_stop_;
+
+  // True if 'batch_' evaluated the selection on the rows successfully.
+  bool batch_ok_;
+
+  // If true, row objects are reused.
+  bool reuse_;
+
+  // Row objects that may be reused.  Two are kept, since while the next
+  // row is requested, a loop variable typically still refers to the
+  // last one.
+  static const int num_views = 2;
+  Py::Ref<PyRow> views_[num_views];
+
+  // The element of 'views_' to replace next, when none can be reused.
+  int next_view_;
+
 };
 
 
 inline PyIterator*
 PyIterator::New(PyTable* table,
-		PyObject* selection)
+		PyObject* selection,
+		int start,
+		int stop,
+		bool reuse)
 {
   // Construct the Python object for the iterator.
   PyIterator* result = Py::allocate<PyIterator>();
   // Perform C++ construction.
   try {
-    new(result) PyIterator(table, (Py::Object*) selection);
+    new(result) PyIterator(table, (Py::Object*) selection, start, stop,
+			   reuse);
   }
   catch (Py::Exception) {
     Py::deallocate(result);
@@ -41,7 +41,9 @@ PyRow::PyRow(PyTable* table,
   : table_(Ref<PyTable>::create(table)),
     index_(index),
     read_(false),
-    row_(NULL)
+    row_(NULL),
+    owns_row_(false),
+    row_index_(-1)
 {
   assert(table_ != NULL);
 }
@@ -49,7 +51,9 @@ PyRow::PyRow(PyTable* table,
 
 PyRow::~PyRow()
 {
-  if (row_ != NULL) 
+  if (owns_row_)
+    delete row_;
+  else if (row_ != NULL) 
     table_->returnRow(row_);
 }
 
@@ -58,12 +62,35 @@ Row*
 PyRow::getRow()
   const
 {
-  if (row_ == NULL)
+  if (owns_row_) {
+    // Read the row into our own buffer, if we haven't yet.
+    if (row_index_ != index_) {
+      table_->readRow(index_, row_);
+      row_index_ = index_;
+    }
+  }
+  else if (row_ == NULL)
     row_ = table_->getRow(index_);
   return row_;
 }
 
 
+void
+PyRow::reuse(int index)
+{
+  if (! owns_row_) {
+    // Stop sharing the row from the table's cache, and use our own.
+    if (row_ != NULL)
+      table_->returnRow(row_);
+    row_ = new Row(table_->table_->getSchema());
+    owns_row_ = true;
+    row_index_ = -1;
+  }
+  // The row is read when it is first used.
+  index_ = index;
+}
+
+
 Object*
 PyRow::getColumn(Object* key,
 		 Object* default_value,
@@ -96,6 +123,27 @@ PyRow::getColumn(Object* key,
 }
 
 
+Object*
+PyRow::getJaggedColumn(int column_index)
+{
+  JaggedRef ref = getJaggedRef(getRow()->getValueData(column_index));
+  std::vector<double> values(ref.count_);
+  if (ref.count_ > 0)
+    try {
+      table_->table_->readJagged(column_index, ref.start_, ref.count_, 
+				 &values[0]);
+    }
+    catch (FileError error) {
+      throw Exception(PyExc_IOError, "%s", error.message_.c_str());
+    }
+
+  Ref<Tuple> result = Tuple::New(ref.count_);
+  for (int i = 0; i < ref.count_; ++i)
+    result->InitializeItem(i, Ref<Object>(Float::FromDouble(values[i])));
+  RETURN_NEW_REF(Object, result);
+}
+
+
 //----------------------------------------------------------------------
 // function definitions
 //----------------------------------------------------------------------
@@ -68,9 +68,21 @@ struct PyRow
   /* Return the underlying 'Row' object.  */
   table::Row* getRow() const;
 
+  /* Make this object represent row 'index' instead.
+
+     The row's data is read into a buffer owned by this object, rather
+     than shared with other row objects through the table's row cache,
+     so the object should be referenced only by its user.  Used to
+     recycle row objects when iterating over rows.  */
+  void reuse(int index);
+
   /* Return the value of column 'column_index' as a Python object.  */
   Py::Object* getColumn(table::ColumnType type, int column_index);
 
+  /* Return the values of jagged column 'column_index' as a tuple of
+     floats.  */
+  Py::Object* getJaggedColumn(int column_index);
+
   /* Return the valueof a column as a Python object.  
 
      'default' -- The default value to return, if 'key' is not a column
@@ -102,6 +114,14 @@ private:
   */
   mutable table::Row* row_;
 
+  /* True if 'row_' belongs to this object, rather than to the table's
+     row cache.  */
+  bool owns_row_;
+
+  /* If 'owns_row_', the index of the row whose data 'row_' contains,
+     or -1.  */
+  mutable int row_index_;
+
 };
 
 
@@ -151,19 +171,27 @@ inline Py::Object*
 PyRow::getColumn(table::ColumnType type,
 		 int column_index)
 {
+  if (type == table::TYPE_JAGGED)
+    return getJaggedColumn(column_index);
+
   Value val = getRow()->getValue(column_index);
 
   switch (type) {
   case table::TYPE_BOOL:
+  case table::TYPE_BIT:
     return Py::newBool(val.as_bool());
 
   case table::TYPE_INT_8:
   case table::TYPE_INT_16:
   case table::TYPE_INT_32:
+  case table::TYPE_DICT_8:
     return Py::Int::FromLong(val.as_long());
 
+  case table::TYPE_FLOAT_16:
   case table::TYPE_FLOAT_32:
   case table::TYPE_FLOAT_64:
+  case table::TYPE_FIXED_16:
+  case table::TYPE_FIXED_32:
     return Py::Float::FromDouble(val.as_double());
 
   case table::TYPE_COMPLEX_64:
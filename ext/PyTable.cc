@@ -11,17 +11,26 @@
 //----------------------------------------------------------------------
 
 #include <algorithm>
+#include <cerrno>
 #include <cfloat>
+#include <cmath>
+#include <cstdio>
+#include <cstring>
+#include <fcntl.h>
 #include <limits>
 #include <memory>
+#include <sys/stat.h>
+#include <unistd.h>
 
 #include "PyBoolArray.hh"
+#include "PyColumnArray.hh"
 #include "PyExpr.hh"
 #include "PyIterator.hh"
 #include "PyRowDict.hh"
 #include "PyTable.hh"
 #include "instcount.hh"
 #include "python.hh"
+#include "random.hh"
 #include "table.hh"
 
 #include <structmember.h>
@@ -76,8 +85,35 @@ makeColumnFromObject(PyObject* column_object)
     throw Exception(PyExc_NotImplementedError, 
 		    "column type %s not supported", type_name);
 
+  // A dictionary column's values are listed in its 'dictionary'
+  // attribute.
+  std::vector<long> dictionary;
+  if (type == TYPE_DICT_8) {
+    Ref<Object> entries_attr = column->GetAttrString("dictionary");
+    Sequence* entries = cast<Sequence>(entries_attr);
+    int num_entries = entries->Size();
+    if (num_entries > 256)
+      throw Exception(PyExc_ValueError, 
+		      "dictionary of column '%s' is too long", name);
+    for (int e = 0; e < num_entries; ++e) {
+      Ref<Object> entry = entries->GetItem(e);
+      dictionary.push_back(entry->IntAsLong());
+    }
+  }
+
+  // A fixed-point column's scale and offset are attributes too.
+  if (type == TYPE_FIXED_16 || type == TYPE_FIXED_32) {
+    Ref<Object> scale_attr = column->GetAttrString("scale");
+    Ref<Object> offset_attr = column->GetAttrString("offset");
+    double scale = scale_attr->FloatAsDouble();
+    if (! (scale > 0))
+      throw Exception(PyExc_ValueError, 
+		      "scale of column '%s' must be positive", name);
+    return Column(name, type, scale, offset_attr->FloatAsDouble());
+  }
+
   // Construct the column.
-  return Column(name, type);
+  return Column(name, type, dictionary);
 }
 
 
@@ -105,8 +141,22 @@ buildSchema(Object* schema_obj)
 }
 
 
+/* Raise an exception if 'table' isn't writable.  */
+
+inline void
+checkWritable(Table* table)
+{
+  if (! table->isWritable())
+    throw Exception(PyExc_IOError, "table is not writable");
+}
+
+
+/* Set column 'column_index' of 'row', which is to be appended to
+   'table', to 'value'.  */
+
 inline void
-setColumn(Row* row,
+setColumn(Table* table,
+	  Row* row,
 	  ColumnType type,
 	  int column_index,
 	  Object* value)
@@ -115,9 +165,21 @@ setColumn(Row* row,
 
   switch (type) {
   case TYPE_BOOL:
+  case TYPE_BIT:
     set_value = Value::make(value->IsTrue());
     break;
 
+  case TYPE_DICT_8: {
+    long long_value = value->IntAsLong();
+    const Column& column = row->getSchema()->getColumn(column_index);
+    if (column.findInDictionary(long_value) == -1)
+      throw Exception(PyExc_ValueError,
+		      "%ld is not in the dictionary of column '%s'", 
+		      long_value, column.getName().c_str());
+    set_value = Value::make(long_value);
+    break;
+  }
+
   case TYPE_INT_8: {
     long long_value = value->IntAsLong();
     if (long_value < CHAR_MIN || long_value > CHAR_MAX)
@@ -155,6 +217,32 @@ setColumn(Row* row,
     break;
   }
 
+  case TYPE_FLOAT_16: {
+    // Finite values that don't round to the largest half-precision
+    // value, 65504, overflow.
+    double dbl_value = value->FloatAsDouble();
+    if (fabs(dbl_value) >= 65520 && fabs(dbl_value) <= DBL_MAX)
+      throw Exception(PyExc_OverflowError, 
+		      "%lf is not a \"float16\"", dbl_value);
+    set_value = Value::make(dbl_value);
+    break;
+  }
+
+  case TYPE_FIXED_16:
+  case TYPE_FIXED_32: {
+    double dbl_value = value->FloatAsDouble();
+    const Column& column = row->getSchema()->getColumn(column_index);
+    double stored = column.encodeFixed(dbl_value);
+    double limit = (type == TYPE_FIXED_16) ? SHRT_MAX : INT_MAX;
+    // NaNs fail both comparisons.
+    if (! (stored >= -limit - 1 && stored <= limit))
+      throw Exception(PyExc_OverflowError,
+		      "%lf is out of range of column '%s'", 
+		      dbl_value, column.getName().c_str());
+    set_value = Value::make(dbl_value);
+    break;
+  }
+
   case TYPE_COMPLEX_64: {
     std::complex<double> cmplx = value->AsComplex();
     if (-std::real(cmplx) > std::numeric_limits<float>::max()
@@ -172,6 +260,32 @@ setColumn(Row* row,
     set_value = Value::make(value->AsComplex());
     break;
 
+  case TYPE_JAGGED: {
+    // Append the values to the column's values, and store where they
+    // are in the row.
+    checkWritable(table);
+    int length = PyObject_Length(value);
+    THROW_IF_MINUS_ONE(length);
+    std::vector<double> values(length);
+    for (int i = 0; i < length; ++i) {
+      Ref<Object> item = PySequence_GetItem(value, i);
+      THROW_IF_NULL(item);
+      values[i] = item->FloatAsDouble();
+    }
+    JaggedRef ref;
+    ref.count_ = length;
+    try {
+      ref.start_ = table->appendJagged
+	(column_index, length > 0 ? &values[0] : NULL, length);
+    }
+    catch (FileError error) {
+      throw Exception(PyExc_IOError, "%s", error.message_.c_str());
+    }
+    setJaggedRef(row->getBuffer() 
+		 + row->getSchema()->getColumnOffset(column_index), ref);
+    return;
+  }
+
   default:
     throw Exception(PyExc_NotImplementedError, 
 		    "unsupported column type %d", (int) type);
@@ -204,11 +318,141 @@ setColumns(PyTable* table,
     // Get the value for this column.
     Ref<Object> value = mapping->GetItem(key_obj);
     // Set it in the row.
-    setColumn(row, type, column_index, value);
+    setColumn(table->table_.get(), row, type, column_index, value);
+  }
+}
+
+
+/* Return true if rows of 'schema0' and 'schema1' are laid out alike.  */
+
+bool
+haveSameLayout(const Schema* schema0,
+	       const Schema* schema1)
+{
+  if (schema0 == schema1)
+    return true;
+  if (schema0->getSize() != schema1->getSize()
+      || schema0->getNumColumns() != schema1->getNumColumns())
+    return false;
+  int num_columns = schema0->getNumColumns();
+  for (int c = 0; c < num_columns; ++c) 
+    if (schema0->getColumn(c).getName() != schema1->getColumn(c).getName()
+	|| schema0->getColumn(c).getType() != schema1->getColumn(c).getType()
+	|| schema0->getColumnOffset(c) != schema1->getColumnOffset(c)
+	|| schema0->getColumnBit(c) != schema1->getColumnBit(c)
+	|| schema0->getColumn(c).getDictionary() 
+	   != schema1->getColumn(c).getDictionary()
+	|| schema0->getColumn(c).getScale() 
+	   != schema1->getColumn(c).getScale()
+	|| schema0->getColumn(c).getOffset() 
+	   != schema1->getColumn(c).getOffset())
+      return false;
+  return true;
+}
+
+
+/* Return the 'array' module typecode for values of a column type.
+
+   returns -- The typecode, or NULL if the 'array' module cannot
+   represent values of 'type'.  
+*/
+
+const char*
+getArrayTypecode(ColumnType type)
+{
+  switch (type) {
+  case TYPE_BOOL:
+  case TYPE_INT_8:
+    return "b";
+  case TYPE_INT_16:
+    return "h";
+  case TYPE_INT_32:
+    return "i";
+  case TYPE_FLOAT_32:
+    return "f";
+  case TYPE_FLOAT_64:
+    return "d";
+  default:
+    return NULL;
+  }
+}
+
+
+/* Return the NumPy type string for stored values of a column type.
+
+   returns -- The type string, or NULL if values of 'type' don't have
+   a NumPy type.  Dictionary columns' indices are given as unsigned
+   bytes, and fixed-point columns' stored integers as integers; bit
+   columns, which share bytes, have none.
+*/
+
+const char*
+getNumPyFormat(ColumnType type)
+{
+  switch (type) {
+  case TYPE_BOOL:
+    return "?";
+  case TYPE_INT_8:
+    return "i1";
+  case TYPE_INT_16:
+    return "i2";
+  case TYPE_INT_32:
+    return "i4";
+  case TYPE_FLOAT_32:
+    return "f4";
+  case TYPE_FLOAT_64:
+    return "f8";
+  case TYPE_COMPLEX_64:
+    return "c8";
+  case TYPE_COMPLEX_128:
+    return "c16";
+  case TYPE_DICT_8:
+    return "u1";
+  case TYPE_FLOAT_16:
+    return "f2";
+  case TYPE_FIXED_16:
+    return "i2";
+  case TYPE_FIXED_32:
+    return "i4";
+  default:
+    return NULL;
   }
 }
 
 
+/* Construct an 'array.array' for values of a column type.
+
+   'length' -- The number of elements in the array.
+
+   'buffer' -- Set to the address of the array's contents.
+
+   returns -- A new reference.  */
+
+Object*
+newArray(ColumnType type,
+	 int length,
+	 char** buffer)
+{
+  const char* typecode = getArrayTypecode(type);
+  if (typecode == NULL)
+    throw Exception(PyExc_NotImplementedError,
+		    "no array type for column type %s", getTypeName(type));
+
+  // Construct a one-element array and repeat it, which allocates the
+  // whole array at once.
+  Ref<Object> array_type = import("array", "array");
+  Ref<Object> unit = 
+    cast<Callable>(array_type)->CallFunction("s[i]", typecode, 0);
+  Ref<Object> result = PySequence_Repeat(unit, length);
+  THROW_IF_NULL(result);
+
+  int buffer_length;
+  result->AsWriteBuffer(buffer, &buffer_length);
+  assert(buffer_length == (int) (length * getTypeSize(type)));
+  return result.release();
+}
+
+
 void
 setPath(Object* table,
 	const char* path)
@@ -224,268 +468,1670 @@ setPath(Object* table,
 }
 
 
-/* Opens an existing table at 'path' with 'mode'.
+/* The header of a file containing the cached values of an expression.
 
-   returns -- A 'PyTable' object for the table.
+   The header is followed by the mask bits and then the values, each
+   with room for 'capacity_' rows.  */
 
-   raises -- 'FileError' if the table cannot be opened.  
-*/
+struct CacheFileHeader
+{
+  int magic_;
+  int version_;
+  // The type of the values: 'Value::TYPE_BOOL' for bits, or
+  // 'Value::TYPE_LONG' or 'Value::TYPE_DOUBLE'.
+  int value_type_;
+  // The size of each value, or zero for bits.
+  int value_size_;
+  // The number of rows for which values are stored.
+  int64_t length_;
+  // The number of rows for which there is room.
+  int64_t capacity_;
+  // The creation stamp of the table whose values these are.
+  int64_t table_stamp_;
+};
 
-inline PyTable*
-loadTable(const char* path,
-	  const char* mode,
-	  Callable* row_type=(Callable*) &PyRowDict::type,
-	  bool with_metadata=true)
+
+const int 
+cache_file_magic = 0x11a6682c;
+
+const int
+cache_file_version = 3;
+
+/* Cache files have room for at least this many rows, so that appending
+   rows seldom requires a new file.  */
+const int64_t
+min_cache_capacity = 65536;
+
+
+/* Return the path of cache file number 'number' of 'table'.  */
+
+std::string
+getCachePath(PyTable* table,
+	     long number)
 {
-  // Open the table itself.
-  Table* table;
-  table = FileTable::open(path, mode);
-  // Build a Python schema object for its schema.
-  Ref<Object> schema(buildSchemaObject(table->getSchema()));
-  // Construct the Python table object.
-  Ref<PyTable> result = 
-    PyTable::New(table, schema, row_type, with_metadata);
-  // Store the path in it.
-  setPath(result, path);
-  // All done.
-  return result.release();
+  Ref<Object> path_obj = table->GetAttrString("path");
+  Ref<String> path = path_obj->Str();
+  char suffix[32];
+  sprintf(suffix, ".%ld.cache", number);
+  return std::string(path->AsString()) + suffix;
 }
 
 
-}  // anonymous namespace
+inline off64_t
+getCacheValuesOffset(int64_t capacity)
+{
+  // Align the values for their type.
+  off64_t offset = sizeof(CacheFileHeader) + (capacity + 7) / 8;
+  return (offset + 7) / 8 * 8;
+}
 
 
-//----------------------------------------------------------------------
-// method definitions
-//----------------------------------------------------------------------
+inline off64_t
+getCacheValuesSize(const CacheFileHeader& header,
+		   int64_t num_rows)
+{
+  if (header.value_type_ == Value::TYPE_BOOL)
+    return (num_rows + 7) / 8;
+  else
+    return num_rows * header.value_size_;
+}
 
-PyTable::PyTable(Table* table,
-		 PyObject* schema_obj,
-		 Callable* row_type,
-		 bool with_metadata)
-  : table_(table),
-    row_cache_max_size_(16),
-    attribute_dict_(NULL),
-    row_type_(newRef(row_type)),
-    expression_cache_(Dict::New()),
-    compiled_expressions_(Dict::New()),
-    schema_(Ref<Object>::create(schema_obj).release()),
-    weak_references_(NULL),
-    file_object_(newRef(None)),
-    with_metadata_(with_metadata)
+
+/* Map the '(mask, values)' arrays from cache file 'fd'.  */
+
+Tuple*
+mapCacheFile(int fd,
+	     const CacheFileHeader& header)
 {
-  assert(table != NULL);
+  Ref<PyBoolArray> mask = PyBoolArray::Map
+    (fd, sizeof(CacheFileHeader), header.length_, header.capacity_);
+  off64_t values_offset = getCacheValuesOffset(header.capacity_);
+  Ref<Object> values;
+  if (header.value_type_ == Value::TYPE_BOOL)
+    values = PyBoolArray::Map
+      (fd, values_offset, header.length_, header.capacity_);
+  else
+    values = PyColumnArray::Map
+      (fd, values_offset, (Value::Type) header.value_type_, 
+       header.length_, header.capacity_);
+  return Tuple::New(2, (Object*) mask, (Object*) values);
+}
 
-  if (with_metadata_) {
-    std::string metadata = table->getMetadata();
-    if (metadata.length() > 0) {
-      // Import the standard Python unpickling function.
-      // FIXME: Module 'cPickle' seems to have problems with
-      // PyBoolVector's '__reduce__' method, so use 'pickle' instead.
-      Ref<Object> unpickle_obj = Py::import("pickle", "loads");
-      Callable* unpickle_fn = cast<Callable>(unpickle_obj); 
-      Ref<Tuple> metadata_tuple;
-      try {
-	// Unpickle the metadata.
-	Ref<Object> metadata_obj = 
-	  unpickle_fn->CallFunction("s#", metadata.data(), 
-				    metadata.length());
-	// The result should be a tuple.
-	metadata_tuple.set(cast<Tuple>(metadata_obj));
-
-	if (metadata_tuple->Size() >= 1) 
-	  // The first element is the attribute dictionary.
-	  attribute_dict_ = metadata_tuple->GetItem(0);
-
-	if (metadata_tuple->Size() >= 2) {
-	  // The second element is the table schema.
-	  Ref<Object> new_schema = metadata_tuple->GetItem(1);
-	  // Call 'checkSchema' to make sure the loaded schema is
-	  // compatible with what's really in the table.
-	  Ref<Object> checkSchema_obj = 
-	    Py::import("hep.table", "checkSchema");
-	  Callable* checkSchema_fn = cast<Callable>(checkSchema_obj);
-	  Ref<Object> ignored = checkSchema_fn->CallFunctionObjArgs
-	    (schema_, (Object*) new_schema, NULL);
-	  // Use the new schema.
-	  schema_.set(new_schema.release());
-	}
 
-	if (metadata_tuple->Size() >= 3) {
-	  // The third item is the expression cache.
-	  Ref<Object> expression_cache = metadata_tuple->GetItem(2);
-	  cast<Dict>(expression_cache_)->Update(expression_cache);
-	}
-      }
-      catch (Exception exception) {
-	// Extract the exception state.
-	Ref<Object> type;
-	Ref<Object> value;
-	Ref<Object> traceback;
-	exception.Get(type, value, traceback);
-	// Print a warning.
-	Ref<String> exc_string = value->Str();
-	Warn(PyExc_RuntimeWarning, "error extracting table metadata: %s",
-	     exc_string->AsString());
-	// Clear the exception.
-	exception.Clear();
-      }
-    }
-  }
+/* Return the address of the contents of 'values', a 'PyBoolArray' or
+   'PyColumnArray'.  */
 
-  // Import, and save a reference to, the pickling function.  We will
-  // need in the destructor, which may be called during Python cleanup
-  // when imports are not allowed.
-  // FIXME: Module 'cPickle' seems to have problems with PyBoolVector's
-  // '__reduce__' method, so use 'pickle' instead.
-  Ref<Object> pickle_obj = import("pickle", "dumps");
-  Callable* pickle_fn = cast<Callable>(pickle_obj);
-  pickle_fn_ = Ref<Callable>::create(pickle_fn);
+inline const char*
+getCacheValuesData(Object* values)
+{
+  if (PyBoolArray::Check(values))
+    return (const char*) cast<PyBoolArray>(values)->bits_;
+  else
+    return cast<PyColumnArray>(values)->data_;
+}
 
-  // Construct a sequence of column keys (names in the schema).  This
-  // will be handy for rows to use.
-  const Schema* schema = table->getSchema();
-  unsigned num_columns = schema->getNumColumns();
-  Ref<Tuple> keys = Tuple::New(num_columns);
-  // Loop over columns in the schema.
-  for (unsigned c = 0; c < num_columns; ++c) {
-    const Column& column = schema->getColumn(c);
-    const char* column_name = column.getName().c_str();
-    Ref<String> key = String::InternFromString(column_name);
-    keys->InitializeItem(c, key);
 
-    column_lookup_[key] = ColumnData_t(c, column.getType());
+/* Create a cache file at 'path' for 'length' rows.
 
-    // Associate the column index with name index in 'symbol_name_table'.
-    int column_index = symbol_name_table.find(key);
-    if (column_index >= (int) column_index_map_.size())
-      column_index_map_.resize(column_index + 1, -1);
-    column_index_map_[column_index] = c;
+   'value_type' -- The type of the values.
+
+   'table_stamp' -- The creation stamp of the table.
+
+   'mask', 'values' -- Arrays whose contents to store in the file, or
+   NULL for an empty cache.
+
+   returns -- The '(mask, values)' arrays mapped from the new file.  */
+
+Tuple*
+createCacheFile(const std::string& path,
+		Value::Type value_type,
+		int length,
+		int64_t table_stamp,
+		const PyBoolArray* mask,
+		Object* values)
+{
+  CacheFileHeader header;
+  header.magic_ = cache_file_magic;
+  header.version_ = cache_file_version;
+  header.value_type_ = value_type;
+  header.value_size_ = 
+    value_type == Value::TYPE_BOOL ? 0 : PyColumnArray::getItemSize(value_type);
+  header.length_ = length;
+  header.capacity_ = std::max(2 * (int64_t) length, min_cache_capacity);
+  header.table_stamp_ = table_stamp;
+
+  // Write a new file and move it into place, so that arrays mapped from
+  // the file it replaces aren't affected.
+  std::string new_path = path + ".new";
+  int fd = ::open(new_path.c_str(), O_RDWR | O_CREAT | O_TRUNC, 0666);
+  if (fd < 0)
+    throw Exception(PyExc_IOError, "%s: %s", new_path.c_str(), 
+		    strerror(errno));
+  off64_t size = getCacheValuesOffset(header.capacity_) 
+    + getCacheValuesSize(header, header.capacity_);
+  bool written = 
+    ftruncate64(fd, size) == 0
+    && pwrite64(fd, &header, sizeof(header), 0) == sizeof(header);
+  if (written && mask != NULL) {
+    int num_rows = std::min(mask->length_, length);
+    size_t num_bytes = (num_rows + 7) / 8;
+    size_t num_value_bytes = getCacheValuesSize(header, num_rows);
+    written = 
+      pwrite64(fd, mask->bits_, num_bytes, sizeof(header)) 
+        == (ssize_t) num_bytes
+      && pwrite64(fd, getCacheValuesData(values), num_value_bytes, 
+		  getCacheValuesOffset(header.capacity_)) 
+        == (ssize_t) num_value_bytes;
+  }
+  if (! written || ::rename(new_path.c_str(), path.c_str()) != 0) {
+    Exception exception(PyExc_IOError, "%s: %s", path.c_str(), 
+			strerror(errno));
+    ::close(fd);
+    ::unlink(new_path.c_str());
+    throw exception;
   }
-  keys_.set(keys.release());
 
-  instances.add(this);
+  try {
+    Ref<Tuple> result = mapCacheFile(fd, header);
+    ::close(fd);
+    return result.release();
+  }
+  catch (Exception) {
+    ::close(fd);
+    throw;
+  }
 }
 
 
-PyTable::~PyTable()
+/* Open the cache file at 'path' for a table with 'num_rows' rows and
+   creation stamp 'table_stamp'.
+
+   If rows have been appended to the table since the file was written,
+   the file is lengthened to include them.
+
+   returns -- The '(mask, values)' arrays mapped from the file, or NULL
+   if the file is missing or doesn't match the table or 'value_type'.  */
+
+Tuple*
+openCacheFile(const std::string& path,
+	      Value::Type value_type,
+	      int num_rows,
+	      int64_t table_stamp)
 {
-  if (with_metadata_) {
-    // Construct a tuple containing all the metadata we want to persist. 
-    Ref<Tuple> metadata_tuple = Tuple::New(3);
-    if (attribute_dict_ == NULL) {
-      Ref<Dict> empty_dict = Dict::New();
-      metadata_tuple->InitializeItem(0, empty_dict);
-    }
-    else 
-      metadata_tuple->InitializeItem(0, attribute_dict_);
-    metadata_tuple->InitializeItem(1, schema_);
-    metadata_tuple->InitializeItem(2, expression_cache_);
-    // Pickle it to obtain a persistent representation.
-    Ref<Object> metadata_obj;
-    try {
-      // The second argument specifies the binary pickle format.
-      metadata_obj = 
-	pickle_fn_->CallFunction("Oi", (PyObject*) metadata_tuple, 1);
-    }
-    catch (Exception ex) {
-      // Failed to pickle the metadata.
-      // FIXME: For now, print a warning, the exception, and the
-      // metadata itself, and continue on without writing it.
-      std::cerr << "WARNING: Failed to pickle table metadata:\n";
-      // printException(std::cerr);
-      // std::cerr << "\n";
-      ex.Print();
-      ex.Clear();
+  int fd = ::open(path.c_str(), O_RDWR);
+  if (fd < 0)
+    return NULL;
+
+  CacheFileHeader header;
+  struct stat64 info;
+  if (pread64(fd, &header, sizeof(header), 0) != sizeof(header)
+      || header.magic_ != cache_file_magic
+      || header.version_ != cache_file_version
+      || header.value_type_ != value_type
+      || (value_type != Value::TYPE_BOOL
+	  && header.value_size_ != (int) PyColumnArray::getItemSize(value_type))
+      || header.length_ > header.capacity_
+      // A cache for more rows than the table has, or for a table
+      // created earlier at the same path, isn't for this table.
+      || header.length_ > num_rows
+      || header.table_stamp_ != table_stamp
+      || fstat64(fd, &info) != 0
+      || info.st_size < getCacheValuesOffset(header.capacity_) 
+                        + getCacheValuesSize(header, header.capacity_)) {
+    ::close(fd);
+    return NULL;
+  }
+
+  try {
+    if (num_rows > header.capacity_) {
+      // There's no room in the file for the appended rows.  Copy the
+      // cache to a larger file.
+      Ref<Tuple> arrays = mapCacheFile(fd, header);
+      ::close(fd);
+      fd = -1;
+      Ref<Object> mask = arrays->GetItem(0);
+      Ref<Object> values = arrays->GetItem(1);
+      return createCacheFile(path, value_type, num_rows, table_stamp,
+			     cast<PyBoolArray>(mask), values);
     }
-    // Did we manage to pickle the metadata?
-    if (metadata_obj != NULL) {
-      // Yup.  Store the metadata in the table.
-      String* metadata_str = cast<String>(metadata_obj);
-      std::string metadata(metadata_str->AsString(), 
-			   metadata_str->Size());
-      table_->setMetadata(metadata);
-      // We don't need the metadata tuple any more.
-      metadata_tuple.clear();
+    if (num_rows > header.length_) {
+      // Lengthen the cache in place.  The mask bits for the appended
+      // rows were never set.
+      header.length_ = num_rows;
+      if (pwrite64(fd, &header, sizeof(header), 0) != sizeof(header))
+	throw Exception(PyExc_IOError, "%s: %s", path.c_str(), 
+			strerror(errno));
     }
+    Ref<Tuple> result = mapCacheFile(fd, header);
+    ::close(fd);
+    return result.release();
   }
+  catch (Exception) {
+    if (fd >= 0)
+      ::close(fd);
+    throw;
+  }
+}
 
-  assert(row_cache_.size() == 0);
-  schema_.clear();
 
-  // Let go (close and delete) the underlying table here.  Do this
-  // before deleting the attribute dictionary, since the latter may
-  // carry the last reference to a file containing the table.
-  table_.reset();
-  // Delete the attribute dictionary.
-  if (attribute_dict_ != NULL)
-    Py_DECREF(attribute_dict_);
+/* Return '(mask, values)' arrays for 'num_rows' rows from the cache file
+   at 'path', for the table with creation stamp 'table_stamp'.
 
-  PyObject_ClearWeakRefs((PyObject*) this);
-  
-  instances.remove(this);
-}
+   'arrays' -- The arrays already mapped from the file, or NULL.  If
+   there's room in the file, they are lengthened in place.  Otherwise,
+   they are copied to a larger file, and appended to 'retired'; since
+   compiled expressions may still refer to them, they must be kept.
 
+   returns -- A new reference to the arrays.  */
 
-Row*
-PyTable::getRow(int index)
+Tuple*
+loadCacheFile(const std::string& path,
+	      Value::Type value_type,
+	      int num_rows,
+	      int64_t table_stamp,
+	      Tuple* arrays,
+	      List* retired)
 {
-  if (index < 0 || index >= table_->getNumRows())
-    throw Exception(PyExc_IndexError, "%d", index);
+  if (arrays == NULL) {
+    // Map the arrays from the file, creating a new empty one if it's
+    // missing, damaged, or left by another table.
+    Tuple* result = openCacheFile(path, value_type, num_rows, table_stamp);
+    if (result == NULL)
+      result = createCacheFile(path, value_type, num_rows, table_stamp, 
+			       NULL, NULL);
+    return result;
+  }
 
-  // Look for a cache entry that matches this index.  
-  RowCache_t::iterator iter = row_cache_.find(index);
-  if (iter != row_cache_.end()) {
-    ++iter->second->ref_count_;
-    return iter->second;
+  Ref<Object> mask_obj = arrays->GetItem(0);
+  Ref<Object> values = arrays->GetItem(1);
+  PyBoolArray* mask = cast<PyBoolArray>(mask_obj);
+  if (num_rows > mask->capacity_) {
+    retired->Append(arrays);
+    return createCacheFile(path, value_type, num_rows, table_stamp, mask, 
+			   values);
   }
 
-  // No row from cache?  Make a new one.
-  CachedRow* row = new CachedRow(table_->getSchema(), index);
-  // Add this row to the cache.
-  row_cache_[index] = row;
-  // Read the row contents.
-  table_->read(index, row);
-  // All done.
-  ++row->ref_count_;
-  return row;
+  // Record the new length in the file's header.
+  int fd = ::open(path.c_str(), O_RDWR);
+  int64_t length = num_rows;
+  if (fd < 0 
+      || pwrite64(fd, &length, sizeof(length), 
+		  offsetof(CacheFileHeader, length_)) != sizeof(length)) {
+    Exception exception(PyExc_IOError, "%s: %s", path.c_str(), 
+			strerror(errno));
+    if (fd >= 0)
+      ::close(fd);
+    throw exception;
+  }
+  ::close(fd);
+  // The arrays already have room for the new rows.
+  mask->length_ = num_rows;
+  if (PyBoolArray::Check(values))
+    cast<PyBoolArray>(values)->length_ = num_rows;
+  else
+    cast<PyColumnArray>(values)->length_ = num_rows;
+  return Ref<Tuple>::create(arrays).release();
 }
 
 
-void
-PyTable::returnRow(Row* row_arg)
+/* Return '(mask, values)' arrays for 'length' rows that aren't stored in
+   a file, with the contents of 'arrays' if it's not NULL.  */
+
+Tuple*
+newCacheArrays(int length,
+	       Tuple* arrays)
 {
-  CachedRow* row = (CachedRow*) row_arg;
-  assert(row->index_ >= 0);
-  assert(row->index_ < table_->getNumRows());
-  assert(row->ref_count_ > 0);
+  Ref<PyBoolArray> mask = PyBoolArray::New(length);
+  Ref<PyBoolArray> values = PyBoolArray::New(length);
+  if (arrays != NULL) {
+    Ref<Object> old_mask = arrays->GetItem(0);
+    Ref<Object> old_values = arrays->GetItem(1);
+    int old_length = std::min(cast<PyBoolArray>(old_mask)->length_, length);
+    for (int i = 0; i < old_length; ++i) {
+      mask->set(i, cast<PyBoolArray>(old_mask)->get(i));
+      values->set(i, cast<PyBoolArray>(old_values)->get(i));
+    }
+  }
+  return Tuple::New(2, (Object*) mask, (Object*) values);
+}
 
-  --row->ref_count_;
 
-  // Only kill it when the reference count drops to zero.
-  if (row->ref_count_ > 0)
-    return;
+/* Return the path of the file containing the values of materialized
+   column 'name' of 'table'.  */
 
-  // Find the row in the cache.
-  RowCache_t::iterator iter = row_cache_.find(row->index_);
-  assert(iter != row_cache_.end());
-  assert(iter->second == row);
-  // Remove it.
-  row_cache_.erase(iter);
-  // Deallocate it.
-  delete row;
+std::string
+getMaterializedPath(PyTable* table,
+		    Object* name)
+{
+  Ref<Object> path_obj = table->GetAttrString("path");
+  Ref<String> path = path_obj->Str();
+  Ref<String> name_str = name->Str();
+  return std::string(path->AsString()) + "." + name_str->AsString() 
+    + ".column";
 }
 
 
-PyRow*
-PyTable::getRowObject(int index,
-		      Py::Callable* constructor)
+/* Return the value of a bound, or 'unbounded' if it is 'None'.  */
+
+double
+getBoundValue(Object* value,
+	      double unbounded)
 {
-  // Use the default row type, if none was specified explicitly.
-  if (constructor == NULL)
-    constructor = row_type_;
-  // Build it.
-  return cast<PyRow>(constructor->CallFunction("Oi", this, index));
+  if (value == None)
+    return unbounded;
+  double result = PyFloat_AsDouble(value);
+  if (result == -1.0 && PyErr_Occurred())
+    throw Exception();
+  return result;
+}
+
+
+/* Return the type of the values of an expression of type 'type' when
+   materialized.  */
+
+Value::Type
+getMaterializedType(Object* type)
+{
+  if (type == (Object*) &PyInt_Type)
+    return Value::TYPE_LONG;
+  else if (type == (Object*) &PyFloat_Type)
+    return Value::TYPE_DOUBLE;
+  else {
+    Ref<Object> bool_type = import("hep.bool", "bool");
+    if (type == bool_type)
+      return Value::TYPE_BOOL;
+  }
+  throw Exception(PyExc_TypeError, 
+		  "only int, float, and bool expressions may be materialized");
+}
+
+
+/* Return a cache file number not used by 'table'.  */
+
+long
+getNewCacheNumber(PyTable* table)
+{
+  std::vector<long> numbers;
+  Ref<Sequence> keys = table->getExpressionCache()->Keys();
+  int num_keys = keys->Size();
+  for (int k = 0; k < num_keys; ++k) {
+    Ref<Object> key = keys->GetItem(k);
+    Ref<Object> number = table->getExpressionCache()->GetItem(key);
+    if (number != None)
+      numbers.push_back(number->IntAsLong());
+  }
+  long number = 0;
+  while (std::find(numbers.begin(), numbers.end(), number) 
+	 != numbers.end())
+    ++number;
+  return number;
+}
+
+
+/* One-pass summary statistics of a sequence of values.
+
+   Along with the count, extrema, and sums, a sketch of the distribution
+   is kept, from which quantiles are estimated.  The sketch counts
+   values in buckets whose bounds increase geometrically by 'gamma', so
+   that a quantile taken from it is within 'sketch_accuracy' of the
+   true value, relative to its magnitude.  Values of either sign are
+   counted separately, and zeros by themselves.  */
+
+class Summary
+{
+public:
+
+  /* The relative accuracy of quantiles computed from the sketch.  */
+  static const double sketch_accuracy;
+
+  /* The largest number of buckets kept for each sign.  If there would
+     be more, those for values of the smallest magnitude are merged.  */
+  static const int max_buckets = 2048;
+
+  Summary();
+
+  /* Resume summarizing values from a tuple returned by 'asTuple'.  
+
+     raises -- 'ValueError' if 'data' is not a summary built with the
+     same sketch parameters.  */
+  Summary(Object* data);
+
+  /* Add a value.  Values that are not finite are ignored.  */
+  void add(double value);
+
+  /* Return a new reference to a tuple representing the summary.
+
+     The tuple contains the count, minimum, maximum, sum, sum of
+     squares, the sketch's 'gamma', the number of zeros, and the
+     offset and counts of the negative and positive sketch buckets.  
+  */
+  Tuple* asTuple() const;
+
+private:
+
+  /* Counts of values in consecutive buckets, starting with the bucket
+     'offset_'.  Bucket 'k' holds values whose magnitudes are in the
+     range 'gamma ** (k - 1)' to 'gamma ** k'.  */
+  struct Buckets
+  {
+    int offset_;
+    std::vector<int64_t> counts_;
+
+    void add(int key);
+    void collapse(int offset);
+    Object* asList() const;
+    void load(int offset, Object* counts);
+  };
+
+  int64_t count_;
+  double minimum_;
+  double maximum_;
+  double sum_;
+  double sum_of_squares_;
+  int64_t zeros_;
+  Buckets negative_;
+  Buckets positive_;
+  double gamma_;
+  double log_gamma_;
+
+  int getKey(double magnitude) const
+    { return (int) ceil(log(magnitude) / log_gamma_); }
+
+};
+
+
+const double
+Summary::sketch_accuracy = 0.01;
+
+
+Summary::Summary()
+  : count_(0),
+    minimum_(0),
+    maximum_(0),
+    sum_(0),
+    sum_of_squares_(0),
+    zeros_(0),
+    gamma_((1 + sketch_accuracy) / (1 - sketch_accuracy)),
+    log_gamma_(log(gamma_))
+{
+  negative_.offset_ = 0;
+  positive_.offset_ = 0;
+}
+
+
+Summary::Summary(Object* data)
+  : gamma_((1 + sketch_accuracy) / (1 - sketch_accuracy)),
+    log_gamma_(log(gamma_))
+{
+  PY_LONG_LONG count;
+  Object* minimum;
+  Object* maximum;
+  double gamma;
+  PY_LONG_LONG zeros;
+  Object* negative_counts;
+  Object* positive_counts;
+  if (! Tuple::Check(data)
+      || ! PyArg_ParseTuple(data, "LOOdddLiOiO", &count, &minimum,
+			    &maximum, &sum_, &sum_of_squares_, &gamma,
+			    &zeros, &negative_.offset_, &negative_counts,
+			    &positive_.offset_, &positive_counts))
+    throw Exception(PyExc_ValueError, "invalid statistics data");
+  if (gamma != gamma_)
+    throw Exception(PyExc_ValueError, "statistics sketch doesn't match");
+  count_ = count;
+  zeros_ = zeros;
+  minimum_ = count_ == 0 ? 0 : minimum->FloatAsDouble();
+  maximum_ = count_ == 0 ? 0 : maximum->FloatAsDouble();
+  negative_.load(negative_.offset_, negative_counts);
+  positive_.load(positive_.offset_, positive_counts);
+}
+
+
+void
+Summary::add(double value)
+{
+  if (! finite(value))
+    return;
+
+  if (count_ == 0 || value < minimum_)
+    minimum_ = value;
+  if (count_ == 0 || value > maximum_)
+    maximum_ = value;
+  ++count_;
+  sum_ += value;
+  sum_of_squares_ += value * value;
+
+  if (value > 0)
+    positive_.add(getKey(value));
+  else if (value < 0)
+    negative_.add(getKey(-value));
+  else
+    ++zeros_;
+}
+
+
+Tuple*
+Summary::asTuple()
+  const
+{
+  Ref<Object> minimum;
+  Ref<Object> maximum;
+  if (count_ == 0) {
+    minimum = newRef(None);
+    maximum = newRef(None);
+  }
+  else {
+    minimum = Float::FromDouble(minimum_);
+    maximum = Float::FromDouble(maximum_);
+  }
+  Ref<Object> negative_counts = negative_.asList();
+  Ref<Object> positive_counts = positive_.asList();
+  Ref<Object> result = Py_BuildValue
+    ("(LOOdddLiOiO)", (PY_LONG_LONG) count_, (PyObject*) minimum,
+     (PyObject*) maximum, sum_, sum_of_squares_, gamma_,
+     (PY_LONG_LONG) zeros_, negative_.offset_, 
+     (PyObject*) negative_counts, positive_.offset_,
+     (PyObject*) positive_counts);
+  return cast<Tuple>(result.release());
+}
+
+
+void
+Summary::Buckets::add(int key)
+{
+  if (counts_.empty()) {
+    offset_ = key;
+    counts_.push_back(1);
+    return;
+  }
+
+  // If there would be too many buckets, merge the lowest ones.
+  if (key >= offset_ + max_buckets)
+    collapse(key - max_buckets + 1);
+  int size = counts_.size();
+  if (key < offset_) {
+    // Count a value below the lowest bucket we can keep in that bucket.
+    int lowest = std::max(key, offset_ + size - max_buckets);
+    counts_.insert(counts_.begin(), offset_ - lowest, 0);
+    offset_ = lowest;
+    key = lowest;
+  }
+  else if (key >= offset_ + size)
+    counts_.resize(key - offset_ + 1, 0);
+  ++counts_[key - offset_];
+}
+
+
+/* Merge all buckets below 'offset' into bucket 'offset'.  */
+
+void
+Summary::Buckets::collapse(int offset)
+{
+  int num_merged = std::min(offset - offset_, (int) counts_.size());
+  int64_t merged = 0;
+  for (int i = 0; i < num_merged; ++i)
+    merged += counts_[i];
+  counts_.erase(counts_.begin(), counts_.begin() + num_merged);
+  if (counts_.empty())
+    counts_.push_back(0);
+  counts_[0] += merged;
+  offset_ = offset;
+}
+
+
+Object*
+Summary::Buckets::asList()
+  const
+{
+  Ref<List> result = List::New();
+  for (std::vector<int64_t>::const_iterator i = counts_.begin();
+       i != counts_.end(); ++i) {
+    Ref<Object> count = Py_BuildValue("L", (PY_LONG_LONG) *i);
+    result->Append(count);
+  }
+  return result.release();
+}
+
+
+void
+Summary::Buckets::load(int offset,
+		       Object* counts)
+{
+  Sequence* counts_seq = cast<Sequence>(counts);
+  int size = counts_seq->Size();
+  if (size > max_buckets)
+    throw Exception(PyExc_ValueError, "too many statistics buckets");
+  offset_ = offset;
+  counts_.resize(size);
+  for (int i = 0; i < size; ++i) {
+    Ref<Object> count = counts_seq->GetItem(i);
+    counts_[i] = count->IntAsLong();
+  }
+}
+
+
+/* Evaluate a compiled expression on 'row'.  */
+
+inline Value
+evaluateOnRow(Object* compiled,
+	      PyRow* row)
+{
+  if (PyExpr::Check(compiled))
+    return cast<PyExpr>(compiled)->evaluate((Mapping*) row, true);
+  Ref<Object> result = 
+    cast<Callable>(compiled)->CallFunctionObjArgs(row, NULL);
+  return Value::make((Object*) result);
+}
+
+
+/* Evaluates an integer expression on blocks of rows of a table.  */
+
+class KeyEvaluator
+{
+public:
+
+  /* Prepare to evaluate expanded expression 'expr' on rows of 'table'.
+
+     raises -- 'TypeError' if the expression's values aren't
+     integers.  */
+  KeyEvaluator(PyTable* table, Object* expr);
+
+  /* Evaluate the expression on 'count' rows starting at 'start'.
+
+     'count' must be at most 'BatchEvaluator::block_size'.  */
+  void evaluate(int start, int count, long* keys);
+
+private:
+
+  PyTable* table_;
+  Ref<Object> compiled_;
+  std::auto_ptr<BatchEvaluator> batch_;
+
+};
+
+
+KeyEvaluator::KeyEvaluator(PyTable* table,
+			   Object* expr)
+  : table_(table)
+{
+  Ref<Object> expr_type = expr->GetAttrString("type");
+  if (expr_type != (Object*) &PyInt_Type 
+      && expr_type != (Object*) &PyLong_Type)
+    throw Exception(PyExc_TypeError, "join keys must be integers");
+
+  compiled_ = table->compile(expr);
+  if (PyExpr::Check(compiled_)) {
+    batch_.reset(new BatchEvaluator(cast<PyExpr>(compiled_), table));
+    if (! batch_->isValid())
+      batch_.reset();
+  }
+}
+
+
+void
+KeyEvaluator::evaluate(int start,
+		       int count,
+		       long* keys)
+{
+  if (batch_.get() != NULL && batch_->evaluate(start, count))
+    for (int i = 0; i < count; ++i)
+      keys[i] = batch_->getValue(i).cast_as_long();
+  else
+    // Evaluate row by row, so that the row for which evaluation fails
+    // raises the exception.
+    for (int i = 0; i < count; ++i) {
+      Ref<PyRow> row = table_->getRowObject(start + i);
+      keys[i] = evaluateOnRow(compiled_, row).cast_as_long();
+    }
+}
+
+
+/* A hash index of the rows of a table by an integer key.
+
+   Rows with the same hash are chained in order of increasing row
+   index.  */
+
+class KeyIndex
+{
+public:
+
+  /* Index 'keys', the key of each row.  */
+  KeyIndex(const std::vector<long>& keys);
+
+  /* Return the first row with 'key', or -1 if none.  */
+  int find(long key) const
+    { return skip(heads_[getBucket(key)], key); }
+
+  /* Return the next row after 'row' with the same key, or -1.  */
+  int next(int row) const
+    { return skip(next_[row], keys_[row]); }
+
+private:
+
+  int getBucket(long key) const
+    { return (int) (((uint64_t) key * 0x9e3779b97f4a7c15ULL) >> shift_); }
+
+  /* Return the first row from 'row' in its chain with 'key'.  */
+  int skip(int row, long key) const
+  {
+    while (row >= 0 && keys_[row] != key)
+      row = next_[row];
+    return row;
+  }
+
+  const std::vector<long>& keys_;
+  int shift_;
+  std::vector<int> heads_;
+  std::vector<int> next_;
+
+};
+
+
+KeyIndex::KeyIndex(const std::vector<long>& keys)
+  : keys_(keys),
+    shift_(64),
+    next_(keys.size())
+{
+  // Use at least as many buckets as rows.
+  int num_rows = keys.size();
+  int num_buckets = 1;
+  while (num_buckets < num_rows) {
+    num_buckets *= 2;
+    --shift_;
+  }
+  if (shift_ == 64) {
+    // A shift by the width of the key is undefined.
+    num_buckets = 2;
+    shift_ = 63;
+  }
+  heads_.resize(num_buckets, -1);
+  for (int row = num_rows - 1; row >= 0; --row) {
+    int bucket = getBucket(keys[row]);
+    next_[row] = heads_[bucket];
+    heads_[bucket] = row;
+  }
+}
+
+
+/* The column of a table from which a column of a join is copied.  */
+
+struct JoinColumn
+{
+  /* Zero for this table, one for the other table.  */
+  int side_;
+  /* The index of the column in that table.  */
+  int column_index_;
+  size_t size_;
+  /* True for bit columns, which share bytes with other columns.  */
+  bool is_bit_;
+  /* True for jagged columns, whose values are copied too.  */
+  bool is_jagged_;
+};
+
+
+/* Raise an exception unless values of column 'column_index' of
+   'schema' may be copied to 'column'.  */
+
+void
+checkCopyable(const Schema* schema,
+	      int column_index,
+	      const Column& column)
+{
+  const Column& source_column = schema->getColumn(column_index);
+  if (source_column.getType() != column.getType())
+    throw Exception(PyExc_TypeError, "column '%s' has a different type",
+		    column.getName().c_str());
+  if (source_column.getDictionary() != column.getDictionary())
+    throw Exception(PyExc_TypeError, 
+		    "column '%s' has a different dictionary",
+		    column.getName().c_str());
+  if (source_column.getScale() != column.getScale()
+      || source_column.getOffset() != column.getOffset())
+    throw Exception(PyExc_TypeError, 
+		    "column '%s' has a different scale or offset",
+		    column.getName().c_str());
+}
+
+
+/* Return the rows joined from 'table' and 'other', on keys 'expr' and
+   'other_expr'.
+
+   'left' -- If true, include rows of 'table' without a match in
+   'other', paired with -1.
+
+   returns -- Pairs of row indices in 'table' and 'other', in order.  */
+
+void
+joinRows(PyTable* table,
+	 Object* expr,
+	 PyTable* other,
+	 Object* other_expr,
+	 bool left,
+	 std::vector<std::pair<int, int> >& pairs)
+{
+  int num_rows = table->table_->getNumRows();
+  int other_num_rows = other->table_->getNumRows();
+  KeyEvaluator evaluator(table, expr);
+  KeyEvaluator other_evaluator(other, other_expr);
+
+  // Index the smaller table, and look up each row of the larger one.
+  bool index_other = other_num_rows <= num_rows;
+  PyTable* index_table = index_other ? other : table;
+  KeyEvaluator& index_evaluator = index_other ? other_evaluator : evaluator;
+  KeyEvaluator& probe_evaluator = index_other ? evaluator : other_evaluator;
+  int index_num_rows = index_table->table_->getNumRows();
+  int probe_num_rows = index_other ? num_rows : other_num_rows;
+
+  std::vector<long> index_keys(index_num_rows);
+  for (int start = 0; start < index_num_rows; 
+       start += BatchEvaluator::block_size) 
+    index_evaluator.evaluate
+      (start, std::min(index_num_rows - start, BatchEvaluator::block_size),
+       &index_keys[start]);
+  KeyIndex index(index_keys);
+
+  std::vector<bool> matched;
+  if (left && ! index_other)
+    matched.resize(num_rows, false);
+  std::vector<long> keys(BatchEvaluator::block_size);
+  for (int start = 0; start < probe_num_rows; 
+       start += BatchEvaluator::block_size) {
+    int count = std::min(probe_num_rows - start, BatchEvaluator::block_size);
+    probe_evaluator.evaluate(start, count, &keys[0]);
+    for (int i = 0; i < count; ++i) {
+      int row = index.find(keys[i]);
+      if (index_other) {
+	if (row < 0 && left)
+	  pairs.push_back(std::make_pair(start + i, -1));
+	for (; row >= 0; row = index.next(row))
+	  pairs.push_back(std::make_pair(start + i, row));
+      }
+      else 
+	for (; row >= 0; row = index.next(row)) {
+	  pairs.push_back(std::make_pair(row, start + i));
+	  if (left)
+	    matched[row] = true;
+	}
+    }
+  }
+
+  if (! index_other) {
+    // Put the pairs in order of rows of 'table'.
+    if (left)
+      for (int row = 0; row < num_rows; ++row)
+	if (! matched[row])
+	  pairs.push_back(std::make_pair(row, -1));
+    std::sort(pairs.begin(), pairs.end());
+  }
+}
+
+
+/* Append the rows joined by 'pairs' to 'target'.
+
+   Each column of 'target' is copied from the column of the same name
+   in 'table', or otherwise in 'other'.  Columns from 'other' are zero
+   in rows without a match.  */
+
+void
+appendJoinedRows(PyTable* table,
+		 PyTable* other,
+		 PyTable* target,
+		 const std::vector<std::pair<int, int> >& pairs)
+{
+  const Schema* schemas[2] = { 
+    table->table_->getSchema(), 
+    other->table_->getSchema() 
+  };
+  const Schema* target_schema = target->table_->getSchema();
+  int num_columns = target_schema->getNumColumns();
+  std::vector<JoinColumn> columns(num_columns);
+  for (int c = 0; c < num_columns; ++c) {
+    const Column& column = target_schema->getColumn(c);
+    JoinColumn& join_column = columns[c];
+    join_column.side_ = -1;
+    for (int side = 0; side < 2 && join_column.side_ < 0; ++side) 
+      try {
+	join_column.column_index_ = 
+	  schemas[side]->whichColumn(column.getName());
+	join_column.side_ = side;
+      }
+      catch (NoColumn) {
+      }
+    if (join_column.side_ < 0)
+      throw Exception(PyExc_ValueError, "no column '%s' to join",
+		      column.getName().c_str());
+    checkCopyable(schemas[join_column.side_], join_column.column_index_,
+		  column);
+    join_column.size_ = getTypeSize(column.getType());
+    join_column.is_bit_ = column.getType() == TYPE_BIT;
+    join_column.is_jagged_ = column.getType() == TYPE_JAGGED;
+  }
+
+  // Copy the values without the global interpreter lock.
+  std::string error;
+  {
+    AllowThreads allow_threads;
+    Table* tables[2] = { table->table_.get(), other->table_.get() };
+    Row row(schemas[0]);
+    Row other_row(schemas[1]);
+    Row* rows[2] = { &row, &other_row };
+    Row target_row(target_schema);
+    // Clear the unused bits of bytes holding bit columns.
+    memset(target_row.getBuffer(), 0, target_schema->getSize());
+    int last_indices[2] = { -1, -1 };
+    try {
+      for (std::vector<std::pair<int, int> >::const_iterator pair 
+	     = pairs.begin(); pair != pairs.end(); ++pair) {
+	int indices[2] = { pair->first, pair->second };
+	for (int side = 0; side < 2; ++side)
+	  if (indices[side] >= 0 && indices[side] != last_indices[side]) {
+	    tables[side]->read(indices[side], rows[side]);
+	    last_indices[side] = indices[side];
+	  }
+	char* buffer = target_row.getBuffer();
+	for (int c = 0; c < num_columns; ++c) {
+	  const JoinColumn& join_column = columns[c];
+	  char* data = buffer + target_schema->getColumnOffset(c);
+	  if (join_column.is_bit_)
+	    target_row.setValue
+	      (c, indices[join_column.side_] < 0 ? Value::make(false)
+	       : rows[join_column.side_]->getValue(join_column.column_index_));
+	  else if (indices[join_column.side_] < 0)
+	    memset(data, 0, join_column.size_);
+	  else if (join_column.is_jagged_)
+	    copyJagged(tables[join_column.side_], join_column.column_index_,
+		       rows[join_column.side_]->getValueData
+		       (join_column.column_index_),
+		       target->table_.get(), c, data);
+	  else
+	    memcpy(data, rows[join_column.side_]->getValueData
+		   (join_column.column_index_), join_column.size_);
+	}
+	target->table_->append(&target_row);
+      }
+    }
+    catch (FileError file_error) {
+      error = file_error.message_;
+    }
+  }
+  if (error.length() > 0)
+    throw Exception(PyExc_IOError, "error joining rows: %s", error.c_str());
+}
+
+
+/* Copy the attributes of 'source' to 'target', except its path.  */
+
+void
+copyAttributes(PyTable* source,
+	       PyTable* target)
+{
+  source->loadAttributes();
+  if (source->attribute_dict_ == NULL)
+    return;
+  Ref<Object> path = target->GetAttrString("path");
+  Ref<Object> attributes = Dict::Copy(source->attribute_dict_);
+  if (target->attribute_dict_ != NULL)
+    Py_DECREF(target->attribute_dict_);
+  target->attribute_dict_ = attributes.release();
+  target->SetAttrString("path", path);
+}
+
+
+/* Copies rows of a table to a table with the same or fewer columns.
+
+   Each column of the target table is copied from the column of the
+   same name.  Rows are copied a block at a time, reading only the
+   columns that are copied.  */
+
+class RowCopier
+{
+public:
+
+  RowCopier(PyTable* table,
+	    PyTable* target);
+
+  /* Append rows 'start + offsets[i]' to the target table.  All offsets
+     must be less than 'count'.  Uses no Python objects.  */
+  void append(int64_t start,
+	      int count,
+	      const std::vector<int>& offsets);
+
+private:
+
+  Table* table_;
+  Table* target_;
+
+  /* The column of 'table_' from which each column is copied.  */
+  std::vector<int> columns_;
+
+  /* The size and offset in the target row of each column.  */
+  std::vector<size_t> sizes_;
+  std::vector<size_t> offsets_;
+
+  /* For bit columns, the bit of each column in 'table_' and in the
+   target row; otherwise -1.  */
+  std::vector<int> source_bits_;
+  std::vector<int> bits_;
+
+  /* True for jagged columns, whose values are copied too.  */
+  std::vector<bool> jagged_;
+
+  /* Values read from 'table_', for each column.  */
+  std::vector<std::vector<char> > buffers_;
+
+  Row row_;
+
+};
+
+
+RowCopier::RowCopier(PyTable* table,
+		     PyTable* target)
+  : table_(table->table_.get()),
+    target_(target->table_.get()),
+    row_(target->table_->getSchema())
+{
+  const Schema* schema = table_->getSchema();
+  const Schema* target_schema = target_->getSchema();
+  int num_columns = target_schema->getNumColumns();
+  for (int c = 0; c < num_columns; ++c) {
+    const Column& column = target_schema->getColumn(c);
+    int column_index;
+    try {
+      column_index = schema->whichColumn(column.getName());
+    }
+    catch (NoColumn) {
+      throw Exception(PyExc_ValueError, "no column '%s' to copy",
+		      column.getName().c_str());
+    }
+    checkCopyable(schema, column_index, column);
+    columns_.push_back(column_index);
+    sizes_.push_back(getTypeSize(column.getType()));
+    offsets_.push_back(target_schema->getColumnOffset(c));
+    bool is_bit = column.getType() == TYPE_BIT;
+    source_bits_.push_back(is_bit ? schema->getColumnBit(column_index) : -1);
+    bits_.push_back(is_bit ? target_schema->getColumnBit(c) : -1);
+    jagged_.push_back(column.getType() == TYPE_JAGGED);
+  }
+  buffers_.resize(num_columns);
+  // Clear the unused bits of bytes holding bit columns.
+  memset(row_.getBuffer(), 0, target_schema->getSize());
+}
+
+
+void
+RowCopier::append(int64_t start,
+		  int count,
+		  const std::vector<int>& offsets)
+{
+  int num_columns = columns_.size();
+  std::vector<char*> buffers(num_columns);
+  for (int c = 0; c < num_columns; ++c) {
+    buffers_[c].resize(count * sizes_[c]);
+    buffers[c] = &buffers_[c][0];
+  }
+  table_->readColumns(columns_, start, count, buffers);
+
+  char* data = row_.getBuffer();
+  for (std::vector<int>::const_iterator offset = offsets.begin();
+       offset != offsets.end(); ++offset) {
+    for (int c = 0; c < num_columns; ++c)
+      if (bits_[c] >= 0) {
+	// Copy just the column's bit.
+	uint8_t* bits = (uint8_t*) (data + offsets_[c]);
+	uint8_t value = (buffers[c][*offset] >> source_bits_[c]) & 1;
+	*bits = (*bits & ~(1 << bits_[c])) | (value << bits_[c]);
+      }
+      else if (jagged_[c])
+	copyJagged(table_, columns_[c], buffers[c] + *offset * sizes_[c],
+		   target_, c, data + offsets_[c]);
+      else
+	memcpy(data + offsets_[c], buffers[c] + *offset * sizes_[c], 
+	       sizes_[c]);
+    target_->append(&row_);
+  }
+}
+
+
+/* Table metadata is stored in sections: a 'MetadataHeader', followed
+   by a 'MetadataSection' directory entry for each section, followed by
+   the sections' data.  Older tables store a pickled tuple instead.  */
+
+struct MetadataHeader
+{
+  char magic_[8];
+  int32_t version_;
+  int32_t num_sections_;
+};
+
+
+struct MetadataSection
+{
+  /* The name of the section, padded with NULs.  */
+  char name_[24];
+  /* The position of the section's data in the metadata.  */
+  int64_t offset_;
+  int64_t length_;
+};
+
+
+const char
+metadata_magic[8] = { 'H', 'E', 'P', 'T', 'M', 'E', 'T', 'A' };
+
+const int32_t
+metadata_version = 1;
+
+typedef std::map<std::string, std::string> MetadataSections;
+
+
+/* Split 'metadata' into its sections.
+
+   returns -- True on success, or false if 'metadata' is not divided
+   into sections.  */
+
+bool
+parseMetadata(const std::string& metadata,
+	      MetadataSections& sections)
+{
+  MetadataHeader header;
+  if (metadata.length() < sizeof(header))
+    return false;
+  memcpy(&header, metadata.data(), sizeof(header));
+  if (memcmp(header.magic_, metadata_magic, sizeof(header.magic_)) != 0
+      || header.version_ != metadata_version
+      || header.num_sections_ < 0
+      || sizeof(header) + header.num_sections_ * sizeof(MetadataSection)
+         > metadata.length())
+    return false;
+
+  MetadataSections result;
+  for (int n = 0; n < header.num_sections_; ++n) {
+    MetadataSection section;
+    memcpy(&section, 
+	   metadata.data() + sizeof(header) + n * sizeof(section), 
+	   sizeof(section));
+    if (section.offset_ < 0 || section.length_ < 0
+	|| section.offset_ + section.length_ > (int64_t) metadata.length())
+      return false;
+    const char* name_end = 
+      (const char*) memchr(section.name_, '\0', sizeof(section.name_));
+    std::string name(section.name_, name_end == NULL 
+		     ? sizeof(section.name_) : name_end - section.name_);
+    result[name] = metadata.substr(section.offset_, section.length_);
+  }
+  sections.swap(result);
+  return true;
+}
+
+
+/* Return metadata containing 'sections'.  */
+
+std::string
+formatMetadata(const MetadataSections& sections)
+{
+  MetadataHeader header;
+  memcpy(header.magic_, metadata_magic, sizeof(header.magic_));
+  header.version_ = metadata_version;
+  header.num_sections_ = sections.size();
+  std::string result((const char*) &header, sizeof(header));
+
+  int64_t offset = sizeof(header) + sections.size() * sizeof(MetadataSection);
+  MetadataSections::const_iterator section;
+  for (section = sections.begin(); section != sections.end(); ++section) {
+    MetadataSection entry;
+    memset(&entry, 0, sizeof(entry));
+    assert(section->first.length() <= sizeof(entry.name_));
+    memcpy(entry.name_, section->first.data(), section->first.length());
+    entry.offset_ = offset;
+    entry.length_ = section->second.length();
+    result.append((const char*) &entry, sizeof(entry));
+    offset += entry.length_;
+  }
+  for (section = sections.begin(); section != sections.end(); ++section) 
+    result += section->second;
+  return result;
+}
+
+
+/* Print a warning about an error extracting table metadata, and clear
+   the error.  */
+
+void
+warnMetadataError(Exception& exception)
+{
+  // Extract the exception state.
+  Ref<Object> type;
+  Ref<Object> value;
+  Ref<Object> traceback;
+  exception.Get(type, value, traceback);
+  // Print a warning.
+  Ref<String> exc_string = value->Str();
+  Warn(PyExc_RuntimeWarning, "error extracting table metadata: %s",
+       exc_string->AsString());
+  // Clear the exception.
+  exception.Clear();
+}
+
+
+/* Decode metadata section 'name' of 'table', if it hasn't been yet.
+
+   returns -- A new reference to the decoded section, or NULL if it has
+   been decoded already, or can't be.  */
+
+Object*
+decodeSection(PyTable* table,
+	      const char* name)
+{
+  MetadataSections::iterator section = table->metadata_sections_.find(name);
+  if (section == table->metadata_sections_.end())
+    return NULL;
+  std::string data = section->second;
+  table->metadata_sections_.erase(section);
+  try {
+    return table->unpickle_fn_->CallFunction
+      ("s#", data.data(), data.length());
+  }
+  catch (Exception exception) {
+    warnMetadataError(exception);
+    return NULL;
+  }
+}
+
+
+/* Encode 'object' as metadata section 'name' of 'table'.  If it can't
+   be encoded, prints a warning and omits the section.  */
+
+void
+encodeSection(PyTable* table,
+	      MetadataSections& sections,
+	      const char* name,
+	      Object* object)
+{
+  try {
+    // The second argument specifies the binary pickle format.
+    Ref<Object> data_obj = 
+      table->pickle_fn_->CallFunction("Oi", (PyObject*) object, 2);
+    String* data = cast<String>(data_obj);
+    sections[name] = std::string(data->AsString(), data->Size());
+  }
+  catch (Exception exception) {
+    // FIXME: For now, print a warning and the exception, and continue
+    // on without writing it.
+    std::cerr << "WARNING: Failed to pickle table metadata:\n";
+    exception.Print();
+    exception.Clear();
+  }
+}
+
+
+/* Opens an existing table at 'path' with 'mode'.
+
+   returns -- A 'PyTable' object for the table.
+
+   raises -- 'FileError' if the table cannot be opened.  
+*/
+
+inline PyTable*
+loadTable(const char* path,
+	  const char* mode,
+	  Callable* row_type=(Callable*) &PyRowDict::type,
+	  bool with_metadata=true,
+	  bool use_mmap=false,
+	  int read_ahead=0,
+	  int read_ahead_block_size=0)
+{
+  // Open the table itself.
+  FileTable* table;
+  table = FileTable::open(path, mode, use_mmap);
+  if (read_ahead > 0)
+    table->setReadAhead(read_ahead_block_size, read_ahead);
+  // Build a Python schema object for its schema.
+  Ref<Object> schema(buildSchemaObject(table->getSchema()));
+  // Construct the Python table object.
+  Ref<PyTable> result = 
+    PyTable::New(table, schema, row_type, with_metadata);
+  // Store the path in it.
+  setPath(result, path);
+  // All done.
+  return result.release();
+}
+
+
+}  // anonymous namespace
+
+
+//----------------------------------------------------------------------
+// method definitions
+//----------------------------------------------------------------------
+
+PyTable::PyTable(Table* table,
+		 PyObject* schema_obj,
+		 Callable* row_type,
+		 bool with_metadata)
+  : table_(table),
+    row_cache_max_size_(16),
+    attribute_dict_(NULL),
+    row_type_(newRef(row_type)),
+    expression_cache_(Dict::New()),
+    cache_arrays_(Dict::New()),
+    materialized_arrays_(Dict::New()),
+    retired_arrays_(List::New()),
+    statistics_cache_(Dict::New()),
+    compiled_expressions_(Dict::New()),
+    schema_(Ref<Object>::create(schema_obj).release()),
+    weak_references_(NULL),
+    file_object_(newRef(None)),
+    with_metadata_(with_metadata)
+{
+  assert(table != NULL);
+  pthread_mutex_init(&row_cache_mutex_, NULL);
+
+  // Import, and save references to, the pickling functions.  We will
+  // need them in the destructor, which may be called during Python
+  // cleanup when imports are not allowed.
+  Ref<Object> pickle_obj = import("cPickle", "dumps");
+  pickle_fn_ = Ref<Callable>::create(cast<Callable>(pickle_obj));
+  Ref<Object> unpickle_obj = import("cPickle", "loads");
+  unpickle_fn_ = Ref<Callable>::create(cast<Callable>(unpickle_obj));
+
+  if (with_metadata_) {
+    std::string metadata = table->getMetadata();
+    if (metadata.length() > 0) {
+      try {
+	Ref<Object> new_schema;
+	if (parseMetadata(metadata, metadata_sections_)) {
+	  // Decode the schema and zone map now.  The attributes and
+	  // caches are decoded when they are first used.
+	  metadata_ = metadata;
+	  new_schema = decodeSection(this, "schema");
+	  MetadataSections::iterator zone_map_section = 
+	    metadata_sections_.find("zone_map");
+	  if (zone_map_section != metadata_sections_.end()) {
+	    table::ZoneMap* zone_map = table->getZoneMap();
+	    if (zone_map != NULL) 
+	      zone_map->deserialize(zone_map_section->second, 
+				    table->getNumRows());
+	    metadata_sections_.erase(zone_map_section);
+	  }
+	}
+
+	else {
+	  // Older tables store a pickled tuple.
+	  // FIXME: Module 'cPickle' seems to have problems with
+	  // PyBoolVector's '__reduce__' method, so use 'pickle' instead.
+	  Ref<Object> old_unpickle_obj = Py::import("pickle", "loads");
+	  Callable* old_unpickle_fn = cast<Callable>(old_unpickle_obj); 
+	  // Unpickle the metadata.
+	  Ref<Object> metadata_obj = 
+	    old_unpickle_fn->CallFunction("s#", metadata.data(), 
+					  metadata.length());
+	  // The result should be a tuple.
+	  Tuple* metadata_tuple = cast<Tuple>(metadata_obj);
+
+	  if (metadata_tuple->Size() >= 1) 
+	    // The first element is the attribute dictionary.
+	    attribute_dict_ = metadata_tuple->GetItem(0);
+
+	  if (metadata_tuple->Size() >= 2) 
+	    // The second element is the table schema.
+	    new_schema = metadata_tuple->GetItem(1);
+
+	  if (metadata_tuple->Size() >= 3) {
+	    // The third item is the expression cache.  For each
+	    // expression, it contains the number of the file containing
+	    // the cached values.  Older tables store the '(mask, values)'
+	    // arrays themselves; these are written to files when the
+	    // table is closed.
+	    Ref<Object> expression_cache_obj = metadata_tuple->GetItem(2);
+	    Dict* expression_cache = cast<Dict>(expression_cache_obj);
+	    Ref<Sequence> keys = expression_cache->Keys();
+	    int num_keys = keys->Size();
+	    for (int k = 0; k < num_keys; ++k) {
+	      Ref<Object> key = keys->GetItem(k);
+	      Ref<Object> value = expression_cache->GetItem(key);
+	      if (Tuple::Check(value)) {
+		cache_arrays_->SetItem(key, value);
+		expression_cache_->SetItem(key, None);
+	      }
+	      else
+		expression_cache_->SetItem(key, value);
+	    }
+	  }
+
+	  if (metadata_tuple->Size() >= 4) {
+	    // The fourth item is the zone map.
+	    Ref<Object> zone_map_obj = metadata_tuple->GetItem(3);
+	    table::ZoneMap* zone_map = table->getZoneMap();
+	    if (zone_map != NULL && String::Check(zone_map_obj)) {
+	      String* zone_map_str = cast<String>(zone_map_obj);
+	      std::string data(zone_map_str->AsString(), 
+			       zone_map_str->Size());
+	      zone_map->deserialize(data, table->getNumRows());
+	    }
+	  }
+
+	  if (metadata_tuple->Size() >= 5) {
+	    // The fifth item is the statistics cache.
+	    Ref<Object> statistics_cache_obj = metadata_tuple->GetItem(4);
+	    statistics_cache_->Update(statistics_cache_obj);
+	  }
+	}
+
+	if (new_schema != NULL) {
+	  // Call 'checkSchema' to make sure the loaded schema is
+	  // compatible with what's really in the table.
+	  Ref<Object> checkSchema_obj = 
+	    Py::import("hep.table", "checkSchema");
+	  Callable* checkSchema_fn = cast<Callable>(checkSchema_obj);
+	  Ref<Object> ignored = checkSchema_fn->CallFunctionObjArgs
+	    (schema_, (Object*) new_schema, NULL);
+	  // Use the new schema.
+	  schema_.set(new_schema.release());
+	}
+      }
+      catch (Exception exception) {
+	warnMetadataError(exception);
+      }
+    }
+  }
+
+  // Construct a sequence of column keys (names in the schema).  This
+  // will be handy for rows to use.
+  const Schema* schema = table->getSchema();
+  unsigned num_columns = schema->getNumColumns();
+  Ref<Tuple> keys = Tuple::New(num_columns);
+  // Loop over columns in the schema.
+  for (unsigned c = 0; c < num_columns; ++c) {
+    const Column& column = schema->getColumn(c);
+    const char* column_name = column.getName().c_str();
+    Ref<String> key = String::InternFromString(column_name);
+    keys->InitializeItem(c, key);
+
+    column_lookup_[key] = ColumnData_t(c, column.getType());
+
+    // Associate the column index with name index in 'symbol_name_table'.
+    int column_index = symbol_name_table.find(key);
+    if (column_index >= (int) column_index_map_.size())
+      column_index_map_.resize(column_index + 1, -1);
+    column_index_map_[column_index] = c;
+  }
+  keys_.set(keys.release());
+
+  instances.add(this);
+}
+
+
+PyTable::~PyTable()
+{
+  if (with_metadata_) {
+    // Attributes set since the table was opened, other than its path,
+    // are stored along with the others.
+    if (attribute_dict_ != NULL) {
+      Ref<Sequence> keys = cast<Dict>(attribute_dict_)->Keys();
+      int num_keys = keys->Size();
+      for (int k = 0; k < num_keys; ++k) {
+	Ref<Object> key = keys->GetItem(k);
+	if (! String::Check(key) 
+	    || strcmp(cast<String>(key)->AsString(), "path") != 0) {
+	  loadAttributes();
+	  break;
+	}
+      }
+    }
+
+    // Store sections that haven't been decoded as they are.
+    MetadataSections sections = metadata_sections_;
+    if (sections.count("attributes") == 0) {
+      // The path is set when the table is opened.
+      Ref<Dict> attributes = (attribute_dict_ == NULL) 
+	? Dict::New() : Dict::Copy(attribute_dict_);
+      if (PyDict_GetItemString(attributes, "path") != NULL)
+	attributes->DelItemString("path");
+      encodeSection(this, sections, "attributes", attributes);
+    }
+    encodeSection(this, sections, "schema", schema_);
+    if (sections.count("expression_cache") == 0) {
+      // Store only the numbers of the files containing cached values.
+      // Write cached values that aren't in a file yet to new files.
+      Ref<Dict> expression_cache = Dict::New();
+      Ref<Sequence> keys = expression_cache_->Keys();
+      int num_keys = keys->Size();
+      for (int k = 0; k < num_keys; ++k) {
+	Ref<Object> key = keys->GetItem(k);
+	Ref<Object> number = expression_cache_->GetItem(key);
+	if (number == None && cache_arrays_->HasKey(key)) 
+	  try {
+	    Ref<Object> arrays = cache_arrays_->GetItem(key);
+	    Ref<Object> mask = cast<Tuple>(arrays)->GetItem(0);
+	    Ref<Object> values = cast<Tuple>(arrays)->GetItem(1);
+	    long new_number = getNewCacheNumber(this);
+	    Ref<Tuple> ignored = createCacheFile
+	      (getCachePath(this, new_number), Value::TYPE_BOOL, 
+	       table_->getNumRows(), table_->getCreationStamp(), 
+	       cast<PyBoolArray>(mask), values);
+	    number = Int::FromLong(new_number);
+	    expression_cache_->SetItem(key, number);
+	  }
+	  catch (Exception exception) {
+	    // Couldn't write the file; drop the cache.
+	    exception.Clear();
+	  }
+	if (number != None)
+	  expression_cache->SetItem(key, number);
+      }
+      encodeSection(this, sections, "expression_cache", expression_cache);
+    }
+    table::ZoneMap* zone_map = table_->getZoneMap();
+    if (zone_map != NULL)
+      sections["zone_map"] = zone_map->serialize();
+    if (sections.count("statistics_cache") == 0)
+      encodeSection(this, sections, "statistics_cache", statistics_cache_);
+
+    // Store the metadata in the table, unless it hasn't changed.
+    std::string metadata = formatMetadata(sections);
+    if (metadata != metadata_)
+      table_->setMetadata(metadata);
+  }
+
+  assert(row_cache_.size() == 0);
+  pthread_mutex_destroy(&row_cache_mutex_);
+  schema_.clear();
+
+  // Let go (close and delete) the underlying table here.  Do this
+  // before deleting the attribute dictionary, since the latter may
+  // carry the last reference to a file containing the table.
+  table_.reset();
+  // Delete the attribute dictionary.
+  if (attribute_dict_ != NULL)
+    Py_DECREF(attribute_dict_);
+
+  PyObject_ClearWeakRefs((PyObject*) this);
+  
+  instances.remove(this);
+}
+
+
+Row*
+PyTable::getRow(int index)
+{
+  if (index < 0 || index >= table_->getNumRows())
+    throw Exception(PyExc_IndexError, "%d", index);
+
+  // Look for a cache entry that matches this index.  
+  {
+    MutexLock lock(&row_cache_mutex_);
+    RowCache_t::iterator iter = row_cache_.find(index);
+    if (iter != row_cache_.end()) {
+      ++iter->second->ref_count_;
+      return iter->second;
+    }
+  }
+
+  // No row from cache?  Make a new one, and read its contents.
+  std::auto_ptr<CachedRow> row(new CachedRow(table_->getSchema(), index));
+  readRow(index, row.get());
+
+  // Add this row to the cache, unless another thread has read the same
+  // row in the meantime.
+  MutexLock lock(&row_cache_mutex_);
+  RowCache_t::iterator iter = row_cache_.find(index);
+  if (iter != row_cache_.end()) {
+    ++iter->second->ref_count_;
+    return iter->second;
+  }
+  row_cache_[index] = row.get();
+  // All done.
+  ++row->ref_count_;
+  return row.release();
+}
+
+
+void
+PyTable::returnRow(Row* row_arg)
+{
+  CachedRow* row = (CachedRow*) row_arg;
+  assert(row->index_ >= 0);
+  assert(row->index_ < table_->getNumRows());
+  MutexLock lock(&row_cache_mutex_);
+  assert(row->ref_count_ > 0);
+
+  --row->ref_count_;
+
+  // Only kill it when the reference count drops to zero.
+  if (row->ref_count_ > 0)
+    return;
+
+  // Find the row in the cache.
+  RowCache_t::iterator iter = row_cache_.find(row->index_);
+  assert(iter != row_cache_.end());
+  assert(iter->second == row);
+  // Remove it.
+  row_cache_.erase(iter);
+  // Deallocate it.
+  delete row;
+}
+
+
+void
+PyTable::readRow(int index,
+		 Row* row)
+{
+  if (index < 0 || index >= table_->getNumRows())
+    throw Exception(PyExc_IndexError, "%d", index);
+  // Let other threads run while reading.
+  AllowThreads allow_threads;
+  table_->read(index, row);
+}
+
+
+PyRow*
+PyTable::getRowObject(int index,
+		      Py::Callable* constructor)
+{
+  // Use the default row type, if none was specified explicitly.
+  if (constructor == NULL)
+    constructor = row_type_;
+  // Build it.
+  return cast<PyRow>(constructor->CallFunction("Oi", this, index));
 }
 
 
@@ -552,14 +2198,166 @@ PyTable::cacheExpand(Object* expr)
 }
 
 
-Object*
-PyTable::compile(Object* expr)
+Tuple*
+PyTable::getCache(Object* expr)
+{
+  int num_rows = table_->getNumRows();
+  Ref<Tuple> old_arrays;
+  if (cache_arrays_->HasKey(expr)) {
+    Ref<Object> arrays = cache_arrays_->GetItem(expr);
+    Ref<Object> mask = cast<Tuple>(arrays)->GetItem(0);
+    if (cast<PyBoolArray>(mask)->length_ >= num_rows)
+      // Already loaded, and there are no new rows.
+      return cast<Tuple>(arrays.release());
+    old_arrays = cast<Tuple>(arrays.release());
+  }
+
+  Ref<Object> number = getExpressionCache()->GetItem(expr);
+  Ref<Tuple> arrays;
+  if (number != None) 
+    try {
+      std::string path = getCachePath(this, number->IntAsLong());
+      arrays = loadCacheFile(path, Value::TYPE_BOOL, num_rows, 
+			     table_->getCreationStamp(), old_arrays,
+			     retired_arrays_);
+    }
+    catch (Exception exception) {
+      // Keep the cache in memory instead.
+      exception.Clear();
+      getExpressionCache()->SetItem(expr, None);
+    }
+  if (arrays == NULL) {
+    if (old_arrays != NULL)
+      retired_arrays_->Append(old_arrays);
+    arrays = newCacheArrays(num_rows, old_arrays);
+  }
+
+  cache_arrays_->SetItem(expr, arrays);
+  return arrays.release();
+}
+
+
+Tuple*
+PyTable::getMaterialized(Object* name)
+{
+  int num_rows = table_->getNumRows();
+  Ref<Tuple> old_arrays;
+  if (materialized_arrays_->HasKey(name)) {
+    Ref<Object> arrays = materialized_arrays_->GetItem(name);
+    Ref<Object> mask = cast<Tuple>(arrays)->GetItem(0);
+    if (cast<PyBoolArray>(mask)->length_ >= num_rows)
+      // Already loaded, and there are no new rows.
+      return cast<Tuple>(arrays.release());
+    old_arrays = cast<Tuple>(arrays.release());
+  }
+
+  Ref<Object> column = schema_->GetItem(name);
+  Ref<Object> expression = column->GetAttrString("expression");
+  Ref<Object> type = expression->GetAttrString("type");
+  Ref<Tuple> arrays = loadCacheFile
+    (getMaterializedPath(this, name), getMaterializedType(type), num_rows, 
+     table_->getCreationStamp(), old_arrays, retired_arrays_);
+  materialized_arrays_->SetItem(name, arrays);
+  return arrays.release();
+}
+
+
+Object*
+PyTable::compile(Object* expr)
+  const
+{
+  Ref<Object> compiled_expr = callByNameObjArgs
+    ("hep.table", "compile", 
+     (PyObject*) this, (PyObject*) expr, NULL);
+
+  // Tell the table which columns the expression uses, so that it can
+  // read them along with each row.
+  if (PyExpr::Check(compiled_expr)) {
+    PyExpr* compiled = cast<PyExpr>(compiled_expr);
+    for (int o = 0; o < compiled->num_operations_; ++o) {
+      const Operation& op = compiled->operations_[o];
+      if (op.type_ != Operation::OP_LONG_SYMBOL
+	  && op.type_ != Operation::OP_DOUBLE_SYMBOL
+	  && op.type_ != Operation::OP_BOOL_SYMBOL
+	  && op.type_ != Operation::OP_OBJECT_SYMBOL)
+	continue;
+      int name_index = op.arg1_.as_long();
+      if (name_index < (int) column_index_map_.size()
+	  && column_index_map_[name_index] >= 0)
+	table_->addProjectedColumn(column_index_map_[name_index]);
+    }
+  }
+
+  return compiled_expr.release();
+}
+
+
+void
+PyTable::loadAttributes()
+{
+  Ref<Object> attributes = decodeSection(this, "attributes");
+  if (attributes == NULL || ! Dict::Check(attributes))
+    return;
+  if (attribute_dict_ != NULL) {
+    cast<Dict>(attributes)->Update(attribute_dict_);
+    Py_DECREF(attribute_dict_);
+  }
+  attribute_dict_ = attributes.release();
+}
+
+
+Dict*
+PyTable::getExpressionCache()
+{
+  Ref<Object> expression_cache = decodeSection(this, "expression_cache");
+  if (expression_cache != NULL && Dict::Check(expression_cache))
+    expression_cache_->Update(expression_cache);
+  return expression_cache_;
+}
+
+
+Dict*
+PyTable::getStatisticsCache()
+{
+  Ref<Object> statistics_cache = decodeSection(this, "statistics_cache");
+  if (statistics_cache != NULL && Dict::Check(statistics_cache))
+    statistics_cache_->Update(statistics_cache);
+  return statistics_cache_;
+}
+
+
+void
+PyTable::getSelectionBounds(Object* selection,
+			    std::vector<Bound>& bounds)
   const
 {
-  Ref<Object> compiled_expr = callByNameObjArgs
-    ("hep.table", "compile", 
-     (PyObject*) this, (PyObject*) expr, NULL);
-  return compiled_expr.release();
+  Ref<Object> bounds_obj = callByNameObjArgs
+    ("hep.table", "getSelectionBounds", (PyObject*) this, selection, NULL);
+  Sequence* bounds_seq = cast<Sequence>(bounds_obj);
+  const Schema* schema = table_->getSchema();
+  int num_bounds = bounds_seq->Size();
+  for (int i = 0; i < num_bounds; ++i) {
+    Ref<Object> bound_obj = bounds_seq->GetItem(i);
+    char* name;
+    Object* low;
+    int low_inclusive;
+    Object* high;
+    int high_inclusive;
+    cast<Tuple>(bound_obj)->ParseTuple
+      ("sOiOi", &name, &low, &low_inclusive, &high, &high_inclusive);
+    Bound bound;
+    try {
+      bound.column_index_ = schema->whichColumn(name);
+    }
+    catch (NoColumn) {
+      throw Exception(PyExc_KeyError, "%s", name);
+    }
+    bound.low_ = getBoundValue(low, -HUGE_VAL);
+    bound.low_inclusive_ = low_inclusive;
+    bound.high_ = getBoundValue(high, HUGE_VAL);
+    bound.high_inclusive_ = high_inclusive;
+    bounds.push_back(bound);
+  }
 }
 
 
@@ -572,8 +2370,15 @@ namespace {
 void
 tp_dealloc(PyTable* self)
 try {
+  // Storing the metadata calls Python, so preserve an exception that's
+  // being raised while the table is released.
+  PyObject* type;
+  PyObject* value;
+  PyObject* traceback;
+  PyErr_Fetch(&type, &value, &traceback);
   // Perform C++ deallocation.
   self->~PyTable();
+  PyErr_Restore(type, value, traceback);
   // Free memory for the Python object.
   PyMem_DEL(self);
 }
@@ -591,6 +2396,41 @@ catch (Exception) {
 }
 
 
+PyObject*
+tp_getattro(PyTable* self,
+	    Object* name)
+try {
+  // The table's attributes are decoded from its metadata the first
+  // time one is used that isn't set otherwise.
+  PyObject* result = PyObject_GenericGetAttr(self, name);
+  if (result == NULL && self->metadata_sections_.count("attributes") > 0
+      && PyErr_ExceptionMatches(PyExc_AttributeError)) {
+    PyErr_Clear();
+    self->loadAttributes();
+    result = PyObject_GenericGetAttr(self, name);
+  }
+  return result;
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+int
+tp_setattro(PyTable* self,
+	    Object* name,
+	    Object* value)
+try {
+  // Decode the attributes before deleting one.
+  if (value == NULL)
+    self->loadAttributes();
+  return PyObject_GenericSetAttr(self, name, value);
+}
+catch (Exception) {
+  return -1;
+}
+
+
 int
 mp_length(PyTable* self)
 try {
@@ -631,29 +2471,564 @@ tp_as_mapping = {
 
 
 PyObject*
-method_append(PyTable* self,
-	      Arg* args,
-	      Dict* kw_args)
+method_append(PyTable* self,
+	      Arg* args,
+	      Dict* kw_args)
+try {
+  Object* map_obj = NULL;
+  args->ParseTuple("|O", &map_obj);
+
+  Table* table = self->table_.get();
+
+  // Make a row object for this table.  
+  // FIXME: We could use the cached row object, if there is one.
+  Row row(table->getSchema());
+  // Fill the row from the map object, if provided.
+  if (map_obj != NULL) 
+    setColumns(self, &row, cast<Mapping>(map_obj));
+  // Fill in the row from keyword arguments.
+  if (kw_args != NULL) 
+    setColumns(self, &row, kw_args);
+
+  // Append the row.  Let other threads run, in case buffered rows are
+  // written.
+  int index;
+  {
+    AllowThreads allow_threads;
+    index = table->append(&row);
+  }
+  // Return the index of the new row.
+  return Int::FromLong(index);
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_appendColumns(PyTable* self,
+		     Arg* args,
+		     Dict* kw_args)
+try {
+  args->ParseTuple("");
+
+  Table* table = self->table_.get();
+  checkWritable(table);
+  const Schema* schema = table->getSchema();
+  int num_columns = schema->getNumColumns();
+
+  // Match up keyword arguments with columns.  For each column, store
+  // the sequence of values and, if it is an array whose elements have
+  // the same representation as the column, the array's contents.
+  std::vector<Object*> sequences(num_columns, (Object*) NULL);
+  std::vector<const char*> contents(num_columns, (const char*) NULL);
+  int num_rows = -1;
+  Ref<Sequence> keys = 
+    (kw_args == NULL) ? (Sequence*) List::New() : kw_args->Keys();
+  int num_keys = keys->Size();
+  for (int k = 0; k < num_keys; ++k) {
+    Ref<Object> key = keys->GetItem(k);
+    Ref<String> name = key->Str();
+    internInPlace(name);
+    ColumnType type;
+    int c = self->findColumn(name, type);
+    if (c == -1)
+      throw Exception(PyExc_KeyError, "%s", name->AsString());
+    // The dictionary holds a reference to the sequence.
+    Ref<Object> sequence = kw_args->GetItem(key);
+    sequences[c] = sequence;
+
+    // All the sequences must be the same length.
+    int length = PyObject_Length(sequences[c]);
+    THROW_IF_MINUS_ONE(length);
+    if (num_rows == -1)
+      num_rows = length;
+    else if (length != num_rows)
+      throw Exception(PyExc_ValueError, 
+		      "values for column '%s' have a different length",
+		      name->AsString());
+
+    const char* typecode = getArrayTypecode(type);
+    if (typecode != NULL
+	&& sequences[c]->HasAttrString("typecode")
+	&& sequences[c]->HasAttrString("itemsize")) {
+      Ref<Object> array_typecode = sequences[c]->GetAttrString("typecode");
+      Ref<Object> itemsize = sequences[c]->GetAttrString("itemsize");
+      if (strcmp(array_typecode->StrAsString().c_str(), typecode) == 0
+	  && itemsize->IntAsLong() == (long) getTypeSize(type)) {
+	int buffer_length;
+	sequences[c]->AsReadBuffer(&contents[c], &buffer_length);
+      }
+    }
+  }
+
+  // Make sure we have values for every column.
+  for (int c = 0; c < num_columns; ++c)
+    if (sequences[c] == NULL)
+      throw Exception(PyExc_ValueError, "no values for column '%s'",
+		      schema->getColumn(c).getName().c_str());
+
+  // Build and append rows.
+  Row row(schema);
+  char* buffer = row.getBuffer();
+  for (int r = 0; r < num_rows; ++r) {
+    for (int c = 0; c < num_columns; ++c) {
+      ColumnType type = schema->getColumn(c).getType();
+      if (contents[c] != NULL) {
+	size_t size = getTypeSize(type);
+	memcpy(buffer + schema->getColumnOffset(c), 
+	       contents[c] + r * size, size);
+      }
+      else {
+	Ref<Object> value = PySequence_GetItem(sequences[c], r);
+	THROW_IF_NULL(value);
+	setColumn(table, &row, type, c, value);
+      }
+    }
+    table->append(&row);
+  }
+
+  RETURN_NONE;
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_asArray(PyTable* self,
+	       Arg* args,
+	       PyObject* kw_args)
+try {
+  static char* kw_arg_list[] = {
+    "start",
+    "stop",
+    NULL
+  };
+  int start = 0;
+  Object* stop_arg = None;
+  if (! PyArg_ParseTupleAndKeywords(args, kw_args, "|iO", kw_arg_list,
+				    &start, &stop_arg))
+    throw Exception();
+
+  FileTable* table = dynamic_cast<FileTable*>(self->table_.get());
+  if (table == NULL || table->getLayout() != LAYOUT_ROWS)
+    throw Exception(PyExc_ValueError, 
+		    "only tables with layout \"rows\" have array views");
+  // Determine the range of rows.
+  int num_rows = table->getNumRows();
+  int stop = (stop_arg == None) ? num_rows : stop_arg->IntAsLong();
+  if (start < 0 || stop < 0)
+    throw Exception(PyExc_ValueError, "negative row index");
+  start = std::min(start, num_rows);
+  stop = std::max(start, std::min(stop, num_rows));
+
+  // Build the structured type of a row, with a field at each column's
+  // offset.
+  const Schema* schema = table->getSchema();
+  Ref<List> names = List::New();
+  Ref<List> formats = List::New();
+  Ref<List> offsets = List::New();
+  for (int c = 0; c < schema->getNumColumns(); ++c) {
+    const Column& column = schema->getColumn(c);
+    const char* format = getNumPyFormat(column.getType());
+    if (format == NULL)
+      throw Exception(PyExc_ValueError, 
+		      "column '%s' of type %s has no array type",
+		      column.getName().c_str(), getTypeName(column.getType()));
+    Ref<Object> name = String::FromString(column.getName().c_str());
+    Ref<Object> format_str = String::FromString(format);
+    Ref<Object> offset = Int::FromLong(schema->getColumnOffset(c));
+    names->Append(name);
+    formats->Append(format_str);
+    offsets->Append(offset);
+  }
+  Ref<Dict> fields = Dict::New();
+  Ref<Object> names_key = String::FromString("names");
+  Ref<Object> formats_key = String::FromString("formats");
+  Ref<Object> offsets_key = String::FromString("offsets");
+  Ref<Object> itemsize_key = String::FromString("itemsize");
+  Ref<Object> itemsize = Int::FromLong(schema->getSize());
+  fields->SetItem(names_key, names);
+  fields->SetItem(formats_key, formats);
+  fields->SetItem(offsets_key, offsets);
+  fields->SetItem(itemsize_key, itemsize);
+  Ref<Object> dtype_type = import("numpy", "dtype");
+  Ref<Object> dtype = 
+    cast<Callable>(dtype_type)->CallFunctionObjArgs(fields, NULL);
+
+  // Write out appended rows, and map the file through the last row.
+  // The array refers to the read-only mapping, which is removed when
+  // the array is no longer used.
+  {
+    AllowThreads allow_threads;
+    table->flush();
+  }
+  int fd = ::open64(table->getPath().c_str(), O_RDONLY | O_LARGEFILE);
+  if (fd < 0)
+    throw Exception(PyExc_IOError, "%s", strerror(errno));
+  Ref<Object> mmap_type = import("mmap", "mmap");
+  Ref<Object> map_args = 
+    Py_BuildValue("(iL)", fd, (PY_LONG_LONG) table->getRowOffset(stop));
+  THROW_IF_NULL(map_args);
+  Ref<Dict> map_kw_args = Dict::New();
+  Ref<Object> access_key = String::FromString("access");
+  Ref<Object> access = import("mmap", "ACCESS_READ");
+  map_kw_args->SetItem(access_key, access);
+  Ref<Object> map = PyObject_Call(mmap_type, map_args, map_kw_args);
+  ::close(fd);
+  THROW_IF_NULL(map);
+
+  Ref<Object> frombuffer = import("numpy", "frombuffer");
+  return cast<Callable>(frombuffer)->CallFunction
+    ("OOiL", (PyObject*) map, (PyObject*) dtype, stop - start, 
+     (PY_LONG_LONG) table->getRowOffset(start));
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_cache(PyTable* self,
+	     Arg* args)
+try {
+  Object* expr_arg;
+  Object* clear_arg = (Object*) Py_False;
+  args->ParseTuple("O|O", &expr_arg, &clear_arg);
+  Ref<Object> expr_obj = asExpression(expr_arg);
+
+  // Expand the expression.
+  Ref<Object> expanded_expr = self->expand(expr_obj);
+  // For now, only boolean expressions may be cached.  Make sure it is.
+  Ref<Object> expr_type = expanded_expr->GetAttrString("type");
+  Ref<Object> bool_type = import("hep.bool", "bool");
+  if (! expr_type->Compare(bool_type))
+    throw Exception(PyExc_NotImplementedError, 
+		    "only bool expressions may be cached");
+
+  // Is this expression already cached?
+  if (self->getExpressionCache()->HasKey(expanded_expr)) {
+    // If requested to clear it, do so.
+    if (clear_arg->IsTrue()) {
+      Ref<Tuple> cache_entry = self->getCache(expanded_expr);
+      // Clear the mask bits.
+      Ref<Object> mask_array = cache_entry->GetItem(0);
+      cast<PyBoolArray>(mask_array)->clear();
+    }
+    else 
+      // Did not request to clear the bits, and it's already cached, so
+      // do nothing.
+      ;
+  }
+
+  else {
+    // Compile the expression.
+    Ref<Object> compiled_expr = self->compile(expanded_expr);
+
+    // Construct a tuple containing a bit mask for the cache and the
+    // cached values themselves.  If the table stores metadata, these
+    // are mapped from a new cache file next to the table.
+    int num_rows = self->table_->getNumRows();
+    Ref<Object> number = newRef(None);
+    Ref<Tuple> cache_entry;
+    if (self->with_metadata_) 
+      try {
+	long new_number = getNewCacheNumber(self);
+	cache_entry = createCacheFile
+	  (getCachePath(self, new_number), Value::TYPE_BOOL, num_rows, 
+	   self->table_->getCreationStamp(), NULL, NULL);
+	number = Int::FromLong(new_number);
+      }
+      catch (Exception exception) {
+	// Keep the cache in memory instead.
+	exception.Clear();
+      }
+    if (cache_entry == NULL)
+      cache_entry = newCacheArrays(num_rows, NULL);
+    // Set the entry.  The key is the expanded expression.
+    self->getExpressionCache()->SetItem(expanded_expr, number);
+    self->cache_arrays_->SetItem(expanded_expr, cache_entry);
+  }
+
+  RETURN_NONE;
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_createIndex(PyTable* self,
+		   Arg* args)
+try {
+  Object* name_arg;
+  args->ParseTuple("O", &name_arg);
+
+  // Look up the column.
+  Ref<String> name = name_arg->Str();
+  internInPlace(name);
+  ColumnType type;
+  int column_index = self->findColumn(name, type);
+  if (column_index == -1)
+    throw Exception(PyExc_KeyError, "%s", name->AsString());
+  if (type == TYPE_COMPLEX_64 || type == TYPE_COMPLEX_128 
+      || type == TYPE_JAGGED)
+    throw Exception(PyExc_ValueError, 
+		    "cannot index column '%s' of type %s",
+		    name->AsString(), getTypeName(type));
+
+  // Build the index.
+  try {
+    self->table_->createIndex(column_index);
+  }
+  catch (FileError error) {
+    throw Exception(PyExc_IOError, "error creating index: %s",
+		    error.message_.c_str());
+  }
+
+  RETURN_NONE;
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_compile(PyTable* self,
+	       Object* expr_arg)
+try {
+  Ref<Object> expr(asExpression(expr_arg));
+  if (expr == None)
+    return expr.release();
+  else {
+    Ref<Object> compiled_expr = self->compile(expr);
+    return compiled_expr.release();
+  }
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_expand(PyTable* self,
+	      Object* expr_arg)
+try {
+  Ref<Object> expr(asExpression(expr_arg));
+  if (expr == None)
+    return expr.release();
+  else {
+    Ref<Object> expanded_expr = self->expand(expr);
+    return expanded_expr.release();
+  }
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_extend(PyTable* self,
+	      Object* rows_arg)
+try {
+  Table* table = self->table_.get();
+  checkWritable(table);
+  const Schema* schema = table->getSchema();
+
+  // Use the same row object for all rows.
+  Row row(schema);
+  Ref<Iter> iter = rows_arg->GetIter();
+  while (true) {
+    Ref<Object> item = iter->Next();
+    if (item == NULL)
+      break;
+
+    if (PyRow::Check(item)) {
+      // If it's a row from a table with the same layout, copy it
+      // directly. 
+      const Row* source = cast<PyRow>(item)->getRow();
+      if (haveSameLayout(source->getSchema(), schema)) {
+	memcpy(row.getBuffer(), source->getData(), schema->getSize());
+	table->append(&row);
+	continue;
+      }
+    }
+
+    // Otherwise, fill the row from the mapping.
+    setColumns(self, &row, cast<Mapping>(item));
+    table->append(&row);
+  }
+
+  RETURN_NONE;
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_flush(PyTable* self)
+try {
+  {
+    AllowThreads allow_threads;
+    self->table_->flush();
+  }
+  RETURN_NONE;
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_getCache(PyTable* self,
+		Arg* args)
+try {
+  Object* expr;
+  args->ParseTuple("O", &expr);
+
+  if (! self->getExpressionCache()->HasKey(expr))
+    throw Exception(PyExc_KeyError, "expression is not cached");
+  return self->getCache(expr);
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_getMaterialized(PyTable* self,
+		       Arg* args)
+try {
+  Object* name;
+  args->ParseTuple("O", &name);
+
+  Ref<Object> materialized_column_type = 
+    import("hep.table", "MaterializedColumn");
+  Dict* schema = cast<Dict>(self->schema_);
+  if (! schema->HasKey(name))
+    throw Exception(PyExc_KeyError, "no materialized column");
+  Ref<Object> column = schema->GetItem(name);
+  if (! column->IsInstance(materialized_column_type))
+    throw Exception(PyExc_KeyError, "no materialized column");
+  return self->getMaterialized(name);
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_iterRows(PyTable* self,
+		Arg* args,
+		PyObject* kw_args)
+try {
+  static char* kw_arg_list[] = {
+    "start",
+    "stop",
+    "reuse",
+    NULL 
+  };
+  int start = 0;
+  Object* stop_arg = None;
+  Object* reuse = (Object*) Py_False;
+  if (! PyArg_ParseTupleAndKeywords(args, kw_args, "|iOO", kw_arg_list,
+				    &start, &stop_arg, &reuse))
+    throw Exception();
+  int stop = (stop_arg == None) ? -1 : stop_arg->IntAsLong();
+  if (start < 0 || (stop_arg != None && stop < 0))
+    throw Exception(PyExc_ValueError, "negative row index");
+
+  return PyIterator::New(self, NULL, start, stop, reuse->IsTrue());
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_join(PyTable* self,
+	    Arg* args,
+	    PyObject* kw_args)
 try {
-  Object* map_obj = NULL;
-  args->ParseTuple("|O", &map_obj);
-
-  Table* table = self->table_.get();
+  static char* kw_arg_list[] = {
+    "other",
+    "on",
+    "how",
+    "table",
+    NULL 
+  };
+  Object* other_arg;
+  Object* on;
+  char* how = "inner";
+  Object* target_arg = None;
+  if (! PyArg_ParseTupleAndKeywords(args, kw_args, "OO|sO", kw_arg_list,
+				    &other_arg, &on, &how, &target_arg))
+    throw Exception();
+  bool left;
+  if (strcmp(how, "inner") == 0)
+    left = false;
+  else if (strcmp(how, "left") == 0)
+    left = true;
+  else
+    throw Exception(PyExc_ValueError, "invalid join '%s'", how);
+
+  // Resolve the table to join.
+  Ref<Object> other_obj = callByNameObjArgs
+    ("hep.table", "getTableForJoin", (PyObject*) self, other_arg, NULL);
+  PyTable* other = cast<PyTable>(other_obj);
+
+  // The keys are either one expression for both tables, or a pair of
+  // expressions.
+  Ref<Object> expr_obj;
+  Ref<Object> other_expr_obj;
+  if (Tuple::Check(on) && cast<Tuple>(on)->Size() == 2) {
+    Ref<Object> expr = cast<Tuple>(on)->GetItem(0);
+    Ref<Object> other_expr = cast<Tuple>(on)->GetItem(1);
+    expr_obj = asExpression(expr);
+    other_expr_obj = asExpression(other_expr);
+  }
+  else {
+    expr_obj = asExpression(on);
+    other_expr_obj = newRef((Object*) expr_obj);
+  }
+  Ref<Object> expanded_expr = self->expand(expr_obj);
+  Ref<Object> other_expanded_expr = other->expand(other_expr_obj);
+
+  PyTable* target = NULL;
+  if (target_arg != None) {
+    target = cast<PyTable>(target_arg);
+    checkWritable(target->table_.get());
+    if (target == self || target == other)
+      throw Exception(PyExc_ValueError, 
+		      "can't join into one of the joined tables");
+  }
 
-  // Make a row object for this table.  
-  // FIXME: We could use the cached row object, if there is one.
-  Row row(table->getSchema());
-  // Fill the row from the map object, if provided.
-  if (map_obj != NULL) 
-    setColumns(self, &row, cast<Mapping>(map_obj));
-  // Fill in the row from keyword arguments.
-  if (kw_args != NULL) 
-    setColumns(self, &row, kw_args);
+  std::vector<std::pair<int, int> > pairs;
+  joinRows(self, expanded_expr, other, other_expanded_expr, left, pairs);
 
-  // Append the row.
-  int index = table->append(&row);
-  // Return the index of the new row.
-  return Int::FromLong(index);
+  if (target != NULL) {
+    // Write the joined rows to the target table.
+    appendJoinedRows(self, other, target, pairs);
+    return Int::FromLong(pairs.size());
+  }
+  else {
+    // Return an iterator over pairs of joined rows.
+    int num_pairs = pairs.size();
+    char* buffer;
+    Ref<Object> rows = newArray(TYPE_INT_32, num_pairs, &buffer);
+    char* other_buffer;
+    Ref<Object> other_rows = newArray(TYPE_INT_32, num_pairs, &other_buffer);
+    for (int i = 0; i < num_pairs; ++i) {
+      ((int32_t*) buffer)[i] = pairs[i].first;
+      ((int32_t*) other_buffer)[i] = pairs[i].second;
+    }
+    Ref<Object> result = callByNameObjArgs
+      ("hep.table", "_iterJoin", (PyObject*) self, (PyObject*) other, 
+       (PyObject*) rows, (PyObject*) other_rows, NULL);
+    return result.release();
+  }
 }
 catch (Exception) {
   return NULL;
@@ -661,53 +3036,91 @@ catch (Exception) {
 
 
 PyObject*
-method_cache(PyTable* self,
-	     Arg* args)
+method_materialize(PyTable* self,
+		   Arg* args)
 try {
+  Object* name;
   Object* expr_arg;
-  Object* clear_arg = (Object*) Py_False;
-  args->ParseTuple("O|O", &expr_arg, &clear_arg);
+  args->ParseTuple("SO", &name, &expr_arg);
   Ref<Object> expr_obj = asExpression(expr_arg);
 
-  // Expand the expression.
+  // Expand the expression.  Only some types can be materialized.
   Ref<Object> expanded_expr = self->expand(expr_obj);
-  // For now, only boolean expressions may be cached.  Make sure it is.
   Ref<Object> expr_type = expanded_expr->GetAttrString("type");
-  Ref<Object> bool_type = import("hep.bool", "bool");
-  if (! expr_type->Compare(bool_type))
-    throw Exception(PyExc_NotImplementedError, 
-		    "only bool expressions may be cached");
-
-  // Is this expression already cached?
-  if (self->expression_cache_->HasKey(expanded_expr)) {
-    // If requested to clear it, do so.
-    if (clear_arg->IsTrue()) {
-      Ref<Object> cache_entry = 
-	self->expression_cache_->GetItem(expanded_expr);
-      // Clear the mask bits.
-      Ref<Object> mask_array = cast<Tuple>(cache_entry)->GetItem(0);
-      cast<PyBoolArray>(mask_array)->clear();
+  getMaterializedType(expr_type);
+
+  // Is there already a column with this name?
+  Ref<Object> materialized_column_type = 
+    import("hep.table", "MaterializedColumn");
+  Dict* schema = cast<Dict>(self->schema_);
+  if (schema->HasKey(name)) {
+    Ref<Object> column = schema->GetItem(name);
+    if (! column->IsInstance(materialized_column_type))
+      throw Exception(PyExc_ValueError, "name '%s' is already assigned",
+		      cast<String>(name)->AsString());
+    // If it's materialized for a different expression, discard its
+    // values.
+    Ref<Object> old_expr = column->GetAttrString("expression");
+    if (! old_expr->Compare(expanded_expr)) {
+      if (self->materialized_arrays_->HasKey(name)) {
+	Ref<Object> arrays = self->materialized_arrays_->GetItem(name);
+	self->retired_arrays_->Append(arrays);
+	self->materialized_arrays_->DelItem(name);
+      }
+      ::unlink(getMaterializedPath(self, name).c_str());
+      // Statistics of expressions using the column are no longer valid.
+      self->getStatisticsCache()->Clear();
     }
-    else 
-      // Did not request to clear the bits, and it's already cached, so
-      // do nothing.
-      ;
   }
+  else
+    // Any values file for this name isn't for this column.
+    ::unlink(getMaterializedPath(self, name).c_str());
+  // Register the column in the schema.
+  Ref<Object> column = cast<Callable>(materialized_column_type)
+    ->CallFunctionObjArgs(name, (PyObject*) expanded_expr, NULL);
+  schema->SetItem(name, column);
+
+  // Map the values, and compile the expression to compute them.
+  Ref<Tuple> arrays = self->getMaterialized(name);
+  Ref<Object> mask_obj = arrays->GetItem(0);
+  Ref<Object> values = arrays->GetItem(1);
+  PyBoolArray* mask = cast<PyBoolArray>(mask_obj);
+  Ref<Object> compiled_obj = self->compile(expanded_expr);
+  PyExpr* compiled = cast<PyExpr>(compiled_obj);
+  std::auto_ptr<BatchEvaluator> batch(new BatchEvaluator(compiled, self));
+  if (! batch->isValid())
+    batch.reset();
+
+  // Compute values for rows that don't have them, a block at a time.
+  int num_rows = mask->length_;
+  for (int start = 0; start < num_rows; start += BatchEvaluator::block_size) {
+    int count = std::min(num_rows - start, BatchEvaluator::block_size);
+    int i = 0;
+    while (i < count && mask->get(start + i))
+      ++i;
+    if (i == count)
+      // All rows in this block have values.
+      continue;
 
-  else {
-    // Compile the expression.
-    Ref<Object> compiled_expr = self->compile(expanded_expr);
-
-    // Construct a tuple containing a bit mask for the cache, the cached
-    // values themselves, and the compiled expression to use in case of a
-    // cache miss.
-    int num_rows = self->table_->getNumRows();
-    Ref<Object> mask_array = PyBoolArray::New(num_rows);
-    Ref<Object> value_array = PyBoolArray::New(num_rows);
-    Ref<Tuple> cache_entry = 
-      Tuple::New(2, (Object*) mask_array, (Object*) value_array);
-    // Set the entry.  The key is the expanded expression.
-    self->expression_cache_->SetItem(expanded_expr, cache_entry);
+    // Evaluate the block at once, if possible.
+    bool batch_ok = batch.get() != NULL && batch->evaluate(start, count);
+    for (; i < count; ++i) {
+      int index = start + i;
+      if (mask->get(index))
+	continue;
+      Value value;
+      if (batch_ok)
+	value = batch->getValue(i);
+      else {
+	Ref<PyRow> row = self->getRowObject(index);
+	value = compiled->evaluate((Mapping*) (PyRow*) row, true);
+      }
+      if (PyBoolArray::Check(values))
+	cast<PyBoolArray>(values)->set(index, value.cast_as_bool());
+      else
+	cast<PyColumnArray>(values)->set(index, value);
+      mask->set(index, true);
+    }
   }
 
   RETURN_NONE;
@@ -718,16 +3131,117 @@ catch (Exception) {
 
 
 PyObject*
-method_compile(PyTable* self,
-	       Object* expr_arg)
+method_readColumns(PyTable* self,
+		   Arg* args,
+		   PyObject* kw_args)
 try {
-  Ref<Object> expr(asExpression(expr_arg));
-  if (expr == None)
-    return expr.release();
+  static char* kw_arg_list[] = {
+    "names",
+    "start",
+    "stop",
+    "selection",
+    NULL
+  };
+  Object* names_arg;
+  int start = 0;
+  Object* stop_arg = None;
+  Object* selection_arg = None;
+  if (! PyArg_ParseTupleAndKeywords(args, kw_args, "O|iOO", kw_arg_list,
+				    &names_arg, &start, &stop_arg, 
+				    &selection_arg))
+    throw Exception();
+
+  Table* table = self->table_.get();
+  // Determine the range of rows to read.  As for 'iterRows', negative
+  // row indices are not counted from the end.
+  int num_rows = table->getNumRows();
+  int stop = (stop_arg == None) ? num_rows : stop_arg->IntAsLong();
+  if (start < 0 || stop < 0)
+    throw Exception(PyExc_ValueError, "negative row index");
+  start = std::min(start, num_rows);
+  stop = std::max(start, std::min(stop, num_rows));
+
+  // Look up the columns.
+  Sequence* names = cast<Sequence>(names_arg);
+  int num_names = names->Size();
+  std::vector<int> columns(num_names);
+  std::vector<ColumnType> types(num_names);
+  // Packed columns are decoded into arrays of their values' type.
+  std::vector<ColumnType> value_types(num_names);
+  for (int i = 0; i < num_names; ++i) {
+    Ref<Object> name = names->GetItem(i);
+    Ref<String> key = name->Str();
+    internInPlace(key);
+    columns[i] = self->findColumn(key, types[i]);
+    if (columns[i] == -1)
+      throw Exception(PyExc_KeyError, "%s", key->AsString());
+    value_types[i] = getValueType(types[i]);
+    if (getArrayTypecode(value_types[i]) == NULL)
+      throw Exception(PyExc_NotImplementedError,
+		      "no array type for column '%s' of type %s",
+		      key->AsString(), getTypeName(types[i]));
+  }
+
+  const Schema* schema = table->getSchema();
+  Ref<List> result = List::New(num_names);
+  std::vector<char*> buffers(num_names);
+
+  if (selection_arg == None) {
+    // Read the columns directly into the arrays, except packed columns,
+    // which are read into buffers of their own and then decoded.
+    std::vector<char*> read_buffers(num_names);
+    std::vector<std::vector<char> > stored(num_names);
+    for (int i = 0; i < num_names; ++i) {
+      Ref<Object> array = newArray(value_types[i], stop - start, &buffers[i]);
+      result->InitializeItem(i, array);
+      if (types[i] == value_types[i])
+	read_buffers[i] = buffers[i];
+      else {
+	stored[i].resize(std::max(stop - start, 1) * getTypeSize(types[i]));
+	read_buffers[i] = &stored[i][0];
+      }
+    }
+    AllowThreads allow_threads;
+    table->readColumns(columns, start, stop - start, read_buffers);
+    for (int i = 0; i < num_names; ++i)
+      if (types[i] != value_types[i])
+	decodeColumn(schema, columns[i], read_buffers[i], stop - start, 
+		     buffers[i]);
+  }
+
   else {
-    Ref<Object> compiled_expr = self->compile(expr);
-    return compiled_expr.release();
+    // Collect values from the rows that pass the selection.
+    Ref<Object> selection = asExpression(selection_arg);
+    Ref<Object> iter = PyIterator::New(self, selection, start, stop);
+    std::vector<std::vector<char> > values(num_names);
+    int count = 0;
+    while (true) {
+      Ref<Object> row_obj = PyIter_Next(iter);
+      if (row_obj == NULL) {
+	if (PyErr_Occurred())
+	  throw Exception();
+	break;
+      }
+      const Row* row = cast<PyRow>(row_obj)->getRow();
+      for (int i = 0; i < num_names; ++i) {
+	char value[sizeof(double)];
+	decodeColumn(schema, columns[i], row->getValueData(columns[i]), 1, 
+		     value);
+	values[i].insert(values[i].end(), 
+			 value, value + getTypeSize(value_types[i]));
+      }
+      ++count;
+    }
+    // Copy them into the arrays.
+    for (int i = 0; i < num_names; ++i) {
+      Ref<Object> array = newArray(value_types[i], count, &buffers[i]);
+      if (count > 0)
+	memcpy(buffers[i], &values[i][0], values[i].size());
+      result->InitializeItem(i, array);
+    }
   }
+
+  return result.release();
 }
 catch (Exception) {
   return NULL;
@@ -735,16 +3249,58 @@ catch (Exception) {
 
 
 PyObject*
-method_expand(PyTable* self,
-	      Object* expr_arg)
+method_sample(PyTable* self,
+	      Arg* args,
+	      PyObject* kw_args)
 try {
-  Ref<Object> expr(asExpression(expr_arg));
-  if (expr == None)
-    return expr.release();
-  else {
-    Ref<Object> expanded_expr = self->expand(expr);
-    return expanded_expr.release();
+  static char* kw_arg_list[] = {
+    "fraction",
+    "seed",
+    "selection", 
+    "reuse",
+    NULL 
+  };
+  double fraction;
+  Object* seed_arg = None;
+  Object* selection_arg = None;
+  Object* reuse = (Object*) Py_False;
+  if (! PyArg_ParseTupleAndKeywords(args, kw_args, "d|OOO", kw_arg_list,
+				    &fraction, &seed_arg, &selection_arg,
+				    &reuse))
+    throw Exception();
+  if (! (fraction > 0 && fraction <= 1))
+    throw Exception(PyExc_ValueError, "fraction must be in (0, 1]");
+  // A seed of zero chooses one from the system time.
+  long seed = (seed_arg == None) ? 0 : seed_arg->IntAsLong();
+  if (seed_arg != None && seed <= 0)
+    throw Exception(PyExc_ValueError, "seed must be positive");
+  Ref<Object> selection;
+  if (selection_arg != None) 
+    selection.set(asExpression(selection_arg));
+
+  // Choose the rows up front, in order.  Each row is included
+  // independently with probability 'fraction', so the numbers of rows
+  // skipped between included rows are geometrically distributed;
+  // generate those directly rather than a deviate for every row.
+  int64_t num_rows = self->table_->getNumRows();
+  std::vector<int64_t> rows;
+  rows.reserve((size_t) (num_rows * fraction * 1.1) + 16);
+  ShuffledLEcuyerRandom random(seed);
+  double log_skip = log(1.0 - fraction);
+  int64_t row = -1;
+  while (true) {
+    double skip = floor(log(1.0 - random.random()) / log_skip);
+    if (skip >= num_rows - row - 1)
+      break;
+    row += (int64_t) skip + 1;
+    rows.push_back(row);
   }
+
+  // Construct the iterator over them.
+  Ref<PyIterator> iter = 
+    PyIterator::New(self, selection, 0, -1, reuse->IsTrue());
+  iter->setRows(rows);
+  return iter.release();
 }
 catch (Exception) {
   return NULL;
@@ -759,19 +3315,30 @@ try {
   static char* kw_arg_list[] = {
     "selection", 
     "columns", 
+    "start",
+    "stop",
+    "reuse",
     NULL 
   };
   Object* selection_arg = None;
   Object* columns = NULL;
-  if (! PyArg_ParseTupleAndKeywords(args, kw_args, "|OO", kw_arg_list,
-				    &selection_arg, &columns))
+  int start = 0;
+  Object* stop_arg = None;
+  Object* reuse = (Object*) Py_False;
+  if (! PyArg_ParseTupleAndKeywords(args, kw_args, "|OOiOO", kw_arg_list,
+				    &selection_arg, &columns, &start,
+				    &stop_arg, &reuse))
     throw Exception();
   Ref<Object> selection;
   if (selection_arg != None) 
     selection.set(asExpression(selection_arg));
+  int stop = (stop_arg == None) ? -1 : stop_arg->IntAsLong();
+  if (start < 0 || (stop_arg != None && stop < 0))
+    throw Exception(PyExc_ValueError, "negative row index");
   
   // Construct the iterator.
-  PyIterator* iter = PyIterator::New(self, selection);
+  PyIterator* iter = 
+    PyIterator::New(self, selection, start, stop, reuse->IsTrue());
   
   return (PyObject*) iter;
 }
@@ -780,6 +3347,299 @@ catch (Exception) {
 }
 
 
+PyObject*
+method_setReadAhead(PyTable* self,
+		    Arg* args)
+try {
+  int depth;
+  int block_size = 1024 * 1024;
+  args->ParseTuple("i|i", &depth, &block_size);
+  if (depth < 0)
+    throw Exception(PyExc_ValueError, "negative read-ahead depth");
+  if (block_size <= 0)
+    throw Exception(PyExc_ValueError, "invalid read-ahead block size");
+
+  // Only tables stored in files are read ahead.
+  FileTable* table = dynamic_cast<FileTable*>(self->table_.get());
+  if (table != NULL)
+    table->setReadAhead(block_size, depth);
+  RETURN_NONE;
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_skim(PyTable* self,
+	    Arg* args,
+	    PyObject* kw_args)
+try {
+  static char* kw_arg_list[] = {
+    "path",
+    "selection",
+    "columns",
+    NULL 
+  };
+  char* path;
+  Object* selection_arg;
+  Object* columns_arg = None;
+  if (! PyArg_ParseTupleAndKeywords(args, kw_args, "sO|O", kw_arg_list,
+				    &path, &selection_arg, &columns_arg))
+    throw Exception();
+
+  // The new table has all the columns of this one, or just those named.
+  Ref<Object> schema_obj;
+  if (columns_arg == None)
+    schema_obj = newRef(self->schema_);
+  else {
+    if (String::Check(columns_arg))
+      throw Exception(PyExc_TypeError, "columns must be a sequence of names");
+    schema_obj = callByNameObjArgs("hep.table", "Schema", NULL);
+    Ref<Object> schema_columns = schema_obj->GetAttrString("columns");
+    Ref<Object> column_type = import("hep.table", "Column");
+    Dict* schema = cast<Dict>(self->schema_);
+    Sequence* names = cast<Sequence>(columns_arg);
+    int num_names = names->Size();
+    if (num_names == 0)
+      throw Exception(PyExc_ValueError, "no columns to skim");
+    for (int n = 0; n < num_names; ++n) {
+      Ref<Object> name = names->GetItem(n);
+      if (! schema->HasKey(name)) {
+	Ref<String> name_str = name->Str();
+	throw Exception(PyExc_KeyError, "%s", name_str->AsString());
+      }
+      Ref<Object> column = schema->GetItem(name);
+      if (! column->IsInstance(column_type) 
+	  || cast<Dict>(schema_obj)->HasKey(name)) {
+	Ref<String> name_str = name->Str();
+	throw Exception(PyExc_ValueError, "can't skim column '%s'",
+			name_str->AsString());
+      }
+      cast<List>(schema_columns)->Append(column);
+      cast<Dict>(schema_obj)->SetItem(name, column);
+    }
+  }
+
+  // Create the new table, with the same layout as this one.
+  const char* layout = 
+    dynamic_cast<ColumnarFileTable*>(self->table_.get()) != NULL
+    ? "columns" : "rows";
+  Ref<Object> path_obj = String::FromString(path);
+  Ref<Object> layout_obj = String::FromString(layout);
+  Ref<Object> target_obj = callByNameObjArgs
+    ("hep.table", "create", (PyObject*) path_obj, (PyObject*) schema_obj,
+     Py_True, (PyObject*) layout_obj, NULL);
+  PyTable* target = cast<PyTable>(target_obj);
+  copyAttributes(self, target);
+  RowCopier copier(self, target);
+
+  // Compile the selection, and evaluate it on blocks of rows at once,
+  // if possible.  Blocks that the zone map shows contain no selected
+  // rows are skipped.
+  int64_t num_rows = self->table_->getNumRows();
+  Ref<Object> compiled_selection;
+  std::auto_ptr<BatchEvaluator> batch;
+  std::vector<Bound> bounds;
+  if (selection_arg != None) {
+    Ref<Object> selection_obj = asExpression(selection_arg);
+    Ref<Object> expanded_selection = self->expand(selection_obj);
+    compiled_selection = self->compile(expanded_selection);
+    if (PyExpr::Check(compiled_selection)) {
+      batch.reset(new BatchEvaluator(cast<PyExpr>(compiled_selection), self));
+      if (! batch->isValid())
+	batch.reset();
+    }
+    if (num_rows > 0)
+      self->getSelectionBounds(expanded_selection, bounds);
+  }
+  ZoneMap* zone_map = self->table_->getZoneMap();
+
+  std::vector<int> offsets;
+  for (int64_t start = 0; start < num_rows; 
+       start += BatchEvaluator::block_size) {
+    int count = (int) std::min<int64_t>(num_rows - start, 
+					BatchEvaluator::block_size);
+    if (zone_map != NULL && bounds.size() > 0
+	&& zone_map->excludes(start / ZoneMap::block_size, bounds))
+      continue;
+
+    // Find the selected rows in this block.
+    offsets.clear();
+    bool batch_ok = batch.get() != NULL && batch->evaluate(start, count);
+    for (int i = 0; i < count; ++i) 
+      if (compiled_selection == NULL)
+	offsets.push_back(i);
+      else if (batch_ok) {
+	if (batch->getBool(i))
+	  offsets.push_back(i);
+      }
+      else {
+	Ref<PyRow> row = self->getRowObject(start + i);
+	if (evaluateOnRow(compiled_selection, row).cast_as_bool())
+	  offsets.push_back(i);
+      }
+    if (offsets.size() == 0)
+      continue;
+
+    // Copy them without the global interpreter lock.
+    std::string error;
+    {
+      AllowThreads allow_threads;
+      try {
+	copier.append(start, count, offsets);
+      }
+      catch (FileError file_error) {
+	error = file_error.message_;
+      }
+    }
+    if (error.length() > 0)
+      throw Exception(PyExc_IOError, "error skimming rows: %s", 
+		      error.c_str());
+  }
+
+  // Compute the values of materialized columns for the skimmed rows.
+  Ref<Object> materialized_column_type = 
+    import("hep.table", "MaterializedColumn");
+  Dict* target_schema = cast<Dict>(target->schema_);
+  Ref<Sequence> names = target_schema->Keys();
+  int num_names = names->Size();
+  for (int n = 0; n < num_names; ++n) {
+    Ref<Object> name = names->GetItem(n);
+    Ref<Object> column = target_schema->GetItem(name);
+    if (column->IsInstance(materialized_column_type)) {
+      Ref<Object> expression = column->GetAttrString("expression");
+      Ref<Object> materialize = target_obj->GetAttrString("materialize");
+      Ref<Object> result = cast<Callable>(materialize)
+	->CallFunctionObjArgs(name, (PyObject*) expression, NULL);
+    }
+  }
+
+  return target_obj.release();
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+method_statistics(PyTable* self,
+		  Arg* args,
+		  PyObject* kw_args)
+try {
+  static char* kw_arg_list[] = {
+    "expression",
+    "selection",
+    NULL 
+  };
+  Object* expr_arg;
+  Object* selection_arg = None;
+  if (! PyArg_ParseTupleAndKeywords(args, kw_args, "O|O", kw_arg_list,
+				    &expr_arg, &selection_arg))
+    throw Exception();
+
+  // Expand the expression.  Only numerical values can be summarized.
+  Ref<Object> expr_obj = asExpression(expr_arg);
+  Ref<Object> expanded_expr = self->expand(expr_obj);
+  Ref<Object> expr_type = expanded_expr->GetAttrString("type");
+  if (expr_type != (Object*) &PyInt_Type 
+      && expr_type != (Object*) &PyLong_Type
+      && expr_type != (Object*) &PyFloat_Type)
+    throw Exception(PyExc_TypeError, 
+		    "statistics are computed only for int and float "
+		    "expressions");
+  Ref<Object> expanded_selection = newRef(None);
+  if (selection_arg != None) {
+    Ref<Object> selection_obj = asExpression(selection_arg);
+    expanded_selection = self->expand(selection_obj);
+  }
+
+  // Look for statistics computed earlier.  If rows have been appended
+  // since, only those rows need to be added.
+  Ref<Tuple> key = Tuple::New(2);
+  key->InitializeItem(0, expanded_expr);
+  key->InitializeItem(1, expanded_selection);
+  int num_rows = self->table_->getNumRows();
+  std::auto_ptr<Summary> summary;
+  int start = 0;
+  bool up_to_date = false;
+  if (self->getStatisticsCache()->HasKey(key)) 
+    try {
+      Ref<Object> entry_obj = self->getStatisticsCache()->GetItem(key);
+      Tuple* entry = cast<Tuple>(entry_obj);
+      Ref<Object> cached_rows = entry->GetItem(0);
+      Ref<Object> data = entry->GetItem(1);
+      if (cached_rows->IntAsLong() <= num_rows) {
+	summary.reset(new Summary(data));
+	start = cached_rows->IntAsLong();
+	up_to_date = start == num_rows;
+      }
+    }
+    catch (Exception exception) {
+      // Compute them again instead.
+      exception.Clear();
+    }
+  if (summary.get() == NULL)
+    summary.reset(new Summary());
+
+  if (! up_to_date) {
+    // Compile the expression and selection, and evaluate them on blocks
+    // of rows at once, if possible.
+    Ref<Object> compiled = self->compile(expanded_expr);
+    std::auto_ptr<BatchEvaluator> batch;
+    if (PyExpr::Check(compiled)) {
+      batch.reset(new BatchEvaluator(cast<PyExpr>(compiled), self));
+      if (! batch->isValid())
+	batch.reset();
+    }
+    Ref<Object> compiled_selection;
+    std::auto_ptr<BatchEvaluator> selection_batch;
+    if (expanded_selection != None) {
+      compiled_selection = self->compile(expanded_selection);
+      if (PyExpr::Check(compiled_selection)) {
+	selection_batch.reset(new BatchEvaluator
+			      (cast<PyExpr>(compiled_selection), self));
+	if (! selection_batch->isValid())
+	  selection_batch.reset();
+      }
+    }
+
+    for (int block = start; block < num_rows; 
+	 block += BatchEvaluator::block_size) {
+      int count = std::min(num_rows - block, BatchEvaluator::block_size);
+      bool batch_ok = batch.get() != NULL && batch->evaluate(block, count);
+      if (batch_ok && compiled_selection != NULL)
+	batch_ok = selection_batch.get() != NULL
+	  && selection_batch->evaluate(block, count);
+      for (int i = 0; i < count; ++i) 
+	if (batch_ok) {
+	  if (selection_batch.get() == NULL || selection_batch->getBool(i))
+	    summary->add(batch->getValue(i).cast_as_double());
+	}
+	else {
+	  // Evaluate row by row, so that the row for which evaluation
+	  // fails raises the exception.
+	  Ref<PyRow> row = self->getRowObject(block + i);
+	  if (compiled_selection == NULL
+	      || evaluateOnRow(compiled_selection, row).cast_as_bool())
+	    summary->add(evaluateOnRow(compiled, row).cast_as_double());
+	}
+    }
+
+    Ref<Tuple> data = summary->asTuple();
+    Ref<Object> entry = Py_BuildValue("(iO)", num_rows, (PyObject*) data);
+    self->getStatisticsCache()->SetItem(key, entry);
+  }
+
+  Ref<Tuple> data = summary->asTuple();
+  Ref<Object> statistics_type = import("hep.table", "Statistics");
+  return cast<Callable>(statistics_type)->CallObject(data);
+}
+catch (Exception) {
+  return NULL;
+}
+
+
 PyObject*
 method_uncache(PyTable* self,
 	       Arg* args)
@@ -790,8 +3650,13 @@ try {
 
   // Expand the expression.
   Ref<Object> expanded_expr = self->expand(expr_obj);
-  // Remove it from the cache.
-  self->expression_cache_->DelItem(expanded_expr);
+  // Remove it from the cache, and remove its cache file, if any.
+  Ref<Object> number = self->getExpressionCache()->GetItem(expanded_expr);
+  if (number != None) 
+    ::unlink(getCachePath(self, number->IntAsLong()).c_str());
+  self->getExpressionCache()->DelItem(expanded_expr);
+  if (self->cache_arrays_->HasKey(expanded_expr))
+    self->cache_arrays_->DelItem(expanded_expr);
 
   RETURN_NONE;
 }
@@ -804,12 +3669,36 @@ PyMethodDef
 tp_methods[] = {
   { "append", (PyCFunction) method_append, 
     METH_VARARGS | METH_KEYWORDS, NULL },
+  { "appendColumns", (PyCFunction) method_appendColumns, 
+    METH_VARARGS | METH_KEYWORDS, NULL },
+  { "asArray", (PyCFunction) method_asArray, 
+    METH_VARARGS | METH_KEYWORDS, NULL },
   { "cache", (PyCFunction) method_cache, METH_VARARGS, NULL },
   { "compile", (PyCFunction) method_compile, METH_O, NULL },
+  { "createIndex", (PyCFunction) method_createIndex, METH_VARARGS, NULL },
   { "expand", (PyCFunction) method_expand, METH_O, NULL },
+  { "extend", (PyCFunction) method_extend, METH_O, NULL },
+  { "flush", (PyCFunction) method_flush, METH_NOARGS, NULL },
   { "get", (PyCFunction) mp_subscript, METH_O, NULL },
+  { "getCache", (PyCFunction) method_getCache, METH_VARARGS, NULL },
+  { "getMaterialized", (PyCFunction) method_getMaterialized, 
+    METH_VARARGS, NULL },
+  { "iterRows", (PyCFunction) method_iterRows, 
+    METH_VARARGS | METH_KEYWORDS, NULL },
+  { "join", (PyCFunction) method_join, 
+    METH_VARARGS | METH_KEYWORDS, NULL },
+  { "materialize", (PyCFunction) method_materialize, METH_VARARGS, NULL },
+  { "readColumns", (PyCFunction) method_readColumns, 
+    METH_VARARGS | METH_KEYWORDS, NULL },
+  { "sample", (PyCFunction) method_sample, 
+    METH_VARARGS | METH_KEYWORDS, NULL },
   { "select", (PyCFunction) method_select, 
     METH_VARARGS | METH_KEYWORDS, NULL },
+  { "setReadAhead", (PyCFunction) method_setReadAhead, METH_VARARGS, NULL },
+  { "skim", (PyCFunction) method_skim, 
+    METH_VARARGS | METH_KEYWORDS, NULL },
+  { "statistics", (PyCFunction) method_statistics, 
+    METH_VARARGS | METH_KEYWORDS, NULL },
   { "uncache", (PyCFunction) method_uncache, METH_VARARGS, NULL },
   { NULL, NULL, 0, NULL }
 };
@@ -828,8 +3717,6 @@ catch (Exception) {
 
 struct PyMemberDef
 tp_members[] = {
-  { "expression_cache",
-    T_OBJECT, offsetof(PyTable, expression_cache_), 0, NULL },
   { "file",
     T_OBJECT, offsetof(PyTable, file_object_), 0, NULL },
   { "row_cache_max_size", 
@@ -870,6 +3757,40 @@ catch (Exception) {
 }
 
 
+PyObject*
+get_expression_cache(PyTable* self,
+		     void* /* closure */)
+try {
+  RETURN_OBJ_REF(self->getExpressionCache());
+}
+catch (Exception) {
+  return NULL;
+}
+
+
+PyObject*
+get_io_statistics(PyTable* self,
+		  void* /* closure */)
+try {
+  const ReadAhead* read_ahead = self->table_->getReadAhead();
+  if (read_ahead == NULL)
+    RETURN_NONE;
+
+  ReadAhead::Statistics statistics = read_ahead->getStatistics();
+  return Py_BuildValue
+    ("{s:l,s:i,s:L,s:L,s:L,s:L}", 
+     "block_size", (long) read_ahead->getBlockSize(),
+     "depth", read_ahead->getDepth(),
+     "blocks", (PY_LONG_LONG) statistics.blocks_,
+     "bytes", (PY_LONG_LONG) statistics.bytes_,
+     "waits", (PY_LONG_LONG) statistics.waits_,
+     "restarts", (PY_LONG_LONG) statistics.restarts_);
+}
+catch (Exception) {
+  return NULL;
+}
+
+
 PyObject*
 get_rows(PyTable* self,
 	 void* /* closure */)
@@ -915,6 +3836,17 @@ catch (Exception) {
 }
 
 
+PyObject*
+get_statistics_cache(PyTable* self,
+		     void* /* closure */)
+try {
+  RETURN_OBJ_REF(self->getStatisticsCache());
+}
+catch (Exception) {
+  return NULL;
+}
+
+
 PyObject*
 get_with_metadata(PyTable* self,
 		  void* /* closure */)
@@ -941,9 +3873,12 @@ catch (Exception) {
 
 PyGetSetDef
 tp_getset[] = {
+  { "expression_cache", (getter) get_expression_cache, NULL, NULL, NULL },
   { "row_type", (getter) get_row_type, (setter) set_row_type, NULL, NULL },
+  { "io_statistics", (getter) get_io_statistics, NULL, NULL, NULL },
   { "rows", (getter) get_rows, NULL, NULL, NULL },
   { "schema", (getter) get_schema, (setter) set_schema, NULL, NULL },
+  { "statistics_cache", (getter) get_statistics_cache, NULL, NULL, NULL },
   { "with_metadata", (getter) get_with_metadata, 
     (setter) set_with_metadata, NULL, NULL },
   { NULL, NULL, NULL, NULL },
@@ -971,8 +3906,8 @@ PyTable::type = {
   NULL,                                 // tp_hash
   NULL,                                 // tp_call
   (reprfunc) tp_str,                    // tp_str
-  NULL,                                 // tp_getattro
-  NULL,                                 // tp_setattro
+  (getattrofunc) tp_getattro,           // tp_getattro
+  (setattrofunc) tp_setattro,           // tp_setattro
   NULL,                                 // tp_as_buffer
   Py_TPFLAGS_DEFAULT 
   | Py_TPFLAGS_BASETYPE,                // tp_flags
@@ -1030,7 +3965,17 @@ try {
   char* path;
   Object* schema_arg;
   Object* with_metadata;
-  args->ParseTuple("sOO", &path, &schema_arg, &with_metadata);
+  char* layout_name = "rows";
+  args->ParseTuple("sOO|s", &path, &schema_arg, &with_metadata, 
+		   &layout_name);
+  Layout layout;
+  if (strcmp(layout_name, "rows") == 0)
+    layout = LAYOUT_ROWS;
+  else if (strcmp(layout_name, "columns") == 0)
+    layout = LAYOUT_COLUMNS;
+  else
+    throw Exception(PyExc_ValueError, "unrecognized layout '%s'", 
+		    layout_name);
 
   // Copy the schema.
   Ref<Object> schema_obj = 
@@ -1041,7 +3986,7 @@ try {
   // Create the new table.
   std::auto_ptr<Table> table;
   try {
-    table.reset(FileTable::create(schema.get(), path));
+    table.reset(FileTable::create(schema.get(), path, 0666, layout));
   }
   catch (FileError error) {
     throw Exception(PyExc_RuntimeError, "error creating %s: %s", 
@@ -1071,17 +4016,26 @@ try {
   char* mode;
   Object* row_type_arg;
   Object* with_metadata;
-  args->ParseTuple("ssOO", &path, &mode, &row_type_arg, &with_metadata);
+  Object* use_mmap = (Object*) Py_False;
+  int read_ahead = 0;
+  int read_ahead_block_size = 1024 * 1024;
+  args->ParseTuple("ssOO|Oii", &path, &mode, &row_type_arg, &with_metadata,
+		   &use_mmap, &read_ahead, &read_ahead_block_size);
   // Check that the mode is recognized.
   if (strcmp(mode, "r") != 0
       && strcmp(mode, "w") != 0) 
     throw Exception(PyExc_ValueError, "unrecognized mode '%s'", mode);
+  if (read_ahead < 0)
+    throw Exception(PyExc_ValueError, "negative read-ahead depth");
+  if (read_ahead_block_size <= 0)
+    throw Exception(PyExc_ValueError, "invalid read-ahead block size");
   // Check that the row type is callable.
   Callable* row_type = cast<Callable>(row_type_arg);
 
   // Open the table.
   try {
-    return loadTable(path, mode, row_type, with_metadata->IsTrue());
+    return loadTable(path, mode, row_type, with_metadata->IsTrue(),
+		     use_mmap->IsTrue(), read_ahead, read_ahead_block_size);
   }
   catch (FileError error) {
     // Open failed; raise an exception.
@@ -1093,6 +4047,84 @@ catch (Exception) {
 }
 
 
+PyObject*
+function_table_sort(Object* /* self */,
+		    Arg* args)
+try {
+  // Parse arguments.
+  Object* source_arg;
+  Object* target_arg;
+  Object* keys_arg;
+  long memory_limit;
+  args->ParseTuple("OOOl", &source_arg, &target_arg, &keys_arg, 
+		   &memory_limit);
+  PyTable* source = cast<PyTable>(source_arg);
+  PyTable* target = cast<PyTable>(target_arg);
+  checkWritable(target->table_.get());
+  const Schema* schema = source->table_->getSchema();
+  if (! haveSameLayout(schema, target->table_->getSchema()))
+    throw Exception(PyExc_ValueError, "tables have different schemas");
+  if (memory_limit <= 0)
+    throw Exception(PyExc_ValueError, "invalid memory limit");
+
+  // Look up the key columns.
+  Sequence* keys = cast<Sequence>(keys_arg);
+  int num_keys = keys->Size();
+  std::vector<int> key_columns;
+  for (int k = 0; k < num_keys; ++k) {
+    Ref<Object> name_obj = keys->GetItem(k);
+    Ref<String> name = name_obj->Str();
+    int column_index;
+    try {
+      column_index = schema->whichColumn(name->AsString());
+    }
+    catch (NoColumn) {
+      throw Exception(PyExc_KeyError, "%s", name->AsString());
+    }
+    ColumnType type = schema->getColumn(column_index).getType();
+    if (type == TYPE_COMPLEX_64 || type == TYPE_COMPLEX_128
+	|| type == TYPE_JAGGED)
+      throw Exception(PyExc_ValueError, 
+		      "cannot sort by column '%s' of type %s",
+		      name->AsString(), getTypeName(type));
+    key_columns.push_back(column_index);
+  }
+
+  // Put temporary files next to the target table.
+  Ref<Object> path_obj = target->GetAttrString("path");
+  Ref<String> path = path_obj->Str();
+  std::string temp_path = std::string(path->AsString()) + ".sort";
+
+  // Sort the rows, letting other threads run meanwhile.
+  bool was_empty = target->table_->getNumRows() == 0;
+  std::string error;
+  {
+    AllowThreads allow_threads;
+    try {
+      sortTable(source->table_.get(), target->table_.get(), key_columns,
+		memory_limit, temp_path);
+    }
+    catch (FileError file_error) {
+      error = file_error.message_;
+    }
+  }
+  if (error.length() > 0)
+    throw Exception(PyExc_IOError, "error sorting table: %s", 
+		    error.c_str());
+
+  // Copy the source table's attributes.  If the target contains just
+  // the same rows, the statistics computed for the source also apply.
+  copyAttributes(source, target);
+  if (was_empty)
+    target->getStatisticsCache()->Update(source->getStatisticsCache());
+
+  RETURN_NONE;
+}
+catch (Exception) {
+  return NULL;
+}
+
+
 PyObject*
 buildSchemaObject(const Schema* schema)
 {
@@ -1107,9 +4139,33 @@ buildSchemaObject(const Schema* schema)
     // Extract the column name and type name.
     std::string name = column.getName();
     const char* type_name = getTypeName(column.getType());
+    Ref<Object> args = Py_BuildValue("(ss)", name.c_str(), type_name);
+    THROW_IF_NULL(args);
+    // A dictionary column's values are passed as an attribute.
+    Ref<Dict> attributes = Dict::New();
+    if (column.getType() == TYPE_DICT_8) {
+      const std::vector<long>& dictionary = column.getDictionary();
+      Ref<Tuple> entries = Tuple::New(dictionary.size());
+      for (int e = 0; e < (int) dictionary.size(); ++e) {
+	Ref<Object> entry = Int::FromLong(dictionary[e]);
+	entries->InitializeItem(e, entry);
+      }
+      Ref<String> key = String::FromString("dictionary");
+      attributes->SetItem(key, entries);
+    }
+    // So are a fixed-point column's scale and offset.
+    if (column.getType() == TYPE_FIXED_16 
+	|| column.getType() == TYPE_FIXED_32) {
+      Ref<String> scale_key = String::FromString("scale");
+      Ref<Object> scale = Float::FromDouble(column.getScale());
+      attributes->SetItem(scale_key, scale);
+      Ref<String> offset_key = String::FromString("offset");
+      Ref<Object> offset = Float::FromDouble(column.getOffset());
+      attributes->SetItem(offset_key, offset);
+    }
     // Add the column to the schema.
-    Ref<Object> ignored = 
-      schema_obj->CallMethod("addColumn", "ss", name.c_str(), type_name);
+    Ref<Object> add_column = schema_obj->GetAttrString("addColumn");
+    Ref<Object> ignored = cast<Callable>(add_column)->Call(args, attributes);
   }
 
   return schema_obj.release();
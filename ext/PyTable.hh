@@ -18,6 +18,7 @@
 #include <Python.h>
 #include <map>
 #include <memory>
+#include <string>
 
 #include "PyRow.hh"
 #include "python.hh"
@@ -33,6 +34,7 @@ struct PyTable
   : public Py::Object
 {
   static PyTypeObject type;
+  static bool Check(PyObject* object);
   static PyTable* New(table::Table* table, PyObject* schema, 
 		      Py::Callable* row_type, bool with_metadata);
 
@@ -57,6 +59,9 @@ struct PyTable
   */
   void returnRow(table::Row* row);
 
+  /* Read row 'index' into 'row', which is not in the row cache.  */
+  void readRow(int index, table::Row* row);
+
   PyRow* getRowObject(int index, Py::Callable* constructor=NULL);
 
   /* Return the index of the column named 'name', or -1 if none.  
@@ -89,12 +94,58 @@ struct PyTable
   */
   Py::Object* cacheExpand(Py::Object* expression) const;
 
+  /* Return the cached values of 'expression'.
+
+     'expression' -- A key of 'expression_cache_'.
+
+     The values are loaded from the cache file the first time they are
+     used.  If rows have been appended to the table since, the arrays
+     are lengthened to include them.
+
+     returns -- A new reference to the '(mask, values)' pair.  
+  */
+  Py::Tuple* getCache(Py::Object* expression);
+
+  /* Return the values of materialized column 'name'.
+
+     The values are loaded from the column's file the first time they
+     are used.  If rows have been appended to the table since, the
+     arrays are lengthened to include them.
+
+     returns -- A new reference to a '(mask, values)' pair, like the
+     ones returned by 'getCache'.  
+  */
+  Py::Tuple* getMaterialized(Py::Object* name);
+
   /* Compile an expression for this table.
 
      returns -- A new reference to a compiled expression object.  
   */
   Py::Object* compile(Py::Object* expression) const;
 
+  /* Decode the table's attributes from its metadata, if they haven't
+     been yet.  Attributes set since the table was opened take
+     precedence.  */
+  void loadAttributes();
+
+  /* Return 'expression_cache_', decoding it from the table's metadata
+     the first time.  
+
+     returns -- A borrowed reference.  */
+  Py::Dict* getExpressionCache();
+
+  /* Return 'statistics_cache_', decoding it from the table's metadata
+     the first time.  
+
+     returns -- A borrowed reference.  */
+  Py::Dict* getStatisticsCache();
+
+  /* Find the bounds on column values implied by selection expression
+     'selection', and append them to 'bounds'.  See
+     'hep.table.getSelectionBounds'.  */
+  void getSelectionBounds(Py::Object* selection, 
+			  std::vector<table::Bound>& bounds) const;
+
   /* The underlying table.  */
   std::auto_ptr<table::Table> table_;
 
@@ -130,24 +181,66 @@ struct PyTable
   typedef std::map<int, CachedRow*> RowCache_t;
   RowCache_t row_cache_;
 
+  /* Held while 'row_cache_' is used.  Rows are read without the global
+     interpreter lock, so another thread may use the cache meanwhile.  */
+  pthread_mutex_t row_cache_mutex_;
+
   /* Maximum size of the row cache.  */
   size_t row_cache_max_size_;
 
   /* Additional user attributes stored on the table.  */
   PyObject* attribute_dict_;
 
+  /* Sections of the table's metadata that haven't been decoded yet,
+     by name.  They are decoded when first used, and stored again as
+     they are if they aren't.  */
+  std::map<std::string, std::string> metadata_sections_;
+
+  /* The table's metadata, as read.  It isn't written again if it
+     hasn't changed.  */
+  std::string metadata_;
+
   Py::Ref<Py::Callable> row_type_;
 
-  /* A dictionary of cached expression values.
+  /* A dictionary of cached expressions.
 
      A keys is an expression that can be avaluated on rows of this
-     table.  The value is a pair '(mask, values)', where 'mask' is a
-     bool array indicating whether the cache is valid for each row, and
-     'values' is an array containing the cached value for each row (for
-     rows for which the mask bit is set).  
+     table.  The value is the number of the file in which the cached
+     values are stored (see 'getCache'), or 'None' if they are not
+     stored in a file.
   */
   Py::Ref<Py::Dict> expression_cache_;
 
+  /* A dictionary of cached expression values that have been loaded.
+
+     The keys are those of 'expression_cache_'.  The value is a pair
+     '(mask, values)', where 'mask' is a bool array indicating whether
+     the cache is valid for each row, and 'values' is an array
+     containing the cached value for each row (for rows for which the
+     mask bit is set).
+  */
+  Py::Ref<Py::Dict> cache_arrays_;
+
+  /* A dictionary of materialized column values that have been loaded.
+
+     The keys are the names of materialized columns in the schema.  The
+     values are '(mask, values)' pairs, as in 'cache_arrays_'.
+  */
+  Py::Ref<Py::Dict> materialized_arrays_;
+
+  /* Cache and materialized column arrays that have been replaced by
+     longer ones.  Compiled expressions may still refer to them.  */
+  Py::Ref<Py::List> retired_arrays_;
+
+  /* A dictionary of statistics computed by 'statistics'.
+
+     The keys are '(expression, selection)' pairs of expanded
+     expressions; 'selection' is 'None' if all rows are used.  The
+     value is a pair '(num_rows, data)', where 'data' is a tuple of
+     the statistics for the first 'num_rows' rows of the table.
+  */
+  Py::Ref<Py::Dict> statistics_cache_;
+
   /* A dictionary of compiled expressions.  */
   Py::Ref<Py::Dict> compiled_expressions_;
 
@@ -166,6 +259,9 @@ struct PyTable
   */
   Py::Ref<Py::Callable> pickle_fn_;
 
+  /* The function to decode metadata sections, imported likewise.  */
+  Py::Ref<Py::Callable> unpickle_fn_;
+
   /* Required to support weak references to instances.  */
   PyObject* weak_references_;
 
@@ -178,6 +274,13 @@ struct PyTable
 };
 
 
+inline bool
+PyTable::Check(PyObject* object)
+{
+  return ((Py::Object*) object)->IsInstance(&type);
+}
+
+
 inline int
 PyTable::findColumn(Py::String* name, 
 		    table::ColumnType& type)
@@ -206,6 +309,7 @@ extern PyObject* function_table_makeColumn(Py::Object*, Py::Arg* args);
 extern PyObject* function_table_makeIndex(Py::Object*, Py::Arg* args);
 extern PyObject* function_table_open(Py::Object*, Py::Arg* args);
 extern PyObject* function_table_create(Py::Object*, Py::Arg* args);
+extern PyObject* function_table_sort(Py::Object*, Py::Arg* args);
 
 //----------------------------------------------------------------------
 // other useful functions
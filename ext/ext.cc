@@ -16,6 +16,7 @@
 #include <iostream>
 
 #include "PyBoolArray.hh"
+#include "PyColumnArray.hh"
 #include "PyContour.hh"
 #include "PyFourVector.hh"
 #include "PyHistogram1D.hh"
@@ -89,6 +90,7 @@ namespace {
 PyTypeObject*
 types[] = {
   &PyBoolArray::type,
+  &PyColumnArray::type,
   &PyExpr::type,
   &PyFourVector::type,
   &PyHistogram1D::type,
@@ -127,6 +129,8 @@ functions[] = {
     (PyCFunction) function_table_create, METH_VARARGS, NULL },
   { "table_open", 
     (PyCFunction) function_table_open, METH_VARARGS, NULL },
+  { "table_sort", 
+    (PyCFunction) function_table_sort, METH_VARARGS, NULL },
   { "timer_get",
     (PyCFunction) function_timer_get, METH_VARARGS, NULL },
   { "timer_start",
@@ -343,6 +343,26 @@ ThreadStateSwap::~ThreadStateSwap()
 }
 
 
+/* A temporary release of the Python global interpreter lock.
+
+   On construction, releases the global interpreter lock, so that other
+   Python threads may run.  On exit, reacquires it.  No Python objects
+   may be used in between.  */
+
+class AllowThreads
+{
+public:
+
+  AllowThreads() : thread_state_(PyEval_SaveThread()) {}
+  ~AllowThreads() { PyEval_RestoreThread(thread_state_); }
+
+private:
+
+  PyThreadState* thread_state_;
+
+};
+
+
 //----------------------------------------------------------------------
 // wrappers for Python type structs
 //----------------------------------------------------------------------
@@ -923,8 +943,8 @@ struct Dict
   static Dict* New()
     { RETURN(Dict, PyDict_New()); }
 
-  static Dict* Copy(PyObject* object)
-    { RETURN(Dict, PyDict_Copy(object)); }
+  static Dict* Copy(PyObject* dict)
+    { RETURN(Dict, PyDict_Copy(dict)); }
 
   void Clear()
     { PyDict_Clear(this); }
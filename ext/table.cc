@@ -10,13 +10,22 @@
 // includes
 //----------------------------------------------------------------------
 
+#include <algorithm>
 #include <cassert>
 #include <cerrno>
+#include <cmath>
 #include <complex>
+#include <cstdio>
+#include <cstring>
+#include <dirent.h>
 #include <fcntl.h>
 #include <libgen.h>
+#include <queue>
+#include <signal.h>
 #include <stdint.h>
+#include <sys/mman.h>
 #include <sys/stat.h>
+#include <sys/time.h>
 #include <sys/types.h>
 
 #include "table.hh"
@@ -40,6 +49,12 @@ type_sizes[] = {
   8,    // TYPE_FLOAT_64
   8,    // TYPE_COMPLEX_64
   16,   // TYPE_COMPLEX_128
+  1,    // TYPE_BIT
+  1,    // TYPE_DICT_8
+  12,   // TYPE_JAGGED
+  2,    // TYPE_FLOAT_16
+  2,    // TYPE_FIXED_16
+  4,    // TYPE_FIXED_32
  };
 
 
@@ -53,15 +68,53 @@ type_names[] = {
   "float64",    // TYPE_FLOAT_64
   "complex64",  // TYPE_COMPLEX_64
   "complex128", // TYPE_COMPLEX_128
+  "bit",        // TYPE_BIT
+  "dict8",      // TYPE_DICT_8
+  "jagged",     // TYPE_JAGGED
+  "float16",    // TYPE_FLOAT_16
+  "fixed16",    // TYPE_FIXED_16
+  "fixed32",    // TYPE_FIXED_32
 };
 
 
 const int
 file_format_magic_number = 0x11a66826;
 
+const int
+columnar_file_format_magic_number = 0x11a66827;
+
 const int
 file_format_version_number = 6;
 
+/* The approximate number of bytes to read at once when reading many
+   rows.  */
+const off64_t
+read_block_size = 1024 * 1024;
+
+/* The number of bytes of appended rows to buffer before writing them.  */
+const off64_t
+write_buffer_size = 1024 * 1024;
+
+/* The number of appended values of a jagged column to buffer before
+   writing them.  */
+const size_t
+jagged_buffer_size = 128 * 1024;
+
+/* The number of rows in each row group of new columnar tables.  */
+const int
+default_rows_per_group = 4096;
+
+/* The size of windows mapped from table files.  Tables larger than this
+   are mapped a window at a time.  */
+const size_t
+mmap_window_size = 256 * 1024 * 1024;
+
+const int
+index_file_magic_number = 0x11a66828;
+
+const int
+index_file_version_number = 1;
+
 
 //----------------------------------------------------------------------
 // private types
@@ -101,14 +154,58 @@ struct FileFormatHeader
   /* The offset to the data for the first row.  */
   off64_t first_row_offset_;
 
-  /* Ignored, but retained for file format compatibility.  */
-  off64_t metadata_offset_;
+  /* Distinguishes this table from others created at the same path.
+     Files written by older versions may hold any value here.  */
+  int64_t creation_stamp_;
 
   /* Ignored, but retained for file format compatibility.  */
   off64_t metadata_len_;
 };
 
 
+//----------------------------------------------------------------------
+
+struct IndexFileHeader
+{
+  /* A magic number, identifying this file as a column index file.  */
+  int magic_number_;
+
+  /* The file format version number.  */
+  int version_number_;
+
+  /* The index and type of the indexed column.  */
+  int column_index_;
+  int column_type_;
+
+  /* The number of table rows indexed.  */
+  int64_t num_rows_;
+
+  /* The number of entries, which follow the header.  */
+  int64_t num_entries_;
+};
+
+
+/* Orders column index entries by value, then by row number.  Also
+   compares entries to values, for searching.  */
+
+struct EntryLess
+{
+  bool operator()(const ColumnIndex::Entry& entry0, 
+		  const ColumnIndex::Entry& entry1) const
+    { 
+      return entry0.value_ < entry1.value_ 
+	|| (entry0.value_ == entry1.value_ 
+	    && entry0.row_number_ < entry1.row_number_);
+    }
+
+  bool operator()(const ColumnIndex::Entry& entry, double value) const
+    { return entry.value_ < value; }
+
+  bool operator()(double value, const ColumnIndex::Entry& entry) const
+    { return value < entry.value_; }
+};
+
+
 //----------------------------------------------------------------------
 
 class Buffer 
@@ -152,6 +249,37 @@ xread(int fd,
 }
 
 
+/* Read 'count' bytes at 'offset' in 'fd', without using or changing the
+   file position, so that several threads may read at once.  */
+
+inline void
+xpread(int fd,
+       void* buffer,
+       size_t count,
+       off64_t offset)
+  throw (FileError)
+{
+  ssize_t result = ::pread64(fd, buffer, count, offset);
+  if (result < 0)
+    throw FileError(strerror(errno));
+  if ((size_t) result != count)
+    throw FileError("unexpected end of file");
+}
+
+
+inline void
+xpwrite(int fd,
+	const void* buffer,
+	size_t count,
+	off64_t offset)
+  throw (FileError)
+{
+  ssize_t result = ::pwrite64(fd, buffer, count, offset);
+  if (result < 0 || (size_t) result != count)
+    throw FileError(strerror(errno));
+}
+
+
 inline void
 xseek(int fd,
       off64_t offset)
@@ -170,6 +298,44 @@ getMetadataPath(const std::string& path)
 }
 
 
+/* Return the value of column 'column_index' of 'schema' at 'data' as a
+   double.  */
+
+inline double
+getDoubleValue(const Schema* schema,
+	       int column_index,
+	       const char* data)
+{
+  const Column& column = schema->getColumn(column_index);
+  switch (column.getType()) {
+  case TYPE_BIT:
+    return (*((const uint8_t*) data) >> schema->getColumnBit(column_index)) 
+      & 1;
+  case TYPE_DICT_8:
+    return column.getDictionary()[*((const uint8_t*) data)];
+  case TYPE_FLOAT_16:
+    return decodeHalf(*((const uint16_t*) data));
+  case TYPE_FIXED_16:
+    return column.decodeFixed(*((const int16_t*) data));
+  case TYPE_FIXED_32:
+    return column.decodeFixed(*((const int32_t*) data));
+  case TYPE_BOOL:
+  case TYPE_INT_8:
+    return *((const int8_t*) data);
+  case TYPE_INT_16:
+    return *((const int16_t*) data);
+  case TYPE_INT_32:
+    return *((const int32_t*) data);
+  case TYPE_FLOAT_32:
+    return *((const float32_t*) data);
+  case TYPE_FLOAT_64:
+    return *((const float64_t*) data);
+  default:
+    abort();
+  }
+}
+
+
 size_t
 writeSchema(int fd, 
 	    const Schema* schema)
@@ -198,6 +364,27 @@ writeSchema(int fd,
 
     size_t offset = schema->getColumnOffset(c);
     written += xwrite(fd, &offset, sizeof(offset));
+
+    // Packed columns are followed by what's needed to decode them.
+    if (type == TYPE_BIT) {
+      int bit = schema->getColumnBit(c);
+      written += xwrite(fd, &bit, sizeof(int));
+    }
+    else if (type == TYPE_DICT_8) {
+      const std::vector<long>& dictionary = column.getDictionary();
+      int num_entries = dictionary.size();
+      written += xwrite(fd, &num_entries, sizeof(int));
+      for (int e = 0; e < num_entries; ++e) {
+	int64_t entry = dictionary[e];
+	written += xwrite(fd, &entry, sizeof(entry));
+      }
+    }
+    else if (type == TYPE_FIXED_16 || type == TYPE_FIXED_32) {
+      double scale = column.getScale();
+      double fixed_offset = column.getOffset();
+      written += xwrite(fd, &scale, sizeof(scale));
+      written += xwrite(fd, &fixed_offset, sizeof(fixed_offset));
+    }
   }
 
   return written;
@@ -230,50 +417,485 @@ readSchema(int fd)
     size_t offset;
     xread(fd, &offset, sizeof(offset));
 
-    schema->addColumn(Column(name, type), offset);
+    int bit = 0;
+    std::vector<long> dictionary;
+    if (type == TYPE_BIT) {
+      xread(fd, &bit, sizeof(int));
+      if (bit < 0 || bit > 7)
+	throw FileError("invalid bit column");
+    }
+    else if (type == TYPE_DICT_8) {
+      int num_entries;
+      xread(fd, &num_entries, sizeof(int));
+      if (num_entries < 0 || num_entries > 256)
+	throw FileError("invalid dictionary column");
+      for (int e = 0; e < num_entries; ++e) {
+	int64_t entry;
+	xread(fd, &entry, sizeof(entry));
+	dictionary.push_back(entry);
+      }
+    }
+    else if (type == TYPE_FIXED_16 || type == TYPE_FIXED_32) {
+      double scale;
+      double fixed_offset;
+      xread(fd, &scale, sizeof(scale));
+      xread(fd, &fixed_offset, sizeof(fixed_offset));
+      if (! (scale > 0))
+	throw FileError("invalid fixed-point column");
+      schema->addColumn(Column(name, type, scale, fixed_offset), offset);
+      continue;
+    }
+
+    schema->addColumn(Column(name, type, dictionary), offset, bit);
   }
 
   return schema;
 }
 
 
+/* Return a creation stamp for a new table.  */
+
+int64_t
+newCreationStamp()
+{
+  // Use the time in microseconds, but never the same stamp twice in
+  // this process.
+  static int64_t last_stamp = 0;
+  struct timeval now;
+  gettimeofday(&now, NULL);
+  int64_t stamp = (int64_t) now.tv_sec * 1000000 + now.tv_usec;
+  last_stamp = std::max(stamp, last_stamp + 1);
+  return last_stamp;
+}
+
+
+/* Remove files left next to 'path' by an earlier table at the same
+   path: the values of materialized columns, '<path>.<name>.column', and
+   cached selections, '<path>.<number>.cache'.  */
+
+void
+removeSidecarFiles(const std::string& path)
+{
+  std::vector<char> directory_buffer(path.begin(), path.end());
+  directory_buffer.push_back('\0');
+  std::string directory = dirname(&directory_buffer[0]);
+  std::vector<char> base_buffer(path.begin(), path.end());
+  base_buffer.push_back('\0');
+  std::string prefix = std::string(basename(&base_buffer[0])) + ".";
+
+  DIR* dir = opendir(directory.c_str());
+  if (dir == NULL)
+    return;
+  struct dirent* entry;
+  while ((entry = readdir(dir)) != NULL) {
+    std::string name = entry->d_name;
+    if (name.compare(0, prefix.size(), prefix) != 0)
+      continue;
+    // The part between the prefix and the suffix has no dots, so files
+    // of other tables whose names start with this one's aren't matched.
+    std::string::size_type dot = name.find('.', prefix.size());
+    if (dot == std::string::npos || dot == prefix.size())
+      continue;
+    std::string middle = name.substr(prefix.size(), dot - prefix.size());
+    std::string suffix = name.substr(dot);
+    if (suffix == ".column"
+	|| (suffix == ".cache" 
+	    && middle.find_first_not_of("0123456789") == std::string::npos))
+      ::unlink((directory + "/" + name).c_str());
+  }
+  closedir(dir);
+}
+
+
 }  // anonymous namespace
 
 
+//----------------------------------------------------------------------
+// class MappedWindow
+//----------------------------------------------------------------------
+
+MappedWindow::MappedWindow(int fd,
+			   off64_t offset,
+			   size_t length)
+  throw (FileError)
+  : offset_(offset),
+    length_(length),
+    ref_count_(1)
+{
+  void* address = ::mmap64(NULL, length, PROT_READ, MAP_SHARED, fd, offset);
+  if (address == MAP_FAILED)
+    throw FileError(strerror(errno));
+  address_ = (char*) address;
+}
+
+
+MappedWindow::~MappedWindow()
+{
+  int result = ::munmap(address_, length_);
+  assert(result == 0);
+}
+
+
+void
+MappedWindow::releaseReference()
+{
+  assert(ref_count_ > 0);
+  if (__sync_sub_and_fetch(&ref_count_, 1) == 0)
+    delete this;
+}
+
+
+//----------------------------------------------------------------------
+// class ReadAhead
+//----------------------------------------------------------------------
+
+ReadAhead::ReadAhead(int fd,
+		     off64_t first_row_offset,
+		     size_t row_size,
+		     int64_t num_rows,
+		     size_t block_size,
+		     int depth)
+  throw (FileError)
+  : fd_(fd),
+    first_row_offset_(first_row_offset),
+    row_size_(row_size),
+    rows_per_block_(std::max((size_t) 1, block_size / row_size)),
+    blocks_(depth),
+    num_rows_(num_rows),
+    start_row_(0),
+    head_(0),
+    tail_(0),
+    generation_(0),
+    stop_(false)
+{
+  assert(depth > 0);
+  for (int b = 0; b < depth; ++b)
+    blocks_[b].data_.resize(rows_per_block_ * row_size_);
+  memset(&statistics_, 0, sizeof(statistics_));
+
+  pthread_mutex_init(&mutex_, NULL);
+  pthread_cond_init(&filled_, NULL);
+  pthread_cond_init(&freed_, NULL);
+
+  // Start the read-ahead thread with all signals blocked, so that
+  // signals are delivered to the other threads.
+  sigset_t all_signals;
+  sigset_t old_signals;
+  sigfillset(&all_signals);
+  pthread_sigmask(SIG_SETMASK, &all_signals, &old_signals);
+  int result = pthread_create(&thread_, NULL, run, this);
+  pthread_sigmask(SIG_SETMASK, &old_signals, NULL);
+  if (result != 0) {
+    pthread_cond_destroy(&freed_);
+    pthread_cond_destroy(&filled_);
+    pthread_mutex_destroy(&mutex_);
+    throw FileError(strerror(result));
+  }
+}
+
+
+ReadAhead::~ReadAhead()
+{
+  {
+    MutexLock lock(&mutex_);
+    stop_ = true;
+    pthread_cond_broadcast(&freed_);
+  }
+  pthread_join(thread_, NULL);
+
+  pthread_cond_destroy(&freed_);
+  pthread_cond_destroy(&filled_);
+  pthread_mutex_destroy(&mutex_);
+}
+
+
+ReadAhead::Statistics
+ReadAhead::getStatistics()
+  const
+{
+  MutexLock lock(&mutex_);
+  return statistics_;
+}
+
+
+void
+ReadAhead::setNumRows(int64_t num_rows)
+{
+  MutexLock lock(&mutex_);
+  num_rows_ = num_rows;
+  pthread_cond_broadcast(&freed_);
+}
+
+
+const char*
+ReadAhead::getRows(int64_t row_number,
+		   int64_t& count)
+  throw (FileError)
+{
+  MutexLock lock(&mutex_);
+  assert(row_number >= 0 && row_number < num_rows_);
+
+  for (;;) {
+    // Find the block containing the row.  
+    int64_t block = (row_number - start_row_) / rows_per_block_;
+    if (row_number < start_row_ || block < head_ || block > tail_) {
+      // The row isn't in a block that's been read or is being read.
+      restart(row_number);
+      block = 0;
+    }
+    else if (block > head_) {
+      // Discard the blocks before this one, so they can be reused.
+      head_ = block;
+      pthread_cond_broadcast(&freed_);
+    }
+
+    // Wait for the block to be read.
+    if (tail_ <= block) {
+      ++statistics_.waits_;
+      while (tail_ <= block)
+	pthread_cond_wait(&filled_, &mutex_);
+    }
+
+    Block& data = blocks_[block % blocks_.size()];
+    if (! data.error_.empty()) {
+      std::string error = data.error_;
+      // Try again next time.
+      restart(row_number);
+      throw FileError(error);
+    }
+    int64_t index = row_number - (start_row_ + block * rows_per_block_);
+    if (index < data.num_rows_) {
+      count = data.num_rows_ - index;
+      return &data.data_[index * row_size_];
+    }
+    // The block was read when the table had fewer rows.
+    restart(row_number);
+  }
+}
+
+
+void*
+ReadAhead::run(void* read_ahead)
+{
+  ((ReadAhead*) read_ahead)->fill();
+  return NULL;
+}
+
+
+void
+ReadAhead::fill()
+{
+  MutexLock lock(&mutex_);
+  int depth = blocks_.size();
+
+  while (! stop_) {
+    int64_t first_row = start_row_ + tail_ * rows_per_block_;
+    if (tail_ - head_ >= depth || first_row >= num_rows_) {
+      // No room for another block, or no more rows to read.
+      pthread_cond_wait(&freed_, &mutex_);
+      continue;
+    }
+
+    Block& block = blocks_[tail_ % depth];
+    int generation = generation_;
+    int64_t num_rows = std::min(rows_per_block_, num_rows_ - first_row);
+    size_t size = num_rows * row_size_;
+
+    // Read the block without holding the lock.  Rows are only used from
+    // blocks before 'tail_', so this one is not in use.
+    pthread_mutex_unlock(&mutex_);
+    ssize_t result = ::pread64(fd_, &block.data_[0], size, 
+			       first_row_offset_ + first_row * row_size_);
+    std::string error;
+    if (result < 0)
+      error = strerror(errno);
+    else if ((size_t) result != size)
+      error = "unexpected end of file";
+    pthread_mutex_lock(&mutex_);
+
+    if (generation == generation_) {
+      block.num_rows_ = num_rows;
+      block.error_ = error;
+      ++tail_;
+      ++statistics_.blocks_;
+      statistics_.bytes_ += size;
+      pthread_cond_broadcast(&filled_);
+    }
+    // Otherwise, reading restarted while the block was read; discard it.
+  }
+}
+
+
+void
+ReadAhead::restart(int64_t row_number)
+{
+  start_row_ = row_number;
+  head_ = 0;
+  tail_ = 0;
+  ++generation_;
+  ++statistics_.restarts_;
+  pthread_cond_broadcast(&freed_);
+}
+
+
 //----------------------------------------------------------------------
 // class Row
 //----------------------------------------------------------------------
 
 Row::Row(const Schema* schema)
-  : schema_(schema)
+  : schema_(schema),
+    data_(NULL),
+    window_(NULL),
+    deferred_table_(NULL),
+    deferred_row_(-1)
 {
   assert(schema_ != 0);
-  data_ = new char[schema_->getSize()];
 }
 
 
 Row::~Row()
 {
-  delete [] data_;
+  if (window_ != NULL)
+    window_->releaseReference();
+  else
+    delete [] data_;
+}
+
+
+char*
+Row::getBuffer()
+  const
+{
+  // The caller will fill the entire buffer.
+  deferred_table_ = NULL;
+  if (window_ != NULL) {
+    // The data is in a mapped window, which we may not write into.
+    // Detach from it.
+    window_->releaseReference();
+    window_ = NULL;
+    data_ = NULL;
+  }
+  if (data_ == NULL)
+    data_ = new char[schema_->getSize()];
+  return data_;
+}
+
+
+const char*
+Row::getData()
+  const
+{
+  if (deferred_table_ != NULL)
+    readAllDeferred();
+  return data_ != NULL ? data_ : getBuffer();
+}
+
+
+void
+Row::setMappedData(MappedWindow* window,
+		   char* data)
+{
+  deferred_table_ = NULL;
+  window->addReference();
+  if (window_ != NULL)
+    window_->releaseReference();
+  else
+    delete [] data_;
+  window_ = window;
+  data_ = data;
+}
+
+
+void
+Row::setDeferred(Table* table,
+		 int64_t row_number,
+		 const std::vector<bool>& present)
+{
+  assert(window_ == NULL && data_ != NULL);
+  assert((int) present.size() == schema_->getNumColumns());
+
+  // If every column is present, there's nothing to defer.
+  if (std::find(present.begin(), present.end(), false) == present.end()) {
+    deferred_table_ = NULL;
+    return;
+  }
+
+  deferred_table_ = table;
+  deferred_row_ = row_number;
+  present_ = present;
+}
+
+
+const char*
+Row::getValueData(int column_index)
+  const
+{
+  if (deferred_table_ != NULL && ! present_[column_index])
+    readDeferred(column_index);
+  const char* data = (data_ != NULL) ? data_ : getBuffer();
+  return data + schema_->getColumnOffset(column_index);
+}
+
+
+void
+Row::readDeferred(int column_index)
+  const
+{
+  assert(deferred_table_ != NULL);
+  size_t offset = schema_->getColumnOffset(column_index);
+  deferred_table_->readValue(deferred_row_, column_index, data_ + offset);
+  present_[column_index] = true;
+}
+
+
+void
+Row::readAllDeferred()
+  const
+{
+  int num_columns = schema_->getNumColumns();
+  for (int c = 0; c < num_columns; ++c)
+    if (! present_[c])
+      readDeferred(c);
+  deferred_table_ = NULL;
 }
 
 
 #define ROW_GET(TYPE, OFFSET) \
-  (*((TYPE*) (data_ + (OFFSET))))
+  (*((const TYPE*) (data + (OFFSET))))
 
 Value
 Row::getValue(const int column_index)
   const
   throw (WrongColumnType)
 {
-  ColumnType type = schema_->getColumn(column_index).getType();
+  if (deferred_table_ != NULL && ! present_[column_index])
+    readDeferred(column_index);
+  const char* data = (data_ != NULL) ? data_ : getBuffer();
+
+  const Column& column = schema_->getColumn(column_index);
   size_t offset = schema_->getColumnOffset(column_index);
-  switch (type) {
+  switch (column.getType()) {
   case TYPE_NONE:
     abort();
 
   case TYPE_BOOL:
     return Value::make((bool) ROW_GET(int8_t, offset));
+
+  case TYPE_BIT:
+    return Value::make((bool) ((ROW_GET(uint8_t, offset) 
+				>> schema_->getColumnBit(column_index)) & 1));
+
+  case TYPE_DICT_8:
+    return Value::make(column.getDictionary()[ROW_GET(uint8_t, offset)]);
+
+  case TYPE_FLOAT_16:
+    return Value::make((double) decodeHalf(ROW_GET(uint16_t, offset)));
+
+  case TYPE_FIXED_16:
+    return Value::make(column.decodeFixed(ROW_GET(int16_t, offset)));
+
+  case TYPE_FIXED_32:
+    return Value::make(column.decodeFixed(ROW_GET(int32_t, offset)));
 		       
   case TYPE_INT_8:
     return Value::make((long) ROW_GET(int8_t, offset));
@@ -296,6 +918,10 @@ Row::getValue(const int column_index)
   case TYPE_COMPLEX_128: 
     return Value::make((std::complex<double>) ROW_GET(complex128_t, offset));
 
+  case TYPE_JAGGED:
+    // The values aren't in the row.
+    throw WrongColumnType();
+
   default:
     abort();
   }
@@ -303,7 +929,7 @@ Row::getValue(const int column_index)
 
 
 #define ROW_SET(TYPE, OFFSET, VALUE) \
-  *((TYPE*) (data_ + (OFFSET))) = ((TYPE) (VALUE))
+  *((TYPE*) (data + (OFFSET))) = ((TYPE) (VALUE))
 
 void
 Row::setValue(const int column_index,
@@ -311,15 +937,57 @@ Row::setValue(const int column_index,
 {
   assert(column_index >= 0 && column_index < schema_->getNumColumns());
 
-  ColumnType type = schema_->getColumn(column_index).getType();
+  if (deferred_table_ != NULL)
+    // Fill in the rest of the row before modifying it.
+    readAllDeferred();
+  if (window_ != NULL) {
+    // The row's data is in a mapped window, which we may not write
+    // into.  Copy it to a buffer of our own first.
+    char* buffer = new char[schema_->getSize()];
+    memcpy(buffer, data_, schema_->getSize());
+    window_->releaseReference();
+    window_ = NULL;
+    data_ = buffer;
+  }
+  char* data = getBuffer();
+
+  const Column& column = schema_->getColumn(column_index);
   size_t offset = schema_->getColumnOffset(column_index);
-  switch (type) {
+  switch (column.getType()) {
   case TYPE_NONE:
     abort();
 
   case TYPE_BOOL:
     ROW_SET(int8_t, offset, value.as_bool());
     break;
+
+  case TYPE_BIT: {
+    uint8_t mask = 1 << schema_->getColumnBit(column_index);
+    uint8_t bits = ROW_GET(uint8_t, offset);
+    ROW_SET(uint8_t, offset, value.as_bool() ? bits | mask : bits & ~mask);
+    break;
+  }
+
+  case TYPE_DICT_8: {
+    // The caller checks that the value is in the dictionary.
+    int index = column.findInDictionary(value.as_long());
+    assert(index >= 0);
+    ROW_SET(uint8_t, offset, index);
+    break;
+  }
+
+  case TYPE_FLOAT_16:
+    ROW_SET(uint16_t, offset, encodeHalf(value.as_double()));
+    break;
+
+  // The caller checks that fixed-point values are in range.
+  case TYPE_FIXED_16:
+    ROW_SET(int16_t, offset, column.encodeFixed(value.as_double()));
+    break;
+
+  case TYPE_FIXED_32:
+    ROW_SET(int32_t, offset, column.encodeFixed(value.as_double()));
+    break;
 		       
   case TYPE_INT_8:
     ROW_SET(int8_t, offset, value.as_long());
@@ -383,6 +1051,8 @@ Schema::whichColumn(const std::string& name)
 //----------------------------------------------------------------------
 
 AutoSchema::AutoSchema()
+  : bits_offset_(0),
+    num_bits_(8)
 {
 }
 
@@ -395,69 +1065,487 @@ AutoSchema::~AutoSchema()
 void
 AutoSchema::addColumn(const Column& column)
 {
-  ColumnRecord record = { column, size_ };
+  if (column.getType() == TYPE_BIT) {
+    // Pack the bit into the byte of the last bit column, if it has
+    // room.
+    if (num_bits_ == 8) {
+      bits_offset_ = size_++;
+      num_bits_ = 0;
+    }
+    ColumnRecord record = { column, bits_offset_, num_bits_++ };
+    columns_.push_back(record);
+    return;
+  }
+
+  ColumnRecord record = { column, size_, 0 };
   columns_.push_back(record);
   size_ += getTypeSize(column.getType());
 }
 
 
 //----------------------------------------------------------------------
-// class Table
+// class ZoneMap
 //----------------------------------------------------------------------
 
-Table::~Table()
+const int64_t
+ZoneMap::block_size;
+
+
+ZoneMap::ZoneMap(const Schema* schema)
+  : schema_(schema),
+    num_rows_(0),
+    current_(true)
 {
+  // Summarize all columns except complex ones, which aren't ordered,
+  // and jagged ones, which have no single value.
+  int num_columns = schema_->getNumColumns();
+  positions_.resize(num_columns, -1);
+  for (int c = 0; c < num_columns; ++c) {
+    ColumnType type = schema_->getColumn(c).getType();
+    if (type != TYPE_COMPLEX_64 && type != TYPE_COMPLEX_128
+	&& type != TYPE_JAGGED) {
+      positions_[c] = columns_.size();
+      columns_.push_back(c);
+    }
+  }
 }
 
 
-//----------------------------------------------------------------------
-// class FileTable
-//----------------------------------------------------------------------
-
-FileTable*
-FileTable::create(const Schema* schema,
-		  const std::string& path,
-		  mode_t mode)
+void
+ZoneMap::update(int64_t row_number,
+		const char* data)
 {
-  // Create the file.
-  int fd = ::open64(path.c_str(), 
-		    O_RDWR | O_CREAT | O_TRUNC | O_LARGEFILE, mode);
-  if (fd < 0)
-    throw FileError(strerror(errno));
+  if (row_number != num_rows_)
+    // We've missed some rows.  Stop here.
+    current_ = false;
+  if (! current_ || columns_.size() == 0)
+    return;
 
-  // Skip forward to leave enough room for the header, then write the
-  // schema.
-  xseek(fd, sizeof(FileFormatHeader));
-  off64_t schema_size = writeSchema(fd, schema);
+  int num_columns = columns_.size();
+  int64_t block = num_rows_++ / block_size;
+  if (block * num_columns == (int64_t) minima_.size()) {
+    // Start a new block.
+    minima_.resize(minima_.size() + num_columns, HUGE_VAL);
+    maxima_.resize(maxima_.size() + num_columns, -HUGE_VAL);
+  }
 
-  // Construct the header info, now that we know how large the schema
-  // is.
-  FileFormatHeader header;
-  header.magic_number_ = file_format_magic_number;
-  header.version_number_ = file_format_version_number;
-  header.num_rows_ = 0;
-  header.first_row_offset_ = sizeof(FileFormatHeader) + schema_size;
+  double* minima = &minima_[block * num_columns];
+  double* maxima = &maxima_[block * num_columns];
+  for (int i = 0; i < num_columns; ++i) {
+    int c = columns_[i];
+    double x = getDoubleValue(schema_, c, 
+			      data + schema_->getColumnOffset(c));
+    // NaNs fail every comparison, so they needn't be summarized.
+    if (x < minima[i])
+      minima[i] = x;
+    if (x > maxima[i])
+      maxima[i] = x;
+  }
+}
 
-  // Write the header at the beginning of the file.
-  xseek(fd, 0);
-  xwrite(fd, &header, sizeof(header));
 
-  // Close the file.
-  close(fd);
+bool
+ZoneMap::excludes(int64_t block,
+		  const std::vector<Bound>& bounds) const
+{
+  if (block < 0 || block * block_size >= num_rows_)
+    return false;
 
-  // If there is a metadata file for this path, remove it.
-  std::string metadata_path = getMetadataPath(path);
-  if (::access(metadata_path.c_str(), X_OK))
+  int num_columns = columns_.size();
+  std::vector<Bound>::const_iterator iter;
+  for (iter = bounds.begin(); iter != bounds.end(); ++iter) {
+    int position = positions_[iter->column_index_];
+    if (position == -1)
+      continue;
+    double min = minima_[block * num_columns + position];
+    double max = maxima_[block * num_columns + position];
+    if (min > max)
+      // The block contains only NaNs.
+      return true;
+    if (max < iter->low_ || (max == iter->low_ && ! iter->low_inclusive_))
+      return true;
+    if (min > iter->high_ 
+	|| (min == iter->high_ && ! iter->high_inclusive_))
+      return true;
+  }
+
+  return false;
+}
+
+
+std::string
+ZoneMap::serialize()
+  const
+{
+  int num_columns = columns_.size();
+  std::string result;
+  result.append((const char*) &num_rows_, sizeof(num_rows_));
+  result.append((const char*) &num_columns, sizeof(num_columns));
+  if (num_columns > 0) {
+    result.append((const char*) &columns_[0], num_columns * sizeof(int));
+    if (minima_.size() > 0) {
+      size_t size = minima_.size() * sizeof(double);
+      result.append((const char*) &minima_[0], size);
+      result.append((const char*) &maxima_[0], size);
+    }
+  }
+  return result;
+}
+
+
+bool
+ZoneMap::deserialize(const std::string& data,
+		     int64_t num_rows)
+{
+  const char* pointer = data.data();
+  const char* end = pointer + data.length();
+
+  // Check the number of rows and the summarized columns.
+  int64_t data_num_rows;
+  int num_columns;
+  if ((size_t) (end - pointer) < sizeof(data_num_rows) + sizeof(int))
+    return false;
+  memcpy(&data_num_rows, pointer, sizeof(data_num_rows));
+  pointer += sizeof(data_num_rows);
+  memcpy(&num_columns, pointer, sizeof(int));
+  pointer += sizeof(int);
+  if (data_num_rows < 0 || data_num_rows > num_rows
+      || num_columns != (int) columns_.size()
+      || (size_t) (end - pointer) < num_columns * sizeof(int))
+    return false;
+  for (int i = 0; i < num_columns; ++i) {
+    int c;
+    memcpy(&c, pointer, sizeof(int));
+    pointer += sizeof(int);
+    if (c != columns_[i])
+      return false;
+  }
+
+  // Read the summaries.
+  int64_t num_blocks = (data_num_rows + block_size - 1) / block_size;
+  if (num_columns == 0)
+    num_blocks = 0;
+  size_t size = num_blocks * num_columns;
+  if ((size_t) (end - pointer) != 2 * size * sizeof(double))
+    return false;
+  minima_.resize(size);
+  maxima_.resize(size);
+  if (size > 0) {
+    memcpy(&minima_[0], pointer, size * sizeof(double));
+    memcpy(&maxima_[0], pointer + size * sizeof(double), 
+	   size * sizeof(double));
+  }
+  num_rows_ = data_num_rows;
+  // If the table has rows that aren't summarized, stop here.
+  current_ = num_rows_ == num_rows;
+  return true;
+}
+
+
+//----------------------------------------------------------------------
+// class ColumnIndex
+//----------------------------------------------------------------------
+
+std::string
+ColumnIndex::getPath(const std::string& table_path,
+		     const std::string& column_name)
+{
+  return table_path + "." + column_name + ".index";
+}
+
+
+void
+ColumnIndex::create(Table* table,
+		    int column_index,
+		    const std::string& path)
+{
+  const Schema* schema = table->getSchema();
+  ColumnType type = schema->getColumn(column_index).getType();
+  assert(type != TYPE_COMPLEX_64 && type != TYPE_COMPLEX_128
+	 && type != TYPE_JAGGED);
+  size_t size = getTypeSize(type);
+  int64_t num_rows = table->getNumRows();
+
+  // Read the column's values a block at a time, and build an entry for
+  // each, except NaNs.
+  std::vector<Entry> entries;
+  entries.reserve(num_rows);
+  int64_t block_rows = read_block_size / size;
+  Buffer block(block_rows * size);
+  std::vector<int> columns(1, column_index);
+  std::vector<char*> buffers(1, block.pointer_);
+  for (int64_t r0 = 0; r0 < num_rows; r0 += block_rows) {
+    int64_t count = std::min(block_rows, num_rows - r0);
+    table->readColumns(columns, r0, count, buffers);
+    for (int64_t r = 0; r < count; ++r) {
+      Entry entry;
+      entry.value_ = 
+	getDoubleValue(schema, column_index, block.pointer_ + r * size);
+      entry.row_number_ = r0 + r;
+      if (entry.value_ == entry.value_)
+	entries.push_back(entry);
+    }
+  }
+  std::sort(entries.begin(), entries.end(), EntryLess());
+
+  // Write the index file.
+  int fd = ::open64(path.c_str(), 
+		    O_WRONLY | O_CREAT | O_TRUNC | O_LARGEFILE, 0666);
+  if (fd < 0)
+    throw FileError(strerror(errno));
+  IndexFileHeader header;
+  header.magic_number_ = index_file_magic_number;
+  header.version_number_ = index_file_version_number;
+  header.column_index_ = column_index;
+  header.column_type_ = type;
+  header.num_rows_ = num_rows;
+  header.num_entries_ = entries.size();
+  try {
+    xwrite(fd, &header, sizeof(header));
+    if (entries.size() > 0)
+      xwrite(fd, &entries[0], entries.size() * sizeof(Entry));
+  }
+  catch (FileError) {
+    ::close(fd);
+    ::unlink(path.c_str());
+    throw;
+  }
+  ::close(fd);
+}
+
+
+ColumnIndex::ColumnIndex(const std::string& path)
+  throw (FileError)
+  : window_(NULL)
+{
+  int fd = ::open64(path.c_str(), O_RDONLY | O_LARGEFILE);
+  if (fd < 0)
+    throw FileError(strerror(errno));
+
+  try {
+    // Read and check the header.
+    IndexFileHeader header;
+    xread(fd, &header, sizeof(header));
+    if (header.magic_number_ != index_file_magic_number)
+      throw FileError("wrong file format");
+    if (header.version_number_ != index_file_version_number)
+      throw FileError("wrong file format version");
+    column_index_ = header.column_index_;
+    column_type_ = (ColumnType) header.column_type_;
+    num_rows_ = header.num_rows_;
+    num_entries_ = header.num_entries_;
+
+    // Map the entries.
+    off64_t size = sizeof(header) + num_entries_ * sizeof(Entry);
+    struct stat64 file_info;
+    if (::fstat64(fd, &file_info) != 0 || file_info.st_size != size)
+      throw FileError("index file is truncated");
+    window_ = new MappedWindow(fd, 0, size);
+    entries_ = (const Entry*) window_->getAddress(sizeof(header));
+  }
+  catch (FileError) {
+    ::close(fd);
+    throw;
+  }
+  // The mapping remains after the file is closed.
+  ::close(fd);
+}
+
+
+ColumnIndex::~ColumnIndex()
+{
+  window_->releaseReference();
+}
+
+
+int64_t
+ColumnIndex::count(const Bound& bound)
+  const
+{
+  const Entry* begin;
+  const Entry* end;
+  findEntries(bound, begin, end);
+  return end - begin;
+}
+
+
+void
+ColumnIndex::find(const Bound& bound,
+		  std::vector<int64_t>& rows)
+  const
+{
+  const Entry* begin;
+  const Entry* end;
+  findEntries(bound, begin, end);
+  size_t first = rows.size();
+  for (const Entry* entry = begin; entry != end; ++entry)
+    rows.push_back(entry->row_number_);
+  std::sort(rows.begin() + first, rows.end());
+}
+
+
+void
+ColumnIndex::findEntries(const Bound& bound,
+			 const Entry*& begin,
+			 const Entry*& end)
+  const
+{
+  const Entry* first = entries_;
+  const Entry* last = entries_ + num_entries_;
+  if (bound.low_inclusive_)
+    begin = std::lower_bound(first, last, bound.low_, EntryLess());
+  else
+    begin = std::upper_bound(first, last, bound.low_, EntryLess());
+  if (bound.high_inclusive_)
+    end = std::upper_bound(begin, last, bound.high_, EntryLess());
+  else
+    end = std::lower_bound(begin, last, bound.high_, EntryLess());
+}
+
+
+//----------------------------------------------------------------------
+// class Table
+//----------------------------------------------------------------------
+
+Table::~Table()
+{
+}
+
+
+void
+Table::readValue(int64_t row_number,
+		 int column_index,
+		 char* buffer)
+{
+  Row row(schema_);
+  read(row_number, &row);
+  size_t offset = schema_->getColumnOffset(column_index);
+  size_t size = getTypeSize(schema_->getColumn(column_index).getType());
+  memcpy(buffer, row.getData() + offset, size);
+}
+
+
+void
+Table::readColumns(const std::vector<int>& columns,
+		   int64_t start,
+		   int64_t count,
+		   const std::vector<char*>& buffers)
+{
+  assert(columns.size() == buffers.size());
+  int num_columns = columns.size();
+  Row row(schema_);
+  for (int64_t r = 0; r < count; ++r) {
+    read(start + r, &row);
+    for (int i = 0; i < num_columns; ++i) {
+      size_t size = getTypeSize(schema_->getColumn(columns[i]).getType());
+      memcpy(buffers[i] + r * size, row.getValueData(columns[i]), size);
+    }
+  }
+}
+
+
+int64_t
+Table::appendJagged(int column_index,
+		    const double* values,
+		    int32_t count)
+{
+  throw FileError("table cannot store jagged values");
+}
+
+
+void
+Table::readJagged(int column_index,
+		  int64_t start,
+		  int32_t count,
+		  double* values)
+{
+  throw FileError("table cannot store jagged values");
+}
+
+
+void
+Table::createIndex(int column_index)
+{
+  throw FileError("table cannot be indexed");
+}
+
+
+//----------------------------------------------------------------------
+// class FileTable
+//----------------------------------------------------------------------
+
+FileTable*
+FileTable::create(const Schema* schema,
+		  const std::string& path,
+		  mode_t mode,
+		  Layout layout)
+{
+  // Create the file.
+  int fd = ::open64(path.c_str(), 
+		    O_RDWR | O_CREAT | O_TRUNC | O_LARGEFILE, mode);
+  if (fd < 0)
+    throw FileError(strerror(errno));
+
+  // Skip forward to leave enough room for the header.  A columnar
+  // table's header is followed by the number of rows per group.
+  off64_t header_size = sizeof(FileFormatHeader);
+  xseek(fd, header_size);
+  if (layout == LAYOUT_COLUMNS) 
+    header_size += xwrite(fd, &default_rows_per_group, sizeof(int));
+  // Write the schema.
+  off64_t schema_size = writeSchema(fd, schema);
+
+  // Construct the header info, now that we know how large the schema
+  // is.
+  FileFormatHeader header;
+  header.magic_number_ = (layout == LAYOUT_COLUMNS) 
+    ? columnar_file_format_magic_number : file_format_magic_number;
+  header.version_number_ = file_format_version_number;
+  header.num_rows_ = 0;
+  header.first_row_offset_ = header_size + schema_size;
+  header.creation_stamp_ = newCreationStamp();
+  header.metadata_len_ = 0;
+
+  // Write the header at the beginning of the file.
+  xseek(fd, 0);
+  xwrite(fd, &header, sizeof(header));
+
+  // Close the file.
+  close(fd);
+
+  // If there is a metadata file for this path, remove it.
+  std::string metadata_path = getMetadataPath(path);
+  if (::access(metadata_path.c_str(), X_OK))
     ::unlink(metadata_path.c_str());
+  // Remove indices of columns with the same names, too.
+  for (int c = 0; c < schema->getNumColumns(); ++c) 
+    ::unlink(ColumnIndex::getPath(path, schema->getColumn(c).getName())
+	     .c_str());
+  // Materialized values and caches of the earlier table don't belong to
+  // this one.
+  removeSidecarFiles(path);
+  // Create empty values files for jagged columns.
+  for (int c = 0; c < schema->getNumColumns(); ++c) 
+    if (schema->getColumn(c).getType() == TYPE_JAGGED) {
+      std::string values_path = 
+	getJaggedPath(path, schema->getColumn(c).getName());
+      int values_fd = ::open64(values_path.c_str(), 
+			       O_WRONLY | O_CREAT | O_TRUNC | O_LARGEFILE, 
+			       mode);
+      if (values_fd < 0)
+	throw FileError(strerror(errno));
+      close(values_fd);
+    }
 
   // Now open the newly-created table in the usual way.
-  return new FileTable(path, O_RDWR);
+  return open(path, "w");
 }
 
 
 FileTable*
 FileTable::open(const std::string& path,
-		const std::string& mode)
+		const std::string& mode,
+		bool use_mmap)
 {
   int flags;
   if (mode == "r") 
@@ -467,32 +1555,53 @@ FileTable::open(const std::string& path,
   else
     throw FileError("unknown mode");
 
-  return new FileTable(path, flags);
+  // Peek at the magic number to determine the table's layout.
+  int fd = ::open64(path.c_str(), O_RDONLY | O_LARGEFILE);
+  if (fd < 0)
+    throw FileError(strerror(errno));
+  int magic_number;
+  ssize_t result = ::read(fd, &magic_number, sizeof(magic_number));
+  ::close(fd);
+  if (result != sizeof(magic_number))
+    throw FileError("wrong file format");
+
+  if (magic_number == columnar_file_format_magic_number)
+    return new ColumnarFileTable(path, flags);
+  else
+    return new FileTable(path, flags, use_mmap);
 }
 
 
 FileTable::~FileTable()
 {
-  if (isWritable()) {
-    // Build the header.
-    FileFormatHeader header;
-    header.magic_number_ = file_format_magic_number;
-    header.version_number_ = file_format_version_number;
-    header.num_rows_ = num_rows_;
-    header.first_row_offset_ = first_row_offset_;
+  // Stop reading ahead before closing the file.
+  read_ahead_.reset();
+  if (window_ != NULL)
+    window_->releaseReference();
+  for (unsigned c = 0; c < indices_.size(); ++c)
+    delete indices_[c];
 
-    // Write the header.
-    xseek(fd_, 0);
-    xwrite(fd_, &header, sizeof(header));
+  if (isWritable()) {
+    // Write buffered rows and the header.
+    flush();
 
     int result = fsync(fd_);
     if (result != 0)
       throw FileError(strerror(errno));
+    for (unsigned c = 0; c < jagged_.size(); ++c)
+      if (jagged_[c].fd_ >= 0 && fsync(jagged_[c].fd_) != 0)
+	throw FileError(strerror(errno));
   }
 
   int result;
+  for (unsigned c = 0; c < jagged_.size(); ++c)
+    if (jagged_[c].fd_ >= 0) {
+      result = close(jagged_[c].fd_);
+      assert(result == 0);
+    }
   result = close(fd_);
   assert(result == 0);
+  pthread_mutex_destroy(&mutex_);
 }
 
 
@@ -501,11 +1610,29 @@ FileTable::read(int64_t row_number,
 		Row* row)
 {
   assert(row->getSchema() == this->getSchema());
+  MutexLock lock(&mutex_);
   assert(row_number >= 0 && row_number < num_rows_);
 
   off64_t offset = first_row_offset_ + row_number * row_size_;
-  xseek(fd_, offset);
-  xread(fd_, row->getBuffer(), row_size_);
+  if (row_number >= num_written_rows_) 
+    // The row hasn't been written yet.  Copy it from the write buffer.
+    memcpy(row->getBuffer(), 
+	   &write_buffer_[(row_number - num_written_rows_) * row_size_],
+	   row_size_);
+  else if (use_mmap_) {
+    // Point the row into the mapped file, mapping a new window if the
+    // row isn't in the current one.
+    if (window_ == NULL || ! window_->contains(offset, row_size_))
+      mapWindow(offset);
+    row->setMappedData(window_, window_->getAddress(offset));
+  }
+  else if (read_ahead_.get() != NULL) {
+    int64_t count;
+    memcpy(row->getBuffer(), read_ahead_->getRows(row_number, count),
+	   row_size_);
+  }
+  else
+    xpread(fd_, row->getBuffer(), row_size_, offset);
 }
 
 
@@ -513,20 +1640,234 @@ int
 FileTable::append(const Row* row)
 {
   assert(row->getSchema() == this->getSchema());
+  MutexLock lock(&mutex_);
 
   if (! isWritable())
     throw NotWritable();
 
-  int64_t row_number = num_rows_;
-  off64_t offset = first_row_offset_ + row_number * row_size_;
-  xseek(fd_, offset);
-  xwrite(fd_, row->getBuffer(), row_size_);
+  // Add the row to the write buffer.
+  const char* data = row->getData();
+  write_buffer_.insert(write_buffer_.end(), data, data + row_size_);
+  int64_t row_number = num_rows_++;
+  zone_map_->update(row_number, data);
+
+  // Write the buffered rows when the buffer is full.
+  if ((off64_t) write_buffer_.size() >= write_buffer_size) 
+    flush();
 
-  ++num_rows_;
   return row_number;
 }
 
 
+int64_t
+FileTable::appendJagged(int column_index,
+			const double* values,
+			int32_t count)
+{
+  assert(schema_->getColumn(column_index).getType() == TYPE_JAGGED);
+  MutexLock lock(&mutex_);
+
+  if (! isWritable())
+    throw NotWritable();
+
+  JaggedValues& jagged = jagged_[column_index];
+  int64_t start = jagged.num_written_ + jagged.buffer_.size();
+  jagged.buffer_.insert(jagged.buffer_.end(), values, values + count);
+  if (jagged.buffer_.size() >= jagged_buffer_size)
+    writeJagged();
+
+  return start;
+}
+
+
+void
+FileTable::readJagged(int column_index,
+		      int64_t start,
+		      int32_t count,
+		      double* values)
+{
+  assert(schema_->getColumn(column_index).getType() == TYPE_JAGGED);
+  MutexLock lock(&mutex_);
+
+  const JaggedValues& jagged = jagged_[column_index];
+  assert(start >= 0 
+	 && start + count <= jagged.num_written_ 
+	                     + (int64_t) jagged.buffer_.size());
+  // Read values that have been written from the file, and the rest from
+  // the buffer.
+  int64_t num_written = std::max((int64_t) 0, std::min
+				 ((int64_t) count, jagged.num_written_ - start));
+  if (num_written > 0)
+    xpread(jagged.fd_, values, num_written * sizeof(double), 
+	   start * sizeof(double));
+  if (num_written < count)
+    memcpy(values + num_written,
+	   &jagged.buffer_[start + num_written - jagged.num_written_],
+	   (count - num_written) * sizeof(double));
+}
+
+
+void
+FileTable::writeJagged()
+{
+  MutexLock lock(&mutex_);
+
+  for (unsigned c = 0; c < jagged_.size(); ++c) {
+    JaggedValues& jagged = jagged_[c];
+    if (jagged.buffer_.size() > 0) {
+      xpwrite(jagged.fd_, &jagged.buffer_[0], 
+	      jagged.buffer_.size() * sizeof(double),
+	      jagged.num_written_ * sizeof(double));
+      jagged.num_written_ += jagged.buffer_.size();
+      jagged.buffer_.clear();
+    }
+  }
+}
+
+
+void
+FileTable::flush()
+{
+  if (! isWritable())
+    return;
+  MutexLock lock(&mutex_);
+
+  // Write jagged values before the rows that refer to them.
+  writeJagged();
+  if (write_buffer_.size() > 0) {
+    xpwrite(fd_, &write_buffer_[0], write_buffer_.size(),
+	    first_row_offset_ + num_written_rows_ * row_size_);
+    write_buffer_.clear();
+    num_written_rows_ = num_rows_;
+    if (read_ahead_.get() != NULL)
+      read_ahead_->setNumRows(num_written_rows_);
+  }
+  writeHeader();
+}
+
+
+void
+FileTable::writeHeader()
+{
+  FileFormatHeader header;
+  header.magic_number_ = (layout_ == LAYOUT_COLUMNS)
+    ? columnar_file_format_magic_number : file_format_magic_number;
+  header.version_number_ = file_format_version_number;
+  header.num_rows_ = num_rows_;
+  header.first_row_offset_ = first_row_offset_;
+  header.creation_stamp_ = creation_stamp_;
+  header.metadata_len_ = 0;
+
+  xpwrite(fd_, &header, sizeof(header), 0);
+}
+
+
+void
+FileTable::readColumns(const std::vector<int>& columns,
+		       int64_t start,
+		       int64_t count,
+		       const std::vector<char*>& buffers)
+{
+  assert(columns.size() == buffers.size());
+  assert(start >= 0 && start + count <= num_rows_);
+  MutexLock lock(&mutex_);
+
+  // Make sure all the rows are in the file.
+  if (start + count > num_written_rows_)
+    flush();
+
+  int num_columns = columns.size();
+  std::vector<size_t> offsets(num_columns);
+  std::vector<size_t> sizes(num_columns);
+  for (int i = 0; i < num_columns; ++i) {
+    offsets[i] = schema_->getColumnOffset(columns[i]);
+    sizes[i] = getTypeSize(schema_->getColumn(columns[i]).getType());
+  }
+
+  // Read blocks of many rows at a time, and extract the columns' values
+  // from each.  If reading ahead, use the blocks already read instead.
+  int64_t block_rows = std::max((off64_t) 1, read_block_size / row_size_);
+  Buffer block(read_ahead_.get() != NULL ? 0 : block_rows * row_size_);
+  int64_t num_rows;
+  for (int64_t r0 = 0; r0 < count; r0 += num_rows) {
+    const char* rows;
+    if (read_ahead_.get() != NULL) {
+      rows = read_ahead_->getRows(start + r0, num_rows);
+      num_rows = std::min(num_rows, count - r0);
+    }
+    else {
+      num_rows = std::min(block_rows, count - r0);
+      xpread(fd_, block.pointer_, num_rows * row_size_,
+	     first_row_offset_ + (start + r0) * row_size_);
+      rows = block.pointer_;
+    }
+    for (int i = 0; i < num_columns; ++i) {
+      size_t size = sizes[i];
+      const char* source = rows + offsets[i];
+      char* destination = buffers[i] + r0 * size;
+      for (int64_t r = 0; r < num_rows; ++r) {
+	memcpy(destination, source, size);
+	source += row_size_;
+	destination += size;
+      }
+    }
+  }
+}
+
+
+void
+FileTable::createIndex(int column_index)
+{
+  MutexLock lock(&mutex_);
+  const Column& column = schema_->getColumn(column_index);
+  ColumnIndex::create(this, column_index, 
+		      ColumnIndex::getPath(path_, column.getName()));
+  // Discard the old index, if it's open.
+  delete indices_[column_index];
+  indices_[column_index] = NULL;
+}
+
+
+void
+FileTable::setReadAhead(size_t block_size,
+			int depth)
+{
+  MutexLock lock(&mutex_);
+  read_ahead_.reset();
+  if (depth > 0 && layout_ == LAYOUT_ROWS && ! use_mmap_)
+    read_ahead_.reset(new ReadAhead(fd_, first_row_offset_, row_size_, 
+				    num_written_rows_, block_size, depth));
+}
+
+
+ColumnIndex*
+FileTable::getIndex(int column_index)
+{
+  MutexLock lock(&mutex_);
+  if (indices_[column_index] == NULL) {
+    const Column& column = schema_->getColumn(column_index);
+    std::string path = ColumnIndex::getPath(path_, column.getName());
+    if (::access(path.c_str(), R_OK) != 0)
+      // No index.
+      return NULL;
+    std::auto_ptr<ColumnIndex> index;
+    try {
+      index.reset(new ColumnIndex(path));
+    }
+    catch (FileError) {
+      return NULL;
+    }
+    // Ignore the index if it doesn't match the table.
+    if (index->getColumnIndex() != column_index
+	|| index->getColumnType() != column.getType()
+	|| index->getNumRows() > num_rows_)
+      return NULL;
+    indices_[column_index] = index.release();
+  }
+  return indices_[column_index];
+}
+
+
 std::string
 FileTable::getMetadata()
   const
@@ -591,14 +1932,25 @@ FileTable::setMetadata(const std::string& data)
 
 
 FileTable::FileTable(const std::string& path,
-		     int flags)
+		     int flags,
+		     bool use_mmap)
   : Table(NULL, flags == O_RDWR),
-    path_(path)
+    rows_per_group_(0),
+    path_(path),
+    layout_(LAYOUT_ROWS),
+    use_mmap_(use_mmap),
+    window_(NULL)
 {
   if (flags != O_RDWR && flags != O_RDONLY)
     // Invalid flags.
     assert(false);
 
+  pthread_mutexattr_t attributes;
+  pthread_mutexattr_init(&attributes);
+  pthread_mutexattr_settype(&attributes, PTHREAD_MUTEX_RECURSIVE);
+  pthread_mutex_init(&mutex_, &attributes);
+  pthread_mutexattr_destroy(&attributes);
+
   // Open the file.
   fd_ = ::open64(path.c_str(), flags | O_LARGEFILE);
   if (fd_ < 0) {
@@ -610,7 +1962,13 @@ FileTable::FileTable(const std::string& path,
   xread(fd_, &header, sizeof(header));
 
   // Check the magic numbers.
-  if (header.magic_number_ != file_format_magic_number)
+  if (header.magic_number_ == columnar_file_format_magic_number) {
+    layout_ = LAYOUT_COLUMNS;
+    xread(fd_, &rows_per_group_, sizeof(int));
+    if (rows_per_group_ <= 0)
+      throw FileError("invalid row group size");
+  }
+  else if (header.magic_number_ != file_format_magic_number)
     throw FileError("wrong file format");
   if (header.version_number_ != file_format_version_number)
     throw FileError("wrong file format version");
@@ -618,15 +1976,609 @@ FileTable::FileTable(const std::string& path,
   // Extract other info from the header.
   num_rows_ = header.num_rows_;
   assert(num_rows_ >= 0);
+  num_written_rows_ = num_rows_;
   first_row_offset_ = header.first_row_offset_;
+  creation_stamp_ = header.creation_stamp_;
 
   // Read the schema.
   schema_ = readSchema(fd_);
   assert(schema_ != NULL);
   row_size_ = schema_->getSize();
+
+  zone_map_.reset(new ZoneMap(schema_));
+  indices_.resize(schema_->getNumColumns(), NULL);
+
+  // Open the values files of jagged columns.
+  int num_columns = schema_->getNumColumns();
+  jagged_.resize(num_columns);
+  for (int c = 0; c < num_columns; ++c) {
+    JaggedValues& jagged = jagged_[c];
+    jagged.fd_ = -1;
+    jagged.num_written_ = 0;
+    if (schema_->getColumn(c).getType() != TYPE_JAGGED)
+      continue;
+    std::string values_path = 
+      getJaggedPath(path, schema_->getColumn(c).getName());
+    jagged.fd_ = ::open64(values_path.c_str(), flags | O_LARGEFILE);
+    if (jagged.fd_ < 0)
+      throw FileError(strerror(errno));
+    struct stat64 file_info;
+    if (::fstat64(jagged.fd_, &file_info) != 0)
+      throw FileError(strerror(errno));
+    jagged.num_written_ = file_info.st_size / sizeof(double);
+  }
+}
+
+
+void
+FileTable::mapWindow(off64_t offset)
+{
+  // Release the previous window.  Rows still pointing into it keep it
+  // mapped until they are done with it.
+  if (window_ != NULL) {
+    window_->releaseReference();
+    window_ = NULL;
+  }
+
+  // Windows are normally aligned to the window size.  If the row
+  // straddles the end of the aligned window, start the window at the
+  // page containing the row instead.
+  off64_t start = (offset / mmap_window_size) * mmap_window_size;
+  if (offset + row_size_ > start + (off64_t) mmap_window_size) {
+    off64_t page_size = ::sysconf(_SC_PAGESIZE);
+    start = (offset / page_size) * page_size;
+  }
+
+  // Map only as far as the last row currently in the table.  If the
+  // table grows, rows past the end of the window cause a new mapping.
+  off64_t end = first_row_offset_ + num_written_rows_ * row_size_;
+  off64_t limit = std::max(start + (off64_t) mmap_window_size, 
+			   offset + row_size_);
+  if (end > limit)
+    end = limit;
+  assert(offset + row_size_ <= end);
+
+  window_ = new MappedWindow(fd_, start, end - start);
 }
 
 
+//----------------------------------------------------------------------
+// class ColumnarFileTable
+//----------------------------------------------------------------------
+
+ColumnarFileTable::ColumnarFileTable(const std::string& path,
+				     int flags)
+  : FileTable(path, flags)
+{
+  int num_columns = schema_->getNumColumns();
+  chunks_.resize(num_columns);
+  for (int c = 0; c < num_columns; ++c)
+    chunks_[c].group_ = -1;
+  projection_.resize(num_columns, false);
+
+  if (isWritable()) {
+    // Buffer the last row group, reading the rows already in it.
+    group_buffer_.resize(rows_per_group_ * row_size_, 0);
+    if (num_rows_ % rows_per_group_ != 0) {
+      xpread(fd_, &group_buffer_[0], group_buffer_.size(),
+	     getGroupOffset(num_rows_ / rows_per_group_));
+    }
+  }
+}
+
+
+ColumnarFileTable::~ColumnarFileTable()
+{
+  flush();
+}
+
+
+void
+ColumnarFileTable::read(int64_t row_number,
+			Row* row)
+{
+  assert(row->getSchema() == this->getSchema());
+  assert(row_number >= 0 && row_number < num_rows_);
+  MutexLock lock(&mutex_);
+
+  // Read the projected columns, and defer the rest.
+  char* buffer = row->getBuffer();
+  int num_projected = projected_columns_.size();
+  for (int i = 0; i < num_projected; ++i) {
+    int c = projected_columns_[i];
+    memcpy(buffer + schema_->getColumnOffset(c), 
+	   getValueAddress(row_number, c),
+	   getTypeSize(schema_->getColumn(c).getType()));
+  }
+  row->setDeferred(this, row_number, projection_);
+}
+
+
+int
+ColumnarFileTable::append(const Row* row)
+{
+  assert(row->getSchema() == this->getSchema());
+
+  if (! isWritable())
+    throw NotWritable();
+  MutexLock lock(&mutex_);
+
+  // Scatter the row's values into the buffered row group.
+  const char* data = row->getData();
+  int index = num_rows_ % rows_per_group_;
+  int num_columns = schema_->getNumColumns();
+  for (int c = 0; c < num_columns; ++c) {
+    size_t offset = schema_->getColumnOffset(c);
+    size_t size = getTypeSize(schema_->getColumn(c).getType());
+    memcpy(&group_buffer_[rows_per_group_ * offset + index * size],
+	   data + offset, size);
+  }
+
+  int64_t row_number = num_rows_++;
+  zone_map_->update(row_number, data);
+  // If the group is full, write it.
+  if (index == rows_per_group_ - 1) {
+    writeGroup();
+    writeHeader();
+    std::fill(group_buffer_.begin(), group_buffer_.end(), 0);
+  }
+
+  return row_number;
+}
+
+
+void
+ColumnarFileTable::flush()
+{
+  if (! isWritable())
+    return;
+  MutexLock lock(&mutex_);
+
+  // Write the last row group, if it has any rows in it.
+  writeJagged();
+  if (num_rows_ % rows_per_group_ != 0)
+    writeGroup();
+  writeHeader();
+}
+
+
+void
+ColumnarFileTable::readValue(int64_t row_number,
+			     int column_index,
+			     char* buffer)
+{
+  MutexLock lock(&mutex_);
+  memcpy(buffer, getValueAddress(row_number, column_index),
+	 getTypeSize(schema_->getColumn(column_index).getType()));
+}
+
+
+void
+ColumnarFileTable::readColumns(const std::vector<int>& columns,
+			       int64_t start,
+			       int64_t count,
+			       const std::vector<char*>& buffers)
+{
+  assert(columns.size() == buffers.size());
+  assert(start >= 0 && start + count <= num_rows_);
+  MutexLock lock(&mutex_);
+
+  // Within a row group, each column's values are already contiguous, so
+  // copy them a group at a time.
+  int num_columns = columns.size();
+  for (int i = 0; i < num_columns; ++i) {
+    size_t size = getTypeSize(schema_->getColumn(columns[i]).getType());
+    int64_t r = start;
+    while (r < start + count) {
+      int64_t group_end = (r / rows_per_group_ + 1) * rows_per_group_;
+      int64_t num_rows = std::min(group_end, start + count) - r;
+      memcpy(buffers[i] + (r - start) * size, 
+	     getValueAddress(r, columns[i]), num_rows * size);
+      r += num_rows;
+    }
+  }
+}
+
+
+void
+ColumnarFileTable::addProjectedColumn(int column_index)
+{
+  MutexLock lock(&mutex_);
+  if (! projection_[column_index]) {
+    projection_[column_index] = true;
+    projected_columns_.push_back(column_index);
+  }
+}
+
+
+const char*
+ColumnarFileTable::getValueAddress(int64_t row_number,
+				   int column_index)
+{
+  int64_t group = row_number / rows_per_group_;
+  int index = row_number % rows_per_group_;
+  size_t size = getTypeSize(schema_->getColumn(column_index).getType());
+
+  // Rows in the buffered group haven't necessarily been written yet.
+  if (isWritable() && group == num_rows_ / rows_per_group_) 
+    return &group_buffer_[rows_per_group_ 
+			  * schema_->getColumnOffset(column_index)
+			  + index * size];
+
+  Chunk& chunk = chunks_[column_index];
+  if (chunk.group_ != group) {
+    // Read this column's values for the group.  The last group may not
+    // be full.
+    int64_t num_rows = 
+      std::min((int64_t) rows_per_group_, num_rows_ - group * rows_per_group_);
+    chunk.data_.resize(rows_per_group_ * size);
+    xpread(fd_, &chunk.data_[0], num_rows * size, 
+	   getChunkOffset(group, column_index));
+    chunk.group_ = group;
+  }
+  return &chunk.data_[index * size];
+}
+
+
+off64_t
+ColumnarFileTable::getChunkOffset(int64_t group,
+				  int column_index)
+  const
+{
+  // A group stores all values of each column together, in the same
+  // order as the columns in a row.
+  return getGroupOffset(group) 
+    + rows_per_group_ * schema_->getColumnOffset(column_index);
+}
+
+
+void
+ColumnarFileTable::writeGroup()
+{
+  // The group to write is the one containing the last row.
+  int64_t group = (num_rows_ - 1) / rows_per_group_;
+  xpwrite(fd_, &group_buffer_[0], group_buffer_.size(), 
+	  getGroupOffset(group));
+}
+
+
+//----------------------------------------------------------------------
+// external sort
+//----------------------------------------------------------------------
+
+namespace {
+
+/* The size of the buffer through which each run is read when runs are
+   merged.  The number of runs merged at once is limited so that all
+   the buffers fit in the sort's memory limit.  */
+const size_t
+merge_buffer_size = 256 * 1024;
+
+
+/* A column by which rows are sorted.  */
+
+struct SortKey
+{
+  int column_index_;
+  size_t offset_;
+};
+
+
+/* Orders row records by the values of their key columns.  NaNs are
+   ordered after all other values.  */
+
+class RecordLess
+{
+public:
+
+  RecordLess(const Schema* schema,
+	     const std::vector<SortKey>& keys) 
+    : schema_(schema), keys_(keys) {}
+
+  bool operator()(const char* record0, const char* record1) const
+  {
+    for (std::vector<SortKey>::const_iterator key = keys_.begin();
+	 key != keys_.end(); ++key) {
+      double value0 = 
+	getDoubleValue(schema_, key->column_index_, record0 + key->offset_);
+      double value1 = 
+	getDoubleValue(schema_, key->column_index_, record1 + key->offset_);
+      if (value0 < value1 || (value0 == value0 && value1 != value1))
+	return true;
+      if (value1 < value0 || (value1 == value1 && value0 != value0))
+	return false;
+    }
+    return false;
+  }
+
+private:
+
+  const Schema* schema_;
+  const std::vector<SortKey>& keys_;
+
+};
+
+
+/* A destination for sorted row records.  */
+
+class RecordSink
+{
+public:
+
+  virtual ~RecordSink() {}
+  virtual void put(const char* record) = 0;
+
+};
+
+
+/* Appends records to a table.  */
+
+class TableSink
+  : public RecordSink
+{
+public:
+
+  TableSink(Table* source,
+	    Table* table) 
+    : source_(source),
+      table_(table), 
+      row_(table->getSchema()), 
+      record_size_(table->getSchema()->getSize()) 
+    {
+      const Schema* schema = table->getSchema();
+      for (int c = 0; c < schema->getNumColumns(); ++c)
+	if (schema->getColumn(c).getType() == TYPE_JAGGED)
+	  jagged_columns_.push_back(c);
+    }
+
+  virtual void put(const char* record)
+  {
+    char* buffer = row_.getBuffer();
+    memcpy(buffer, record, record_size_);
+    // Jagged values are copied from the source table.
+    const Schema* schema = table_->getSchema();
+    for (std::vector<int>::const_iterator c = jagged_columns_.begin();
+	 c != jagged_columns_.end(); ++c) {
+      size_t offset = schema->getColumnOffset(*c);
+      copyJagged(source_, *c, record + offset, table_, *c, buffer + offset);
+    }
+    table_->append(&row_);
+  }
+
+private:
+
+  Table* source_;
+  Table* table_;
+  std::vector<int> jagged_columns_;
+  Row row_;
+  size_t record_size_;
+
+};
+
+
+/* A temporary file containing a run of sorted records.
+
+   The records are written, and then read back in order, a buffer at a
+   time.  The file is removed when the run is deleted.  */
+
+class SortRun
+  : public RecordSink
+{
+public:
+
+  SortRun(const std::string& path, size_t record_size) throw (FileError);
+  virtual ~SortRun();
+
+  virtual void put(const char* record);
+
+  /* Finish writing records, and start reading them from the first,
+     'buffer_size' bytes at a time.  */
+  void rewind(size_t buffer_size);
+
+  /* Return the current record, or NULL after the last.  */
+  const char* current() const
+    { return current_; }
+
+  /* Advance to the next record.  */
+  void next();
+
+private:
+
+  void flush();
+  void fill();
+
+  const std::string path_;
+  const size_t record_size_;
+  int fd_;
+  std::vector<char> buffer_;
+  /* The number of bytes of records in the buffer.  */
+  size_t used_;
+  /* The offset in the buffer of the current record.  */
+  size_t position_;
+  /* The offset in the file of the buffer.  */
+  off64_t offset_;
+  /* The size of the records written to the file.  */
+  off64_t size_;
+  const char* current_;
+
+};
+
+
+SortRun::SortRun(const std::string& path,
+		 size_t record_size)
+  throw (FileError)
+  : path_(path),
+    record_size_(record_size),
+    buffer_(std::max(record_size, 
+		     merge_buffer_size / record_size * record_size)),
+    used_(0),
+    position_(0),
+    offset_(0),
+    size_(0),
+    current_(NULL)
+{
+  fd_ = ::open64(path.c_str(), 
+		 O_RDWR | O_CREAT | O_TRUNC | O_LARGEFILE, 0600);
+  if (fd_ < 0)
+    throw FileError(strerror(errno));
+}
+
+
+SortRun::~SortRun()
+{
+  ::close(fd_);
+  ::unlink(path_.c_str());
+}
+
+
+void
+SortRun::put(const char* record)
+{
+  if (used_ + record_size_ > buffer_.size())
+    flush();
+  memcpy(&buffer_[used_], record, record_size_);
+  used_ += record_size_;
+}
+
+
+void
+SortRun::flush()
+{
+  if (used_ > 0) {
+    xpwrite(fd_, &buffer_[0], used_, size_);
+    size_ += used_;
+    used_ = 0;
+  }
+}
+
+
+void
+SortRun::rewind(size_t buffer_size)
+{
+  flush();
+  std::vector<char>
+    (std::max(record_size_, buffer_size / record_size_ * record_size_))
+    .swap(buffer_);
+  offset_ = 0;
+  used_ = 0;
+  fill();
+}
+
+
+void
+SortRun::next()
+{
+  position_ += record_size_;
+  if (position_ < used_)
+    current_ = &buffer_[position_];
+  else
+    fill();
+}
+
+
+void
+SortRun::fill()
+{
+  offset_ += used_;
+  used_ = std::min((off64_t) buffer_.size(), size_ - offset_);
+  position_ = 0;
+  if (used_ == 0)
+    current_ = NULL;
+  else {
+    xpread(fd_, &buffer_[0], used_, offset_);
+    current_ = &buffer_[0];
+  }
+}
+
+
+/* Orders runs by their current records, and runs with equal records by
+   their positions, so that merging them is stable.  For use in a
+   'priority_queue', the order is reversed.  */
+
+class RunGreater
+{
+public:
+
+  RunGreater(const RecordLess& less, const std::vector<SortRun*>& runs)
+    : less_(less), runs_(runs) {}
+
+  bool operator()(int run0, int run1) const
+  {
+    const char* record0 = runs_[run0]->current();
+    const char* record1 = runs_[run1]->current();
+    if (less_(record1, record0))
+      return true;
+    if (less_(record0, record1))
+      return false;
+    return run0 > run1;
+  }
+
+private:
+
+  const RecordLess& less_;
+  const std::vector<SortRun*>& runs_;
+
+};
+
+
+/* Merge the records of 'runs', in order, into 'sink'.  */
+
+void
+mergeRuns(const std::vector<SortRun*>& runs,
+	  size_t buffer_size,
+	  const RecordLess& less,
+	  RecordSink& sink)
+{
+  std::priority_queue<int, std::vector<int>, RunGreater> 
+    queue(RunGreater(less, runs));
+  int num_runs = runs.size();
+  for (int r = 0; r < num_runs; ++r) {
+    runs[r]->rewind(buffer_size);
+    if (runs[r]->current() != NULL)
+      queue.push(r);
+  }
+  while (! queue.empty()) {
+    int r = queue.top();
+    queue.pop();
+    sink.put(runs[r]->current());
+    runs[r]->next();
+    if (runs[r]->current() != NULL)
+      queue.push(r);
+  }
+}
+
+
+/* A sequence of runs, which are deleted with it.  */
+
+class RunList
+{
+public:
+
+  ~RunList() 
+  {
+    for (std::vector<SortRun*>::iterator i = runs_.begin(); 
+	 i != runs_.end(); ++i)
+      delete *i;
+  }
+
+  std::vector<SortRun*> runs_;
+
+};
+
+
+inline std::string
+getRunPath(const std::string& temp_path,
+	   int number)
+{
+  char suffix[32];
+  sprintf(suffix, ".%d", number);
+  return temp_path + suffix;
+}
+
+
+}  // anonymous namespace
+
+
 //----------------------------------------------------------------------
 // function definitions
 //----------------------------------------------------------------------
@@ -661,6 +2613,268 @@ getTypeByName(const char* name)
 }
 
 
+std::string
+getJaggedPath(const std::string& table_path,
+	      const std::string& column_name)
+{
+  return table_path + "." + column_name + ".values";
+}
+
+
+void
+copyJagged(Table* source,
+	   int source_column,
+	   const char* source_data,
+	   Table* target,
+	   int target_column,
+	   char* target_data)
+{
+  JaggedRef ref = getJaggedRef(source_data);
+  std::vector<double> values(ref.count_);
+  if (ref.count_ > 0)
+    source->readJagged(source_column, ref.start_, ref.count_, &values[0]);
+  ref.start_ = target->appendJagged
+    (target_column, ref.count_ > 0 ? &values[0] : NULL, ref.count_);
+  setJaggedRef(target_data, ref);
+}
+
+
+ColumnType
+getValueType(ColumnType type)
+{
+  switch (type) {
+  case TYPE_BIT:
+    return TYPE_BOOL;
+  case TYPE_DICT_8:
+    return TYPE_INT_32;
+  case TYPE_FLOAT_16:
+    return TYPE_FLOAT_32;
+  case TYPE_FIXED_16:
+  case TYPE_FIXED_32:
+    return TYPE_FLOAT_64;
+  default:
+    return type;
+  }
+}
+
+
+void
+decodeColumn(const Schema* schema,
+	     int column_index,
+	     const char* data,
+	     int64_t count,
+	     char* values)
+{
+  const uint8_t* stored = (const uint8_t*) data;
+  const Column& column = schema->getColumn(column_index);
+  switch (column.getType()) {
+  case TYPE_BIT: {
+    int bit = schema->getColumnBit(column_index);
+    int8_t* bools = (int8_t*) values;
+    for (int64_t r = 0; r < count; ++r)
+      bools[r] = (stored[r] >> bit) & 1;
+    break;
+  }
+
+  case TYPE_DICT_8: {
+    const std::vector<long>& dictionary = column.getDictionary();
+    int32_t* longs = (int32_t*) values;
+    for (int64_t r = 0; r < count; ++r)
+      longs[r] = dictionary[stored[r]];
+    break;
+  }
+
+  case TYPE_FLOAT_16: {
+    const uint16_t* halves = (const uint16_t*) data;
+    float32_t* floats = (float32_t*) values;
+    for (int64_t r = 0; r < count; ++r)
+      floats[r] = decodeHalf(halves[r]);
+    break;
+  }
+
+  case TYPE_FIXED_16: {
+    const int16_t* integers = (const int16_t*) data;
+    float64_t* doubles = (float64_t*) values;
+    for (int64_t r = 0; r < count; ++r)
+      doubles[r] = column.decodeFixed(integers[r]);
+    break;
+  }
+
+  case TYPE_FIXED_32: {
+    const int32_t* integers = (const int32_t*) data;
+    float64_t* doubles = (float64_t*) values;
+    for (int64_t r = 0; r < count; ++r)
+      doubles[r] = column.decodeFixed(integers[r]);
+    break;
+  }
+
+  default:
+    memcpy(values, data, count * getTypeSize(column.getType()));
+  }
+}
+
+
+uint16_t
+encodeHalf(float value)
+{
+  uint32_t bits;
+  memcpy(&bits, &value, sizeof(bits));
+  uint16_t sign = (bits >> 16) & 0x8000;
+  int exponent = (bits >> 23) & 0xff;
+  uint32_t mantissa = bits & 0x7fffff;
+
+  if (exponent == 0xff)
+    // Infinity stays infinity, and NaN stays NaN.
+    return sign | 0x7c00 | (mantissa != 0 ? 0x200 : 0);
+
+  // Rebias the exponent.
+  int half_exponent = exponent - 127 + 15;
+  if (half_exponent >= 0x1f)
+    // Too large.
+    return sign | 0x7c00;
+
+  if (half_exponent <= 0) {
+    // The value is subnormal at half precision, or rounds to zero.
+    if (half_exponent < -10)
+      return sign;
+    mantissa |= 0x800000;
+    int shift = 14 - half_exponent;
+    uint32_t half = mantissa >> shift;
+    uint32_t rest = mantissa & ((1 << shift) - 1);
+    uint32_t halfway = 1 << (shift - 1);
+    if (rest > halfway || (rest == halfway && (half & 1)))
+      ++half;
+    return sign | half;
+  }
+
+  // Drop the low 13 bits of the mantissa, rounding.  A carry out of the
+  // mantissa increments the exponent, as it should, and may overflow to
+  // infinity.
+  uint32_t half = (half_exponent << 10) | (mantissa >> 13);
+  uint32_t rest = mantissa & 0x1fff;
+  if (rest > 0x1000 || (rest == 0x1000 && (half & 1)))
+    ++half;
+  return sign | half;
+}
+
+
+float
+decodeHalf(uint16_t half)
+{
+  uint32_t sign = (uint32_t) (half & 0x8000) << 16;
+  int exponent = (half >> 10) & 0x1f;
+  uint32_t mantissa = half & 0x3ff;
+
+  uint32_t bits;
+  if (exponent == 0x1f)
+    // Infinity or NaN.
+    bits = sign | 0x7f800000 | (mantissa << 13);
+  else if (exponent != 0)
+    bits = sign | ((exponent - 15 + 127) << 23) | (mantissa << 13);
+  else {
+    // Zero or subnormal.
+    float value = ldexp((float) mantissa, -24);
+    return sign ? -value : value;
+  }
+
+  float value;
+  memcpy(&value, &bits, sizeof(value));
+  return value;
+}
+
+
+void
+sortTable(Table* source,
+	  Table* target,
+	  const std::vector<int>& key_columns,
+	  size_t memory_limit,
+	  const std::string& temp_path)
+  throw (FileError)
+{
+  const Schema* schema = source->getSchema();
+  size_t record_size = schema->getSize();
+  std::vector<SortKey> keys;
+  for (std::vector<int>::const_iterator c = key_columns.begin();
+       c != key_columns.end(); ++c) {
+    SortKey key;
+    ColumnType type = schema->getColumn(*c).getType();
+    assert(type != TYPE_COMPLEX_64 && type != TYPE_COMPLEX_128
+	   && type != TYPE_JAGGED);
+    key.column_index_ = *c;
+    key.offset_ = schema->getColumnOffset(*c);
+    keys.push_back(key);
+  }
+  RecordLess less(schema, keys);
+  int64_t num_rows = source->getNumRows();
+
+  // Sort as many rows at once as fit in memory, along with a pointer to
+  // each, and write each run of sorted rows to a file.  If all the rows
+  // fit, write them to the target directly.
+  int64_t run_rows = 
+    std::max((int64_t) 1, 
+	     (int64_t) (memory_limit / (record_size + sizeof(char*))));
+  run_rows = std::min(run_rows, std::max(num_rows, (int64_t) 1));
+  RunList runs;
+  {
+    std::vector<char> records(run_rows * record_size);
+    std::vector<const char*> order(run_rows);
+    Row row(schema);
+    for (int64_t start = 0; start < num_rows; start += run_rows) {
+      int64_t count = std::min(run_rows, num_rows - start);
+      for (int64_t r = 0; r < count; ++r) {
+	source->read(start + r, &row);
+	order[r] = &records[r * record_size];
+	memcpy(&records[r * record_size], row.getData(), record_size);
+      }
+      std::stable_sort(order.begin(), order.begin() + count, less);
+
+      std::auto_ptr<TableSink> table_sink;
+      RecordSink* sink;
+      if (count == num_rows) {
+	table_sink.reset(new TableSink(source, target));
+	sink = table_sink.get();
+      }
+      else {
+	SortRun* run = 
+	  new SortRun(getRunPath(temp_path, runs.runs_.size()), record_size);
+	runs.runs_.push_back(run);
+	sink = run;
+      }
+      for (int64_t r = 0; r < count; ++r)
+	sink->put(order[r]);
+    }
+  }
+  if (runs.runs_.size() == 0)
+    return;
+
+  // Merge as many runs at once as there are buffers for, until there
+  // are few enough runs to merge into the target.
+  size_t fan_in = std::max((size_t) 2, memory_limit / merge_buffer_size);
+  size_t buffer_size = std::max(record_size, memory_limit / (fan_in + 1));
+  int num_runs = runs.runs_.size();
+  while (runs.runs_.size() > fan_in) {
+    RunList merged;
+    for (size_t r0 = 0; r0 < runs.runs_.size(); r0 += fan_in) {
+      size_t r1 = std::min(r0 + fan_in, runs.runs_.size());
+      std::vector<SortRun*> group(runs.runs_.begin() + r0, 
+				  runs.runs_.begin() + r1);
+      SortRun* run = 
+	new SortRun(getRunPath(temp_path, num_runs++), record_size);
+      merged.runs_.push_back(run);
+      mergeRuns(group, buffer_size, less, *run);
+      // Remove the merged runs now, to save space.
+      for (size_t r = r0; r < r1; ++r) {
+	delete runs.runs_[r];
+	runs.runs_[r] = NULL;
+      }
+    }
+    runs.runs_.swap(merged.runs_);
+  }
+  TableSink sink(source, target);
+  mergeRuns(runs.runs_, buffer_size, less, sink);
+}
+
+
 //----------------------------------------------------------------------
 
 }  // namespace Tables
@@ -15,7 +15,12 @@
 // includes
 //----------------------------------------------------------------------
 
+#include <algorithm>
+#include <cmath>
+#include <cstring>
 #include <fcntl.h>
+#include <memory>
+#include <pthread.h>
 #include <string>
 #include <sys/types.h>
 #include <unistd.h>
@@ -104,10 +109,37 @@ enum ColumnType
   TYPE_FLOAT_64,
   TYPE_COMPLEX_64,
   TYPE_COMPLEX_128,
+  /* A boolean stored as one bit.  Consecutive bit columns share the
+     bytes of a row.  */
+  TYPE_BIT,
+  /* An integer stored as an 8-bit index into the column's dictionary.  */
+  TYPE_DICT_8,
+  /* A variable-length list of float64 values.  The row stores where
+     the row's values are in the column's values file; see
+     'JaggedRef'.  */
+  TYPE_JAGGED,
+  /* A float stored as an IEEE 754 half-precision value.  */
+  TYPE_FLOAT_16,
+  /* A float stored as a 16- or 32-bit integer, the number of multiples
+     of the column's scale by which the value exceeds its offset.  */
+  TYPE_FIXED_16,
+  TYPE_FIXED_32,
   TYPE_LAST
 };
 
 
+/* The arrangement of table data in a file.  */
+
+enum Layout
+{
+  /* Each row's column values are stored together.  */
+  LAYOUT_ROWS,
+  /* Rows are stored in groups of a fixed number of rows.  In each
+     group, values of each column are stored together.  */
+  LAYOUT_COLUMNS
+};
+
+
 //----------------------------------------------------------------------
 
 #if 0
@@ -201,6 +233,38 @@ getColumnType<double>()
 #endif
 
 
+//----------------------------------------------------------------------
+
+/* The location of a row's values of a 'TYPE_JAGGED' column: 'count_'
+   values starting at value 'start_' in the column's values file.  The
+   row stores 'start_' as an int64 followed by 'count_' as an int32.  */
+
+struct JaggedRef
+{
+  int64_t start_;
+  int32_t count_;
+};
+
+
+inline JaggedRef
+getJaggedRef(const char* data)
+{
+  JaggedRef ref;
+  memcpy(&ref.start_, data, sizeof(int64_t));
+  memcpy(&ref.count_, data + sizeof(int64_t), sizeof(int32_t));
+  return ref;
+}
+
+
+inline void
+setJaggedRef(char* data,
+	     const JaggedRef& ref)
+{
+  memcpy(data, &ref.start_, sizeof(int64_t));
+  memcpy(data + sizeof(int64_t), &ref.count_, sizeof(int32_t));
+}
+
+
 //----------------------------------------------------------------------
 
 class Column
@@ -208,15 +272,43 @@ class Column
 public:
 
   Column(const std::string& name, const ColumnType type);
+  Column(const std::string& name, const ColumnType type,
+	 const std::vector<long>& dictionary);
+  Column(const std::string& name, const ColumnType type,
+	 double scale, double offset);
   Column(const Column& column);
 
   const std::string& getName() const;
   ColumnType getType() const;
 
+  /* For 'TYPE_DICT_8' columns, the values that may be stored, indexed
+     by the stored value.  */
+  const std::vector<long>& getDictionary() const;
+
+  /* Return the index of 'value' in the dictionary, or -1 if it's not
+     there.  */
+  int findInDictionary(long value) const;
+
+  /* For 'TYPE_FIXED_16' and 'TYPE_FIXED_32' columns, the value
+     represented by stored integer 0, and the difference between the
+     values represented by successive integers.  */
+  double getOffset() const;
+  double getScale() const;
+
+  /* Return the value represented by stored integer 'stored'.  */
+  double decodeFixed(long stored) const;
+
+  /* Return the integer, as a double, that represents 'value' most
+     closely.  It may be out of range of the stored integers.  */
+  double encodeFixed(double value) const;
+
 private:
 
   std::string name_;
   ColumnType type_;
+  std::vector<long> dictionary_;
+  double scale_;
+  double offset_;
 
 };
 
@@ -234,6 +326,9 @@ public:
   int whichColumn(const std::string& name) const throw (NoColumn);
   const Column& getColumn(int column_index) const;
   size_t getColumnOffset(int column_index) const;
+  /* For 'TYPE_BIT' columns, the bit within the byte at the column's
+     offset that holds the value.  */
+  int getColumnBit(int column_index) const;
 
   size_t getSize() const;
 
@@ -243,6 +338,7 @@ protected:
   {
     Column column_;
     size_t offset_;
+    int bit_;
   };
 
   std::vector<ColumnRecord> columns_;
@@ -259,7 +355,7 @@ public:
   CustomSchema(size_t size=0);
   virtual ~CustomSchema();
 
-  void addColumn(const Column& column, size_t offset);
+  void addColumn(const Column& column, size_t offset, int bit=0);
 
 };
 
@@ -274,6 +370,13 @@ public:
 
   void addColumn(const Column& column);
 
+private:
+
+  /* The offset of the byte holding the last bit column added, and the
+     number of its bits that are used.  */
+  size_t bits_offset_;
+  int num_bits_;
+
 };
 
 
@@ -303,6 +406,325 @@ private:
 #endif
 
 
+/* A region of a table file mapped into memory.
+
+   A window is reference-counted.  The table that mapped it holds one
+   reference while it is the table's current window, and each 'Row'
+   whose buffer points into the window holds another.  The mapping is
+   removed when the last reference is released.  References may be
+   added and released from different threads.  */
+
+class MappedWindow
+{
+public:
+
+  MappedWindow(int fd, off64_t offset, size_t length) throw (FileError);
+
+  void addReference()
+    { __sync_add_and_fetch(&ref_count_, 1); }
+  void releaseReference();
+
+  /* Return true if the window contains 'length' bytes at 'offset'.  */
+  bool contains(off64_t offset, size_t length) const
+    { return offset >= offset_ && offset + length <= offset_ + length_; }
+
+  /* Return the address at which file 'offset' is mapped.  */
+  char* getAddress(off64_t offset) const
+    { return address_ + (offset - offset_); }
+
+private:
+
+  ~MappedWindow();
+
+  char* address_;
+  off64_t offset_;
+  size_t length_;
+  int ref_count_;
+
+};
+
+
+/* Holds a mutex while in scope.  */
+
+class MutexLock
+{
+public:
+
+  MutexLock(pthread_mutex_t* mutex) : mutex_(mutex)
+    { pthread_mutex_lock(mutex_); }
+  ~MutexLock()
+    { pthread_mutex_unlock(mutex_); }
+
+private:
+
+  pthread_mutex_t* mutex_;
+
+};
+
+
+/* Reads rows of a table file ahead of their use, on a separate thread.
+
+   Consecutive rows are read in blocks into a ring of buffers.  While
+   rows are used from one block, the thread reads the following blocks.
+   Rows are expected to be used in order; using a row before the current
+   block, or past the block being read, restarts reading at that row.  */
+
+class ReadAhead
+{
+public:
+
+  struct Statistics
+  {
+    /* The number of blocks and bytes read.  */
+    int64_t blocks_;
+    int64_t bytes_;
+    /* The number of times rows were needed before they had been read.  */
+    int64_t waits_;
+    /* The number of times reading was restarted at another row.  */
+    int64_t restarts_;
+  };
+
+  /* Start reading rows of 'row_size' bytes from 'fd', starting at
+     'first_row_offset'.  The first 'num_rows' rows are read, in blocks
+     of about 'block_size' bytes, up to 'depth' blocks ahead.  */
+  ReadAhead(int fd, off64_t first_row_offset, size_t row_size,
+	    int64_t num_rows, size_t block_size, int depth) throw (FileError);
+  ~ReadAhead();
+
+  /* Return the number of bytes in each block.  */
+  size_t getBlockSize() const
+    { return rows_per_block_ * row_size_; }
+
+  /* Return the number of blocks in the ring.  */
+  int getDepth() const
+    { return blocks_.size(); }
+
+  Statistics getStatistics() const;
+
+  /* Allow rows up to 'num_rows' to be read.  */
+  void setNumRows(int64_t num_rows);
+
+  /* Return the address of the data for row 'row_number', waiting for it
+     to be read if necessary.  
+
+     'count' is set to the number of consecutive rows whose data follows
+     at the address.  The data remains valid until the next call.  */
+  const char* getRows(int64_t row_number, int64_t& count) throw (FileError);
+
+private:
+
+  /* A block of consecutive rows.  */
+  struct Block
+  {
+    std::vector<char> data_;
+    /* The number of rows read into 'data_'.  */
+    int64_t num_rows_;
+    /* If not empty, the error that occurred reading the block.  */
+    std::string error_;
+  };
+
+  static void* run(void* read_ahead);
+
+  /* Read blocks until stopped.  Runs on the read-ahead thread.  */
+  void fill();
+
+  /* Discard all blocks, and start reading again at 'row_number'.  */
+  void restart(int64_t row_number);
+
+  const int fd_;
+  const off64_t first_row_offset_;
+  const size_t row_size_;
+  int64_t rows_per_block_;
+
+  std::vector<Block> blocks_;
+
+  /* Members below are protected by 'mutex_'.  */
+  mutable pthread_mutex_t mutex_;
+  /* Signaled when a block has been read.  */
+  pthread_cond_t filled_;
+  /* Signaled when the reader may have more blocks to read.  */
+  pthread_cond_t freed_;
+  pthread_t thread_;
+
+  /* The number of rows that may be read.  */
+  int64_t num_rows_;
+
+  /* The row at which block 0 starts.  Block 'n' starts 'n' blocks
+     later, and is stored in 'blocks_[n % blocks_.size()]'.  */
+  int64_t start_row_;
+
+  /* The block from which rows are being used.  Earlier blocks are
+     discarded.  */
+  int64_t head_;
+
+  /* The block being read.  Blocks before it have been read.  */
+  int64_t tail_;
+
+  /* Incremented on restart, so that a block being read when the reading
+     restarted is discarded.  */
+  int generation_;
+
+  /* If true, the read-ahead thread exits.  */
+  bool stop_;
+
+  Statistics statistics_;
+
+};
+
+
+class Table;
+
+
+/* A constraint on the values of a column.  */
+
+struct Bound
+{
+  int column_index_;
+  double low_;
+  bool low_inclusive_;
+  double high_;
+  bool high_inclusive_;
+};
+
+
+/* Summaries of the values of a table's columns in blocks of rows.
+
+   For each block of 'block_size' consecutive rows, a zone map records
+   the smallest and largest value of each numeric column.  No row in a
+   block can satisfy a comparison of a column to a constant if the
+   column's values in the block all lie outside the range allowed by the
+   comparison.  */
+
+class ZoneMap
+{
+public:
+
+  /* The number of rows in each block.  */
+  static const int64_t block_size = 65536;
+
+  ZoneMap(const Schema* schema);
+
+  /* Return the number of rows summarized.  */
+  int64_t getNumRows() const
+    { return num_rows_; }
+
+  /* Include row 'row_number', with row data 'data', in the summaries.
+
+     Rows must be included in order.  If 'row_number' is not the next
+     row, the zone map stops including rows.  Its summaries remain valid
+     for the rows it already includes.  */
+  void update(int64_t row_number, const char* data);
+
+  /* Return true if no row in 'block' can satisfy all of 'bounds'.  Rows
+     in the block that aren't summarized are not considered.  */
+  bool excludes(int64_t block, const std::vector<Bound>& bounds) const;
+
+  /* Return a representation of the summaries, for storing.  */
+  std::string serialize() const;
+
+  /* Restore summaries returned by 'serialize' for a table with
+     'num_rows' rows.
+
+     returns -- True if the summaries were restored, or false if 'data'
+     is not valid for the table.  */
+  bool deserialize(const std::string& data, int64_t num_rows);
+
+private:
+
+  const Schema* schema_;
+
+  /* The indices of summarized columns.  */
+  std::vector<int> columns_;
+
+  /* For each column in the schema, its position in 'columns_', or -1 if
+     it is not summarized.  */
+  std::vector<int> positions_;
+
+  int64_t num_rows_;
+
+  /* False if a row was appended that is not included.  */
+  bool current_;
+
+  /* The smallest and largest value of each summarized column, for each
+     block.  The values for column 'columns_[i]' in block 'b' are at
+     index 'b * columns_.size() + i'.  */
+  std::vector<double> minima_;
+  std::vector<double> maxima_;
+
+};
+
+
+/* A sorted index of the values of one column of a table.
+
+   The index is stored in its own file.  It lists the number of each row
+   in the table, sorted by the row's value of the column.  Rows whose
+   value is NaN are omitted, since they satisfy no bounds.  */
+
+class ColumnIndex
+{
+public:
+
+  /* Return the path to the index for column 'column_name' of the table
+     at 'table_path'.  */
+  static std::string getPath(const std::string& table_path,
+			     const std::string& column_name);
+
+  /* Build an index for column 'column_index' of the rows currently in
+     'table', and store it at 'path'.  */
+  static void create(Table* table, int column_index, 
+		     const std::string& path);
+
+  /* Open the index at 'path'.  */
+  ColumnIndex(const std::string& path) throw (FileError);
+  ~ColumnIndex();
+
+  /* Return the index of the column that is indexed.  */
+  int getColumnIndex() const
+    { return column_index_; }
+
+  /* Return the type of the column that is indexed.  */
+  ColumnType getColumnType() const
+    { return column_type_; }
+
+  /* Return the number of table rows indexed.  These are the first rows
+     of the table.  */
+  int64_t getNumRows() const
+    { return num_rows_; }
+
+  /* Return the number of indexed rows whose values satisfy 'bound'.  */
+  int64_t count(const Bound& bound) const;
+
+  /* Append the numbers of indexed rows whose values satisfy 'bound' to
+     'rows', in increasing order.  */
+  void find(const Bound& bound, std::vector<int64_t>& rows) const;
+
+  /* An entry in the index.  */
+  struct Entry
+  {
+    double value_;
+    int64_t row_number_;
+  };
+
+private:
+
+  /* Set 'begin' and 'end' to the range of entries satisfying 'bound'.  */
+  void findEntries(const Bound& bound, 
+		   const Entry*& begin, const Entry*& end) const;
+
+  int column_index_;
+  ColumnType column_type_;
+  int64_t num_rows_;
+
+  /* The window into which the index file is mapped.  */
+  MappedWindow* window_;
+
+  /* The entries, sorted by value and row number.  */
+  const Entry* entries_;
+  int64_t num_entries_;
+
+};
+
+
 class Row
 {
 public:
@@ -313,16 +735,52 @@ public:
   const Schema* getSchema() const
     { return schema_; }
 
-  char* getBuffer() const
-    { return data_; }
+  /* Return a writable buffer for the row's data.  
+
+     If the row's data is in a mapped window, the row is detached from
+     it first, and the returned buffer's contents are undefined.  */
+  char* getBuffer() const;
+
+  /* Return the row's data, for reading only.  */
+  const char* getData() const;
+
+  /* Point the row's data at 'data', which is in 'window'.  */
+  void setMappedData(MappedWindow* window, char* data);
+
+  /* Defer reading some of the row's columns.  
+
+     Columns for which 'present' is false have not been read into the
+     row's buffer.  Each is read from row 'row_number' of 'table' when
+     it is first accessed.  */
+  void setDeferred(Table* table, int64_t row_number, 
+		   const std::vector<bool>& present);
+
+  /* Return the address of the value of column 'column_index'.  */
+  const char* getValueData(int column_index) const;
 
   Value getValue(int column_index) const throw (WrongColumnType);
   void setValue(int column_index, const Value& value);
 
 private:
 
+  /* Read deferred column 'column_index' into the buffer.  */
+  void readDeferred(int column_index) const;
+
+  /* Read all deferred columns into the buffer.  */
+  void readAllDeferred() const;
+
   const Schema* const schema_;
-  char* data_;
+  mutable char* data_;
+
+  /* The window into which 'data_' points, or NULL if the row owns
+     'data_'.  */
+  mutable MappedWindow* window_;
+
+  /* The table from which deferred columns are read, or NULL if no
+     columns are deferred.  */
+  mutable Table* deferred_table_;
+  int64_t deferred_row_;
+  mutable std::vector<bool> present_;
 
 };
 
@@ -349,6 +807,63 @@ public:
   virtual std::string getMetadata() const = 0;
   virtual void setMetadata(const std::string& data) = 0;
 
+  /* Read the value of column 'column_index' in row 'row_number' into
+     'buffer'.  */
+  virtual void readValue(int64_t row_number, int column_index, 
+			 char* buffer);
+
+  /* Read the values of columns from 'count' rows starting at 'start'.  
+
+     The values of column 'columns[i]' are stored consecutively in
+     'buffers[i]', in the column's own representation.  */
+  virtual void readColumns(const std::vector<int>& columns, 
+			   int64_t start, int64_t count,
+			   const std::vector<char*>& buffers);
+
+  /* Append 'count' values to those of jagged column 'column_index'.
+
+     returns -- The position of the first of them, for a 'JaggedRef'.  */
+  virtual int64_t appendJagged(int column_index, const double* values,
+			       int32_t count);
+
+  /* Read 'count' values of jagged column 'column_index', starting at
+     position 'start', into 'values'.  */
+  virtual void readJagged(int column_index, int64_t start, int32_t count,
+			  double* values);
+
+  /* Write any buffered rows.  */
+  virtual void flush() {}
+
+  /* Indicate that column 'column_index' will be used from most rows.  
+
+     Tables that can read columns separately read these columns along
+     with each row, and defer reading the others until they are
+     needed.  */
+  virtual void addProjectedColumn(int column_index) {}
+
+  /* Return summaries of the table's rows, or NULL if the table doesn't
+     keep them.  */
+  virtual ZoneMap* getZoneMap()
+    { return NULL; }
+
+  /* Build an index of column 'column_index'.  */
+  virtual void createIndex(int column_index);
+
+  /* Return the index of column 'column_index', or NULL if there is
+     none.  */
+  virtual ColumnIndex* getIndex(int column_index)
+    { return NULL; }
+
+  /* Return the reader that reads rows ahead, or NULL if the table
+     doesn't read ahead.  */
+  virtual const ReadAhead* getReadAhead() const
+    { return NULL; }
+
+  /* Return a number that distinguishes this table from others created
+     at the same path, or zero if there is none.  */
+  virtual int64_t getCreationStamp() const
+    { return 0; }
+
 protected:
 
   const Schema* schema_;
@@ -357,6 +872,12 @@ protected:
 };
 
 
+/* A table stored in a file.
+
+   A file table may be used from several threads at once.  Its methods
+   hold a lock on the table while using its buffers, and read the file
+   at explicit offsets.  */
+
 class FileTable
   : public Table
 {
@@ -369,22 +890,60 @@ public:
   virtual int append(const Row* row);
   virtual std::string getMetadata() const;
   virtual void setMetadata(const std::string& data);
+  virtual void readColumns(const std::vector<int>& columns, 
+			   int64_t start, int64_t count,
+			   const std::vector<char*>& buffers);
+  virtual int64_t appendJagged(int column_index, const double* values,
+			       int32_t count);
+  virtual void readJagged(int column_index, int64_t start, int32_t count,
+			  double* values);
+  virtual void flush();
+  virtual ZoneMap* getZoneMap()
+    { return zone_map_.get(); }
+  virtual void createIndex(int column_index);
+  virtual ColumnIndex* getIndex(int column_index);
+  virtual const ReadAhead* getReadAhead() const
+    { return read_ahead_.get(); }
+  virtual int64_t getCreationStamp() const
+    { return creation_stamp_; }
+
+  /* Read rows ahead of their use, in blocks of about 'block_size'
+     bytes, up to 'depth' blocks ahead.  If 'depth' is zero, stop
+     reading ahead.  Has no effect for columnar or mapped tables.  */
+  void setReadAhead(size_t block_size, int depth);
 
   static FileTable* create(const Schema* schema,
 			   const std::string& path, 
-			   mode_t mode=0666);
+			   mode_t mode=0666,
+			   Layout layout=LAYOUT_ROWS);
   static FileTable* open(const std::string& path, 
-			 const std::string& mode);
+			 const std::string& mode,
+			 bool use_mmap=false);
   std::string getPath() const
     { return path_; }
+  Layout getLayout() const
+    { return layout_; }
+
+  /* Return the offset in the file of row 'row_number'.  For
+     'LAYOUT_ROWS' only.  */
+  off64_t getRowOffset(int64_t row_number) const
+    { return first_row_offset_ + row_number * row_size_; }
 
 protected:
 
-  FileTable(const std::string& path, int flags=O_RDONLY);
+  FileTable(const std::string& path, int flags=O_RDONLY, 
+	    bool use_mmap=false);
 
-private:
+  /* Write the file header, including the current number of rows.  */
+  void writeHeader();
+
+  /* Write the buffered values of jagged columns.  */
+  void writeJagged();
+
+  /* Held while the table's buffers and file are used.  Recursive, since
+     methods call each other.  */
+  pthread_mutex_t mutex_;
 
-  const std::string path_;
   int fd_;
 
   off64_t first_row_offset_;
@@ -392,6 +951,128 @@ private:
 
   int64_t num_rows_;
 
+  /* Distinguishes this table from others created at the same path.  */
+  int64_t creation_stamp_;
+
+  /* The number of rows in each row group, for 'LAYOUT_COLUMNS'.  */
+  int rows_per_group_;
+
+  /* Summaries of appended rows.  */
+  std::auto_ptr<ZoneMap> zone_map_;
+
+private:
+
+  /* Map the window containing the row at 'offset'.  */
+  void mapWindow(off64_t offset);
+
+  const std::string path_;
+
+  Layout layout_;
+
+  /* If true, rows are read through windows mapped from the file, rather
+     than copied into row buffers.  */
+  bool use_mmap_;
+
+  /* The current mapped window, or NULL.  */
+  MappedWindow* window_;
+
+  /* The reader that reads rows ahead, or NULL.  */
+  std::auto_ptr<ReadAhead> read_ahead_;
+
+  /* Indices of columns that have been opened, or NULL.  */
+  std::vector<ColumnIndex*> indices_;
+
+  /* Rows that have been appended but not yet written to the file.  */
+  std::vector<char> write_buffer_;
+
+  /* The number of rows that have been written to the file.  */
+  int64_t num_written_rows_;
+
+  /* The values of a jagged column, which are stored in a file of their
+     own.  */
+  struct JaggedValues
+  {
+    int fd_;
+    /* The number of values in the file.  */
+    int64_t num_written_;
+    /* Values that have been appended but not yet written.  */
+    std::vector<double> buffer_;
+  };
+
+  /* The values of each jagged column, by column index.  Other columns'
+     entries are unused.  */
+  std::vector<JaggedValues> jagged_;
+
+};
+
+
+/* A file table with 'LAYOUT_COLUMNS'.
+
+   Values of a column are read a row group at a time, and only for
+   columns that are used.  Projected columns are read along with each
+   row; other columns are deferred until accessed.  */
+
+class ColumnarFileTable
+  : public FileTable
+{
+public:
+
+  ~ColumnarFileTable();
+
+  virtual void read(int64_t row_number, Row* row);
+  virtual int append(const Row* row);
+  virtual void readValue(int64_t row_number, int column_index, 
+			 char* buffer);
+  virtual void readColumns(const std::vector<int>& columns, 
+			   int64_t start, int64_t count,
+			   const std::vector<char*>& buffers);
+  virtual void flush();
+  virtual void addProjectedColumn(int column_index);
+
+protected:
+
+  friend class FileTable;
+
+  ColumnarFileTable(const std::string& path, int flags=O_RDONLY);
+
+private:
+
+  /* Return the address of the value of column 'column_index' in row
+     'row_number', loading that column's values for the row's group if
+     necessary.  */
+  const char* getValueAddress(int64_t row_number, int column_index);
+
+  /* Return the file offset of row group 'group'.  */
+  off64_t getGroupOffset(int64_t group) const
+    { return first_row_offset_ + group * rows_per_group_ * row_size_; }
+
+  /* Return the file offset of the values of column 'column_index' in
+     row group 'group'.  */
+  off64_t getChunkOffset(int64_t group, int column_index) const;
+
+  /* Write the buffered row group to the file.  */
+  void writeGroup();
+
+  /* The values of one column for one row group.  */
+  struct Chunk 
+  {
+    int64_t group_;
+    std::vector<char> data_;
+  };
+
+  /* The most recently loaded chunk of each column.  */
+  std::vector<Chunk> chunks_;
+
+  /* Flags for columns that are read along with each row.  */
+  std::vector<bool> projection_;
+
+  /* The indices of columns that are read along with each row.  */
+  std::vector<int> projected_columns_;
+
+  /* For writable tables, the contents of the last row group, which is
+     written when it is full or when the table is closed.  */
+  std::vector<char> group_buffer_;
+
 };
 
 
@@ -408,6 +1089,61 @@ getTypeName(ColumnType type);
 extern ColumnType
 getTypeByName(const char* name);
 
+/* Return the path of the values file of jagged column 'column_name' of
+   the table at 'table_path'.  */
+extern std::string
+getJaggedPath(const std::string& table_path, const std::string& column_name);
+
+/* Copy the values of a jagged column to another table.
+
+   'source_data' -- The column's 'JaggedRef' in a row of 'source'.
+
+   'target_data' -- Set to the 'JaggedRef' of the copied values, which
+   are appended to column 'target_column' of 'target'.  */
+extern void
+copyJagged(Table* source, int source_column, const char* source_data,
+	   Table* target, int target_column, char* target_data);
+
+/* Return the type of the values of columns of 'type'.  Bits are
+   decoded to 'TYPE_BOOL' and dictionary indices to 'TYPE_INT_32';
+   other types are stored as they are.  */
+extern ColumnType
+getValueType(ColumnType type);
+
+/* Decode values of a column.
+
+   'data' -- 'count' stored values of column 'column_index' of 'schema',
+   as filled in by 'Table::readColumns'.
+
+   'values' -- Filled with the decoded values, of type 'getValueType'
+   of the column's type.  */
+extern void
+decodeColumn(const Schema* schema, int column_index, const char* data,
+	     int64_t count, char* values);
+
+/* Return the half-precision value closest to 'value', rounding halfway
+   cases to even.  Values too large overflow to infinity.  */
+extern uint16_t
+encodeHalf(float value);
+
+/* Return the value of half-precision value 'half'.  */
+extern float
+decodeHalf(uint16_t half);
+
+/* Append the rows of 'source' to 'target', sorted by the values of
+   columns 'key_columns'.
+
+   Rows are ordered by the first key column, then by the next, and so
+   on.  NaNs are ordered after other values, and rows with equal keys
+   stay in the same order.  'target' must have the same schema.  About
+   'memory_limit' bytes of rows are sorted at a time; the sorted runs
+   are written to temporary files whose paths start with 'temp_path',
+   and then merged.  Complex and jagged columns may not be keys.  */
+extern void
+sortTable(Table* source, Table* target, const std::vector<int>& key_columns,
+	  size_t memory_limit, const std::string& temp_path) 
+  throw (FileError);
+
 //----------------------------------------------------------------------
 // inline methods
 //----------------------------------------------------------------------
@@ -416,7 +1152,35 @@ inline
 Column::Column(const std::string& name,
 	       const ColumnType type)
   : name_(name),
-    type_(type)
+    type_(type),
+    scale_(1),
+    offset_(0)
+{
+}
+
+
+inline
+Column::Column(const std::string& name,
+	       const ColumnType type,
+	       const std::vector<long>& dictionary)
+  : name_(name),
+    type_(type),
+    dictionary_(dictionary),
+    scale_(1),
+    offset_(0)
+{
+}
+
+
+inline
+Column::Column(const std::string& name,
+	       const ColumnType type,
+	       double scale,
+	       double offset)
+  : name_(name),
+    type_(type),
+    scale_(scale),
+    offset_(offset)
 {
 }
 
@@ -424,7 +1188,10 @@ Column::Column(const std::string& name,
 inline
 Column::Column(const Column& column)
   : name_(column.name_),
-    type_(column.type_)
+    type_(column.type_),
+    dictionary_(column.dictionary_),
+    scale_(column.scale_),
+    offset_(column.offset_)
 {
 }
 
@@ -445,6 +1212,56 @@ Column::getType()
 }
 
 
+inline const std::vector<long>&
+Column::getDictionary()
+  const
+{
+  return dictionary_;
+}
+
+
+inline int
+Column::findInDictionary(long value)
+  const
+{
+  std::vector<long>::const_iterator iter = 
+    std::find(dictionary_.begin(), dictionary_.end(), value);
+  return iter == dictionary_.end() ? -1 : iter - dictionary_.begin();
+}
+
+
+inline double
+Column::getOffset()
+  const
+{
+  return offset_;
+}
+
+
+inline double
+Column::getScale()
+  const
+{
+  return scale_;
+}
+
+
+inline double
+Column::decodeFixed(long stored)
+  const
+{
+  return offset_ + scale_ * stored;
+}
+
+
+inline double
+Column::encodeFixed(double value)
+  const
+{
+  return floor((value - offset_) / scale_ + 0.5);
+}
+
+
 //----------------------------------------------------------------------
 
 inline
@@ -478,6 +1295,14 @@ Schema::getColumnOffset(int column_index)
 }
 
 
+inline int
+Schema::getColumnBit(int column_index)
+  const
+{
+  return columns_[column_index].bit_;
+}
+
+
 inline size_t
 Schema::getSize()
   const
@@ -503,9 +1328,10 @@ CustomSchema::~CustomSchema()
 
 inline void
 CustomSchema::addColumn(const Column& column,
-			size_t offset)
+			size_t offset,
+			int bit)
 {
-  ColumnRecord record = { column, offset };
+  ColumnRecord record = { column, offset, bit };
   columns_.push_back(record);
 }
 
@@ -16,6 +16,7 @@ from   __future__ import division
 import hep
 from   hep.bool import *
 from   hep.fn import *
+import hep.num
 import inspect
 import math
 import operator
@@ -326,6 +327,9 @@ class Call(Expression):
     def __get_type(self):
         if isinstance(self.function, Constant):
             function = self.function.value
+            if len(self.subexprs) == 1 and self.subexprs[0].type is Jagged:
+                # The function reduces the values of a jagged column.
+                return Jagged.functions.get(function, None)
             subexpr_type = coerceExprTypes(self.subexprs)
             if function in (int, float, bool):
                 # The function is actually a type constructor, so the
@@ -473,8 +477,28 @@ class Subscript(Expression):
         self.subexprs = (collection, subscript)
 
 
-    type = None
-    subexpr_types = (None, None)
+    def __isJaggedElement(self):
+        return self.subexprs[0].type is Jagged \
+               and self.subexprs[1].type is int
+
+
+    def __get_type(self):
+        if self.__isJaggedElement():
+            # An element of the values of a jagged column.
+            return float
+        return None
+
+
+    def __get_subexpr_types(self):
+        if self.__isJaggedElement():
+            return (Jagged, int)
+        return (None, None)
+
+
+    type = property(__get_type)
+
+
+    subexpr_types = property(__get_subexpr_types)
     
 
     def __repr__(self):
@@ -1408,6 +1432,26 @@ class Tuple(Expression):
 
 
 
+#-----------------------------------------------------------------------
+
+class Jagged(tuple):
+    """The type of the values of a jagged table column.
+
+    In each row, the value of a jagged column is a tuple of floats,
+    whose length varies from row to row.  An expression of this type may
+    be subscripted by an 'int' expression, or passed to one of the
+    functions in 'functions', which maps each to its result type."""
+
+    functions = {
+        len: int,
+        hep.num.any: bool,
+        hep.num.sum: float,
+        max: float,
+        min: float,
+        }
+
+
+
 #-----------------------------------------------------------------------
 # functions
 #-----------------------------------------------------------------------
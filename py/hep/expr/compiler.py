@@ -113,6 +113,16 @@ function_map_2 = {
     (math.tanh, 1): (float, "DOUBLE_TANH"),
     }
 
+# These functions reduce the values of a jagged column, which are read
+# directly from the table.
+jagged_function_map = {
+    len: "LONG_JAGGED_LEN",
+    hep.num.any: "BOOL_JAGGED_ANY",
+    hep.num.sum: "DOUBLE_JAGGED_SUM",
+    max: "DOUBLE_JAGGED_MAX",
+    min: "DOUBLE_JAGGED_MIN",
+    }
+
 cast_map = {
     (None, bool): "OBJECT_CAST_FROM_BOOL",
     (None, float): "OBJECT_CAST_FROM_DOUBLE",
@@ -134,18 +144,19 @@ symbol_map = {
     complex: "OBJECT_SYMBOL",
     float: "DOUBLE_SYMBOL",
     int: "LONG_SYMBOL",
+    Jagged: "OBJECT_SYMBOL",
     None: "OBJECT_SYMBOL",
     }
 
 cache_get_operation_map = {
-    float: "FLOAT_CACHE_GET",
-    int: "INT_CACHE_GET",
+    float: "DOUBLE_CACHE_GET",
+    int: "LONG_CACHE_GET",
     bool: "BOOL_CACHE_GET",
     }
 
 cache_set_operation_map = {
-    float: "FLOAT_CACHE_SET",
-    int: "INT_CACHE_SET",
+    float: "DOUBLE_CACHE_SET",
+    int: "LONG_CACHE_SET",
     bool: "BOOL_CACHE_SET",
     }
 
@@ -179,7 +190,7 @@ def _compileCachedExpression(expression, compiled):
     compiled.extend(subexpr_compiled)
 
 
-def _compileIfThen(expression, compiled):
+def _compileIfThen(expression, compiled, temporaries):
     if len(expression.subexprs) != 3:
         raise ValueError, "if_then must take three arguments"
     condition_expr, true_expr, false_expr = expression.subexprs
@@ -194,12 +205,12 @@ def _compileIfThen(expression, compiled):
     
     # Compile the cases off to the side.
     true_compiled = ext.Expr()
-    _compile(true_expr, true_compiled)
+    _compile(true_expr, true_compiled, temporaries)
     false_compiled = ext.Expr()
-    _compile(false_expr, false_compiled)
+    _compile(false_expr, false_compiled, temporaries)
 
     # First, we evaluate the condition.
-    _compile(condition_expr, compiled)
+    _compile(condition_expr, compiled, temporaries)
     # If it's true, we skip over the next instructions, which would
     # have evaluated the value if the condition were false.
     compiled.append("CONDITIONAL_JUMP", None, false_compiled.length + 1)
@@ -212,8 +223,17 @@ def _compileIfThen(expression, compiled):
     compiled.extend(true_compiled)
 
 
-def _compile(expression, compiled):
+def _compile(expression, compiled, temporaries=None):
     type = expression.type
+
+    # If the value of this expression has already been computed and
+    # stored in a temporary, just retrieve it.
+    if temporaries:
+        index = temporaries.get(_getSubexprKey(expression), None)
+        if index is not None:
+            compiled.append("TEMPORARY_GET", type, index)
+            return
+
     subexprs = list(expression.subexprs)
     subexpr_types = tuple(expression.subexpr_types)
     operation = None
@@ -230,12 +250,12 @@ def _compile(expression, compiled):
         subexpr1, subexpr2 = subexprs
         # Go ahead and compile the first subexpression.  It will always
         # be evaluated.
-        _compile(subexpr1, compiled)
+        _compile(subexpr1, compiled, temporaries)
         # Compile the second subexpression off to the side.  It gets
         # evaluated only if the first one is true for 'And' / false for
         # 'Or'. 
         subexpr2_compiled = ext.Expr()
-        _compile(subexpr2, subexpr2_compiled)
+        _compile(subexpr2, subexpr2_compiled, temporaries)
         # Stick the lazy-evaluation operation between the
         # subexpressions.  The argument is the number of operations that
         # should be skipped if the second subexpression needn't be
@@ -252,10 +272,8 @@ def _compile(expression, compiled):
         return
 
     # Compile an 'if_then call.
-    if isinstance(expression, Call) \
-       and isinstance(expression.function, Constant) \
-       and expression.function.value == hep.num.if_then:
-        _compileIfThen(expression, compiled)
+    if _isIfThen(expression):
+        _compileIfThen(expression, compiled, temporaries)
         return
 
     # Compile casts.
@@ -274,6 +292,22 @@ def _compile(expression, compiled):
         operation = symbol_map[type]
         args = (ext.get_symbol_index(name), )
 
+    # Compile a function of a jagged symbol, and an element of one, into
+    # an operation that takes the symbol as its argument.
+    elif isinstance(expression, Call) \
+         and isinstance(expression.function, Constant) \
+         and subexpr_types == (Jagged, ) \
+         and isinstance(subexprs[0], Symbol) \
+         and expression.function.value in jagged_function_map:
+        operation = jagged_function_map[expression.function.value]
+        args = (ext.get_symbol_index(subexprs.pop().symbol_name), )
+
+    elif isinstance(expression, Subscript) \
+         and type is float \
+         and isinstance(subexprs[0], Symbol):
+        operation = "DOUBLE_JAGGED_INDEX"
+        args = (ext.get_symbol_index(subexprs.pop(0).symbol_name), )
+
     elif isinstance(expression, Function):
         operation = "OBJECT_FUNCTION_CALL"
         column_dict = {}
@@ -327,7 +361,7 @@ def _compile(expression, compiled):
     # take their arguments left-to-right from the top of the stack down.
     subexprs.reverse()
     for subexpr in subexprs:
-        _compile(subexpr, compiled)
+        _compile(subexpr, compiled, temporaries)
 
     # Now the main operation.
     if operation == "NO_OPERATION":
@@ -337,6 +371,71 @@ def _compile(expression, compiled):
     compiled.append(*args)
 
 
+def _getSubexprKey(expression):
+    # Expressions' equality ignores the order of operands, so identify
+    # them by their representations instead.
+    return (expression.type, repr(expression))
+
+
+def _isIfThen(expression):
+    return isinstance(expression, Call) \
+           and isinstance(expression.function, Constant) \
+           and expression.function.value == hep.num.if_then
+
+
+def _getEagerSubexprs(expression):
+    """Return the subexpressions of 'expression' that are always evaluated.
+
+    Operands of 'And', 'Or', and 'if_then' after the first are
+    evaluated only if needed, and the subexpression of a cached
+    expression only if the value isn't cached."""
+
+    import hep.table
+    if isinstance(expression, hep.table.CachedExpression):
+        return ()
+    elif isinstance(expression, And) or isinstance(expression, Or) \
+         or _isIfThen(expression):
+        return expression.subexprs[: 1]
+    else:
+        return expression.subexprs
+
+
+def _countSubexprs(expression, counts):
+    """Count occurrences of 'expression' and its subexpressions.
+
+    Only subexpressions that are always evaluated are counted.  Those
+    of a repeated subexpression are counted only once, since they are
+    evaluated only once.  Symbols and constants are as cheap to evaluate
+    as temporaries, so they aren't counted."""
+
+    if isinstance(expression, Constant) or isinstance(expression, Symbol):
+        return
+    key = _getSubexprKey(expression)
+    counts[key] = counts.get(key, 0) + 1
+    if counts[key] == 1:
+        for subexpr in _getEagerSubexprs(expression):
+            _countSubexprs(subexpr, counts)
+
+
+def _compileTemporaries(expression, compiled, shared, temporaries):
+    """Compute the shared subexpressions of 'expression' into temporaries.
+
+    Each subexpression in 'shared' that isn't already in 'temporaries'
+    is evaluated and stored in a new temporary, after the shared
+    subexpressions it contains."""
+
+    key = _getSubexprKey(expression)
+    if key in temporaries:
+        return
+    for subexpr in _getEagerSubexprs(expression):
+        _compileTemporaries(subexpr, compiled, shared, temporaries)
+    if key in shared:
+        _compile(expression, compiled, temporaries)
+        index = len(temporaries)
+        compiled.append("TEMPORARY_SET", expression.type, index)
+        temporaries[key] = index
+
+
 #-----------------------------------------------------------------------
 # functions
 #-----------------------------------------------------------------------
@@ -369,6 +468,47 @@ def compile(expression):
     return compiled
 
 
+def compileMultiple(expressions):
+    """Compile several expressions into a single program.
+
+    Subexpressions that occur more than once in 'expressions' are
+    evaluated once, and their values stored in temporaries for reuse.
+    Only subexpressions which are always evaluated are shared, not
+    those in the lazily-evaluated operands of 'and', 'or', and
+    'if_then'.
+
+    'expressions' -- A sequence of expression objects.
+
+    returns -- A compiled expression with an output for each of
+    'expressions'.  Evaluating it returns a tuple of their values, in
+    order.  If any of them raises an exception, so does the whole
+    evaluation."""
+
+    expressions = list(expressions)
+    if len(expressions) == 0:
+        raise ValueError, "no expressions to compile"
+
+    # Find subexpressions that occur more than once.
+    counts = {}
+    for expression in expressions:
+        _countSubexprs(expression, counts)
+    shared = {}
+    for key, count in counts.items():
+        if count > 1:
+            shared[key] = None
+
+    compiled = ext.Expr(outputs=len(expressions))
+    temporaries = {}
+    for expression in expressions:
+        # Compute the shared subexpressions this expression uses, the
+        # first time they're needed.
+        _compileTemporaries(expression, compiled, shared, temporaries)
+        # Leave the expression's value on the stack.
+        _compile(expression, compiled, temporaries)
+    compiled.formula = ", ".join(map(str, expressions))
+    return compiled
+
+
 #-----------------------------------------------------------------------
 # script
 #-----------------------------------------------------------------------
@@ -53,22 +53,42 @@ math_constants = {
     "tanh": math.tanh,
     }
 
+# These are substituted only where they're called, so that a column
+# may still have one of these names.
+math_functions = {
+    "any": hep.num.any,
+    "len": len,
+    "sum": hep.num.sum,
+    }
+
 #-----------------------------------------------------------------------
 # functions
 #-----------------------------------------------------------------------
 
-def _substituteConstants(expression, constants):
+def _substituteConstants(expression, constants, functions={}):
     """Attempt to replace symbol 'expression' with a constant.
 
     If 'expression' is a 'Symbol' whose name is a key in 'constants',
     returns a 'Constant' with the corrpesonding value from 'constants'.
-    Otherwise returns a copy of 'expression'."""
+    If 'expression' is a 'Call' of a symbol whose name is a key in
+    'functions', the function is replaced likewise.  Otherwise returns
+    a copy of 'expression'."""
     
+    substitute = lambda e: _substituteConstants(e, constants, functions)
     if isinstance(expression, Symbol):
         name = expression.symbol_name
         if name in constants:
             return Constant(constants[name])
-    return expression.copy(lambda e: _substituteConstants(e, constants))
+    elif isinstance(expression, Call) \
+         and isinstance(expression.function, Symbol):
+        name = expression.function.symbol_name
+        if name not in constants and name in functions:
+            kw_args = {}
+            for arg_name, arg in expression.kw_args.items():
+                kw_args[arg_name] = substitute(arg)
+            return Call(Constant(functions[name]),
+                        map(substitute, expression.subexprs), kw_args)
+    return expression.copy(substitute)
 
 
 def substituteConstants(expression, constants={}, use_math=True):
@@ -82,9 +102,11 @@ def substituteConstants(expression, constants={}, use_math=True):
     # Copy the supplied dictionary.
     constants = dict(constants)
     # Include math constants, if requested.
+    functions = {}
     if use_math:
         constants.update(math_constants)
+        functions = math_functions
     # Perform substitution.
-    return _substituteConstants(expression, constants)
+    return _substituteConstants(expression, constants, functions)
 
 
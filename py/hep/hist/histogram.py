@@ -218,6 +218,51 @@ class _Histogram:
             return (error, error)
 
 
+    def getBinSumOfSquares(self, bin_numbers):
+        """Return the stored sums of squares of the error on a bin.
+
+        Returns a '(lo, hi)' pair of the squares of the bin errors, from
+        which bins may be combined exactly.  Only histograms with the
+        "symmetric" or "asymmetric" error models store these.
+
+        'bin_numbers' -- A sequence of bin numbers for the axes of the
+        histogram."""
+
+        bin_index = self._getIndexForBinNumbers(bin_numbers)
+        if self.__error_model == "asymmetric":
+            return (self.__lo_errors[bin_index], self.__hi_errors[bin_index])
+        elif self.__error_model == "symmetric":
+            return (self.__errors[bin_index], self.__errors[bin_index])
+        else:
+            raise RuntimeError, \
+                  "no stored errors with error model %r" % self.__error_model
+
+
+    def setBinSumOfSquares(self, bin_numbers, sums_of_squares):
+        """Set the stored sums of squares of the error on a bin.
+
+        'bin_numbers' -- A sequence of bin numbers for the axes of the
+        histogram.
+
+        'sums_of_squares' -- A '(lo, hi)' pair, as returned by
+        'getBinSumOfSquares'."""
+
+        lo, hi = sums_of_squares
+        lo = float(lo)
+        hi = float(hi)
+        if lo < 0 or hi < 0:
+            raise ValueError, "sums of squares must be nonnegative"
+        bin_index = self._getIndexForBinNumbers(bin_numbers)
+        if self.__error_model == "asymmetric":
+            self.__lo_errors[bin_index] = lo
+            self.__hi_errors[bin_index] = hi
+        elif self.__error_model == "symmetric":
+            self.__errors[bin_index] = max(lo, hi)
+        else:
+            raise RuntimeError, \
+                  "no stored errors with error model %r" % self.__error_model
+
+
     def getBinRange(self, bin_numbers):
         """Return the range of coordinates corresponding to a bin.
 
@@ -349,6 +394,15 @@ class _Histogram1D(_Histogram):
         return _Histogram.setBinError(self, wrap1D(bin_numbers), error)
 
 
+    def getBinSumOfSquares(self, bin_numbers):
+        return _Histogram.getBinSumOfSquares(self, wrap1D(bin_numbers))
+
+        
+    def setBinSumOfSquares(self, bin_numbers, sums_of_squares):
+        return _Histogram.setBinSumOfSquares(
+            self, wrap1D(bin_numbers), sums_of_squares)
+
+
     def getBinRange(self, bin_numbers):
         return _Histogram.getBinRange(self, wrap1D(bin_numbers))
 
@@ -487,7 +541,9 @@ def _reduce(histogram):
     bin_contents = [ histogram.getBinContent(bin)
                      for bin in AxesIterator(histogram.axes, True) ]
     if histogram.error_model in ("symmetric", "asymmetric"):
-        bin_errors = [ histogram.getBinError(bin)
+        # Store the sums of squares, rather than the errors themselves,
+        # so that they are restored exactly.
+        bin_errors = [ histogram.getBinSumOfSquares(bin)
                        for bin in AxesIterator(histogram.axes, True) ]
     else:
         bin_errors = None
@@ -500,13 +556,18 @@ def _reduce(histogram):
         histogram.number_of_samples,
         bin_contents,
         bin_errors,
-        histogram.__dict__, )
+        histogram.__dict__,
+        True, )
     return _reconstitute, state
 
 
 def _reconstitute(axes, bin_type, error_model, number_of_samples,
-                  bin_contents, bin_errors, attributes):
-    """Rebuild a histogram from pickled state."""
+                  bin_contents, bin_errors, attributes,
+                  sums_of_squares=False):
+    """Rebuild a histogram from pickled state.
+
+    'sums_of_squares' -- If true, 'bin_errors' contains the sums of
+    squares of the bin errors.  Older pickles contain the errors."""
 
     # Build the histogram.
     histogram = Histogram(
@@ -520,7 +581,11 @@ def _reconstitute(axes, bin_type, error_model, number_of_samples,
         error_iter = None
     for bin in AxesIterator(axes, True):
         histogram.setBinContent(bin, value_iter.next())
-        if error_iter is not None:
+        if error_iter is None:
+            pass
+        elif sums_of_squares:
+            histogram.setBinSumOfSquares(bin, error_iter.next())
+        else:
             histogram.setBinError(bin, error_iter.next())
     # Restore other attributes.
     histogram.__dict__.update(attributes)
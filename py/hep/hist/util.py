@@ -233,7 +233,8 @@ def slice(histogram, slice_index, bins="all"):
 
 def project(events,
             histograms,
-            weight=None):
+            weight=None,
+            processes=1):
     """Fill historams from rows.
 
     For each row in 'events', each histogram in 'histograms' is
@@ -252,6 +253,10 @@ def project(events,
 
     'weight' -- A callable to determine the weight to use for each row.
 
+    'processes' -- The number of processes to use.  If more than one,
+    'events' must be a table or a 'Chain' of tables.  See
+    'hep.table.project'.
+
     returns -- The number of events (or total weight) projected."""
 
     def makeProjection(histogram):
@@ -264,7 +269,7 @@ def project(events,
 
     projections = [ makeProjection(h) for h in histograms ]
 
-    return hep.table.project(events, projections, weight, True)
+    return hep.table.project(events, projections, weight, True, processes)
 
 
 def getRange(histogram, bin_numbers=None, errors=False, overflows=False):
@@ -629,38 +634,20 @@ def makeNiceRange(lo, hi, margin_factor=1):
     return lo, hi
 
 
-def autoHistogram1D(values, number_of_bins=None, range=None,
-                    weights=None, name=None, units=None):
-    """Construct a 1D histogram from some values.
-
-    'values' -- An iterable of values.  They must all be the same type.
-
-    'numer_of_bins' -- The number of bins in the histogram.  If 'None',
-    it is chosen automatically.
-
-    'range' -- The range of the histogram.  If 'None', it is chosen
-    automatically.
-
-    'weights' -- An iterable of weights corresponding to 'values'.  If
-    'None', unit weights are used.
-
-    'name' -- Name describing the values for the histogram's axis.
-
-    'units' -- Units of the values.
-
-    returns -- A histogram."""
+def _makeHistogram1D(value_type, count, lo, hi, number_of_bins, range,
+                     weighted, name, units):
+    """Construct an empty histogram for 'count' values from 'lo' to 'hi'.
 
-    if len(values) == 0:
-        raise ValueError, "'values' is empty"
-    value_type = type(values[0])
+    The number of bins and range, if 'None', are chosen as
+    'autoHistogram1D' does."""
 
     if number_of_bins is None:
         # Choose a reasonable number of bins.
-        number_of_bins = min(100, max(10, len(values) / 10))
+        number_of_bins = min(100, max(10, count // 10))
 
     if range is None:
-        # Compute the actual range of values.
-        lo, hi = hep.fn.minmax(None, values)
+        # Use the actual range of values.
+        lo, hi = map(value_type, (lo, hi))
         if value_type in (int, long):
             # For integral types, expand the upper limit by one so the
             # largest value fits in the last bin.
@@ -676,12 +663,12 @@ def autoHistogram1D(values, number_of_bins=None, range=None,
     lo, hi = map(value_type, (lo, hi))
     
     # Use 'float' bins if weights are given, 'int' otherwise.
-    if weights is None:
-        bin_type = int
-        error_model = "poisson"
-    else:
+    if weighted:
         bin_type = float
         error_model = "symmetric"
+    else:
+        bin_type = int
+        error_model = "poisson"
 
     # Construct the histogram.
     histogram = Histogram1D(number_of_bins, (lo, hi),
@@ -690,6 +677,42 @@ def autoHistogram1D(values, number_of_bins=None, range=None,
         histogram.axis.name = name
     if units is not None:
         histogram.axis.units = units
+    return histogram
+
+
+def autoHistogram1D(values, number_of_bins=None, range=None,
+                    weights=None, name=None, units=None):
+    """Construct a 1D histogram from some values.
+
+    'values' -- An iterable of values.  They must all be the same type.
+
+    'numer_of_bins' -- The number of bins in the histogram.  If 'None',
+    it is chosen automatically.
+
+    'range' -- The range of the histogram.  If 'None', it is chosen
+    automatically.
+
+    'weights' -- An iterable of weights corresponding to 'values'.  If
+    'None', unit weights are used.
+
+    'name' -- Name describing the values for the histogram's axis.
+
+    'units' -- Units of the values.
+
+    returns -- A histogram."""
+
+    if len(values) == 0:
+        raise ValueError, "'values' is empty"
+    value_type = type(values[0])
+    if range is None:
+        # Compute the actual range of values.
+        lo, hi = hep.fn.minmax(None, values)
+    else:
+        lo = hi = None
+
+    histogram = _makeHistogram1D(
+        value_type, len(values), lo, hi, number_of_bins, range,
+        weights is not None, name, units)
     # Fill the values into it.
     if weights is None:
         map(histogram.accumulate, values)
@@ -700,6 +723,33 @@ def autoHistogram1D(values, number_of_bins=None, range=None,
     return histogram
 
 
+def makeAutoHistogram1D(statistics, value_type=float, number_of_bins=None,
+                        range=None, weighted=False, name=None, units=None):
+    """Construct an empty 1D histogram for values with 'statistics'.
+
+    The histogram is binned as 'autoHistogram1D' would bin the values,
+    but it is not filled.  Since only the count and range of the values
+    are needed, they need not be kept in memory; the histogram can be
+    filled as the values are computed again.
+
+    'statistics' -- A 'hep.table.Statistics' object for the values, or
+    any object with 'count', 'minimum', and 'maximum' attributes.
+
+    'value_type' -- The type of the values.
+
+    'weighted' -- If true, the histogram is to be filled with weights.
+
+    See 'autoHistogram1D' for the other arguments.
+
+    returns -- A histogram."""
+
+    if range is None and statistics.count == 0:
+        raise ValueError, "there are no values"
+    return _makeHistogram1D(
+        value_type, statistics.count, statistics.minimum,
+        statistics.maximum, number_of_bins, range, weighted, name, units)
+
+
 def autoHistogram(values, numbers_of_bins=None, ranges=None,
                   weights=None):
     """Construct a histogram from some values.
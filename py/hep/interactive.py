@@ -62,6 +62,7 @@ from   hep.lorentz import lab
 from   hep.num import *
 from   hep.pdt import default as pdt
 import hep.py
+import hep.table
 from   math import *
 import os
 import sys
@@ -486,7 +487,8 @@ def iprint(file_name, size=None, page_size=None, border=None):
 
 
 def iproj1(table, expression, selection=None, weight=None,
-           number_of_bins=None, range=None, plot=True, over=False, **style):
+           number_of_bins=None, range=None, plot=True, over=False,
+           sample=None, **style):
     """Project a 1D histogram from a table.
 
     Accumulates 'expression' evaluated on each row of 'table' into a new
@@ -505,6 +507,9 @@ def iproj1(table, expression, selection=None, weight=None,
     'range' -- If specified, the range to use for the histogram.
     Otherwise, chosen automatically.
 
+    'sample' -- If specified, the fraction of rows to project, chosen at
+    random.  Only those rows are read from the table.
+
     returns -- The projected histogram."""
 
     # Process the expression.
@@ -512,32 +517,51 @@ def iproj1(table, expression, selection=None, weight=None,
     expr_type = expression.type
     if expr_type not in (int, long, float):
         expr_type = float
-    expression = hep.expr.compile(expression)
-    values = []
 
-    # Process the expression for weights, if given.
-    if weight is not None:
-        weight_expression = hep.expr.asExpression(weight, compile=True)
-        weights = []
-    else:
-        weights = None
+    if sample is None and hasattr(table, "statistics") \
+       and expression.type is expr_type:
+        # Choose the binning from the statistics of the values, which
+        # the table computes in one pass over its rows, and then fill
+        # the histogram in another.  The values aren't kept in memory.
+        statistics = table.statistics(expression, selection)
+        histogram = hep.hist.makeAutoHistogram1D(
+            statistics, expr_type, number_of_bins, range,
+            weighted=weight is not None, name=str(expression))
+        if selection:
+            projection = (expression, histogram.accumulate, selection)
+        else:
+            projection = (expression, histogram.accumulate)
+        hep.table.project(table, [projection], weight=weight)
 
-    # Grab all the values that match the selection.
-    if selection:
-        selected_table = table.select(selection)
     else:
-        selected_table = table
+        expression = hep.expr.compile(expression)
+        values = []
 
-    # Compute values, and weights if necessary.
-    for row in selected_table:
-        values.append(expr_type(expression.evaluate(row)))
+        # Process the expression for weights, if given.
         if weight is not None:
-            weights.append(float(weight_expression.evaluate(row)))
+            weight_expression = hep.expr.asExpression(weight, compile=True)
+            weights = []
+        else:
+            weights = None
 
-    # Make the histogram.
-    histogram = hep.hist.autoHistogram1D(
-        values, number_of_bins, range, weights=weights)
-    histogram.axis.name = str(expression)
+        # Grab all the values that match the selection.
+        if sample is not None:
+            selected_table = table.sample(sample, selection=selection)
+        elif selection:
+            selected_table = table.select(selection)
+        else:
+            selected_table = table
+
+        # Compute values, and weights if necessary.
+        for row in selected_table:
+            values.append(expr_type(expression.evaluate(row)))
+            if weight is not None:
+                weights.append(float(weight_expression.evaluate(row)))
+
+        # Make the histogram.
+        histogram = hep.hist.autoHistogram1D(
+            values, number_of_bins, range, weights=weights)
+        histogram.axis.name = str(expression)
 
     if over:
         iseries(histogram, **style)
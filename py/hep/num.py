@@ -450,6 +450,15 @@ def sum(values):
     return reduce(lambda a, b: a + b, values, 0)
 
 
+def any(values):
+    """Return true if any of 'values' is true."""
+
+    for value in values:
+        if value:
+            return True
+    return False
+
+
 def product(values):
     """Return the product of 'values'."""
 
@@ -14,16 +14,22 @@
 
 from   __future__ import generators
 
+import array as _array
+import bisect
+import cPickle
 from   hep.bool import *
 import hep.expr
+import hep.expr.compiler
 import hep.expr.op
 from   hep.ext import Iterator, RowObject, RowDict, Table
-from   hep.ext import table_create, table_open 
+from   hep.ext import table_create, table_open, table_sort
 import hep.fs
 from   hep.xml_util import *
-import operator
+import math
 import os
 import sys
+import threading
+import traceback
 import weakref
 
 #-----------------------------------------------------------------------
@@ -33,9 +39,39 @@ import weakref
 # The file extension to use for table files.
 extension = ".table"
 
+# The number of rows for which 'project' evaluates expressions at once.
+_project_block_size = 4096
+
+# The number of bytes read at once when prefetching a table of a 'Chain'.
+_prefetch_read_size = 1 << 20
+
+# The number of rows 'fromArray' appends at once.
+_from_array_block_size = 65536
+
+# The number of rows whose values 'quantize' compares at once.
+_quantize_block_size = 65536
+
+# For each NumPy type string, the column type used to store values, and
+# the 'array' module typecode with which they're appended, if any.
+_numpy_type_info = {
+    "b1":           ("int8",        "b"),
+    "i1":           ("int8",        "b"),
+    "i2":           ("int16",       "h"),
+    "i4":           ("int32",       "i"),
+    "f2":           ("float16",     None),
+    "f4":           ("float32",     "f"),
+    "f8":           ("float64",     "d"),
+    "c8":           ("complex64",   None),
+    "c16":          ("complex128",  None),
+    }
+
 # For each column type, the Python type used to represent values, and
-# the number of bytes the value occupies in the table.
+# the number of bytes the value occupies in the table.  Up to eight
+# "bit" columns share a byte.  A "jagged" column's values are stored in
+# a separate file; the row holds where they are.
 _type_info = {
+    "bit":          (bool,       1),
+    "dict8":        (int,        1),
     "int8":         (int,        1),
     "int16":        (int,        2),
     "int32":        (int,        4),
@@ -43,6 +79,10 @@ _type_info = {
     "float64":      (float,      8),
     "complex64":    (complex,    8),
     "complex128":   (complex,   16),
+    "jagged":       (hep.expr.Jagged, 12),
+    "float16":      (float,      2),
+    "fixed16":      (float,      2),
+    "fixed32":      (float,      4),
     }
 
 #-----------------------------------------------------------------------
@@ -131,6 +171,36 @@ class Column:
             raise ValueError, "invalid type '%s'" % type
         self.name = name
         self.type = type
+        if type == "dict8":
+            # Values are stored as indices into the dictionary.
+            try:
+                dictionary = tuple(map(int, attributes["dictionary"]))
+            except KeyError:
+                raise ValueError, \
+                      "column '%s' of type dict8 needs a dictionary" % name
+            if len(dictionary) > 256:
+                raise ValueError, \
+                      "dictionary of column '%s' is too long" % name
+            for value in dictionary:
+                if value < -2 ** 31 or value >= 2 ** 31:
+                    raise OverflowError, "%d is not an \"int32\"" % value
+                if dictionary.count(value) > 1:
+                    raise ValueError, \
+                          "%d is repeated in the dictionary of column '%s'" \
+                          % (value, name)
+            self.dictionary = dictionary
+        elif type in ("fixed16", "fixed32"):
+            # Values are stored as integer multiples of the scale.
+            try:
+                scale = float(attributes["scale"])
+            except KeyError:
+                raise ValueError, \
+                      "column '%s' of type %s needs a scale" % (name, type)
+            if not scale > 0:
+                raise ValueError, \
+                      "scale of column '%s' must be positive" % name
+            self.scale = scale
+            self.offset = float(attributes.get("offset", 0))
 
         
     def __repr__(self):
@@ -144,6 +214,132 @@ class Column:
 
 
 
+#-----------------------------------------------------------------------
+
+class MaterializedColumn:
+    """A column whose values are computed from an expression.
+
+    A materialized column is not stored in the table itself.  Its values
+    are stored in a separate file next to the table, and are computed
+    by the table's 'materialize' method.  It appears in the schema, but
+    not in the schema's 'columns'.  It may be used in expressions like
+    other columns."""
+
+    def __init__(self, name, expression):
+        """Create a materialized column.
+
+        'name' -- The column name.
+
+        'expression' -- The expression, expanded for the table, whose
+        values the column contains."""
+
+        self.name = name
+        self.expression = expression
+
+
+    def __repr__(self):
+        return "MaterializedColumn(%r, %r)" % (self.name, self.expression)
+
+
+    Python_type = property(lambda self: self.expression.type)
+
+
+
+class Statistics(object):
+    """Summary statistics of an expression over the rows of a table.
+
+    Instances are returned by a table's 'statistics' method.  The
+    attributes 'count', 'minimum', 'maximum', 'sum', and
+    'sum_of_squares' summarize the values.  Values that are not finite
+    are not included.  If there are no values, 'minimum' and 'maximum'
+    are 'None'.
+
+    The distribution of the values is summarized in a sketch, from which
+    'quantile' estimates quantiles.  The sketch counts values in
+    buckets whose bounds are successive powers of 'gamma'."""
+
+    def __init__(self, count, minimum, maximum, sum, sum_of_squares,
+                 gamma, zeros, negative_offset, negative_counts,
+                 positive_offset, positive_counts):
+        self.count = count
+        self.minimum = minimum
+        self.maximum = maximum
+        self.sum = sum
+        self.sum_of_squares = sum_of_squares
+        self.gamma = gamma
+        self.__zeros = zeros
+        self.__negative = (negative_offset, negative_counts)
+        self.__positive = (positive_offset, positive_counts)
+
+
+    def __repr__(self):
+        return "Statistics(count=%d, minimum=%r, maximum=%r)" \
+               % (self.count, self.minimum, self.maximum)
+
+
+    def __getMean(self):
+        if self.count == 0:
+            raise ValueError, "no values"
+        return self.sum / self.count
+
+
+    def __getVariance(self):
+        mean = self.mean
+        return max(0.0, self.sum_of_squares / self.count - mean * mean)
+
+
+    mean = property(__getMean)
+
+    variance = property(__getVariance)
+
+    standard_deviation = property(lambda self: math.sqrt(self.variance))
+
+
+    def quantile(self, fraction):
+        """Estimate a quantile of the values.
+
+        'fraction' -- The fraction of values below the quantile, between
+        zero and one.  For instance, 0.5 gives the median.
+
+        returns -- The estimated quantile.  Its relative error is at
+        most about '(gamma - 1) / (gamma + 1)'."""
+
+        if not 0 <= fraction <= 1:
+            raise ValueError, "fraction must be between 0 and 1"
+        if self.count == 0:
+            raise ValueError, "no values"
+        if fraction == 0:
+            return self.minimum
+        if fraction == 1:
+            return self.maximum
+
+        # Walk the buckets in order of their values until we reach the
+        # rank of the quantile.
+        rank = fraction * (self.count - 1)
+        total = 0
+        for value, count in self.__iterBuckets():
+            total += count
+            if total > rank:
+                return min(max(value, self.minimum), self.maximum)
+        return self.maximum
+
+
+    def __iterBuckets(self):
+        """Generate '(value, count)' for buckets in increasing order.
+
+        'value' is a value representative of those in the bucket."""
+
+        gamma = self.gamma
+        offset, counts = self.__negative
+        for k in xrange(len(counts) - 1, -1, -1):
+            yield -2 * gamma ** (offset + k) / (gamma + 1), counts[k]
+        yield 0.0, self.__zeros
+        offset, counts = self.__positive
+        for k in xrange(len(counts)):
+            yield 2 * gamma ** (offset + k) / (gamma + 1), counts[k]
+
+
+
 #-----------------------------------------------------------------------
 
 class Schema(dict):
@@ -154,6 +350,26 @@ class Schema(dict):
     '"int16"', '"int32"', '"float32"', '"float64"', '"complex64"',
     '"complex128"'.
 
+    Two more types pack values into less space.  A '"bit"' column holds
+    a boolean in one bit; consecutive bit columns share bytes.  A
+    '"dict8"' column holds integers from its 'dictionary' attribute, a
+    sequence of up to 256 distinct values, each stored as a one-byte
+    index.  Both are decoded when values are read.
+
+    Three types store floats with less precision.  A '"float16"' column
+    holds IEEE half-precision values, with about three significant
+    digits.  A '"fixed16"' or '"fixed32"' column holds a 16- or 32-bit
+    integer 'n' for the value 'offset + n * scale', where 'scale' and
+    'offset' are attributes of the column.  Values are rounded when
+    they're stored; see 'quantize'.
+
+    A '"jagged"' column holds a variable-length list of floats in each
+    row, such as the momenta of an event's tracks.  The values are
+    stored one after another in a file next to the table, and are read
+    as a tuple.  Expressions may use 'len', 'sum', 'max', 'min', and
+    'any' of a jagged column, and index its elements, without building
+    the tuples.
+
     """
 
     def __init__(self, **columns):
@@ -178,7 +394,12 @@ class Schema(dict):
 
         'name' -- The column name; it must be unique.
 
-        'type' -- A string specifying the column type."""
+        'type' -- A string specifying the column type.
+
+        '**attributes' -- Additional attributes of the column.  A
+        '"dict8"' column requires 'dictionary', the sequence of values
+        it may hold.  A '"fixed16"' or '"fixed32"' column requires
+        'scale', and takes 'offset', which is zero if omitted."""
 
         # Do not allow a column to be added with the same name as
         # an existing column.
@@ -198,44 +419,152 @@ class Schema(dict):
 #-----------------------------------------------------------------------
 
 class Chain(object):
-    """A table formed by chaining several tables together."""
+    """A table formed by chaining several tables together.
 
-    def __init__(self, *tables):
+    The number of rows in each table is determined the first time a
+    row is accessed by index or the length of the chain is requested.
+    The tables should not be modified after that."""
+
+    def __init__(self, *tables, **options):
         """Construct a chained table.
 
-        '*tables' -- The tables to chain together."""
-        
-        self.tables = tables
+        '*tables' -- The tables to chain together.  Each may be a table,
+        or the path to a table file, which is opened when it is first
+        needed.
+
+        'prefetch' -- If true, while the rows of one table are iterated
+        over, the next table is opened, and its file read, on a
+        background thread, so that it is ready when needed."""
+
+        self.prefetch = options.pop("prefetch", False)
+        if options:
+            raise TypeError, \
+                  "unexpected keyword argument '%s'" % options.keys()[0]
+        self.__tables = list(tables)
+        # The number of rows preceding each table, followed by the total
+        # number of rows, once computed.
+        self.__offsets = None
+
+
+    def getTable(self, index):
+        """Return table number 'index', opening it if necessary."""
+
+        table = self.__tables[index]
+        if isinstance(table, str):
+            table = open(table)
+            self.__tables[index] = table
+        return table
+
+
+    def __get_tables(self):
+        return tuple([ self.getTable(i) for i in range(len(self.__tables)) ])
+
+    tables = property(__get_tables)
+
+
+    def iterTables(self):
+        """Return an iterator over the tables.
+
+        If the chain prefetches, each table is prefetched while the
+        previous one is in use."""
+
+        num_tables = len(self.__tables)
+        prefetcher = None
+        for index in range(num_tables):
+            if prefetcher is None:
+                table = self.getTable(index)
+            else:
+                table = prefetcher.getTable()
+            if self.prefetch and index + 1 < num_tables:
+                prefetcher = _TablePrefetcher(self, index + 1)
+                prefetcher.start()
+            yield table
 
 
     def __get_rows(self):
-        for table in self.tables:
+        for table in self.iterTables():
             for row in table.rows:
                 yield row
 
     rows = property(__get_rows)
 
 
+    def __iter__(self):
+        return self.rows
+
+
     def select(self, expression):
-        for table in self.tables:
+        for table in self.iterTables():
             for row in table.select(expression):
                 yield row
 
 
+    def __getOffsets(self):
+        if self.__offsets is None:
+            offsets = [0]
+            for table in self.tables:
+                offsets.append(offsets[-1] + len(table))
+            self.__offsets = offsets
+        return self.__offsets
+
+
     def __len__(self):
-        return reduce(operator.add, map(len, self.tables), 0)
+        return self.__getOffsets()[-1]
 
 
     def __getitem__(self, index):
         index = int(index)
+        offsets = self.__getOffsets()
         if index < 0:
-            return IndexError, index
-        for table in self.tables:
-            if index < len(table):
-                return table[index]
-            else:
-                index -= len(table)
-        return IndexError, index
+            index += offsets[-1]
+        if index < 0 or index >= offsets[-1]:
+            raise IndexError, index
+        # Find the last table that starts at or before this row.  Empty
+        # tables before it start at the same row.
+        which = bisect.bisect_right(offsets, index) - 1
+        return self.getTable(which)[index - offsets[which]]
+
+
+
+class _TablePrefetcher(threading.Thread):
+    """A thread that prepares a table of a 'Chain' to be used.
+
+    The thread opens the table, if necessary, and reads its file, so
+    that the contents are in the operating system's cache when the rows
+    are read."""
+
+    def __init__(self, chain, index):
+        threading.Thread.__init__(self)
+        self.setDaemon(True)
+        self.__chain = chain
+        self.__index = index
+        self.__exc_info = None
+
+
+    def run(self):
+        try:
+            table = self.__chain.getTable(self.__index)
+            path = getattr(table, "path", None)
+            if path is not None:
+                # Reading a file doesn't hold the interpreter lock, so
+                # this proceeds while the previous table is used.
+                table_file = file(path, "rb")
+                try:
+                    while table_file.read(_prefetch_read_size):
+                        pass
+                finally:
+                    table_file.close()
+        except:
+            self.__exc_info = sys.exc_info()
+
+
+    def getTable(self):
+        """Wait for the table to be prepared, and return it."""
+
+        self.join()
+        if self.__exc_info is not None:
+            raise self.__exc_info[0], self.__exc_info[1], self.__exc_info[2]
+        return self.__chain.getTable(self.__index)
 
 
 
@@ -261,6 +590,9 @@ def expand(table, expression):
             value = table.schema[name]
             if isinstance(value, Column):
                 expression = hep.expr.Symbol(name, _type_info[value.type][0])
+            elif isinstance(value, MaterializedColumn):
+                # 'cacheExpand' substitutes the materialized values.
+                expression = hep.expr.Symbol(name, value.Python_type)
             elif isinstance(value, Expression):
                 expression = expand_subexpr(value.expression)
             else:
@@ -289,9 +621,20 @@ def cacheExpand(table, expr):
     if isinstance(expr, CachedExpression):
         return expr
 
+    elif isinstance(expr, hep.expr.Symbol) \
+         and isinstance(table.schema.get(expr.symbol_name, None),
+                        MaterializedColumn):
+        # Use the values of the materialized column.  If a value is
+        # missing, because the row was appended since the column was
+        # materialized, compute it from the underlying expression.
+        column = table.schema[expr.symbol_name]
+        mask, values = table.getMaterialized(expr.symbol_name)
+        return CachedExpression(mask, values,
+                                cacheExpand(table, column.expression))
+
     elif expr in table.expression_cache:
         # Get the cache arrays.
-        mask, values = table.expression_cache[expr]
+        mask, values = table.getCache(expr)
         # Copy the expression, caching subexpressions as necessary.
         expr = expr.copy(subexpr_expand)
         # Wrap the expression to use the cached value.  If no cache
@@ -319,6 +662,127 @@ def compile(table, expr):
     return expr
 
 
+def compileMultiple(table, exprs):
+    """Compile 'exprs' together for 'table'.
+
+    Like 'compile', but produces a single compiled expression with an
+    output for each of 'exprs'.  Subexpressions they share are evaluated
+    only once."""
+
+    exprs = [ cacheExpand(table, expand(table, hep.expr.asExpression(e)))
+              for e in exprs ]
+    return hep.expr.compiler.compileMultiple(exprs)
+
+
+def getSelectionBounds(table, expression):
+    """Find bounds on column values implied by a selection.
+
+    Only comparisons between a column and a constant, possibly combined
+    with 'and', are considered.
+
+    'expression' -- The selection expression.
+
+    returns -- A sequence of '(name, low, low_inclusive, high,
+    high_inclusive)' tuples.  A row can satisfy 'expression' only if,
+    for each tuple, the value of column 'name' is between 'low' and
+    'high'.  A 'low' or 'high' of 'None' indicates no bound."""
+
+    expression = expand(table, hep.expr.asExpression(expression))
+
+    # Break the selection into terms combined with 'and'.
+    terms = [expression]
+    conjuncts = []
+    while len(terms) > 0:
+        term = terms.pop()
+        if isinstance(term, hep.expr.And):
+            terms.extend(term.subexprs)
+        else:
+            conjuncts.append(term)
+
+    # Narrow the bounds on each column with each term.
+    bounds = {}
+    for term in conjuncts:
+        bound = _getComparisonBound(table, term)
+        if bound is None:
+            continue
+        name, low, low_inclusive, high, high_inclusive = bound
+        old_low, old_low_inclusive, old_high, old_high_inclusive = \
+            bounds.get(name, (None, True, None, True))
+        if low is None or (old_low is not None and low < old_low):
+            low, low_inclusive = old_low, old_low_inclusive
+        elif low == old_low:
+            low_inclusive = low_inclusive and old_low_inclusive
+        if high is None or (old_high is not None and high > old_high):
+            high, high_inclusive = old_high, old_high_inclusive
+        elif high == old_high:
+            high_inclusive = high_inclusive and old_high_inclusive
+        bounds[name] = (low, low_inclusive, high, high_inclusive)
+
+    return [ (name, ) + bound for (name, bound) in bounds.items() ]
+
+
+def _getComparisonBound(table, expression):
+    """Return the bound on a column value implied by a comparison.
+
+    returns -- A '(name, low, low_inclusive, high, high_inclusive)'
+    tuple if 'expression' compares a column of 'table' to a constant,
+    otherwise 'None'."""
+
+    if isinstance(expression, hep.expr.Equal):
+        inclusive = True
+    elif isinstance(expression, hep.expr.LessThan):
+        inclusive = False
+    elif isinstance(expression, hep.expr.LessThanOrEqual):
+        inclusive = True
+    else:
+        return None
+
+    left, right = map(lambda e: _getBoundOperand(table, e),
+                      expression.subexprs)
+    if left is None or right is None:
+        return None
+    if isinstance(left, str) and not isinstance(right, str):
+        # The column is compared to an upper bound.
+        name, value = left, right
+        if isinstance(expression, hep.expr.Equal):
+            return (name, value, True, value, True)
+        else:
+            return (name, None, True, value, inclusive)
+    elif isinstance(right, str) and not isinstance(left, str):
+        # The column is compared to a lower bound.
+        name, value = right, left
+        if isinstance(expression, hep.expr.Equal):
+            return (name, value, True, value, True)
+        else:
+            return (name, value, inclusive, None, True)
+    else:
+        return None
+
+
+def _getBoundOperand(table, expression):
+    """Classify an operand of a comparison for '_getComparisonBound'.
+
+    returns -- The column name if 'expression' is the value of an
+    ordered column in 'table', the value if 'expression' is a real
+    constant, or 'None'."""
+
+    if isinstance(expression, hep.expr.Cast) \
+       and expression.type is float:
+        # Converting an integer to floating point preserves order.
+        expression = expression.subexprs[0]
+
+    if isinstance(expression, hep.expr.Symbol):
+        column = table.schema.get(expression.symbol_name, None)
+        if isinstance(column, Column) \
+           and column.Python_type not in (complex, hep.expr.Jagged):
+            return column.name
+    elif isinstance(expression, hep.expr.Constant):
+        value = expression.value
+        if isinstance(value, (int, long, float)):
+            return float(value)
+    return None
+
+
 def checkSchema(table_schema, schema):
     """Check schema consistency.
 
@@ -375,20 +839,42 @@ def getTableForJoin(table, target_table):
         table_path = os.path.realpath(
             os.path.join(table_dir, target_table)) + ".table"
         # Check if we already have opened this table for another join.
-        if target_table in table.joined_tables:
+        joined_tables = _joined_tables.setdefault(table, {})
+        if target_table in joined_tables:
             # Found it.
-            return table.joined_tables[target_table]
+            return joined_tables[target_table]
         else:
             # Not there.  Open the table.
             joined_table = hep.table.open(table_path)
             # Store a referene.  That way other joins can find it, and
             # also we hold a reference, so it won't get closed.
-            table.joined_tables[target_table] = joined_table
+            joined_tables[target_table] = joined_table
             return joined_table
     else:
         raise TypeError, "invalid join table '%s'" % repr(target_table)
         
 
+# For each table, the tables opened by name by 'getTableForJoin'.  These
+# aren't stored as table attributes, which are saved with the table.
+_joined_tables = weakref.WeakKeyDictionary()
+
+
+def _iterJoin(table, other, rows, other_rows):
+    """Generate the pairs of rows joined by 'Table.join'.
+
+    'rows', 'other_rows' -- Arrays of the indices of each pair of rows
+    in 'table' and 'other'.  An index of -1 in 'other_rows' stands for
+    no row."""
+
+    for i in xrange(len(rows)):
+        other_row = other_rows[i]
+        if other_row < 0:
+            yield table[rows[i]], None
+        else:
+            yield table[rows[i]], other[other_row]
+
+
+
 # FIXME: This whole business is lousy.  We need a better way to manage
 # all this. 
 
@@ -396,7 +882,15 @@ def getTableForJoin(table, target_table):
 # tables. 
 _open_tables = weakref.WeakValueDictionary()
 
-def open(path, update=False, row_type=RowDict, with_metadata=True):
+# The I/O options with which tables are opened by default, as '(mmap,
+# read_ahead, read_ahead_block_size)'.
+_default_io_options = (False, 0, 1 << 20)
+
+# For each open table, the I/O options with which it was opened.
+_io_options = weakref.WeakKeyDictionary()
+
+def open(path, update=False, row_type=RowDict, with_metadata=True,
+         mmap=None, read_ahead=None, read_ahead_block_size=None):
     # Canonicalize the path to the table.
     real_path = os.path.realpath(path)
     # Choose the mode to use when opening the table.
@@ -407,35 +901,249 @@ def open(path, update=False, row_type=RowDict, with_metadata=True):
     else:
         mode = "r"
 
-    try:
-        # If the table's already open, return it.  NOTE:  The table may
-        # be open in the wrong mode!
-        return _open_tables[real_path]
-    except KeyError:
+    # I/O options that aren't given are the defaults, or for a table
+    # that's already open, those with which it was opened.
+    table = _open_tables.get(real_path)
+    if table is None:
+        current = _default_io_options
+    else:
+        current = _io_options.get(table, _default_io_options)
+    options = list(current)
+    for i, value in enumerate((mmap, read_ahead, read_ahead_block_size)):
+        if value is not None:
+            options[i] = value
+    options = tuple(options)
+
+    if table is None:
         # The table is not open.  Open it.
-        table = table_open(real_path, mode, row_type, with_metadata)
+        table = table_open(real_path, mode, row_type, with_metadata,
+                           *options)
         # Store the open table.
         _open_tables[real_path] = table
-        return table
+    elif options != current:
+        # The table's already open, but with other I/O options.  NOTE:
+        # The table may be open in the wrong mode!
+        if bool(options[0]) != bool(current[0]):
+            raise ValueError, \
+                  "table %s is already open with mmap=%s" \
+                  % (path, bool(current[0]))
+        table.setReadAhead(options[1], options[2])
+    _io_options[table] = options
+    return table
 
 
-def create(path, schema, with_metadata=True):
+def create(path, schema, with_metadata=True, layout="rows"):
     # Canonicalize the path to the table.
     real_path = os.path.realpath(path)
     # Make sure there isn't already an open table with this path.
     if real_path in _open_tables:
         raise RuntimeError, "table %s is already open" % path
     # Create the table.
-    table = table_create(real_path, schema, with_metadata)
+    table = table_create(real_path, schema, with_metadata, layout)
     # Store the open table.
     _open_tables[real_path] = table
     return table
     
 
+def _checkDistinctPaths(src_path, dst_path):
+    """Raise 'ValueError' if 'dst_path' is the table at 'src_path'.
+
+    Creating the new table would truncate the table being read."""
+
+    if os.path.realpath(src_path) == os.path.realpath(dst_path) \
+       or (os.path.exists(dst_path)
+           and os.path.samefile(src_path, dst_path)):
+        raise ValueError, "'%s' is the source table" % dst_path
+
+
+def sort(src_path, dst_path, keys, memory_limit=64 << 20, layout="rows"):
+    """Write a copy of a table with its rows sorted.
+
+    'src_path' -- The path to the table to sort.
+
+    'dst_path' -- The path at which to create the sorted table.
+
+    'keys' -- The name of the column by which to sort rows, or a
+    sequence of names.  Rows are sorted by the first column, then by
+    the next, and so on.  Rows with equal keys stay in the same order.
+
+    'memory_limit' -- The approximate number of bytes of rows to sort
+    in memory at once.  Larger tables are sorted in runs, which are
+    stored in temporary files next to the new table and merged.
+
+    'layout' -- The layout of the new table.
+
+    returns -- The sorted table.  It has the same schema and attributes
+    as the original table.  Values of materialized columns are computed
+    again for the new order of rows."""
+
+    if isinstance(keys, str):
+        keys = [keys]
+    _checkDistinctPaths(src_path, dst_path)
+    source = open(src_path, read_ahead=2)
+    target = create(dst_path, source.schema, layout=layout)
+    table_sort(source, target, list(keys), memory_limit)
+    for name, column in target.schema.items():
+        if isinstance(column, MaterializedColumn):
+            target.materialize(name, column.expression)
+    return target
+
+
+def quantize(src_path, dst_path, columns, layout="rows"):
+    """Write a copy of a table with some columns stored less precisely.
+
+    'src_path' -- The path to the table to copy.
+
+    'dst_path' -- The path at which to create the copy.
+
+    'columns' -- A mapping from names of columns to the types with which
+    to store them in the copy.  Each type is '"float16"', '"fixed16"',
+    or '"fixed32"', or for the fixed-point types, a '(type, scale)' or
+    '(type, scale, offset)' tuple.  If a fixed-point type is given
+    without a scale, the scale and offset are chosen so that the range
+    of the column's values fits.
+
+    'layout' -- The layout of the copy.
+
+    returns -- A mapping from the names in 'columns' to the largest
+    absolute difference between a value in the copy and the original
+    value."""
+
+    _checkDistinctPaths(src_path, dst_path)
+    source = open(src_path, read_ahead=2)
+    names = [ c.name for c in source.schema.columns ]
+    for name in columns:
+        if name not in names:
+            raise KeyError, name
+
+    # Build the copy's schema, replacing the types of the quantized
+    # columns.
+    schema = Schema()
+    for column in source.schema.columns:
+        if column.name in columns:
+            type, attributes = _getQuantizedType(
+                source, column, columns[column.name])
+            schema.addColumn(column.name, type, **attributes)
+        else:
+            attributes = dict(column.__dict__)
+            del attributes["name"], attributes["type"]
+            schema.addColumn(column.name, column.type, **attributes)
+
+    # Copy the rows, a block at a time.  Complex and jagged columns have
+    # no array type, so their values are taken from rows.
+    target = create(dst_path, schema, layout=layout)
+    from_rows = [ c.name for c in source.schema.columns
+                  if c.Python_type in (complex, hep.expr.Jagged) ]
+    arrays = [ n for n in names if n not in from_rows ]
+    for start in range(0, len(source), _quantize_block_size):
+        stop = start + _quantize_block_size
+        values = dict(zip(arrays, source.readColumns(arrays, start, stop)))
+        for name in from_rows:
+            values[name] = [ row[name] for row in
+                             source.iterRows(start, stop, reuse=True) ]
+        target.appendColumns(**values)
+    for name, column in source.schema.items():
+        if isinstance(column, MaterializedColumn):
+            target.materialize(name, column.expression)
+
+    # Compare the values in the copy with the originals.
+    quantized = list(columns)
+    errors = dict([ (n, 0.0) for n in quantized ])
+    for start in range(0, len(source), _quantize_block_size):
+        stop = start + _quantize_block_size
+        originals = source.readColumns(quantized, start, stop)
+        values = target.readColumns(quantized, start, stop)
+        for name, original, value in zip(quantized, originals, values):
+            error = errors[name]
+            for x, y in zip(original, value):
+                # NaNs are stored as NaNs.
+                if x != y and not (x != x and y != y):
+                    error = max(error, abs(y - x))
+            errors[name] = error
+    return errors
+
+
+def _getQuantizedType(table, column, type):
+    """Return the type and attributes for quantizing 'column' of 'table'.
+
+    returns -- A '(type, attributes)' pair."""
+
+    if column.Python_type not in (int, float):
+        raise TypeError, "column '%s' of type %s can't be quantized" \
+              % (column.name, column.type)
+    if isinstance(type, str):
+        type = (type, )
+    type, parameters = type[0], type[1 :]
+    if type not in ("float16", "fixed16", "fixed32"):
+        raise ValueError, "'%s' is not a quantized type" % type
+    if type == "float16" or len(parameters) > 0:
+        return type, dict(zip(("scale", "offset"), parameters))
+
+    # Center the range of values on the offset, and choose the scale to
+    # span it with the integers.
+    statistics = table.statistics(column.name)
+    if statistics.count == 0 or not statistics.maximum > statistics.minimum:
+        return type, { "scale": 1.0, "offset": statistics.minimum or 0.0 }
+    bits = _type_info[type][1] * 8
+    return type, {
+        "scale": float(statistics.maximum - statistics.minimum)
+                 / (2 ** bits - 2),
+        "offset": (statistics.maximum + statistics.minimum) / 2.0,
+        }
+
+
+def fromArray(path, array, layout="rows"):
+    """Create a table from the rows of a NumPy structured array.
+
+    'path' -- The path at which to create the table.
+
+    'array' -- A one-dimensional structured array.  Each field becomes
+    a column of the same name.  Fields must be booleans, which are
+    stored as "int8", or signed integers, floats, or complex numbers
+    of a size that a column type holds.
+
+    'layout' -- The layout of the new table.
+
+    returns -- The new table."""
+
+    fields = array.dtype.names
+    if fields is None:
+        raise TypeError, "not a structured array"
+    schema = Schema()
+    codes = {}
+    typecodes = {}
+    for name in fields:
+        code = codes[name] = array.dtype.fields[name][0].str[1 :]
+        try:
+            type, typecodes[name] = _numpy_type_info[code]
+        except KeyError:
+            raise ValueError, \
+                  "no column type for field '%s' of type %s" % (name, code)
+        schema.addColumn(name, type)
+
+    # Append the values a block at a time, converted to native byte
+    # order.  'array' module arrays are appended without converting
+    # each value.
+    table = create(path, schema, layout=layout)
+    for start in range(0, len(array), _from_array_block_size):
+        block = array[start : start + _from_array_block_size]
+        columns = {}
+        for name in fields:
+            values = block[name].astype(codes[name])
+            if typecodes[name] is None:
+                columns[name] = values
+            else:
+                columns[name] = \
+                    _array.array(typecodes[name], values.tostring())
+        table.appendColumns(**columns)
+    return table
+
+
 def project(rows,
             projections,
             weight=None,
-            handle_expr_exceptions=False):
+            handle_expr_exceptions=False,
+            processes=1):
     """Project expressions on rows in a table.
 
     'rows' -- An iterable object returning rows to project.
@@ -453,8 +1161,29 @@ def project(rows,
     evaluation of expressions in 'projections' or 'weight' are handled;
     a warning is printed, and that value is skipped.
 
+    'processes' -- The number of processes to use.  If more than one,
+    'rows' must be a table or a 'Chain' of tables, and each function in
+    'projections' must be the 'accumulate' method of a histogram.  The
+    rows are divided into ranges, which are projected in separate
+    processes, and the histograms filled in them are added.
+
     returns -- The sum of weights of projected rows."""
 
+    if processes > 1:
+        return _projectInProcesses(rows, projections, weight,
+                                   handle_expr_exceptions, processes)
+    if isinstance(rows, Table):
+        # Evaluate the expressions on blocks of the table's rows.
+        return _projectBlocks(rows, 0, len(rows), projections, weight,
+                              handle_expr_exceptions)
+    if isinstance(rows, Chain):
+        # Project each table in turn.
+        total_weight = 0
+        for table in rows.iterTables():
+            total_weight += project(table, projections, weight,
+                                    handle_expr_exceptions)
+        return total_weight
+
     rows = iter(rows)
     try:
         # Get the first event from the iterator.
@@ -517,22 +1246,8 @@ def project(rows,
     total_weight = 0
 
     def handleException(expression, exception):
-        """Maybe handle 'exception' raised while evaluating 'expression'.
-
-        returns -- Only if the exception was handled; otherwise,
-        re-raises it."""
-
-        # Always let keyboard interrupts propagate.
-        if isinstance(exception, KeyboardInterrupt):
-            raise
-        # Should we handle the excpetion?
-        if not handle_expr_exceptions:
-            # No; let the exception propagate upward.
-            raise
-        # Print a warning.
-        print >> sys.stderr, \
-              "warning: exception '%s' in expression \"%s\" in 'project'" \
-              % (exception, expression)
+        _handleProjectException(expression, exception,
+                                handle_expr_exceptions)
 
 
     # Loop over the rest of the rows in in iterator.  Start with the row
@@ -583,6 +1298,399 @@ def project(rows,
     return total_weight
 
 
+def _handleProjectException(expression, exception, handle_expr_exceptions):
+    """Maybe handle 'exception' raised while evaluating 'expression'.
+
+    returns -- Only if the exception was handled; otherwise, re-raises
+    it."""
+
+    # Always let keyboard interrupts propagate.
+    if isinstance(exception, KeyboardInterrupt):
+        raise
+    # Should we handle the excpetion?
+    if not handle_expr_exceptions:
+        # No; let the exception propagate upward.
+        raise
+    # Print a warning.
+    print >> sys.stderr, \
+          "warning: exception '%s' in expression \"%s\" in 'project'" \
+          % (exception, expression)
+
+
+def _projectBlocks(table, start, stop, projections, weight,
+                   handle_expr_exceptions):
+    """Implementation of 'project' for rows 'start' to 'stop' of 'table'.
+
+    The weight, selection, and projected expressions are all evaluated
+    together on a block of rows at once, if they can be, or else row by
+    row, so that subexpressions they share are evaluated once.  Only
+    rows for which that raises an exception are evaluated one expression
+    at a time."""
+
+    def compileExpression(expression):
+        if expression is None:
+            return None
+        return table.compile(hep.expr.asExpression(expression))
+
+    # Compile the expressions for the table.
+    items = []
+    for projection in projections:
+        if len(projection) == 2:
+            expression, function = projection
+            selection = None
+        elif len(projection) == 3:
+            expression, function, selection = projection
+        items.append((compileExpression(selection), selection,
+                      compileExpression(expression), expression, function))
+    weight_compiled = compileExpression(weight)
+
+    # Also compile them all together, in the order in which they're
+    # evaluated below.
+    expressions = [weight]
+    for item in items:
+        expressions.extend([item[1], item[3]])
+    expressions = [ hep.expr.asExpression(e)
+                    for e in expressions if e is not None ]
+    if len(expressions) > 1 \
+       and not filter(hep.expr.isCompiledExpression, expressions):
+        combined_compiled = compileMultiple(table, expressions)
+        # Evaluating it on no rows shows whether it can be evaluated on
+        # blocks of rows at all.
+        combined_blocks = \
+            combined_compiled.evaluateBlock(table, start, start) is not None
+    else:
+        combined_compiled = None
+        combined_blocks = False
+
+    # A marker for rows that are skipped.
+    skip = object()
+
+    def evaluateRow(compiled, expression, row):
+        """Evaluate 'compiled' on 'row'.
+
+        returns -- The value, or 'skip' if evaluation raised a handled
+        exception."""
+
+        try:
+            return compiled.evaluate(row)
+        except Exception, exception:
+            _handleProjectException(expression, exception,
+                                    handle_expr_exceptions)
+            return skip
+
+    def evaluateSeparately(row):
+        """Evaluate the expressions on 'row' one at a time.
+
+        Like 'project', evaluates only the expressions whose values are
+        used.
+
+        returns -- A sequence of values in the order of the combined
+        compiled expression's outputs, with 'skip' for values that are
+        not used or whose evaluation raised a handled exception."""
+
+        values = []
+        use = True
+        if weight_compiled is not None:
+            value = evaluateRow(weight_compiled, weight, row)
+            values.append(value)
+            use = value is not skip
+        for compiled_selection, selection, compiled, expression, function \
+                in items:
+            use_item = use
+            if compiled_selection is not None:
+                if use_item:
+                    accept = evaluateRow(compiled_selection, selection, row)
+                else:
+                    accept = skip
+                values.append(accept)
+                use_item = accept is not skip and accept
+            if use_item:
+                values.append(evaluateRow(compiled, expression, row))
+            else:
+                values.append(skip)
+        return values
+
+    def evaluateCombinedRows(start, stop):
+        """Evaluate the combined compiled expression row by row.
+
+        Rows for which that raises an exception are evaluated one
+        expression at a time instead.
+
+        returns -- A list of values for each expression, as from the
+        combined compiled expression's 'evaluateBlock'."""
+
+        rows = []
+        for index in xrange(start, stop):
+            row = table[index]
+            try:
+                rows.append(combined_compiled.evaluate(row))
+            except KeyboardInterrupt:
+                raise
+            except Exception:
+                rows.append(evaluateSeparately(row))
+        return zip(*rows)
+
+    def evaluateBlock(compiled, expression, start, stop, mask, combined):
+        """Evaluate 'compiled' on rows 'start' to 'stop'.
+
+        'mask' -- A list of true values for rows whose values are used,
+        or 'None' for all rows.
+
+        'combined' -- An iterator over the values of each expression
+        from the combined compiled expression, or 'None'.
+
+        returns -- A list of values, with 'skip' for rows whose values
+        are not used or whose evaluation raised a handled exception."""
+
+        if combined is not None:
+            return combined.next()
+
+        values = compiled.evaluateBlock(table, start, stop)
+        if values is not None:
+            return values
+
+        # Evaluate row by row instead, only where needed, so that
+        # exceptions are raised (or handled) only for those rows.
+        values = []
+        for index in xrange(start, stop):
+            if mask is not None and not mask[index - start]:
+                values.append(skip)
+            else:
+                values.append(evaluateRow(compiled, expression,
+                                          table[index]))
+        return values
+
+    total_weight = 0
+    for block_start in xrange(start, stop, _project_block_size):
+        block_stop = min(block_start + _project_block_size, stop)
+
+        # Evaluate all the expressions at once, on the block if
+        # possible.
+        combined = None
+        if combined_blocks:
+            combined = combined_compiled.evaluateBlock(
+                table, block_start, block_stop)
+        if combined is None and combined_compiled is not None:
+            combined = evaluateCombinedRows(block_start, block_stop)
+        if combined is not None:
+            combined = iter(combined)
+
+        # Compute the weights of the rows.
+        if weight_compiled is None:
+            weights = [1] * (block_stop - block_start)
+            mask = None
+        else:
+            weights = evaluateBlock(weight_compiled, weight, block_start,
+                                    block_stop, None, combined)
+            mask = [ w is not skip for w in weights ]
+
+        # Compute the values to project.
+        block_items = []
+        for compiled_selection, selection, compiled, expression, function \
+                in items:
+            if compiled_selection is None:
+                item_mask = mask
+            else:
+                accepts = evaluateBlock(compiled_selection, selection,
+                                        block_start, block_stop, mask,
+                                        combined)
+                item_mask = [ a is not skip and a for a in accepts ]
+            values = evaluateBlock(compiled, expression, block_start,
+                                   block_stop, item_mask, combined)
+            block_items.append((item_mask, values, function))
+
+        # Use the values, in the same order as 'project' would for the
+        # rows one at a time.
+        for i in xrange(block_stop - block_start):
+            weight_value = weights[i]
+            if weight_value is skip:
+                continue
+            total_weight += weight_value
+            for item_mask, values, function in block_items:
+                if item_mask is not None and not item_mask[i]:
+                    continue
+                value = values[i]
+                if value is not skip:
+                    function(value, weight_value)
+
+    return total_weight
+
+
+def _projectInProcesses(rows, projections, weight,
+                        handle_expr_exceptions, processes):
+    """Implementation of 'project' with several processes."""
+
+    import hep.hist
+
+    # Find the histogram filled by each projection.
+    histograms = []
+    for projection in projections:
+        function = projection[1]
+        histogram = getattr(function, "im_self",
+                            getattr(function, "__self__", None))
+        if getattr(function, "__name__", None) != "accumulate" \
+           or not hep.hist.isHistogram(histogram):
+            raise TypeError, \
+                  "projecting in processes requires histogram " \
+                  "'accumulate' methods"
+        if len([ h for h in histograms if h is histogram ]) == 0:
+            histograms.append(histogram)
+
+    # Divide the rows evenly into a shard for each process.  Each shard
+    # is a sequence of '(table, start, stop)' ranges of table rows.
+    segments = _getTableSegments(rows)
+    num_rows = 0
+    for table, start, stop in segments:
+        num_rows += stop - start
+        # Write buffered rows, so the processes can read them.
+        table.flush()
+    shards = []
+    for i in range(processes):
+        shard = _sliceSegments(segments, num_rows * i / processes,
+                               num_rows * (i + 1) / processes)
+        if len(shard) > 0:
+            shards.append(shard)
+
+    # Start a process for each shard.  Each sends its results back
+    # through a pipe.
+    children = []
+    for shard in shards:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            _projectShard(shard, projections, weight,
+                          handle_expr_exceptions, histograms, write_fd)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    # Collect the results, in order.
+    results = []
+    for pid, read_fd in children:
+        in_file = os.fdopen(read_fd, "rb")
+        data = in_file.read()
+        in_file.close()
+        os.waitpid(pid, 0)
+        try:
+            results.append(cPickle.loads(data))
+        except (EOFError, cPickle.UnpicklingError):
+            results.append((False, "worker process %d failed" % pid))
+
+    # Add the results to the histograms.
+    total_weight = 0
+    for succeeded, result in results:
+        if not succeeded:
+            raise RuntimeError, \
+                  "exception in 'project' worker process:\n" + result
+    for succeeded, (shard_weight, shard_histograms) in results:
+        total_weight += shard_weight
+        for histogram, shard_histogram in zip(histograms, shard_histograms):
+            _addHistogram(histogram, shard_histogram)
+    return total_weight
+
+
+def _projectShard(shard, projections, weight, handle_expr_exceptions,
+                  histograms, fd):
+    """Project a shard of rows in a worker process of 'project'.
+
+    Writes the pickled results to 'fd', and exits the process."""
+
+    try:
+        try:
+            # Fill the histograms from empty, so that only the
+            # contributions from this shard are sent back.
+            for histogram in histograms:
+                _clearHistogram(histogram)
+            total_weight = 0
+            for table, start, stop in shard:
+                # Reopen the table, so that reading it doesn't interfere
+                # with other processes using the same file descriptor.
+                shard_table = table_open(table.path, "r", table.row_type,
+                                         table.with_metadata, False)
+                shard_table.schema = table.schema
+                total_weight += _projectBlocks(
+                    shard_table, start, stop, projections, weight,
+                    handle_expr_exceptions)
+            result = (True, (total_weight, histograms))
+        except:
+            result = (False, "".join(
+                traceback.format_exception(*sys.exc_info())))
+        out_file = os.fdopen(fd, "wb")
+        cPickle.dump(result, out_file, 1)
+        out_file.close()
+    finally:
+        os._exit(0)
+
+
+def _getTableSegments(rows):
+    """Return the rows of a table or 'Chain' as '(table, start, stop)'."""
+
+    if isinstance(rows, Table):
+        return [ (rows, 0, len(rows)) ]
+    elif isinstance(rows, Chain):
+        segments = []
+        for table in rows.tables:
+            segments.extend(_getTableSegments(table))
+        return segments
+    else:
+        raise TypeError, \
+              "projecting in processes requires a table or 'Chain'"
+
+
+def _sliceSegments(segments, start, stop):
+    """Return the part of 'segments' from row 'start' to 'stop'.
+
+    'segments' -- A sequence of '(table, start, stop)' row ranges,
+    treated as consecutive rows.
+
+    returns -- A sequence of row ranges containing the rows numbered
+    from 'start' to 'stop' in 'segments'."""
+
+    result = []
+    offset = 0
+    for table, segment_start, segment_stop in segments:
+        length = segment_stop - segment_start
+        lo = max(start - offset, 0)
+        hi = min(stop - offset, length)
+        if lo < hi:
+            result.append((table, segment_start + lo, segment_start + hi))
+        offset += length
+    return result
+
+
+def _clearHistogram(histogram):
+    """Set all bins of 'histogram', and their errors, to zero."""
+
+    import hep.hist
+
+    stored_errors = histogram.error_model in ("symmetric", "asymmetric")
+    for bin in hep.hist.AxesIterator(histogram.axes, True):
+        histogram.setBinContent(bin, 0)
+        if stored_errors:
+            histogram.setBinError(bin, 0)
+    histogram.number_of_samples = 0
+
+
+def _addHistogram(histogram, other):
+    """Add the bins of 'other' to 'histogram'.
+
+    Errors are added in quadrature, if 'histogram' stores them.  The
+    sums of squares are added directly, so that the result is the same
+    as filling 'histogram' with the contents of both."""
+
+    import hep.hist
+
+    stored_errors = histogram.error_model in ("symmetric", "asymmetric")
+    for bin in hep.hist.AxesIterator(histogram.axes, True):
+        histogram.setBinContent(
+            bin, histogram.getBinContent(bin) + other.getBinContent(bin))
+        if stored_errors:
+            lo0, hi0 = histogram.getBinSumOfSquares(bin)
+            lo1, hi1 = other.getBinSumOfSquares(bin)
+            histogram.setBinSumOfSquares(bin, (lo0 + lo1, hi0 + hi1))
+    histogram.number_of_samples += other.number_of_samples
+
+
 def dumpSchema(schema, out=sys.stdout):
     """Print a summary of 'schema'."""
 
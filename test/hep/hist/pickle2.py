@@ -53,3 +53,26 @@ compare(histogram.title, "A Nice Histogram")
 compare(contents, 
         [ (histogram.getBinContent(bin), histogram.getBinError(bin))
           for bin in hep.hist.AxesIterator(histogram.axes, True) ])
+
+# The sums of squares of bin errors survive pickling exactly.
+histogram = hep.hist.Histogram1D(4, (0.0, 4.0), bin_type=float,
+                                 error_model="asymmetric")
+for x, weight in [ (0.5, 0.1), (0.5, 0.7), (2.5, 1.3), (2.5, 0.3) ]:
+    histogram.accumulate(x, weight)
+histogram.setBinSumOfSquares(3, (0.5, 2.0))
+sums = [ histogram.getBinSumOfSquares(bin)
+         for bin in hep.hist.AxesIterator(histogram.axes, True) ]
+compare(sums[1], (0.1 * 0.1 + 0.7 * 0.7, 0.1 * 0.1 + 0.7 * 0.7))
+compare(sums[4], (0.5, 2.0))
+histogram = cPickle.loads(cPickle.dumps(histogram, 1))
+compare([ histogram.getBinSumOfSquares(bin)
+          for bin in hep.hist.AxesIterator(histogram.axes, True) ], sums)
+
+# Histograms that don't store errors have no sums of squares.
+try:
+    hep.hist.Histogram1D(4, (0.0, 4.0), error_model="gaussian") \
+        .getBinSumOfSquares(0)
+except RuntimeError:
+    pass
+else:
+    raise AssertionError, "sums of squares with gaussian errors"
@@ -0,0 +1,96 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+import numpy
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 10000
+
+def x(i):
+    return (i * 37 % 1000) * 0.01
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("n", "int8")
+schema.addColumn("x", "float64")
+schema.addColumn("q", "dict8", dictionary=(-1, 1))
+table = hep.table.create("asarray1.table", schema)
+table.appendColumns(
+    i=array.array("i", range(num_rows)),
+    n=array.array("b", [ i % 5 for i in range(num_rows) ]),
+    x=array.array("d", [ x(i) for i in range(num_rows) ]),
+    q=[ (-1, 1)[i % 2] for i in range(num_rows) ])
+
+# The array's fields are the table's columns.  Dictionary columns give
+# the indices of their values.
+rows = table.asArray(100, 200)
+compare(rows.dtype.names, ("i", "n", "x", "q"))
+compare(len(rows), 100)
+compare(list(rows["i"]), range(100, 200))
+compare(list(rows["n"]), [ i % 5 for i in range(100, 200) ])
+compare(list(rows["x"]), [ x(i) for i in range(100, 200) ])
+compare(list(rows["q"]), [ i % 2 for i in range(100, 200) ])
+compare(rows.flags.writeable, False)
+compare(numpy.sum(table.asArray()["x"] > 5),
+        len([ i for i in range(num_rows) if x(i) > 5 ]))
+compare(len(table.asArray(num_rows - 5, num_rows + 5)), 5)
+compare(len(table.asArray(20, 10)), 0)
+try:
+    table.asArray(-5)
+except ValueError:
+    pass
+else:
+    raise AssertionError, "negative row index should be rejected"
+
+# Appended rows are written before they're viewed.
+table.append(i=num_rows, n=0, x=0.5, q=1)
+compare(table.asArray(num_rows)["x"][0], 0.5)
+
+# The view outlives the table.
+del table
+compare(rows["i"][-1], 199)
+
+# Columnar tables have no row-major view.
+table = hep.table.create("asarray1c.table", schema, layout="columns")
+try:
+    table.asArray()
+except ValueError:
+    pass
+else:
+    raise AssertionError, "array view of columnar table not detected"
+del table
+
+# Tables are created from structured arrays.
+values = numpy.zeros(num_rows, dtype=[("a", ">i4"), ("b", "f4"),
+                                      ("c", "?"), ("z", "c16")])
+values["a"] = range(num_rows)
+values["b"] = [ x(i) for i in range(num_rows) ]
+values["c"] = [ i % 3 == 0 for i in range(num_rows) ]
+values["z"] = [ i * 1j for i in range(num_rows) ]
+table = hep.table.fromArray("asarray1f.table", values)
+compare([ (c.name, c.type) for c in table.schema.columns ],
+        [ ("a", "int32"), ("b", "float32"), ("c", "int8"),
+          ("z", "complex128") ])
+compare(len(table), num_rows)
+compare(table[1234]["a"], 1234)
+compare(table[1234]["c"], 0)
+compare(table[1235]["z"], 1235j)
+rows = table.asArray()
+compare(list(rows["a"]), range(num_rows))
+compare(list(rows["b"] == values["b"]), [ True ] * num_rows)
+del table, rows
+
+try:
+    hep.table.fromArray("asarray1g.table",
+                        numpy.zeros(3, dtype=[("u", "u4")]))
+except ValueError:
+    pass
+else:
+    raise AssertionError, "unsupported field type not detected"
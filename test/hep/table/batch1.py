@@ -0,0 +1,91 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+from   hep.hist import Histogram1D
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+# More rows than fit in one block.
+num_rows = 10000
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+schema.addColumn("f", "float32")
+schema.addColumn("k", "int8")
+table = hep.table.create("batch1.table", schema, layout="columns")
+table.appendColumns(
+    i=array.array("i", range(num_rows)),
+    x=array.array("d", [ (i * 37 % 1000) * 0.01 - 3 for i in range(num_rows) ]),
+    f=array.array("f", [ i % 11 for i in range(num_rows) ]),
+    k=array.array("b", [ i % 3 for i in range(num_rows) ]))
+
+
+def evaluateRows(compiled, start, stop):
+    return [ compiled.evaluate(table[i]) for i in range(start, stop) ]
+
+
+# Expressions evaluated on blocks give the same values as row by row.
+for expression in [
+    "x + f",
+    "x * 2 - i",
+    "i // 3 + i % 7",
+    "x < 2.5",
+    "i % 7 == 3 and x > 0",
+    "not k or i < 5",
+    "x > 0 or f > 5",
+    "_index * 2",
+    "abs(x) ** 2",
+    ]:
+    compiled = table.compile(expression)
+    compare(compiled.evaluateBlock(table, 0, num_rows),
+            evaluateRows(compiled, 0, num_rows))
+    compare(compiled.evaluateBlock(table, 4000, 4100),
+            evaluateRows(compiled, 4000, 4100))
+    # Selections are the same too.
+    compare([ row["_index"] for row in table.select(expression) ],
+            [ i for i in range(num_rows)
+              if compiled.evaluate(table[i]) ])
+    compare([ row["_index"] for row in table.select(expression, start=17,
+                                                    stop=9000) ],
+            [ i for i in range(17, 9000) if compiled.evaluate(table[i]) ])
+
+# Expressions with Python objects aren't evaluated on blocks.
+compare(table.compile("(x, f)").evaluateBlock(table, 0, 10), None)
+
+# Neither are blocks for which evaluation fails.  Selections on them
+# are evaluated row by row, so the failure is reported as usual.
+compiled = table.compile("x / f")
+compare(compiled.evaluateBlock(table, 0, 100), None)
+compare(len(compiled.evaluateBlock(table, 1, 11)), 10)
+try:
+    list(table.select("x / f > 1"))
+except ZeroDivisionError:
+    pass
+else:
+    raise AssertionError, "division by zero not detected"
+compare(len(list(table.select("f > 0 and x / f > 1"))),
+        len([ i for i in range(num_rows)
+              if table[i]["f"] > 0 and table[i]["x"] / table[i]["f"] > 1 ]))
+
+# Projections give the same results for a table and its rows.
+projections = lambda h1, h2, h3: (
+    ("x + f", h1.accumulate),
+    ("x / f", h2.accumulate, "f != 0"),
+    ("(x, f)[0]", h3.accumulate, "k == 1"),
+    )
+histograms1 = [ Histogram1D(20, (-5.0, 15.0)) for i in range(3) ]
+histograms2 = [ Histogram1D(20, (-5.0, 15.0)) for i in range(3) ]
+compare(hep.table.project(table, projections(*histograms1), weight="k"),
+        hep.table.project(table.rows, projections(*histograms2),
+                          weight="k"))
+for histogram1, histogram2 in zip(histograms1, histograms2):
+    compare(histogram1.number_of_samples, histogram2.number_of_samples)
+    for bin in range(20):
+        compare(histogram1.getBinContent(bin), histogram2.getBinContent(bin))
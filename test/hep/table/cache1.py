@@ -0,0 +1,66 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import hep.table
+from   hep.test import compare
+import os
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+table = hep.table.create("cache1.table", schema)
+for i in range(1000):
+    table.append(i=i, x=(i * 37 % 100) * 0.1)
+
+selection = "x > 5 and i % 3 == 0"
+expected = [ i for i in range(1000) if (i * 37 % 100) * 0.1 > 5 and i % 3 == 0 ]
+
+# Selecting rows fills the cache.
+table.cache(selection)
+compare([ row["i"] for row in table.select(selection) ], expected)
+cache_path = table.path + ".0.cache"
+compare(os.path.isfile(cache_path), True)
+del row, table
+
+# The cached values are stored in the cache file, not the metadata.
+compare(os.path.getsize("cache1.table.metadata") < 1000, True)
+table = hep.table.open("cache1.table", "a")
+expr = table.expand(hep.expr.parse(selection))
+mask, values = table.getCache(expr)
+compare(len(mask), 1000)
+compare([ i for i in range(1000) if mask[i] ], range(1000))
+compare([ i for i in range(1000) if values[i] ], expected)
+
+# Appended rows are added to the cache, but aren't cached yet.
+for i in range(1000, 1200):
+    table.append(i=i, x=(i * 37 % 100) * 0.1)
+mask, values = table.getCache(expr)
+compare(len(mask), 1200)
+compare(mask[999], True)
+compare(mask[1000], False)
+expected = [ i for i in range(1200) if (i * 37 % 100) * 0.1 > 5 and i % 3 == 0 ]
+compare([ row["i"] for row in table.select(selection) ], expected)
+compare(mask[1100], True)
+del mask, values, row, table
+
+table = hep.table.open("cache1.table")
+compare([ row["i"] for row in table.select(selection) ], expected)
+mask, values = table.getCache(expr)
+compare(len([ i for i in range(1200) if mask[i] ]), 1200)
+del mask, values, row
+
+# Clearing the cache clears the mask bits.
+table.cache(selection, True)
+mask, values = table.getCache(expr)
+compare(len([ i for i in range(1200) if mask[i] ]), 0)
+del mask, values
+
+# Uncaching removes the cache file.
+table.uncache(selection)
+compare(os.path.exists(cache_path), False)
+compare(len(table.expression_cache), 0)
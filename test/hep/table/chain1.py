@@ -0,0 +1,72 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+from   hep.hist import Histogram1D
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+
+# Some tables, including empty ones.
+lengths = (100, 0, 250, 1, 0, 64)
+paths = []
+index = 0
+for number in range(len(lengths)):
+    length = lengths[number]
+    path = "chain1-%d.table" % number
+    table = hep.table.create(path, schema)
+    for i in range(length):
+        table.append(i=index, x=index * 0.5)
+        index += 1
+    paths.append(path)
+    del table
+num_rows = index
+
+for prefetch in (False, True):
+    # Tables may be given by path, and are opened when needed.
+    chain = hep.table.Chain(*paths, **{"prefetch": prefetch})
+    compare(len(chain), num_rows)
+
+    # Rows are found by index.
+    for index in (0, 99, 100, 349, 350, 351, num_rows - 1):
+        compare(chain[index]["i"], index)
+    compare(chain[-1]["i"], num_rows - 1)
+    for index in (num_rows, -num_rows - 1):
+        try:
+            chain[index]
+        except IndexError:
+            pass
+        else:
+            raise AssertionError, "index %d out of range not detected" % index
+
+    # Iteration ends after the last row.
+    compare([ row["i"] for row in chain ], range(num_rows))
+    compare([ row["i"] for row in chain.rows ], range(num_rows))
+    compare([ row["i"] for row in chain.select("i % 7 == 3") ],
+            [ i for i in range(num_rows) if i % 7 == 3 ])
+
+    # Projecting a chain projects each table.
+    histogram = Histogram1D(10, (0.0, 250.0))
+    compare(hep.table.project(chain, (("x", histogram.accumulate), )),
+            num_rows)
+    compare(histogram.getBinContent(0), 50)
+    del row
+
+# Errors opening a prefetched table are raised when it's needed.
+chain = hep.table.Chain(paths[0], "chain1-missing.table", prefetch=True)
+rows = chain.rows
+for i in range(100):
+    rows.next()
+try:
+    rows.next()
+except IOError:
+    pass
+else:
+    raise AssertionError, "missing table not detected"
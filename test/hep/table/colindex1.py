@@ -0,0 +1,77 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import hep.table
+from   hep.test import compare
+import os
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 20000
+
+def run(i):
+    return (i * 7919) % 1000
+
+schema = hep.table.Schema()
+schema.addColumn("run", "int32")
+schema.addColumn("mass", "float32")
+schema.addColumn("c", "complex64")
+table = hep.table.create("colindex1.table", schema)
+for i in range(num_rows):
+    table.append(run=run(i), mass=(i * 31) % 500 * 0.25, c=0j)
+
+table.createIndex("run")
+table.createIndex("mass")
+compare(os.path.isfile("colindex1.table.run.index"), True)
+
+try:
+    table.createIndex("c")
+except ValueError:
+    pass
+else:
+    raise AssertionError, "complex column should not be indexed"
+try:
+    table.createIndex("nonexistent")
+except KeyError:
+    pass
+else:
+    raise AssertionError, "missing column not detected"
+
+# Rows appended after the index was built are still selected.
+for i in range(num_rows, num_rows + 100):
+    table.append(run=run(i), mass=(i * 31) % 500 * 0.25, c=0j)
+del table
+
+table = hep.table.open("colindex1.table")
+all_rows = range(num_rows + 100)
+for selection, expected in [
+    ("run == 17", [ i for i in all_rows if run(i) == 17 ]),
+    ("run >= 998", [ i for i in all_rows if run(i) >= 998 ]),
+    ("run > 3 and run <= 5 and mass < 50",
+     [ i for i in all_rows
+       if 3 < run(i) <= 5 and (i * 31) % 500 * 0.25 < 50 ]),
+    ("mass == 10.25", [ i for i in all_rows if (i * 31) % 500 == 41 ]),
+    ("run == 2000", []),
+    ("run % 100 == 17", [ i for i in all_rows if run(i) % 100 == 17 ]),
+    ]:
+    compare([ row["_index"] for row in table.select(selection) ], expected)
+
+# Selections on chains use the indices of each table.
+chain = hep.table.Chain(table, table)
+compare(len(list(chain.select("run == 17"))),
+        2 * len([ i for i in all_rows if run(i) == 17 ]))
+
+# Reading columns with a selection uses the index, too.
+runs, = table.readColumns(["run"], start=100, stop=10000,
+                          selection="run == 17")
+compare(list(runs), [ 17 for i in range(100, 10000) if run(i) == 17 ])
+del chain, row, table
+
+# Recreating the table removes the index.
+table = hep.table.create("colindex1.table", schema)
+compare(os.path.isfile("colindex1.table.run.index"), False)
+table.append(run=17, mass=0.0, c=0j)
+compare(len(list(table.select("run == 17"))), 1)
@@ -0,0 +1,53 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import hep.expr
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+# Enough rows for several row groups, the last one partial.
+num_rows = 10000
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("flag", "int8")
+schema.addColumn("x", "float64")
+schema.addColumn("c", "complex64")
+table = hep.table.create("columnar1.table", schema, layout="columns")
+for i in range(num_rows):
+    table.append(i=i, flag=i % 3, x=i * 0.25, c=complex(i, -i))
+compare(len(table), num_rows)
+compare(table[num_rows - 1]["i"], num_rows - 1)
+del schema, table
+
+table = hep.table.open("columnar1.table")
+compare(len(table), num_rows)
+for row in table:
+    i = row["_index"]
+    compare(row["i"], i)
+    compare(row["x"], i * 0.25)
+compare(table[1234]["c"], complex(1234, -1234))
+
+# Selections read only the columns they use, but other columns are
+# still available from the selected rows.
+rows = list(table.select("flag == 2 and x < 100"))
+compare(len(rows), len([ i for i in range(400) if i % 3 == 2 ]))
+for row in rows:
+    compare(row["i"] % 3, 2)
+    compare(row["c"].real, float(row["i"]))
+del rows, row, table
+
+# Append to the existing table, starting in a partial row group.
+table = hep.table.open("columnar1.table", update=True)
+for i in range(num_rows, num_rows + 100):
+    table.append(i=i, flag=i % 3, x=i * 0.25, c=complex(i, -i))
+del table
+
+table = hep.table.open("columnar1.table")
+compare(len(table), num_rows + 100)
+compare([ row["i"] for row in table ], range(num_rows + 100))
@@ -0,0 +1,60 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 5000
+
+for layout in ("rows", "columns"):
+    schema = hep.table.Schema()
+    schema.addColumn("i", "int32")
+    schema.addColumn("s", "int16")
+    schema.addColumn("x", "float64")
+    schema.addColumn("y", "float32")
+    schema.addColumn("c", "complex128")
+    table = hep.table.create("columns1.table", schema, layout=layout)
+    for i in range(num_rows):
+        table.append(i=i, s=-i % 1000, x=i / 4.0, y=i / 2.0, c=0j)
+    del schema, table
+
+    table = hep.table.open("columns1.table")
+
+    i, x, y = table.readColumns(("i", "x", "y"))
+    compare(type(i), array.array)
+    compare(i.typecode, "i")
+    compare(x.typecode, "d")
+    compare(y.typecode, "f")
+    compare(list(i), range(num_rows))
+    compare(list(x), [ n / 4.0 for n in range(num_rows) ])
+    compare(list(y), [ n / 2.0 for n in range(num_rows) ])
+
+    s, = table.readColumns(["s"], start=100, stop=200)
+    compare(list(s), [ -n % 1000 for n in range(100, 200) ])
+    compare(len(table.readColumns(["s"], start=4990, stop=6000)[0]), 10)
+    compare(len(table.readColumns(["s"], start=10, stop=5)[0]), 0)
+    for start, stop in ((-5, None), (0, -5)):
+        try:
+            table.readColumns(["i"], start, stop)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError, "negative row index should be rejected"
+
+    i, s = table.readColumns(("i", "s"), stop=1000, selection="i % 7 == 3")
+    compare(list(i), range(3, 1000, 7))
+    compare(list(s), [ -n % 1000 for n in range(3, 1000, 7) ])
+
+    try:
+        table.readColumns(["c"])
+    except NotImplementedError:
+        pass
+    else:
+        raise AssertionError, "complex column should not be supported"
+    del table
@@ -0,0 +1,140 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import hep.expr
+import hep.ext
+import hep.table
+from   hep.test import compare
+import math
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 10000
+
+def x(i):
+    return (i % 11) - 5.0
+
+def y(i):
+    return (i % 7) * 0.5
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+schema.addColumn("y", "float32")
+table = hep.table.create("cse1.table", schema)
+for i in range(num_rows):
+    table.append(i=i, x=x(i), y=y(i))
+
+# Expressions compiled together have an output for each.
+expressions = [ hep.expr.parse(e) for e in (
+    "sqrt(x * x + y * y)",
+    "sqrt(x * x + y * y) / (y + 1)",
+    "x * x + y * y < 4",
+    "y - x",
+    "x - y",
+    ) ]
+compiled = hep.table.compileMultiple(table, expressions)
+compare(compiled.outputs, len(expressions))
+singles = [ hep.table.compile(table, e) for e in expressions ]
+
+# The shared subexpressions are computed only once.
+compare(compiled.length < sum([ c.length for c in singles ]), True)
+compare(repr(compiled).count("DOUBLE_SQRT"), 1)
+
+# Rows give a tuple of the outputs' values.
+row = table[1234]
+compare(compiled.evaluate(row), tuple([ c.evaluate(row) for c in singles ]))
+compare(compiled.evaluate(row)[3], y(1234) - x(1234))
+compare(compiled.evaluate(row)[4], x(1234) - y(1234))
+
+# Blocks give a list of values for each output.
+outputs = compiled.evaluateBlock(table, 100, 5000)
+compare(len(outputs), len(expressions))
+for values, single in zip(outputs, singles):
+    compare(values, single.evaluateBlock(table, 100, 5000))
+
+# Only subexpressions that are always evaluated are shared, so the
+# lazy operands aren't evaluated for rows where they'd fail.
+compiled = hep.table.compileMultiple(
+    table, [ hep.expr.parse("x > 0 and sqrt(x) > 1"),
+             hep.expr.parse("x > 0 and sqrt(x) < 2") ])
+compare(compiled.evaluate(table[0]), (False, False))
+compare(compiled.evaluate(table[9]), (True, False))
+
+# Projections evaluate their expressions together, but give the same
+# results as evaluating them separately on each row.
+def makeFunction(values):
+    return lambda v, w: values.append((v, w))
+
+def projectBoth(projections, weight):
+    results = []
+    for rows in (table, table.rows):
+        values = tuple([ [] for p in projections ])
+        total_weight = hep.table.project(
+            rows,
+            [ (p[0], makeFunction(v)) + tuple(p[1:])
+              for p, v in zip(projections, values) ],
+            weight=hep.expr.parse(weight), handle_expr_exceptions=True)
+        results.append(values + (total_weight, ))
+    compare(results[0], results[1])
+    return results[0]
+
+# The weight, selections, and expressions share subexpressions, and are
+# evaluated on blocks of rows together.
+projections = (
+    ("sqrt(x * x + y * y)", ),
+    ("sqrt(x * x + y * y) * 2", "sqrt(x * x + y * y) > 1"),
+    ("x * y", "y + 1 > 2"),
+    )
+weight = "y + 1"
+combined = hep.table.compileMultiple(
+    table, [weight, "sqrt(x * x + y * y)", "sqrt(x * x + y * y) > 1",
+             "sqrt(x * x + y * y) * 2", "y + 1 > 2", "x * y"])
+compare(combined.evaluateBlock(table, 0, len(table)) is None, False)
+fused = projectBoth(projections, weight)
+compare(fused[1][:3], [ (2 * math.hypot(x(i), y(i)), y(i) + 1)
+                        for i in range(3) ])
+compare(len(fused[2]), len([ i for i in range(num_rows) if y(i) + 1 > 2 ]))
+
+# Expressions that can't be evaluated on blocks are evaluated together
+# row by row.
+projections = (
+    ("if_then(x > 0, sqrt(x * x + y * y), 0)", ),
+    ("sqrt(x * x + y * y) + 1", "x > 0"),
+    )
+fused = projectBoth(projections, "y + 1")
+compare(len(fused[1]), len([ i for i in range(num_rows) if x(i) > 0 ]))
+
+# Rows for which an expression raises an exception are evaluated one
+# expression at a time, so that exceptions are handled as for rows
+# projected one at a time.
+projections = (
+    ("sqrt(x * x + y * y)", ),
+    ("1 / x", ),
+    ("1 / y", "sqrt(x * x + y * y) > 1"),
+    )
+fused = projectBoth(projections, "y + 1")
+compare(len(fused[0]), num_rows)
+compare(len(fused[1]), len([ i for i in range(num_rows) if x(i) != 0 ]))
+compare(len(fused[2]), len([ i for i in range(num_rows)
+                             if y(i) != 0 and math.hypot(x(i), y(i)) > 1 ]))
+
+# The number of outputs is fixed when the expression is created.
+compiled = hep.expr.compile(hep.expr.parse("1 + 2"))
+try:
+    compiled.outputs = 2
+except AttributeError:
+    pass
+else:
+    raise AssertionError, "outputs set"
+compiled = hep.ext.Expr(outputs=2)
+compiled.extend(hep.expr.compile(hep.expr.parse("1 + 2")))
+try:
+    compiled.evaluate({})
+except ValueError:
+    pass
+else:
+    raise AssertionError, "missing output not detected"
@@ -0,0 +1,64 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+import struct
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+schema.addColumn("f", "float32")
+
+# Extend with mappings.
+table = hep.table.create("extend1.table", schema)
+table.extend([ { "i": i, "x": i * 0.5, "f": -i } for i in range(100) ])
+compare(len(table), 100)
+
+# Extend with rows from a table with the same columns.
+other = hep.table.create("extend1-other.table", schema, layout="columns")
+other.extend(table.select("i % 2 == 0"))
+compare(len(other), 50)
+compare([ row["i"] for row in other ], range(0, 100, 2))
+compare(other[10]["x"], 10.0)
+del other
+
+# Append columns, some from arrays and some from lists.
+table.appendColumns(i=array.array("i", range(100, 200)),
+                    x=array.array("d", [ i * 0.5 for i in range(100, 200) ]),
+                    f=[ -i for i in range(100, 200) ])
+compare(len(table), 200)
+for row in table:
+    i = row["_index"]
+    compare(row["i"], i)
+    compare(row["x"], i * 0.5)
+    compare(row["f"], float(-i))
+
+try:
+    table.appendColumns(i=[1, 2], x=[1.0], f=[1.0, 2.0])
+except ValueError:
+    pass
+else:
+    raise AssertionError, "mismatched lengths not detected"
+try:
+    table.appendColumns(i=[1], x=[1.0])
+except ValueError:
+    pass
+else:
+    raise AssertionError, "missing column not detected"
+
+# After flushing, the row count in the file is up to date.
+table.flush()
+header = file("extend1.table", "rb").read(12)
+compare(struct.unpack("iii", header)[2], 200)
+del table
+
+table = hep.table.open("extend1.table")
+compare(len(table), 200)
+compare(table[150]["x"], 75.0)
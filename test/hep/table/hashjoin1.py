@@ -0,0 +1,107 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+# Candidates, several per event, and MC truth for some events.
+num_events = 1000
+candidate_events = [ (i * 7) % num_events for i in range(3000) ]
+
+schema = hep.table.Schema()
+schema.addColumn("evt", "int32")
+schema.addColumn("mass", "float64")
+candidates = hep.table.create("hashjoin1-candidates.table", schema)
+candidates.appendColumns(
+    evt=array.array("i", candidate_events),
+    mass=array.array("d", [ i * 0.5 for i in range(3000) ]))
+
+schema = hep.table.Schema()
+schema.addColumn("event", "int32")
+schema.addColumn("true_mass", "float32")
+truth = hep.table.create("hashjoin1-truth.table", schema)
+truth_events = range(0, num_events, 2) + [ 5000 ]
+truth.appendColumns(
+    event=array.array("i", truth_events),
+    true_mass=array.array("f", [ e * 0.25 for e in truth_events ]))
+
+def expected(how):
+    pairs = []
+    for i in range(len(candidate_events)):
+        event = candidate_events[i]
+        if event % 2 == 0:
+            pairs.append((i, event // 2))
+        elif how == "left":
+            pairs.append((i, None))
+    return pairs
+
+def joined(pairs):
+    result = []
+    for row, other_row in pairs:
+        if other_row is None:
+            result.append((row["_index"], None))
+        else:
+            compare(row["evt"], other_row["event"])
+            result.append((row["_index"], other_row["_index"]))
+    return result
+
+# An inner join pairs rows with equal keys; a left join keeps rows
+# without a match.  The smaller table is indexed either way.
+compare(joined(candidates.join(truth, ("evt", "event"))), expected("inner"))
+compare(joined(candidates.join(truth, ("evt", "event"), how="left")),
+        expected("left"))
+# Pairs are in order of rows of the table whose method is called.
+pairs = joined([ (c, t) for t, c in truth.join(candidates, ("event", "evt")) ])
+compare([ t for c, t in pairs ], [ t for c, t in sorted(expected("inner"),
+                                                        key=lambda p: p[1]) ])
+pairs.sort()
+compare(pairs, expected("inner"))
+pairs = list(truth.join(candidates, ("event", "evt"), how="left"))
+compare(len(pairs), 1501)
+compare(pairs[-1][0]["event"], 5000)
+compare(pairs[-1][1], None)
+del pairs
+
+# The keys may be expressions.
+compare(len(list(candidates.join(truth, ("evt + 2", "event")))),
+        len([ e for e in candidate_events if e % 2 == 0 and e + 2 < num_events ]))
+
+# Keys must be integers.
+try:
+    candidates.join(truth, ("mass", "true_mass"))
+except TypeError:
+    pass
+else:
+    raise AssertionError, "non-integer join key not detected"
+try:
+    candidates.join(truth, "evt", how="outer")
+except ValueError:
+    pass
+else:
+    raise AssertionError, "invalid join not detected"
+del truth
+
+# Write the joined rows into a new table.  The other table may be given
+# by name.
+schema = hep.table.Schema()
+schema.addColumn("evt", "int32")
+schema.addColumn("mass", "float64")
+schema.addColumn("true_mass", "float32")
+target = hep.table.create("hashjoin1-joined.table", schema)
+compare(candidates.join("hashjoin1-truth", ("evt", "event"), how="left",
+                        table=target), 3000)
+compare(len(target), 3000)
+for i in (0, 1, 2, 1500, 2999):
+    event = candidate_events[i]
+    compare(target[i]["evt"], event)
+    compare(target[i]["mass"], i * 0.5)
+    if event % 2 == 0:
+        compare(target[i]["true_mass"], event * 0.25)
+    else:
+        compare(target[i]["true_mass"], 0)
@@ -0,0 +1,106 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 10000
+
+def pt(i):
+    return tuple([ ((i * 7 + j) % 10) * 0.5 for j in range(i % 5) ])
+
+def x(i):
+    return (i * 37 % 1000) * 0.01
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("pt", "jagged")
+schema.addColumn("x", "float64")
+for layout in ("rows", "columns"):
+    table = hep.table.create("jagged1-%s.table" % layout, schema,
+                             layout=layout)
+    for i in range(num_rows):
+        table.append(i=i, pt=pt(i), x=x(i))
+    # Values are read before they're written to the file.
+    compare(table[num_rows - 1]["pt"], pt(num_rows - 1))
+    del table
+
+for layout in ("rows", "columns"):
+    table = hep.table.open("jagged1-%s.table" % layout)
+    compare(len(table), num_rows)
+
+    # Rows give the values as tuples.
+    compare(table[0]["pt"], ())
+    compare(table[1234]["pt"], pt(1234))
+    compare([ r["pt"] for r in table.iterRows(100, 110) ],
+            map(pt, range(100, 110)))
+
+    # Expressions reduce and index the values, on blocks of rows ...
+    compare([ r["i"] for r in table.select("len(pt) == 4 and pt[-1] > 4") ],
+            [ i for i in range(num_rows)
+              if len(pt(i)) == 4 and pt(i)[-1] > 4 ])
+    compare([ r["i"] for r in table.select("len(pt) > 0 and max(pt) < 1") ],
+            [ i for i in range(num_rows) if pt(i) and max(pt(i)) < 1 ])
+    compare(table.compile("sum(pt)").evaluateBlock(table, 200, 210),
+            [ sum(pt(i)) for i in range(200, 210) ])
+    compare(table.compile("any(pt)").evaluateBlock(table, 200, 210),
+            [ len([ v for v in pt(i) if v ]) > 0 for i in range(200, 210) ])
+    compare(table.compile("min(pt) + x").evaluateBlock(table, 201, 205),
+            [ min(pt(i)) + x(i) for i in range(201, 205) ])
+
+    # ... and on single rows, raising the same errors as for tuples.
+    compiled = table.compile("pt[1] * 2 + len(pt)")
+    compare(compiled.evaluate(table[1233]), pt(1233)[1] * 2 + 3)
+    for expression, exception in (("pt[2]", IndexError),
+                                  ("max(pt)", ValueError)):
+        try:
+            table.compile(expression).evaluate(table[1230])
+        except exception:
+            pass
+        else:
+            raise AssertionError, "%s of empty list not detected" \
+                  % expression
+
+    # Jagged columns can't be indexed or sorted by.
+    try:
+        table.createIndex("pt")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError, "index of jagged column not detected"
+
+    # Skims and sorts copy the values.
+    skimmed = table.skim("jagged1-%s-skim.table" % layout, "len(pt) == 2",
+                         columns=["i", "pt"])
+    compare([ r["pt"] for r in skimmed ],
+            [ pt(i) for i in range(num_rows) if len(pt(i)) == 2 ])
+    sorted_table = hep.table.sort(
+        "jagged1-%s.table" % layout, "jagged1-%s-sorted.table" % layout,
+        ["x", "i"], memory_limit=50000)
+    order = sorted(range(num_rows), key=lambda i: (x(i), i))
+    compare([ r["pt"] for r in sorted_table ], map(pt, order))
+    del skimmed, sorted_table, table
+
+# Compiled expressions use sequences of values bound to names, too.
+compiled = hep.expr.compile(hep.expr.parse("sum(v) + v[0]"))
+compare(compiled.evaluate({"v": (1.0, 2.5)}), 4.5)
+expression = hep.expr.setTypes(hep.expr.parse("sum(v) + v[0]"),
+                               v=hep.expr.Jagged)
+compare(hep.expr.compile(expression).evaluate({"v": (1.0, 2.5)}), 4.5)
+
+# A column may have the name of one of the jagged functions.
+schema = hep.table.Schema()
+schema.addColumn("sum", "float64")
+schema.addColumn("pt", "jagged")
+table = hep.table.create("jagged1-names.table", schema)
+for i in range(5):
+    table.append(sum=float(i), pt=pt(i))
+compare([ r["sum"] for r in table.select("sum > 2") ], [3.0, 4.0])
+compare(table.compile("sum(pt) + sum").evaluateBlock(table, 0, 5),
+        [ sum(pt(i)) + i for i in range(5) ])
+compare(hep.expr.parse("sum + len").evaluate({"sum": 1, "len": 2}), 3)
@@ -0,0 +1,97 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+import os
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+# More rows than fit in one block.
+num_rows = 10000
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+table = hep.table.create("materialize1.table", schema)
+table.appendColumns(
+    i=array.array("i", range(num_rows)),
+    x=array.array("d", [ (i * 37 % 1000) * 0.01 for i in range(num_rows) ]))
+
+def r(i):
+    return (i * 37 % 1000) * 0.01 * 2 + 1
+
+table.materialize("r", "x * 2 + 1")
+table.materialize("j", "i // 3")
+table.materialize("odd", "i % 2 == 1")
+compare(os.path.isfile(table.path + ".r.column"), True)
+compare(isinstance(table.schema["r"], hep.table.MaterializedColumn), True)
+compare(len(table.schema.columns), 2)
+
+# Materialized columns are used like other columns in expressions.
+compare(table.compile("r").evaluate(table[17]), r(17))
+compare(table.compile("j + 1").evaluate(table[17]), 6)
+compare([ row["i"] for row in table.select("r > 20 and odd") ],
+        [ i for i in range(num_rows) if r(i) > 20 and i % 2 == 1 ])
+compare(table.compile("r - 1").evaluateBlock(table, 100, 110),
+        [ r(i) - 1 for i in range(100, 110) ])
+
+# A name can't be both a column and a materialized column.
+try:
+    table.materialize("x", "i + 1")
+except ValueError:
+    pass
+else:
+    raise AssertionError, "materializing an existing column not detected"
+del row, table
+
+# The values are stored, and the column is restored with the table.
+table = hep.table.open("materialize1.table", update=True)
+mask, values = table.getMaterialized("r")
+compare(len(values), num_rows)
+compare(values[123], r(123))
+compare(len([ i for i in range(num_rows) if not mask[i] ]), 0)
+del mask, values
+
+# Values for appended rows are computed when they are used, or by
+# materializing the column again.
+for i in range(num_rows, num_rows + 100):
+    table.append(i=i, x=(i * 37 % 1000) * 0.01)
+compare(table.compile("r").evaluate(table[num_rows + 5]), r(num_rows + 5))
+table.materialize("r", "x * 2 + 1")
+mask, values = table.getMaterialized("r")
+compare(len(values), num_rows + 100)
+compare(values[num_rows + 50], r(num_rows + 50))
+compare(len([ i for i in range(num_rows + 100) if not mask[i] ]), 0)
+compare([ row["i"] for row in table.select("j == 3340") ],
+        [10020, 10021, 10022])
+del mask, values, row
+
+# Materializing a different expression recomputes the values.
+table.materialize("j", "i * 3")
+compare(table.compile("j").evaluate(table[10]), 30)
+del table
+
+# A table created again at the same path doesn't use the values
+# materialized for the earlier table.
+import shutil
+shutil.copy("materialize1.table.r.column", "materialize1-old.column")
+table = hep.table.create("materialize1.table", schema)
+compare(os.path.isfile("materialize1.table.r.column"), False)
+table.appendColumns(
+    i=array.array("i", range(num_rows)),
+    x=array.array("d", [ i * 100.0 for i in range(num_rows) ]))
+table.materialize("r", "x * 2 + 1")
+compare(table.compile("r").evaluateBlock(table, 0, 3), [ 1.0, 201.0, 401.0 ])
+del table
+
+# Nor does it use a values file left by the earlier table.
+shutil.copy("materialize1-old.column", "materialize1.table.r.column")
+table = hep.table.open("materialize1.table")
+mask, values = table.getMaterialized("r")
+compare(len([ i for i in range(num_rows) if mask[i] ]), 0)
+compare(table.compile("r").evaluate(table[2]), 401.0)
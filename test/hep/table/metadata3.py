@@ -0,0 +1,78 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import hep.table
+from   hep.test import compare
+import os
+import pickle
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+metadata_path = "metadata3.table.metadata"
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32", units="events")
+schema.addColumn("x", "float64")
+table = hep.table.create("metadata3.table", schema)
+for i in range(1000):
+    table.append(i=i, x=i * 0.5)
+table.run = 17
+table.notes = [ "first", "second" ]
+table.materialize("y", "x * 2")
+compare(table.statistics("x").count, 1000)
+table.cache("i % 2 == 0")
+del table
+
+# The metadata is stored in sections.
+compare(file(metadata_path).read(8), "HEPTMETA")
+
+# Attributes and caches are restored when they are used.
+table = hep.table.open("metadata3.table", update=True)
+compare(table.schema["i"].units, "events")
+compare(isinstance(table.schema["y"], hep.table.MaterializedColumn), True)
+compare(table.path, os.path.realpath("metadata3.table"))
+compare(table.run, 17)
+compare(table.notes, [ "first", "second" ])
+compare(len(table.statistics_cache), 1)
+compare(len(table.expression_cache), 1)
+compare(len(list(table.select("i % 2 == 0"))), 500)
+compare(getattr(table, "nosuch", None), None)
+del table
+
+# Metadata that hasn't changed isn't written again.
+os.utime(metadata_path, (1000000000, 1000000000))
+table = hep.table.open("metadata3.table")
+compare([ row["i"] for row in table.select("i > 995") ], [ 996, 997, 998, 999 ])
+compare(table.run, 17)
+del row, table
+compare(os.stat(metadata_path).st_mtime, 1000000000)
+
+# Setting an attribute keeps the others, without using them.
+table = hep.table.open("metadata3.table", update=True)
+table.run = 18
+table.energy = 10.58
+del table
+table = hep.table.open("metadata3.table", update=True)
+compare((table.run, table.energy, table.notes[1]), (18, 10.58, "second"))
+compare(len(table.statistics_cache), 1)
+del table.notes
+del table
+table = hep.table.open("metadata3.table")
+compare(hasattr(table, "notes"), False)
+compare(table.run, 18)
+schema = table.schema
+del table
+
+# Metadata stored as a pickled tuple by older versions is still read.
+file(metadata_path, "w").write(
+    pickle.dumps(({ "run": 5 }, schema, {}, None, {}), 1))
+table = hep.table.open("metadata3.table")
+compare(table.run, 5)
+compare(table.schema["i"].units, "events")
+del table
+compare(file(metadata_path).read(8), "HEPTMETA")
+table = hep.table.open("metadata3.table")
+compare(table.run, 5)
@@ -0,0 +1,37 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+schema = hep.table.Schema()
+schema.addColumn("x", "int32")
+schema.addColumn("y", "float64")
+table = hep.table.create("mmap1.table", schema)
+for i in range(1000):
+    table.append(x=i, y=i * 0.5)
+del schema, table
+
+# Read the table through a mapping.
+table = hep.table.open("mmap1.table", mmap=True)
+compare(len(table), 1000)
+for row in table:
+    compare(row["y"], row["x"] * 0.5)
+rows = [ table[i] for i in range(0, 1000, 7) ]
+for row in rows:
+    compare(row["x"], row["_index"])
+del rows, row, table
+
+# Rows appended after the file is mapped must be visible.
+table = hep.table.open("mmap1.table", update=True, mmap=True)
+compare(table[999]["x"], 999)
+for i in range(1000, 1500):
+    table.append(x=i, y=i * 0.5)
+compare(len(table), 1500)
+compare(table[1499]["x"], 1499)
+compare(sum([ row["x"] for row in table ]), sum(range(1500)))
@@ -0,0 +1,96 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import hep.table
+from   hep.test import compare
+import os
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 10000
+charges = (-1, 0, 1, 1000000)
+
+def flags(i):
+    return [ (i >> b) % 2 == 1 for b in range(10) ]
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+for b in range(10):
+    schema.addColumn("f%d" % b, "bit")
+schema.addColumn("q", "dict8", dictionary=charges)
+hep.table.create("packed1-empty.table", schema)
+
+for layout in ("rows", "columns"):
+    table = hep.table.create("packed1-%s.table" % layout, schema,
+                             layout=layout)
+    for i in range(num_rows):
+        values = dict([ ("f%d" % b, f) for b, f in enumerate(flags(i)) ])
+        table.append(i=i, q=charges[i % 4], **values)
+
+    # A value not in the dictionary can't be stored.
+    try:
+        table.append(i=-1, q=2)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError, "value not in dictionary not detected"
+    del table
+
+# Ten bit columns fit in two bytes, and the dictionary column in one.
+compare(os.path.getsize("packed1-rows.table")
+        - os.path.getsize("packed1-empty.table"), num_rows * 7)
+
+# A dictionary column needs a dictionary.
+try:
+    schema.addColumn("r", "dict8")
+except ValueError:
+    pass
+else:
+    raise AssertionError, "missing dictionary not detected"
+
+for layout in ("rows", "columns"):
+    table = hep.table.open("packed1-%s.table" % layout)
+    compare(table.schema["q"].dictionary, charges)
+    compare(len(table), num_rows)
+
+    # Values are decoded when they're read from rows.
+    row = table[1234]
+    compare([ row["f%d" % b] for b in range(10) ], flags(1234))
+    compare(row["q"], charges[1234 % 4])
+    compare(row["f1"] is True, True)
+
+    # ... when they're read as columns.
+    f3, q = table.readColumns(["f3", "q"])
+    compare(list(f3), [ int(flags(i)[3]) for i in range(num_rows) ])
+    compare(list(q), [ charges[i % 4] for i in range(num_rows) ])
+    f9, q = table.readColumns(["f9", "q"], selection="i > 9990")
+    compare(list(f9), [ int(flags(i)[9]) for i in range(9991, num_rows) ])
+
+    # ... and when they're used in expressions.
+    compare([ r["i"] for r in table.select("f2 and f5 and q > 0") ],
+            [ i for i in range(num_rows)
+              if flags(i)[2] and flags(i)[5] and charges[i % 4] > 0 ])
+    compare(table.compile("q * 2 + f1").evaluateBlock(table, 100, 104),
+            [ charges[i % 4] * 2 + flags(i)[1] for i in range(100, 104) ])
+    statistics = table.statistics("q")
+    compare(statistics.maximum, 1000000)
+    compare(statistics.minimum, -1)
+
+    # Skims and sorts keep the bits of each column apart.
+    skimmed = table.skim("packed1-%s-skim.table" % layout, "f7",
+                         columns=["i", "f1", "f7", "q"])
+    compare([ r["i"] for r in skimmed ],
+            [ i for i in range(num_rows) if flags(i)[7] ])
+    compare([ (r["f1"], r["q"]) for r in skimmed ],
+            [ (flags(i)[1], charges[i % 4])
+              for i in range(num_rows) if flags(i)[7] ])
+    sorted_table = hep.table.sort(
+        "packed1-%s.table" % layout, "packed1-%s-sorted.table" % layout,
+        ["q", "f0", "i"])
+    compare([ (r["q"], r["f0"]) for r in sorted_table.select("i < 8") ],
+            [ (-1, False), (-1, False), (0, True), (0, True),
+              (1, False), (1, False), (1000000, True), (1000000, True) ])
+    del row, skimmed, sorted_table, table
@@ -0,0 +1,95 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+from   hep.hist import AxesIterator, Histogram, Histogram1D
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# test
+#-----------------------------------------------------------------------
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+schema.addColumn("y", "float32")
+
+table1 = hep.table.create("project2-1.table", schema)
+for i in range(5000):
+    table1.append(i=i, x=(i * 37 % 1000) * 0.01, y=(i % 17) * 0.5)
+table2 = hep.table.create("project2-2.table", schema, layout="columns")
+for i in range(3001):
+    table2.append(i=i, x=(i * 53 % 1000) * 0.01, y=(i % 13) * 0.5)
+
+
+def makeHistograms():
+    return (
+        Histogram1D(20, (0.0, 10.0)),
+        Histogram1D(20, (0.0, 10.0), bin_type=float),
+        Histogram((10, (0.0, 10.0)), (10, (0.0, 8.0)), bin_type=float),
+        Histogram1D(10, (0.0, 10.0), bin_type=float,
+                    error_model="symmetric"),
+        )
+
+
+def makeProjections(histograms):
+    h1, h2, h3, h4 = histograms
+    return (
+        ("x", h1.accumulate),
+        ("x + y", h2.accumulate, "i % 3 == 0"),
+        ("(x, y)", h3.accumulate),
+        ("y", h4.accumulate),
+        )
+
+
+def compareHistograms(histogram1, histogram2, precision=None):
+    # Contents and errors are identical, unless a precision is given.
+    compare(histogram1.number_of_samples, histogram2.number_of_samples)
+    for bin in AxesIterator(histogram1.axes, True):
+        compare(histogram1.getBinContent(bin),
+                histogram2.getBinContent(bin), precision)
+        compare(histogram1.getBinError(bin),
+                histogram2.getBinError(bin), precision)
+
+
+for rows in (table1, hep.table.Chain(table1, table2)):
+    serial = makeHistograms()
+    serial_weight = hep.table.project(rows.rows, makeProjections(serial))
+    for processes in (2, 5):
+        parallel = makeHistograms()
+        parallel_weight = hep.table.project(
+            rows, makeProjections(parallel), processes=processes)
+        compare(parallel_weight, serial_weight)
+        for histogram1, histogram2 in zip(serial, parallel):
+            compareHistograms(histogram1, histogram2)
+
+# Weighted projection.
+serial = makeHistograms()
+serial_weight = hep.table.project(table1, makeProjections(serial),
+                                  weight=hep.expr.parse("y"))
+parallel = makeHistograms()
+parallel_weight = hep.table.project(table1, makeProjections(parallel),
+                                    weight=hep.expr.parse("y"), processes=3)
+compare(abs(parallel_weight - serial_weight) < 1e-6, True)
+for histogram1, histogram2 in zip(serial, parallel):
+    compareHistograms(histogram1, histogram2, 1e-9)
+
+# Only histograms can be filled in processes.
+values = []
+try:
+    hep.table.project(table1, (("x", lambda v, w: values.append(v)), ),
+                      processes=2)
+except TypeError:
+    pass
+else:
+    raise AssertionError, "non-histogram function not detected"
+
+# Exceptions in worker processes are reported.
+try:
+    hep.table.project(table1, (("x / (i - 4000)", serial[0].accumulate), ),
+                      processes=2)
+except RuntimeError:
+    pass
+else:
+    raise AssertionError, "exception in worker process not reported"
@@ -0,0 +1,153 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+import os
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 10000
+
+def x(i):
+    return (i * 37 % 1000) * 0.01
+
+def p(i):
+    return (i * 7919 % 10007) * 0.0173 - 50
+
+# Half-precision values have 11 significant bits.
+for value, stored in [(1.0, 1.0),
+                      (1 + 2 ** -11, 1.0),
+                      (1 + 3 * 2 ** -11, 1 + 2 ** -9),
+                      (65504.0, 65504.0),
+                      (-2 ** -24, -2 ** -24),
+                      (2 ** -26, 0.0),
+                      (1e10, None)]:
+    schema = hep.table.Schema()
+    schema.addColumn("h", "float16")
+    table = hep.table.create("quantize1-half.table", schema)
+    if stored is None:
+        try:
+            table.append(h=value)
+        except OverflowError:
+            pass
+        else:
+            raise AssertionError, "float16 overflow not detected"
+    else:
+        table.append(h=value)
+        compare(table[0]["h"], stored)
+    del table
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+schema.addColumn("p", "float64")
+schema.addColumn("pt", "jagged")
+schema.addColumn("z", "complex64")
+table = hep.table.create("quantize1.table", schema)
+for i in range(num_rows):
+    table.append(i=i, x=x(i), p=p(i), pt=(x(i), ) * (i % 3), z=i - 2j)
+del table
+
+for layout in ("rows", "columns"):
+    # Copy the table with the float columns quantized.
+    path = "quantize1-%s.table" % layout
+    errors = hep.table.quantize(
+        "quantize1.table", path,
+        { "x": ("fixed16", 0.01), "p": "float16" }, layout=layout)
+    compare(errors["x"] < 1e-12, True)
+    compare(0 < errors["p"] <= 0.0625 / 2, True)
+
+    table = hep.table.open(path)
+    compare([ (c.name, c.type) for c in table.schema.columns ],
+            [ ("i", "int32"), ("x", "fixed16"), ("p", "float16"),
+              ("pt", "jagged"), ("z", "complex64") ])
+    compare(table.schema["x"].scale, 0.01)
+    compare(table.schema["x"].offset, 0.0)
+    compare(len(table), num_rows)
+
+    # Values are decoded when they're read from rows ...
+    row = table[1234]
+    compare(abs(row["x"] - x(1234)) < 1e-12, True)
+    compare(abs(row["p"] - p(1234)) <= errors["p"], True)
+    compare(row["pt"], (x(1234), ))
+    compare(row["z"], 1234 - 2j)
+
+    # ... when they're read as columns ...
+    xs, ps = table.readColumns(["x", "p"], 100, 200)
+    compare(xs.typecode, "d")
+    compare(ps.typecode, "f")
+    compare(max([ abs(v - x(i)) for i, v in zip(range(100, 200), xs) ])
+            < 1e-12, True)
+
+    # ... and when they're used in expressions.
+    compare([ r["i"] for r in table.select("x > 9.9") ],
+            [ i for i in range(num_rows) if x(i) > 9.9 ])
+    compare([ r["i"] for r in table.select("p < -49.9") ],
+            [ r["i"] for r in table if r["p"] < -49.9 ])
+    compare(table.statistics("x").maximum, 9.99)
+    del row, table
+
+# The quantized columns are smaller.  The fixed-point column's scale
+# and offset are stored in the header.
+compare(os.path.getsize("quantize1.table")
+        - os.path.getsize("quantize1-rows.table"), num_rows * 12 - 16)
+
+# A fixed-point column's scale can be chosen to fit its values.
+errors = hep.table.quantize("quantize1.table", "quantize1-fit.table",
+                            { "p": "fixed16" })
+table = hep.table.open("quantize1-fit.table")
+scale = table.schema["p"].scale
+compare(0 < errors["p"] <= scale / 2 + 1e-12, True)
+minimum = min(map(p, range(num_rows)))
+compare(abs(table.statistics("p").minimum - minimum) <= scale / 2 + 1e-12,
+        True)
+del table
+
+# Values out of range of a fixed-point column can't be stored.
+schema = hep.table.Schema()
+schema.addColumn("f", "fixed16", scale=0.5, offset=100)
+table = hep.table.create("quantize1-range.table", schema)
+table.append(f=100 + 0.5 * 32767)
+compare(table[0]["f"], 100 + 0.5 * 32767)
+try:
+    table.append(f=100 + 0.5 * 32768)
+except OverflowError:
+    pass
+else:
+    raise AssertionError, "fixed16 overflow not detected"
+
+try:
+    schema.addColumn("g", "fixed32")
+except ValueError:
+    pass
+else:
+    raise AssertionError, "missing scale not detected"
+
+# Quantizing again into the same path computes materialized columns for
+# the new copy.
+for modulus in (2, 3):
+    table = hep.table.open("quantize1.table", update=True)
+    table.materialize("m", "i %% %d" % modulus)
+    del table
+    hep.table.quantize("quantize1.table", "quantize1-again.table",
+                       { "x": ("fixed16", 0.01) })
+    table = hep.table.open("quantize1-again.table")
+    compare(len(table), num_rows)
+    compare([ r["i"] for r in table.select("m == 1", stop=100) ],
+            [ i for i in range(100) if i % modulus == 1 ])
+    del r, table
+
+# A table can't be quantized onto itself.
+try:
+    hep.table.quantize("quantize1.table", "quantize1.table",
+                       { "x": "float16" })
+except ValueError:
+    pass
+else:
+    raise AssertionError, "quantizing onto source table not detected"
+compare(len(hep.table.open("quantize1.table")), num_rows)
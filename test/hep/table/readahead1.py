@@ -0,0 +1,86 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 20000
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+table = hep.table.create("readahead1.table", schema)
+table.appendColumns(
+    i=array.array("i", range(num_rows)),
+    x=array.array("d", [ i * 0.5 for i in range(num_rows) ]))
+compare(table.io_statistics, None)
+del table
+
+# Small blocks, so that the ring is reused many times.
+table = hep.table.open("readahead1.table", update=True, read_ahead=3,
+                       read_ahead_block_size=1000)
+statistics = table.io_statistics
+compare(statistics["depth"], 3)
+compare(statistics["block_size"], 996)
+
+# Rows read in order come from the blocks read ahead.
+compare([ row["i"] for row in table ], range(num_rows))
+compare([ row["i"] for row in table.select("x > 9990") ],
+        range(19981, num_rows))
+compare(sum(table.readColumns(["x"], 100, 15000)[0]),
+        sum([ i * 0.5 for i in range(100, 15000) ]))
+compare(table.io_statistics["blocks"] >= num_rows / 83, True)
+
+# Rows read out of order restart reading ahead.
+restarts = table.io_statistics["restarts"]
+for i in [ 5, 17000, 3, 3, 19999, 0 ]:
+    compare(table[i]["i"], i)
+    compare(table[i]["x"], i * 0.5)
+compare(table.io_statistics["restarts"] > restarts, True)
+
+# Appended rows are read ahead once they are written.
+for i in range(num_rows, num_rows + 500):
+    table.append(i=i, x=i * 0.5)
+compare([ row["i"] for row in table.select("i >= 19990") ],
+        range(19990, num_rows + 500))
+table.flush()
+compare([ row["i"] for row in table.select("i >= 19990") ],
+        range(19990, num_rows + 500))
+compare(table[num_rows + 499]["x"], (num_rows + 499) * 0.5)
+del row, table
+
+# Read-ahead isn't used for columnar tables.
+table = hep.table.create("readahead1c.table", schema, layout="columns")
+for i in range(100):
+    table.append(i=i, x=i * 0.5)
+del table
+table = hep.table.open("readahead1c.table", read_ahead=4)
+compare(table.io_statistics, None)
+compare([ row["i"] for row in table ], range(100))
+del row, table
+
+# Opening a table that's already open sets the read-ahead requested.
+table = hep.table.open("readahead1.table")
+compare(table.io_statistics, None)
+compare(hep.table.open("readahead1.table") is table, True)
+compare(hep.table.open("readahead1.table", read_ahead=4) is table, True)
+compare(table.io_statistics["depth"], 4)
+hep.table.open("readahead1.table")
+compare(table.io_statistics["depth"], 4)
+hep.table.open("readahead1.table", read_ahead=0)
+compare(table.io_statistics, None)
+
+# Whether it's mapped can't be changed.
+try:
+    hep.table.open("readahead1.table", mmap=True)
+except ValueError:
+    pass
+else:
+    raise AssertionError, "mmap of open table changed"
+del table
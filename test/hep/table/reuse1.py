@@ -0,0 +1,54 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 10000
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+table = hep.table.create("reuse1.table", schema)
+table.appendColumns(
+    i=array.array("i", range(num_rows)),
+    x=array.array("d", [ (i * 37 % 1000) * 0.01 for i in range(num_rows) ]))
+
+# Reused rows give the same values.
+compare([ row["i"] for row in table.iterRows(reuse=True) ], range(num_rows))
+compare([ row["i"] for row in table.iterRows(100, 200, reuse=True) ],
+        range(100, 200))
+compare([ row["i"] for row in table.select("x > 9.9", reuse=True) ],
+        [ i for i in range(num_rows) if (i * 37 % 1000) * 0.01 > 9.9 ])
+compare([ row["_index"] for row in table.select("i % 7 == 3", stop=50,
+                                                 reuse=True) ],
+        [ 3, 10, 17, 24, 31, 38, 45 ])
+
+# A row object is reused only when nothing else refers to it.
+rows = table.iterRows(reuse=True)
+row0 = rows.next()
+row1 = rows.next()
+compare(row0 is row1, False)
+compare(row0["i"], 0)
+compare(row1["i"], 1)
+row0_id = id(row0)
+del row0
+row2 = rows.next()
+compare(id(row2), row0_id)
+compare(row2["i"], 2)
+compare(row1["i"], 1)
+del row1, row2, rows
+
+# Rows that are kept are not reused.
+rows = list(table.iterRows(reuse=True))
+compare(len(rows), num_rows)
+compare([ row["i"] for row in rows[:5] ], range(5))
+compare(rows[-1]["x"], (9999 * 37 % 1000) * 0.01)
+kept = [ row for row in table.select("i < 20", reuse=True) if row["i"] % 2 ]
+compare([ row["i"] for row in kept ], range(1, 20, 2))
@@ -0,0 +1,69 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 100000
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+table = hep.table.create("sample1.table", schema)
+table.appendColumns(
+    i=array.array("i", range(num_rows)),
+    x=array.array("d", [ (i * 37 % 1000) * 0.01 for i in range(num_rows) ]))
+
+# Slices of rows skip the rows in between.
+compare([ r["i"] for r in table.rows[::1000] ], range(0, num_rows, 1000))
+compare([ r["i"] for r in table.rows[10:55:7] ], range(10, 55, 7))
+compare([ r["i"] for r in table.rows[-3:] ], range(num_rows - 3, num_rows))
+compare([ r["i"] for r in table.rows[20:10:-4] ], [ 20, 16, 12 ])
+compare([ r["i"] for r in table.iterRows(500, 600)[::30] ],
+        [ 500, 530, 560, 590 ])
+compare([ r["i"] for r in table.rows[5::num_rows * 10] ], [ 5 ])
+compare(list(table.rows[num_rows:]), [])
+compare([ r["i"] for r in table.iterRows(reuse=True)[::25000] ],
+        [ 0, 25000, 50000, 75000 ])
+
+# Selections can't be sliced.
+try:
+    table.select("x > 5")[::2]
+except TypeError:
+    pass
+else:
+    raise AssertionError, "slice of selection not detected"
+
+# A sample includes about the requested fraction of rows, in order.
+rows = [ r["i"] for r in table.sample(0.01, seed=17) ]
+compare(900 < len(rows) < 1100, True)
+compare(rows, sorted(rows))
+compare(len(dict.fromkeys(rows)), len(rows))
+compare(min(rows) >= 0 and max(rows) < num_rows, True)
+
+# The same seed gives the same sample.
+compare([ r["i"] for r in table.sample(0.01, seed=17) ], rows)
+compare([ r["i"] for r in table.sample(fraction=0.01, seed=18) ] == rows,
+        False)
+compare(len(list(table.sample(1.0))), num_rows)
+
+# Sampled rows are selected.
+compare([ r["i"] for r in table.sample(0.01, seed=17, selection="x > 5") ],
+        [ i for i in rows if (i * 37 % 1000) * 0.01 > 5 ])
+table.createIndex("i")
+compare([ r["i"] for r in table.sample(0.01, seed=17, selection="i < 5000") ],
+        [ i for i in rows if i < 5000 ])
+
+for fraction in (0, 1.5):
+    try:
+        table.sample(fraction)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError, "invalid fraction not detected"
@@ -0,0 +1,84 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 100000
+
+def x(i):
+    return (i * 37 % 1000) * 0.01
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("n", "int8")
+schema.addColumn("x", "float64")
+for layout in ("rows", "columns"):
+    table = hep.table.create("skim1-%s.table" % layout, schema, layout=layout)
+    table.appendColumns(
+        i=array.array("i", range(num_rows)),
+        n=array.array("b", [ i % 5 for i in range(num_rows) ]),
+        x=array.array("d", [ x(i) for i in range(num_rows) ]))
+    table.materialize("odd", "i % 2 == 1")
+    table.run = 42
+    del table
+
+for layout in ("rows", "columns"):
+    table = hep.table.open("skim1-%s.table" % layout)
+
+    # The skim has the selected rows, and the table's attributes.
+    skim = table.skim("skim1-%s-a.table" % layout, "x > 9.9 and odd")
+    expected = [ i for i in range(num_rows) if x(i) > 9.9 and i % 2 == 1 ]
+    compare(len(skim), len(expected))
+    compare(list(skim.readColumns(["i"])[0]), expected)
+    compare([ row["n"] for row in skim.iterRows(0, 5) ],
+            [ i % 5 for i in expected[:5] ])
+    compare(skim[7]["x"], x(expected[7]))
+    compare(skim.run, 42)
+    compare(skim.path.endswith("skim1-%s-a.table" % layout), True)
+    del skim, row
+
+    # Materialized columns are computed for the skimmed rows, also when
+    # skimming again into the same path.
+    skim = table.skim("skim1-%s-a.table" % layout, "x < 0.1")
+    expected = [ i for i in range(num_rows) if x(i) < 0.1 ]
+    compare(list(skim.readColumns(["i"])[0]), expected)
+    mask, values = skim.getMaterialized("odd")
+    compare([ mask[n] for n in range(20) ], 20 * [True])
+    compare([ values[n] for n in range(20) ],
+            [ i % 2 == 1 for i in expected[:20] ])
+    compare([ row["i"] for row in skim.select("odd") ],
+            [ i for i in expected if i % 2 == 1 ])
+    del skim, mask, values, row
+
+    # Selections on columns skip blocks using the zone map.
+    skim = table.skim("skim1-%s-b.table" % layout, "i >= 70000 and n == 3",
+                      columns=["x", "i"])
+    compare(sorted(skim.schema.keys()), ["i", "x"])
+    compare(list(skim.readColumns(["i"])[0]), range(70003, num_rows, 5))
+    compare(list(skim.readColumns(["x"])[0]), 
+            [ x(i) for i in range(70003, num_rows, 5) ])
+    del skim
+
+    # Without a selection, all rows are copied.
+    skim = table.skim("skim1-%s-c.table" % layout, None, columns=["n"])
+    compare(len(skim), num_rows)
+    compare(sum(skim.readColumns(["n"])[0]), 2 * num_rows)
+    del skim
+
+    # Only stored columns can be copied.
+    for columns, exception in [(["nosuch"], KeyError), 
+                               (["i", "odd"], ValueError)]:
+        try:
+            table.skim("skim1-%s-d.table" % layout, "i < 10", columns)
+        except exception:
+            pass
+        else:
+            raise AssertionError, "invalid column %r not detected" % columns
+    del table
@@ -0,0 +1,95 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import glob
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 5000
+nan = float("nan")
+
+def evt(i):
+    return (i * 7919) % 1000
+
+def x(i):
+    if i % 97 == 0:
+        return nan
+    return (i * 37 % 100) * 0.5
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("evt", "int16")
+schema.addColumn("x", "float64")
+table = hep.table.create("sort1.table", schema, layout="columns")
+table.appendColumns(
+    i=array.array("i", range(num_rows)),
+    evt=array.array("h", [ evt(i) for i in range(num_rows) ]),
+    x=array.array("d", [ x(i) for i in range(num_rows) ]))
+table.materialize("z", "i % 10")
+table.run = 17
+compare(table.statistics("x").count, num_rows - 52)
+del table
+
+def key(i):
+    # NaNs sort last; equal keys keep their order.
+    value = x(i)
+    return (evt(i), value != value, value, i)
+
+expected = range(num_rows)
+expected.sort(key=key)
+
+# Sort in memory, and in many runs merged in several passes.
+for memory_limit in (1 << 20, 4096):
+    path = "sort1-%d.table" % memory_limit
+    sorted_table = hep.table.sort("sort1.table", path, ["evt", "x"],
+                                  memory_limit=memory_limit)
+    compare(len(sorted_table), num_rows)
+    compare(list(sorted_table.readColumns(["i"])[0]), expected)
+    compare(glob.glob(path + ".sort*"), [])
+
+    # The attributes and statistics are copied, and
+    # materialized columns are computed for the new order.
+    compare(sorted_table.run, 17)
+    compare(sorted_table.path.endswith(path), True)
+    compare(len(sorted_table.statistics_cache), 1)
+    compare([ row["i"] for row in sorted_table.select("z == 3", stop=200) ],
+            [ i for i in expected[:200] if i % 10 == 3 ])
+    compare(sorted_table[10]["x"], x(expected[10]))
+    del sorted_table
+
+# A single key may be given by name.
+sorted_table = hep.table.sort("sort1.table", "sort1-i.table", "i")
+compare(list(sorted_table.readColumns(["i"])[0]), range(num_rows))
+
+# Keys must be columns.
+try:
+    hep.table.sort("sort1.table", "sort1-bad.table", ["nosuch"])
+except KeyError:
+    pass
+else:
+    raise AssertionError, "missing key column not detected"
+
+del sorted_table
+
+# Sorting again into the same path doesn't reuse the materialized
+# values of the earlier table.
+sorted_table = hep.table.sort("sort1.table", "sort1-i.table", ["evt", "x"])
+compare(list(sorted_table.readColumns(["i"])[0]), expected)
+compare([ row["i"] for row in sorted_table.select("z == 3", stop=200) ],
+        [ i for i in expected[:200] if i % 10 == 3 ])
+del sorted_table
+
+# A table can't be sorted onto itself.
+try:
+    hep.table.sort("sort1.table", "./sort1.table", "i")
+except ValueError:
+    pass
+else:
+    raise AssertionError, "sort onto source table not detected"
+compare(len(hep.table.open("sort1.table")), num_rows)
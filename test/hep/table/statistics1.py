@@ -0,0 +1,91 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.hist
+import hep.table
+from   hep.test import compare
+import math
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 10000
+
+def x(i):
+    return (i * 37 % 1000) * 0.01 - 2
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+table = hep.table.create("statistics1.table", schema)
+table.appendColumns(
+    i=array.array("i", range(num_rows)),
+    x=array.array("d", [ x(i) for i in range(num_rows) ]))
+
+def check(statistics, values):
+    compare(statistics.count, len(values))
+    compare(statistics.minimum, min(values))
+    compare(statistics.maximum, max(values))
+    compare(statistics.sum, sum(values), precision=1e-9)
+    compare(statistics.sum_of_squares, sum([ v * v for v in values ]),
+            precision=1e-9)
+    mean = float(sum(values)) / len(values)
+    compare(statistics.mean, mean, precision=1e-9)
+    compare(statistics.variance,
+            sum([ (v - mean) ** 2 for v in values ]) / len(values),
+            precision=1e-6)
+    # Quantiles are approximate.
+    values = list(values)
+    values.sort()
+    for fraction in (0, 0.1, 0.25, 0.5, 0.9, 1):
+        quantile = values[int(fraction * (len(values) - 1))]
+        compare(statistics.quantile(fraction), quantile, 
+                precision=0.03 * abs(quantile) + 0.011)
+
+values = [ x(i) for i in range(num_rows) ]
+check(table.statistics("x"), values)
+check(table.statistics("x * 2 + i", "i % 3 == 0"),
+      [ x(i) * 2 + i for i in range(0, num_rows, 3) ])
+check(table.statistics("i"), range(num_rows))
+
+# Only numerical expressions are summarized.
+try:
+    table.statistics("x > 0")
+except TypeError:
+    pass
+else:
+    raise AssertionError, "statistics of a bool expression not detected"
+
+# No rows are selected.
+statistics = table.statistics("x", "x > 1000")
+compare(statistics.count, 0)
+compare(statistics.minimum, None)
+del table
+
+# The statistics are stored with the table, and extended to rows
+# appended later.
+table = hep.table.open("statistics1.table", update=True)
+compare(len(table.statistics_cache), 4)
+check(table.statistics("x"), values)
+for i in range(num_rows, num_rows + 100):
+    table.append(i=i, x=x(i) + 100)
+    values.append(x(i) + 100)
+check(table.statistics("x"), values)
+del table
+table = hep.table.open("statistics1.table")
+statistics = table.statistics("x")
+compare(statistics.count, num_rows + 100)
+compare(statistics.maximum, max(values))
+
+# The statistics choose the binning of a histogram, filled in a second
+# pass.
+histogram = hep.hist.makeAutoHistogram1D(statistics, float)
+compare(histogram.axis.number_of_bins, 100)
+compare(histogram.axis.range[0] <= statistics.minimum, True)
+compare(histogram.axis.range[1] >= statistics.maximum, True)
+hep.table.project(table, [("x", histogram.accumulate)])
+compare(histogram.getBinContent("underflow"), 0)
+compare(histogram.getBinContent("overflow"), 0)
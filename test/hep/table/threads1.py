@@ -0,0 +1,77 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+from   hep.hist import Histogram1D
+import hep.table
+from   hep.test import compare
+import threading
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+num_rows = 20000
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+for layout in ("rows", "columns"):
+    table = hep.table.create("threads1-%s.table" % layout, schema,
+                             layout=layout)
+    table.appendColumns(
+        i=array.array("i", range(num_rows)),
+        x=array.array("d", [ (i * 37 % 1000) * 0.01 for i in range(num_rows) ]))
+    del table
+
+
+def readRows(table, results, start):
+    # Read rows out of order, so that threads read different rows.
+    total = 0
+    for i in range(start, num_rows, 7) + range(0, start):
+        total += table[i]["i"]
+    results.append(total)
+
+
+def selectRows(table, results):
+    results.append(len(list(table.select("x > 5"))))
+
+
+def projectRows(table, results):
+    histogram = Histogram1D(10, (0.0, 10.0))
+    hep.table.project(table, [("x", histogram.accumulate)])
+    results.append(histogram.getBinContent(7))
+
+
+def readColumns(table, results):
+    results.append(sum(table.readColumns(["i"])[0]))
+
+
+for layout in ("rows", "columns"):
+    # Several threads use the same table at once.
+    table = hep.table.open("threads1-%s.table" % layout, read_ahead=2)
+    results = {}
+    threads = []
+    for n in range(3):
+        for name, function, args in [
+            ("rows", readRows, (n * 1000, )),
+            ("select", selectRows, ()),
+            ("project", projectRows, ()),
+            ("columns", readColumns, ()),
+            ]:
+            result = results.setdefault(name, [])
+            thread = threading.Thread(
+                target=function, args=(table, result) + args)
+            thread.start()
+            threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    compare(results["rows"],
+            [ sum(range(n * 1000, num_rows, 7) + range(0, n * 1000))
+              for n in range(3) ])
+    compare(results["select"], [ 9980 ] * 3)
+    compare(results["project"], [ 2000 ] * 3)
+    compare(results["columns"], [ sum(range(num_rows)) ] * 3)
+    del table
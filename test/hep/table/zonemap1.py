@@ -0,0 +1,68 @@
+#-----------------------------------------------------------------------
+# imports
+#-----------------------------------------------------------------------
+
+import array
+import hep.table
+from   hep.test import compare
+
+#-----------------------------------------------------------------------
+# tests
+#-----------------------------------------------------------------------
+
+# Enough rows for several zone map blocks, the last one partial.
+num_rows = 300000
+
+schema = hep.table.Schema()
+schema.addColumn("i", "int32")
+schema.addColumn("x", "float64")
+schema.addColumn("k", "int16")
+table = hep.table.create("zonemap1.table", schema)
+table.appendColumns(i=array.array("i", range(num_rows)),
+                    x=array.array("d", [ i * 0.5 for i in range(num_rows) ]),
+                    k=array.array("h", [ i % 7 for i in range(num_rows) ]))
+del table
+
+table = hep.table.open("zonemap1.table")
+
+# Bounds implied by selections.
+bounds = hep.table.getSelectionBounds(table, "x > 10 and 20 >= x and k < 3")
+bounds.sort()
+compare(bounds, [ ("k", None, True, 3.0, False),
+                  ("x", 10.0, False, 20.0, True) ])
+compare(hep.table.getSelectionBounds(table, "i == 5 and i <= 7"),
+        [ ("i", 5.0, True, 5.0, True) ])
+compare(hep.table.getSelectionBounds(table, "x < 10 or x > 20"), [])
+compare(hep.table.getSelectionBounds(table, "i * 2 < 10"), [])
+
+# Selections give the same rows with or without skipping blocks.
+for selection, expected in [
+    ("i >= 70000 and i < 70010", range(70000, 70010)),
+    ("x > 140000", range(280001, num_rows)),
+    ("i == 131072 or i == 5", [5, 131072]),
+    ("i < 200000 and k == 3 and x >= 99990",
+     [ i for i in range(199980, 200000) if i % 7 == 3 ]),
+    ("x < 0", []),
+    ]:
+    compare([ row["i"] for row in table.select(selection) ], expected)
+del row, table
+
+# Rows appended later are summarized too.
+table = hep.table.open("zonemap1.table", update=True)
+table.append(i=-1, x=-1.0, k=0)
+compare([ row["_index"] for row in table.select("i < 0") ], [num_rows])
+del row, table
+
+table = hep.table.open("zonemap1.table")
+compare([ row["_index"] for row in table.select("i < 0") ], [num_rows])
+compare(len(list(table.select("i < 10"))), 11)
+del row, table
+
+# Rows appended without metadata aren't summarized, so they must all be
+# scanned.
+table = hep.table.open("zonemap1.table", update=True, with_metadata=False)
+table.append(i=-2, x=-2.0, k=0)
+del table
+
+table = hep.table.open("zonemap1.table")
+compare([ row["i"] for row in table.select("i < 0") ], [-1, -2])